@@ -0,0 +1,138 @@
+// 认证开销基准测试：极小的HEAD请求（stat后返回头部）的请求/秒
+// before：原先的中间件，每个请求解析 Authorization 头（与basic-auth包相同的正则和base64解码）并比较字符串
+// cached：Authenticator，验证通过的头命中缓存
+// file-cached / file-uncached：凭据文件中的scrypt用户，有缓存 / 每个请求都计算哈希（AUTH_CACHE_SIZE=0）
+// 各模式交替运行多轮，取每种模式的中位数
+// 用法: node bench/auth.bench.js [请求数]，默认 4000
+const os = require('os');
+const fs = require('fs');
+const path = require('path');
+const http = require('http');
+const { performance } = require('perf_hooks');
+const { Authenticator, hashPassword, loadCredentialFile } = require('../src/modules/auth');
+
+const REQUESTS = parseInt(process.argv[2]) || 4000;
+const CONCURRENCY = 32;
+const ROUNDS = 7;
+const UNCACHED_REQUESTS = 200; // 每个请求都计算scrypt时很慢，只发送少量请求
+
+const USERNAME = 'admin';
+const PASSWORD = 'password';
+const header = `Basic ${Buffer.from(`${USERNAME}:${PASSWORD}`).toString('base64')}`;
+
+const dir = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-bench-'));
+const filePath = path.join(dir, 'config.yaml');
+fs.writeFileSync(filePath, 'key: value\n');
+
+// 原先的 basicAuthMiddleware（basic-auth包的解析逻辑）
+const CREDENTIALS_REGEXP = /^ *(?:[Bb][Aa][Ss][Ii][Cc]) +([A-Za-z0-9._~+/-]+=*) *$/;
+const USER_PASS_REGEXP = /^([^:]*):(.*)$/;
+const legacyVerify = (authorization, callback) => {
+  const match = CREDENTIALS_REGEXP.exec(authorization || '');
+  const userPass = match && USER_PASS_REGEXP.exec(Buffer.from(match[1], 'base64').toString());
+  callback(userPass && userPass[1] === USERNAME && userPass[2] === PASSWORD ? USERNAME : null);
+};
+
+// 凭据文件中的scrypt用户
+const usersFile = path.join(dir, 'users');
+fs.writeFileSync(usersFile, `${USERNAME}:${hashPassword(PASSWORD)}\n`);
+const fromFile = (cacheSize) => new Authenticator({ hashedUsers: loadCredentialFile(usersFile), cacheSize });
+
+const bindVerify = (authenticator) => authenticator.verify.bind(authenticator);
+const modes = {
+  before: legacyVerify,
+  cached: bindVerify(new Authenticator({ users: { [USERNAME]: PASSWORD } })),
+  'file-cached': bindVerify(fromFile(256)),
+  'file-uncached': bindVerify(fromFile(0))
+};
+
+let verify = modes.before;
+const server = http.createServer((req, res) => {
+  verify(req.headers.authorization, (username) => {
+    if (username === null) {
+      res.writeHead(401);
+      res.end();
+      return;
+    }
+    fs.stat(filePath, (err, stats) => {
+      res.writeHead(200, { 'Content-Length': stats.size, 'Last-Modified': stats.mtime.toUTCString() });
+      res.end();
+    });
+  });
+});
+const agent = new http.Agent({ keepAlive: true, maxSockets: CONCURRENCY });
+
+const measure = async (count) => {
+  const { port } = server.address();
+  let remaining = count;
+  let rejected = 0;
+  const worker = async () => {
+    while (remaining-- > 0) {
+      await new Promise((resolve, reject) => {
+        http.request({ host: '127.0.0.1', port, path: '/config.yaml', method: 'HEAD', agent, headers: { Authorization: header } }, (res) => {
+          if (res.statusCode !== 200) {
+            rejected++;
+          }
+          res.resume();
+          res.on('end', resolve);
+        }).on('error', reject).end();
+      });
+    }
+  };
+  const start = performance.now();
+  await Promise.all(Array.from({ length: CONCURRENCY }, worker));
+  if (rejected > 0) {
+    throw new Error(`${rejected} requests were rejected`);
+  }
+  return count / ((performance.now() - start) / 1000);
+};
+
+// 单次验证的耗时（纳秒），不含HTTP处理
+const measureVerifyCost = (fn) => {
+  const iterations = 200000;
+  const start = performance.now();
+  for (let i = 0; i < iterations; i++) {
+    fn(header, () => {});
+  }
+  return (performance.now() - start) * 1e6 / iterations;
+};
+
+const median = (values) => values.slice().sort((a, b) => a - b)[Math.floor(values.length / 2)];
+
+const main = async () => {
+  await new Promise(resolve => server.listen(0, '127.0.0.1', resolve));
+  const rates = { before: [], cached: [], 'file-cached': [] };
+  for (let round = -1; round < ROUNDS; round++) { // 第一轮为预热
+    const order = Object.keys(rates);
+    if (round % 2 === 1) {
+      order.reverse();
+    }
+    for (const mode of order) {
+      verify = modes[mode];
+      const rate = await measure(REQUESTS);
+      if (round >= 0) {
+        rates[mode].push(rate);
+      }
+    }
+  }
+  verify = modes['file-uncached'];
+  const uncachedRate = await measure(UNCACHED_REQUESTS);
+
+  agent.destroy();
+  server.close();
+  fs.rmSync(dir, { recursive: true, force: true });
+
+  const result = { requests: REQUESTS, concurrency: CONCURRENCY, headRequestsPerSec: {}, verifyNs: {} };
+  for (const [mode, values] of Object.entries(rates)) {
+    result.headRequestsPerSec[mode] = Math.round(median(values));
+    result.verifyNs[mode] = Number(measureVerifyCost(modes[mode]).toFixed(1));
+  }
+  result.headRequestsPerSec['file-uncached'] = Math.round(uncachedRate);
+  result.cachedSpeedupPercent = Number(((result.headRequestsPerSec.cached / result.headRequestsPerSec.before - 1) * 100).toFixed(2));
+  console.log(JSON.stringify(result));
+};
+
+main().catch((err) => {
+  console.error(err);
+  process.exit(1);
+});
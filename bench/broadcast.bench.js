@@ -0,0 +1,101 @@
+// 文件事件广播基准测试：比较逐订阅匹配+逐订阅序列化（旧实现）与索引匹配+单次序列化（当前实现）
+// 用法: node bench/broadcast.bench.js [订阅者数量...]，默认 1000 10000
+const os = require('os');
+const fs = require('fs');
+const path = require('path');
+const SubscriptionManager = require('../src/modules/subscriptions');
+const { isPathMatch } = require('../src/modules/pathMatcher');
+
+// 只测量匹配与分发，不需要原生文件监视
+process.env.WATCHER_BACKEND = process.env.WATCHER_BACKEND || 'polling';
+
+const EVENTS = 200;
+const subscriberCounts = process.argv.slice(2).map(Number).filter(Boolean);
+if (subscriberCounts.length === 0) {
+  subscriberCounts.push(1000, 10000);
+}
+
+// 模拟WebSocket客户端，只统计发送的字节数
+const createClient = () => ({
+  readyState: 1,
+  bufferedAmount: 0,
+  bytes: 0,
+  send(data) {
+    this.bytes += data.length;
+  }
+});
+
+// 每个客户端持有 /**、/* 和精确路径三种订阅
+const subscribeClient = (manager, client, i) => {
+  manager.subscribe(client, `/dev${i % 100}/**`);
+  manager.subscribe(client, `/dev${i % 100}/inbox/*`);
+  manager.subscribe(client, `/dev${i % 100}/config.json`);
+};
+
+const eventPath = (uploadDir, i) => path.join(uploadDir, `dev${i % 100}`, 'inbox', `file${i}.txt`);
+
+// 旧实现：遍历所有客户端的所有订阅，每次匹配都构建通知并序列化两次
+const legacyHandleFileEvent = (manager, eventType, filePath) => {
+  const relativePath = path.relative(manager.uploadDir, filePath);
+  for (const [client, subscriptions] of manager.subscriptions) {
+    for (const subscriptionPath of subscriptions) {
+      if (isPathMatch(relativePath, subscriptionPath)) {
+        const notification = {
+          type: 'fileChange',
+          eventType,
+          path: relativePath,
+          timestamp: new Date().toISOString(),
+          size: 0,
+          mimeType: 'text/plain'
+        };
+        client.send(JSON.stringify(notification));
+        JSON.stringify(notification); // 旧实现中的日志序列化
+      }
+    }
+  }
+};
+
+const measure = (label, fn) => {
+  const start = process.cpuUsage();
+  const startTime = process.hrtime.bigint();
+  for (let i = 0; i < EVENTS; i++) {
+    fn(i);
+  }
+  const cpu = process.cpuUsage(start);
+  const wallMs = Number(process.hrtime.bigint() - startTime) / 1e6;
+  const cpuMsPerEvent = (cpu.user + cpu.system) / 1000 / EVENTS;
+  return { label, cpuMsPerEvent: Number(cpuMsPerEvent.toFixed(3)), wallMs: Number(wallMs.toFixed(1)) };
+};
+
+const uploadDir = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-bench-'));
+const originalLog = console.log;
+
+for (const count of subscriberCounts) {
+  console.log = () => {};
+  const manager = new SubscriptionManager(uploadDir);
+  const clients = [];
+  for (let i = 0; i < count; i++) {
+    const client = createClient();
+    subscribeClient(manager, client, i);
+    clients.push(client);
+  }
+  clients.forEach(client => { client.bytes = 0; });
+
+  const legacy = measure('legacy', i => legacyHandleFileEvent(manager, 'created', eventPath(uploadDir, i)));
+  const legacyBytes = clients.reduce((sum, client) => sum + client.bytes, 0);
+  clients.forEach(client => { client.bytes = 0; });
+
+  const current = measure('indexed', i => manager.handleFileEvent('created', eventPath(uploadDir, i), null));
+  const currentBytes = clients.reduce((sum, client) => sum + client.bytes, 0);
+
+  manager.close();
+  console.log = originalLog;
+  console.log(JSON.stringify({
+    subscribers: count,
+    events: EVENTS,
+    legacy: { ...legacy, bytesSent: legacyBytes },
+    indexed: { ...current, bytesSent: currentBytes }
+  }));
+}
+
+fs.rmSync(uploadDir, { recursive: true, force: true });
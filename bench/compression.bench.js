@@ -0,0 +1,117 @@
+// 压缩基准测试：比较gzip和brotli对PROPFIND响应、JSON目录列表的压缩率和CPU耗时，
+// 以及WebSocket通知帧在permessage-deflate（保留/不保留压缩上下文）下的大小
+// 用法: node bench/compression.bench.js [目录项数量]，默认 1000
+const zlib = require('zlib');
+const { formatPropfindResponse, MULTISTATUS_OPEN, MULTISTATUS_CLOSE } = require('../src/modules/propfind');
+const { compressBuffer } = require('../src/modules/compression');
+
+const ENTRIES = parseInt(process.argv[2]) || 1000;
+const ROUNDS = 20;
+const FRAMES = 1000;
+
+const now = Date.now();
+const resources = Array.from({ length: ENTRIES }, (_, i) => ({
+  path: `/documents/project/report-${i}.txt`,
+  ctime: new Date(now - i * 60000),
+  name: `report-${i}.txt`,
+  isDirectory: i % 10 === 0,
+  size: 1000 + i * 37,
+  mtime: new Date(now - i * 60000),
+  etag: `"${(1000 + i).toString(16)}-${(1000 + i * 37).toString(16)}-${(now * 1000 - i).toString(16)}"`
+}));
+
+const propfindXml = Buffer.from(MULTISTATUS_OPEN + resources.map(formatPropfindResponse).join('') + MULTISTATUS_CLOSE);
+const jsonListing = Buffer.from(JSON.stringify({
+  path: '/documents/project/',
+  items: resources.map(r => ({
+    name: r.name,
+    path: r.path,
+    isDirectory: r.isDirectory,
+    size: r.size,
+    mtime: r.mtime
+  }))
+}));
+
+const measure = async (name, body, encoding, options) => {
+  let compressed = null;
+  const start = process.cpuUsage();
+  for (let i = 0; i < ROUNDS; i++) {
+    compressed = await compressBuffer(encoding, body, options);
+  }
+  const cpu = process.cpuUsage(start);
+  console.log(JSON.stringify({
+    body: name,
+    encoding,
+    options,
+    rawBytes: body.length,
+    compressedBytes: compressed.length,
+    ratio: +(compressed.length / body.length).toFixed(3),
+    cpuMsPerResponse: +((cpu.user + cpu.system) / 1000 / ROUNDS).toFixed(2)
+  }));
+};
+
+// 模拟一个连接上连续发送的文件变更通知帧，分别按独立压缩（无上下文）和共享压缩上下文统计字节数
+const measureFrames = async () => {
+  const frames = Array.from({ length: FRAMES }, (_, i) => Buffer.from(JSON.stringify({
+    type: 'fileChange',
+    eventType: i % 3 === 0 ? 'add' : 'change',
+    path: `documents/project/report-${i % 50}.txt`,
+    subscriptionPath: '/documents/**',
+    timestamp: new Date(now + i).toISOString(),
+    size: 1000 + i,
+    mtime: new Date(now + i).toISOString(),
+    mimeType: 'text/plain',
+    seq: i + 1
+  })));
+  const rawBytes = frames.reduce((total, frame) => total + frame.length, 0);
+
+  for (const level of [1, 3, 6]) {
+    const start = process.cpuUsage();
+    let noContextBytes = 0;
+    for (const frame of frames) {
+      noContextBytes += zlib.deflateRawSync(frame, { level, windowBits: 10, memLevel: 7 }).length;
+    }
+    const noContextCpu = process.cpuUsage(start);
+
+    // 保留上下文：同一个deflate流，每帧以SYNC_FLUSH结束（与permessage-deflate相同）
+    const deflate = zlib.createDeflateRaw({ level, windowBits: 10, memLevel: 7 });
+    let contextBytes = 0;
+    deflate.on('data', (chunk) => {
+      contextBytes += chunk.length;
+    });
+    const contextStart = process.cpuUsage();
+    for (const frame of frames) {
+      deflate.write(frame);
+      await new Promise(resolve => deflate.flush(zlib.constants.Z_SYNC_FLUSH, resolve));
+    }
+    const contextCpu = process.cpuUsage(contextStart);
+    deflate.close();
+
+    console.log(JSON.stringify({
+      body: 'fileChange frames',
+      level,
+      frames: FRAMES,
+      avgFrameBytes: Math.round(rawBytes / FRAMES),
+      rawBytes,
+      noContextBytes,
+      contextTakeoverBytes: contextBytes,
+      noContextCpuMs: +((noContextCpu.user + noContextCpu.system) / 1000).toFixed(2),
+      contextTakeoverCpuMs: +((contextCpu.user + contextCpu.system) / 1000).toFixed(2)
+    }));
+  }
+};
+
+const main = async () => {
+  for (const [name, body] of [['propfind', propfindXml], ['json listing', jsonListing]]) {
+    await measure(name, body, 'gzip', { level: 1 });
+    await measure(name, body, 'gzip', { level: 6 });
+    await measure(name, body, 'br', { brotliQuality: 4 });
+    await measure(name, body, 'br', { brotliQuality: 11 });
+  }
+  await measureFrames();
+};
+
+main().catch((err) => {
+  console.error(err);
+  process.exit(1);
+});
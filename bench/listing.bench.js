@@ -0,0 +1,73 @@
+// 目录列表基准测试：比较不经缓存（每次readdir + 逐个stat）与经由元数据缓存的列表耗时
+// 模拟rclone检查器对同一目录的重复列表请求，每轮之间随机修改一个文件并按监视器事件失效
+// 用法: node bench/listing.bench.js [条目数...]，默认 1000 10000
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { listDirectory } = require('../src/modules/propfind');
+const { MetadataCache } = require('../src/modules/metadataCache');
+
+const ROUNDS = 20;
+
+const listOnce = async (dirPath, options) => {
+  let count = 0;
+  for await (const batch of listDirectory(dirPath, { concurrency: 32, ...options })) {
+    count += batch.length;
+  }
+  return count;
+};
+
+const measure = async (dirPath, count, options, onRound) => {
+  const latencies = [];
+  for (let round = 0; round < ROUNDS; round++) {
+    const start = process.hrtime.bigint();
+    const listed = await listOnce(dirPath, options);
+    latencies.push(Number(process.hrtime.bigint() - start) / 1e6);
+    if (listed !== count) {
+      throw new Error(`Expected ${count} entries, listed ${listed}`);
+    }
+    if (onRound) {
+      onRound(round);
+    }
+  }
+  latencies.sort((a, b) => a - b);
+  return {
+    minMs: Number(latencies[0].toFixed(2)),
+    p50Ms: Number(latencies[Math.floor(ROUNDS / 2)].toFixed(2)),
+    maxMs: Number(latencies[ROUNDS - 1].toFixed(2))
+  };
+};
+
+const main = async () => {
+  const counts = process.argv.slice(2).map(Number).filter(Boolean);
+  if (counts.length === 0) {
+    counts.push(1000, 10000);
+  }
+  const root = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-listing-'));
+  try {
+    for (const count of counts) {
+      const dirPath = path.join(root, String(count));
+      fs.mkdirSync(dirPath, { recursive: true });
+      for (let i = 0; i < count; i++) {
+        fs.writeFileSync(path.join(dirPath, `file-${i}.txt`), '');
+      }
+
+      const uncached = await measure(dirPath, count, {});
+
+      const cache = new MetadataCache({ maxEntries: count * 2 + 16, ttlMs: 60000 });
+      const cached = await measure(dirPath, count, {
+        stat: (filePath) => cache.stat(filePath),
+        readdir: (dir) => cache.readdir(dir)
+      }, (round) => {
+        // 模拟监视器报告的单文件变更
+        cache.handleFileEvent('updated', path.join(dirPath, `file-${round % count}.txt`));
+      });
+
+      console.log(JSON.stringify({ entries: count, rounds: ROUNDS, uncached, cached, cache: cache.getStats() }));
+    }
+  } finally {
+    fs.rmSync(root, { recursive: true, force: true });
+  }
+};
+
+main();
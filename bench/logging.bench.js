@@ -0,0 +1,102 @@
+// 日志开销基准测试：在不同日志级别下测量文件事件的处理速度（事件/秒）
+// info为默认级别；debug输出采样后的逐事件日志；trace输出每个事件和完整的通知内容；
+// trace-sync 与 trace 相同但每行同步写出（相当于原先的 console.log）
+// 日志写入临时文件，以免终端输出速度影响结果
+// 用法: node bench/logging.bench.js [订阅者数量]，默认 5000
+const os = require('os');
+const fs = require('fs');
+const path = require('path');
+const SubscriptionManager = require('../src/modules/subscriptions');
+const { BufferedSink, getDefaultOutput } = require('../src/modules/logger');
+
+// 只测量匹配与分发，不需要原生文件监视
+process.env.WATCHER_BACKEND = process.env.WATCHER_BACKEND || 'polling';
+
+const EVENTS = 5000;
+const EVENTS_PER_TICK = 50; // 每轮事件循环处理的事件数，其间异步日志输出得以写出
+const ROUNDS = 3; // 每个级别运行的轮数，取最快的一轮
+const subscriberCount = parseInt(process.argv[2]) || 5000;
+
+// 模拟WebSocket客户端
+const createClient = () => ({
+  readyState: 1,
+  bufferedAmount: 0,
+  send() {}
+});
+
+// 同步写出每一行的输出
+class SyncSink {
+  constructor(fd) {
+    this.fd = fd;
+  }
+
+  push(line) {
+    fs.writeSync(this.fd, line);
+    return true;
+  }
+
+  flushSync() {}
+}
+
+const uploadDir = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-bench-'));
+const logFile = path.join(uploadDir, 'bench.log');
+const fd = fs.openSync(logFile, 'a'); // 追加模式：每轮截断后从头写入
+const output = getDefaultOutput();
+
+const runLevel = async (manager, level) => {
+  const sync = level.endsWith('-sync');
+  output.setLevel(sync ? level.slice(0, -'-sync'.length) : level);
+  const sink = sync ? new SyncSink(fd) : new BufferedSink({ fd, maxBufferBytes: 64 * 1024 * 1024 });
+  output.stdout = sink;
+  output.stderr = sink;
+  fs.ftruncateSync(fd, 0);
+
+  const start = process.hrtime.bigint();
+  for (let i = 0; i < EVENTS; i += EVENTS_PER_TICK) {
+    for (let j = i; j < i + EVENTS_PER_TICK; j++) {
+      manager.handleFileEvent('updated', path.join(uploadDir, `dev${j % 100}`, 'inbox', `file${j}.txt`), null);
+    }
+    await new Promise(resolve => setImmediate(resolve));
+  }
+  // 等待缓冲中的日志写完，计入总时间
+  while (sink.writing || (sink.lines && sink.lines.length > 0)) {
+    await new Promise(resolve => setTimeout(resolve, 1));
+  }
+  const seconds = Number(process.hrtime.bigint() - start) / 1e9;
+  return {
+    level,
+    eventsPerSec: Math.round(EVENTS / seconds),
+    logBytes: fs.fstatSync(fd).size
+  };
+};
+
+const main = async () => {
+  const manager = new SubscriptionManager(uploadDir);
+  for (let i = 0; i < subscriberCount; i++) {
+    const client = createClient();
+    manager.subscribe(client, `/dev${i % 100}/**`);
+    manager.subscribe(client, `/dev${i % 100}/inbox/*`);
+  }
+
+  await runLevel(manager, 'info'); // 预热
+  const results = [];
+  for (const level of ['info', 'debug', 'trace', 'trace-sync']) {
+    let best = null;
+    for (let round = 0; round < ROUNDS; round++) {
+      const result = await runLevel(manager, level);
+      if (!best || result.eventsPerSec > best.eventsPerSec) {
+        best = result;
+      }
+    }
+    results.push(best);
+  }
+  manager.close();
+  fs.closeSync(fd);
+  fs.rmSync(uploadDir, { recursive: true, force: true });
+  process.stdout.write(JSON.stringify({ subscribers: subscriberCount, events: EVENTS, results }) + '\n');
+};
+
+main().catch((err) => {
+  console.error(err);
+  process.exit(1);
+});
@@ -0,0 +1,205 @@
+// 插桩开销基准测试：比较启用和禁用运行指标（METRICS_ENABLE）时的处理速度
+// 1. 文件事件分发（分发延迟和匹配耗时两个直方图）：事件/秒
+// 2. 极小的HEAD请求（与控制器相同的每请求记录：延迟、请求/响应字节数、stat耗时）：请求/秒
+// 两种模式交替运行多轮，以每轮速度比的中位数估计开销
+// 用法: node bench/metrics.bench.js [订阅者数量]，默认 5000
+const os = require('os');
+const fs = require('fs');
+const path = require('path');
+const http = require('http');
+const EventEmitter = require('events');
+const { performance } = require('perf_hooks');
+const SubscriptionManager = require('../src/modules/subscriptions');
+const { MetricsRegistry } = require('../src/modules/metrics');
+const { setLogLevel } = require('../src/modules/logger');
+
+// 只测量匹配与分发，不需要原生文件监视
+process.env.WATCHER_BACKEND = process.env.WATCHER_BACKEND || 'polling';
+setLogLevel('warn');
+
+const EVENTS = 1000; // 每轮的事件数
+const REQUESTS = 4000; // 每轮的请求数
+const CONCURRENCY = 32;
+const ROUNDS = 15;
+const subscriberCount = parseInt(process.argv[2]) || 5000;
+
+const uploadDir = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-bench-'));
+fs.writeFileSync(path.join(uploadDir, 'config.yaml'), 'key: value\n');
+
+const enabledRegistry = new MetricsRegistry();
+const disabledRegistry = new MetricsRegistry({ enabled: false });
+
+// 同一个订阅管理器，按模式切换它使用的直方图，避免两个实例的堆状态不同影响结果
+const manager = new SubscriptionManager(uploadDir, { metrics: enabledRegistry });
+for (let i = 0; i < subscriberCount; i++) {
+  const client = { readyState: 1, bufferedAmount: 0, send() {} };
+  manager.subscribe(client, `/dev${i % 100}/**`);
+  manager.subscribe(client, `/dev${i % 100}/inbox/*`);
+  manager.subscribe(client, `/dev${i % 100}/config.json`);
+}
+const histogramsFor = (registry) => ({
+  fanoutLatency: registry.histogram('event_fanout', 'fanout'),
+  matchLatency: registry.histogram('event_match', 'match'),
+  requestLatency: registry.histogram('webdav_request_duration', 'latency', { labelName: 'method' }),
+  requestBytes: registry.histogram('webdav_request', 'in', { unit: 'bytes', labelName: 'method' }),
+  responseBytes: registry.histogram('webdav_response', 'out', { unit: 'bytes', labelName: 'method' }),
+  fsLatency: registry.histogram('fs_operation_duration', 'fs', { labelName: 'operation' })
+});
+const modes = { disabled: histogramsFor(disabledRegistry), enabled: histogramsFor(enabledRegistry) };
+let current = modes.enabled;
+const useMode = (mode) => {
+  current = modes[mode];
+  manager.fanoutLatency = current.fanoutLatency;
+  manager.matchLatency = current.matchLatency;
+};
+
+const measureEvents = () => {
+  const start = performance.now();
+  for (let i = 0; i < EVENTS; i++) {
+    manager.handleFileEvent('updated', path.join(uploadDir, `dev${i % 100}`, 'inbox', `file${i}.txt`), null);
+  }
+  return EVENTS / ((performance.now() - start) / 1000);
+};
+
+// 与控制器相同的每请求插桩
+const filePath = path.join(uploadDir, 'config.yaml');
+const server = http.createServer((req, res) => {
+  const { requestLatency, requestBytes, responseBytes, fsLatency } = current;
+  const startedAt = performance.now();
+  const socket = req.socket;
+  res.on('close', () => {
+    requestLatency.recordSince(startedAt, req.method);
+    requestBytes.record(socket.bytesRead - (socket.sdavBytesRead || 0), req.method);
+    responseBytes.record(socket.bytesWritten - (socket.sdavBytesWritten || 0), req.method);
+    socket.sdavBytesRead = socket.bytesRead;
+    socket.sdavBytesWritten = socket.bytesWritten;
+  });
+  const statStartedAt = performance.now();
+  fs.stat(filePath, (err, stats) => {
+    fsLatency.recordSince(statStartedAt, 'stat');
+    res.writeHead(200, { 'Content-Length': stats.size, 'Last-Modified': stats.mtime.toUTCString() });
+    res.end();
+  });
+});
+const agent = new http.Agent({ keepAlive: true, maxSockets: CONCURRENCY });
+
+const measureRequests = async () => {
+  const { port } = server.address();
+  let remaining = REQUESTS;
+  const worker = async () => {
+    while (remaining-- > 0) {
+      await new Promise((resolve, reject) => {
+        http.request({ host: '127.0.0.1', port, path: '/config.yaml', method: 'HEAD', agent }, (res) => {
+          res.resume();
+          res.on('end', resolve);
+        }).on('error', reject).end();
+      });
+    }
+  };
+  const start = performance.now();
+  await Promise.all(Array.from({ length: CONCURRENCY }, worker));
+  return REQUESTS / ((performance.now() - start) / 1000);
+};
+
+// 插桩本身的开销：每个事件两次 performance.now() 与两次记录
+const measureRecordCost = () => {
+  const registry = new MetricsRegistry();
+  const fanoutLatency = registry.histogram('event_fanout', 'fanout');
+  const matchLatency = registry.histogram('event_match', 'match');
+  const iterations = 1000000;
+  const start = performance.now();
+  for (let i = 0; i < iterations; i++) {
+    const startedAt = performance.now();
+    matchLatency.recordSince(startedAt);
+    fanoutLatency.recordSince(startedAt);
+  }
+  return (performance.now() - start) * 1e6 / iterations;
+};
+
+// 每个请求的插桩开销：注册close监听、三次 performance.now() 与四次记录
+const measureRequestRecordCost = () => {
+  const { requestLatency, requestBytes, responseBytes, fsLatency } = histogramsFor(new MetricsRegistry());
+  const socket = { bytesRead: 0, bytesWritten: 0, sdavBytesRead: 0, sdavBytesWritten: 0 };
+  const iterations = 200000;
+  const start = performance.now();
+  for (let i = 0; i < iterations; i++) {
+    const res = new EventEmitter();
+    const startedAt = performance.now();
+    res.on('close', () => {
+      requestLatency.recordSince(startedAt, 'HEAD');
+      requestBytes.record(socket.bytesRead - (socket.sdavBytesRead || 0), 'HEAD');
+      responseBytes.record(socket.bytesWritten - (socket.sdavBytesWritten || 0), 'HEAD');
+      socket.sdavBytesRead = socket.bytesRead;
+      socket.sdavBytesWritten = socket.bytesWritten;
+    });
+    const statStartedAt = performance.now();
+    fsLatency.recordSince(statStartedAt, 'stat');
+    res.emit('close');
+  }
+  const withInstrumentation = performance.now() - start;
+  const baselineStart = performance.now();
+  for (let i = 0; i < iterations; i++) {
+    new EventEmitter().emit('close');
+  }
+  return (withInstrumentation - (performance.now() - baselineStart)) * 1e6 / iterations;
+};
+
+const median = (values) => values.slice().sort((a, b) => a - b)[Math.floor(values.length / 2)];
+
+// 交替运行两种模式，以每轮的速度比的中位数估计开销
+const compare = async (measure) => {
+  const ratios = [];
+  const rates = { disabled: [], enabled: [] };
+  for (let round = 0; round < ROUNDS; round++) {
+    const order = round % 2 === 0 ? ['disabled', 'enabled'] : ['enabled', 'disabled'];
+    const result = {};
+    for (const mode of order) {
+      useMode(mode);
+      result[mode] = await measure();
+      rates[mode].push(result[mode]);
+    }
+    ratios.push(result.enabled / result.disabled);
+  }
+  return {
+    disabledPerSec: Math.round(median(rates.disabled)),
+    enabledPerSec: Math.round(median(rates.enabled)),
+    overheadPercent: Number(((1 - median(ratios)) * 100).toFixed(2))
+  };
+};
+
+const main = async () => {
+  await new Promise(resolve => server.listen(0, '127.0.0.1', resolve));
+  measureEvents(); // 预热
+  await measureRequests();
+
+  const fileEvents = await compare(measureEvents);
+  const headRequests = await compare(measureRequests);
+  const recordNsPerEvent = measureRecordCost();
+  const recordNsPerRequest = measureRequestRecordCost();
+
+  agent.destroy();
+  server.close();
+  manager.close();
+  fs.rmSync(uploadDir, { recursive: true, force: true });
+
+  console.log(JSON.stringify({
+    subscribers: subscriberCount,
+    fileEvents: {
+      ...fileEvents,
+      // 由单次插桩的耗时和每个事件（请求）的处理时间计算，不受运行间波动影响
+      instrumentationNsPerEvent: Number(recordNsPerEvent.toFixed(1)),
+      computedOverheadPercent: Number((recordNsPerEvent / (1e9 / fileEvents.disabledPerSec) * 100).toFixed(3))
+    },
+    headRequests: {
+      ...headRequests,
+      instrumentationNsPerRequest: Number(recordNsPerRequest.toFixed(1)),
+      computedOverheadPercent: Number((recordNsPerRequest / (1e9 / headRequests.disabledPerSec) * 100).toFixed(3))
+    },
+    fanout: enabledRegistry.snapshot().histograms.event_fanout_seconds
+  }));
+};
+
+main().catch((err) => {
+  console.error(err);
+  process.exit(1);
+});
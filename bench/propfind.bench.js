@@ -0,0 +1,102 @@
+// PROPFIND基准测试：比较旧实现（readdir + 逐个串行stat + 字符串拼接整个XML）与
+// 当前实现（opendir + 有界并发stat + 分块流式写出）在大目录上的耗时和峰值RSS
+// 用法: node bench/propfind.bench.js [条目数...]，默认 10000 100000
+// 每种实现在独立子进程中运行，保证峰值RSS互不影响
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { fork } = require('child_process');
+const { Writable } = require('stream');
+const { streamPropfind, formatPropfindResponse, MULTISTATUS_OPEN, MULTISTATUS_CLOSE } = require('../src/modules/propfind');
+
+// 模拟HTTP响应：丢弃数据但保留背压语义
+const createSink = () => {
+  const sink = new Writable({
+    highWaterMark: 64 * 1024,
+    write(chunk, encoding, callback) {
+      sink.bytes += chunk.length;
+      setImmediate(callback);
+    }
+  });
+  sink.bytes = 0;
+  return sink;
+};
+
+const legacyPropfind = async (dirPath, res) => {
+  const stats = await fs.promises.stat(dirPath);
+  const resources = [{ path: '/', isDirectory: true, size: stats.size, mtime: stats.mtime, ctime: stats.ctime }];
+  for (const item of await fs.promises.readdir(dirPath)) {
+    const itemStats = await fs.promises.stat(path.join(dirPath, item));
+    resources.push({
+      path: path.posix.join('/', item),
+      isDirectory: itemStats.isDirectory(),
+      size: itemStats.size,
+      mtime: itemStats.mtime,
+      ctime: itemStats.ctime
+    });
+  }
+  let xml = MULTISTATUS_OPEN;
+  for (const resource of resources) {
+    xml += formatPropfindResponse(resource);
+  }
+  xml += MULTISTATUS_CLOSE;
+  await new Promise(resolve => res.end(xml, resolve));
+};
+
+const streamedPropfind = async (dirPath, res) => {
+  const stats = await fs.promises.stat(dirPath);
+  await streamPropfind(res, { filePath: dirPath, href: '/', stats, depth: 1, concurrency: 32 });
+  await new Promise(resolve => res.on('finish', resolve));
+};
+
+const runChild = async (mode, dirPath) => {
+  let peakRss = process.memoryUsage().rss;
+  const sampler = setInterval(() => {
+    peakRss = Math.max(peakRss, process.memoryUsage().rss);
+  }, 5);
+  const sink = createSink();
+  const start = process.hrtime.bigint();
+  await (mode === 'legacy' ? legacyPropfind : streamedPropfind)(dirPath, sink);
+  const latencyMs = Number(process.hrtime.bigint() - start) / 1e6;
+  clearInterval(sampler);
+  peakRss = Math.max(peakRss, process.memoryUsage().rss);
+  process.send({ mode, latencyMs: Number(latencyMs.toFixed(1)), peakRssMb: Number((peakRss / 1048576).toFixed(1)), bytes: sink.bytes });
+};
+
+const createTree = (dirPath, count) => {
+  fs.mkdirSync(dirPath, { recursive: true });
+  for (let i = 0; i < count; i++) {
+    fs.writeFileSync(path.join(dirPath, `file-${i}.txt`), '');
+  }
+};
+
+const runInChild = (mode, dirPath) => new Promise((resolve, reject) => {
+  const child = fork(__filename, ['--child', mode, dirPath]);
+  child.on('message', resolve);
+  child.on('error', reject);
+});
+
+const main = async () => {
+  const counts = process.argv.slice(2).map(Number).filter(Boolean);
+  if (counts.length === 0) {
+    counts.push(10000, 100000);
+  }
+  const root = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-propfind-'));
+  try {
+    for (const count of counts) {
+      const dirPath = path.join(root, String(count));
+      createTree(dirPath, count);
+      const legacy = await runInChild('legacy', dirPath);
+      const streamed = await runInChild('streamed', dirPath);
+      console.log(JSON.stringify({ entries: count, legacy, streamed }));
+    }
+  } finally {
+    fs.rmSync(root, { recursive: true, force: true });
+  }
+};
+
+if (process.argv[2] === '--child') {
+  runChild(process.argv[3], process.argv[4]).then(() => process.exit(0));
+} else {
+  main();
+}
@@ -1,8 +1,9 @@
 module.exports = {
   apps: [{
     name: 'sdav',
-    script: './src/server.js',
-    // 在Docker容器中，使用单个实例的fork模式以避免文件监视重复问题和IPC复杂性
+    script: './src/clusterServer.js',
+    // pm2只管理一个主进程；主进程按WORKER_COUNT自行启动HTTP/WebSocket工作进程，
+    // 文件监视器只在主进程中运行一次，事件经IPC广播给工作进程（不能使用pm2的cluster模式，否则每个实例都会启动监视器）
     instances: 1,  // 固定为1个实例
     exec_mode: 'fork',  // 使用fork模式而非cluster
     max_memory_restart: '4G',  // 增加内存限制以支持大文件处理
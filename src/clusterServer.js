@@ -0,0 +1,107 @@
+const cluster = require("cluster");
+const os = require("os");
+const fs = require("fs");
+const path = require("path");
+require("dotenv").config();
+
+// 集群模式入口
+// 主进程只运行唯一的文件监视器（SubscriptionManager），经IPC把规范化后的文件事件广播给工作进程；
+// 每个工作进程运行完整的HTTP/WebSocket服务（server.js），共享监听端口，各自匹配本进程客户端的订阅
+// WORKER_COUNT 未设置或为0时按CPU核数启动，为1时直接以单进程模式运行 server.js
+
+const availableCores = typeof os.availableParallelism === 'function' ? os.availableParallelism() : os.cpus().length;
+const WORKER_COUNT = parseInt(process.env.WORKER_COUNT) || availableCores;
+const WORKER_RESTART_DELAY_MS = parseInt(process.env.WORKER_RESTART_DELAY_MS) || 1000; // 工作进程意外退出后重启前的等待时间
+const SHUTDOWN_TIMEOUT_MS = 10000; // 关闭时等待工作进程退出的最长时间
+
+if (WORKER_COUNT <= 1) {
+  require("./server");
+} else {
+  startPrimary();
+}
+
+function startPrimary() {
+  const SubscriptionManager = require('./modules/subscriptions');
+  const { ClusterEventHub } = require('./modules/clusterBus');
+  const { createContentHashIndex } = require('./modules/contentHashIndex');
+  const { createLogger } = require('./modules/logger');
+  const log = createLogger('Cluster');
+
+  const absoluteUploadDir = path.resolve(process.env.UPLOAD_DIR || "./uploads");
+  fs.mkdirSync(absoluteUploadDir, { recursive: true });
+
+  // 监视器、变更日志和事件日志只存在于主进程，所有序列号都在这里分配
+  const subscriptionManager = new SubscriptionManager(absoluteUploadDir);
+  // 内容哈希也只在主进程计算，工作进程持有索引的副本
+  const contentHashIndex = createContentHashIndex(subscriptionManager);
+  const hub = new ClusterEventHub(subscriptionManager, { hashIndex: contentHashIndex });
+  let shuttingDown = false;
+
+  cluster.setupPrimary({ exec: path.join(__dirname, "server.js") });
+
+  const forkWorker = () => {
+    const worker = cluster.fork({ SDAV_CLUSTER_WORKER: 'true' });
+    hub.addWorker(worker);
+    return worker;
+  };
+
+  cluster.on('online', (worker) => {
+    log.info(`Worker ${worker.process.pid} online`);
+  });
+
+  cluster.on('exit', (worker, code, signal) => {
+    if (shuttingDown) {
+      return;
+    }
+    log.warn(`Worker ${worker.process.pid} exited (${signal || code}), restarting in ${WORKER_RESTART_DELAY_MS}ms`);
+    setTimeout(() => {
+      if (!shuttingDown) {
+        forkWorker();
+      }
+    }, WORKER_RESTART_DELAY_MS);
+  });
+
+  log.info(`SDAV cluster primary ${process.pid} starting ${WORKER_COUNT} workers`);
+  for (let i = 0; i < WORKER_COUNT; i++) {
+    forkWorker();
+  }
+
+  const shutdown = (signal) => {
+    if (shuttingDown) {
+      return;
+    }
+    shuttingDown = true;
+    log.info(`Received ${signal}, stopping workers`);
+    for (const worker of Object.values(cluster.workers)) {
+      worker.process.kill('SIGTERM');
+    }
+    const finish = () => {
+      if (contentHashIndex) {
+        contentHashIndex.close();
+      }
+      subscriptionManager.close();
+      process.exit(0);
+    };
+    const timer = setTimeout(finish, SHUTDOWN_TIMEOUT_MS);
+    timer.unref();
+    cluster.on('exit', () => {
+      if (Object.keys(cluster.workers).length === 0) {
+        clearTimeout(timer);
+        finish();
+      }
+    });
+  };
+  process.on('SIGTERM', () => shutdown('SIGTERM'));
+  process.on('SIGINT', () => shutdown('SIGINT'));
+
+  // 定期输出主进程的事件指标（各工作进程输出自己的连接和推送指标）
+  setInterval(() => {
+    const metrics = subscriptionManager.getPerformanceMetrics();
+    const busStats = hub.getStats();
+    const watcher = metrics.watcher;
+    const inotifyRemaining = watcher.inotify ? watcher.inotify.remaining : 'n/a';
+    const hashStats = contentHashIndex ? contentHashIndex.getStats() : null;
+    const hashSummary = hashStats ? `${hashStats.entries} indexed, ${hashStats.pending} pending` : 'disabled';
+    log.info(`Cluster Metrics - Workers: ${busStats.workers}, Events: ${metrics.totalFileEvents}, Coalesced: ${metrics.eventCoalescing.eventsAbsorbed}, Broadcast: ${busStats.eventsBroadcast}, IPC Batches: ${busStats.batchesSent}, Worker Messages: ${busStats.messagesFromWorkers}, Watched Dirs: ${watcher.watchedDirectories}, Polling Roots: ${watcher.pollingRoots}, inotify Remaining: ${inotifyRemaining}, Content Hashes: ${hashSummary}`);
+  }, 30000).unref();
+}
@@ -1,19 +1,35 @@
-const basicAuth = require("basic-auth");
+const { createAuthenticator } = require("../modules/auth");
 
-const USERNAME = process.env.USERNAME || "admin";
-const PASSWORD = process.env.PASSWORD || "password";
+// 进程内共享的认证器：WebDAV请求（中间件）和WebSocket认证使用同一个已验证凭据缓存
+// 用户来自 AUTH_USERS_FILE（scrypt哈希）或 USERNAME/PASSWORD，见 ../modules/auth.js
+const authenticator = createAuthenticator();
+
+const rejectRequest = (res) => {
+  res.set("WWW-Authenticate", "Basic realm=\"SDAV File Server\"");
+  res.status(401).json({
+    error: "Authentication required"
+  });
+};
+
+// 同时进行的哈希计算已达上限时，建议客户端重试的秒数
+const BUSY_RETRY_AFTER_SECONDS = 1;
 
 const basicAuthMiddleware = (req, res, next) => {
-  const credentials = basicAuth(req);
-  
-  if (!credentials || credentials.name !== USERNAME || credentials.pass !== PASSWORD) {
-    res.set("WWW-Authenticate", "Basic realm=\"SDAV File Server\"");
-    return res.status(401).json({ 
-      error: "Authentication required" 
-    });
-  }
-  
-  next();
+  authenticator.verify(req.headers.authorization, (username, busy) => {
+    if (busy) {
+      // 凭据尚未验证：返回503而不是401，客户端不会把它当作错误的密码
+      res.set("Retry-After", String(BUSY_RETRY_AFTER_SECONDS));
+      res.status(503).json({
+        error: "Authentication busy, retry later"
+      });
+      return;
+    }
+    if (username === null) {
+      rejectRequest(res);
+      return;
+    }
+    next();
+  });
 };
 
-module.exports = { basicAuthMiddleware };
\ No newline at end of file
+module.exports = { authenticator, basicAuthMiddleware, BUSY_RETRY_AFTER_SECONDS };
@@ -0,0 +1,27 @@
+// 文件系统读写相关配置
+
+// 解析带单位的大小（如 1mb、128M、64k），无法解析时返回默认值
+const parseSize = (value, defaultValue) => {
+  const match = /^\s*(\d+(?:\.\d+)?)\s*([kmg]?)b?\s*$/i.exec(String(value || ''));
+  if (!match) {
+    return defaultValue;
+  }
+  const multipliers = { '': 1, k: 1024, m: 1024 * 1024, g: 1024 * 1024 * 1024 };
+  return Math.floor(parseFloat(match[1]) * multipliers[match[2].toLowerCase()]);
+};
+
+const FS_SYNC_ON_CLOSE = process.env.FS_SYNC_ON_CLOSE === 'true'; // 写入完成后fsync再替换目标文件
+const FS_READ_AHEAD = parseSize(process.env.FS_READ_AHEAD, 128 * 1024 * 1024); // 单个读取流最多预读多少字节
+const FS_BUFFER_MULTIPLE = parseInt(process.env.FS_BUFFER_MULTIPLE) || 4; // 上传写入流缓冲区为传输块大小的倍数
+const WEBDAV_STREAM_CHUNK_SIZE = parseSize(process.env.WEBDAV_STREAM_CHUNK_SIZE, 1024 * 1024); // 流式传输块大小
+// 每个下载读取流的缓冲区大小：每个并发下载都预留一份（见ioScheduler的缓冲区预算），不随写入缓冲放大
+const WEBDAV_READ_BUFFER_SIZE = parseSize(process.env.WEBDAV_READ_BUFFER_SIZE, 1024 * 1024);
+
+module.exports = {
+  parseSize,
+  syncOnClose: FS_SYNC_ON_CLOSE,
+  // 上传写入流的缓冲区大小
+  writeHighWaterMark: WEBDAV_STREAM_CHUNK_SIZE * FS_BUFFER_MULTIPLE,
+  // 下载读取流的缓冲区大小，不超过预读上限
+  readHighWaterMark: Math.min(FS_READ_AHEAD, WEBDAV_READ_BUFFER_SIZE)
+};
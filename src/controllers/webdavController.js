@@ -1,11 +1,54 @@
 const express = require('express');
 const path = require('path');
 const fs = require('fs-extra');
-const { createReadStream, createWriteStream } = require('fs');
-const { pipeline } = require('stream');
-const { promisify } = require('util');
-
-const pipelineAsync = promisify(pipeline);
+const { createReadStream } = require('fs');
+const { performance } = require('perf_hooks');
+const { parseDepth, streamPropfind, listDirectory } = require('../modules/propfind');
+const { MetadataCache } = require('../modules/metadataCache');
+const { ContentCache } = require('../modules/contentCache');
+const { computeEtag, evaluatePreconditions } = require('../modules/conditionalRequest');
+const { copyTree, moveTree, isSameOrInside, parseDestination } = require('../modules/fileTransfer');
+const { writeFileAtomic, isTempFileName } = require('../modules/atomicWrite');
+const storageConfig = require('../config/storage');
+const { IoScheduler, QueueFullError } = require('../modules/ioScheduler');
+const { negotiateEncoding, createCompressionStream, compressBuffer, weakEtag } = require('../modules/compression');
+const { getMimeType, isCompressibleType } = require('../modules/mimeTypes');
+const { parseRangeHeader, isRangeFresh, buildMultipartRanges, streamMultipartRanges } = require('../modules/httpRange');
+const { ChunkedUploadStore, UploadConflictError, STAGING_DIR_NAME, parseContentRange } = require('../modules/chunkedUpload');
+const { STATE_DIR_NAME } = require('../modules/contentHashIndex');
+const { DedupUploader, parseDeclaredContent } = require('../modules/dedupUpload');
+const { encodeSyncToken, decodeSyncToken, collectChanges, normalizeRelative } = require('../modules/changeFeed');
+const { createLogger } = require('../modules/logger');
+const { getDefaultRegistry } = require('../modules/metrics');
+
+const log = createLogger('WebDAV');
+
+// PROPFIND获取子项状态时的最大并发数
+const PROPFIND_STAT_CONCURRENCY = parseInt(process.env.PROPFIND_STAT_CONCURRENCY) || 32;
+
+// 是否接受带Content-Range的可续传分块上传，以及未完成上传的暂存文件保留多久
+const CHUNKED_UPLOAD_ENABLE = process.env.CHUNKED_UPLOAD_ENABLE === 'true';
+const CHUNKED_UPLOAD_TTL_MS = parseInt(process.env.CHUNKED_UPLOAD_TTL_MS) || 24 * 60 * 60 * 1000;
+
+// 下载（文件读取流）的并发限制：全局、每个客户端IP，以及最多排队的请求数；
+// 每个读取流预留 readHighWaterMark 大小的缓冲，总预留不超过缓冲区预算
+const ioScheduler = new IoScheduler({
+  maxConcurrent: parseInt(process.env.WEBDAV_MAX_CONCURRENT_READS) || 32,
+  maxPerClient: parseInt(process.env.MAX_CONNECTIONS_PER_IP) || 8,
+  maxQueueLength: parseInt(process.env.WEBDAV_READ_QUEUE_LIMIT) || 1000,
+  bufferBudget: storageConfig.parseSize(process.env.WEBDAV_READ_BUFFER_BUDGET, 256 * 1024 * 1024)
+});
+
+// 响应压缩：支持的编码（按优先顺序，off表示关闭）、最小压缩大小、按需压缩的文本类下载的最大文件大小
+const HTTP_COMPRESSION = (process.env.HTTP_COMPRESSION || 'br,gzip').split(',')
+  .map(encoding => encoding.trim().toLowerCase())
+  .filter(encoding => encoding === 'br' || encoding === 'gzip');
+const HTTP_COMPRESSION_MIN_SIZE = storageConfig.parseSize(process.env.HTTP_COMPRESSION_MIN_SIZE, 1024);
+const HTTP_COMPRESSION_MAX_FILE_SIZE = storageConfig.parseSize(process.env.HTTP_COMPRESSION_MAX_FILE_SIZE, 64 * 1024 * 1024);
+const compressionOptions = {
+  level: parseInt(process.env.HTTP_COMPRESSION_LEVEL) || 6,
+  brotliQuality: parseInt(process.env.HTTP_COMPRESSION_BROTLI_QUALITY) || 4
+};
 
 // 默认上传目录
 let UPLOAD_DIR = process.env.UPLOAD_DIR || "./uploads";
@@ -47,36 +90,199 @@ const safePathJoin = (basePath, relativePath) => {
 // 存储WebSocket订阅管理器
 let subscriptionManager = null;
 
+// 运行指标（见 metrics.js）：各WebDAV方法的处理延迟和传输字节数、文件系统stat/readdir的耗时、正在进行的下载
+const metrics = getDefaultRegistry();
+const requestLatency = metrics.histogram('webdav_request_duration', 'WebDAV request latency until the response is finished or aborted', { labelName: 'method' });
+const requestBytes = metrics.histogram('webdav_request', 'Bytes received per WebDAV request, including headers', { unit: 'bytes', labelName: 'method' });
+const responseBytes = metrics.histogram('webdav_response', 'Bytes sent per WebDAV response, including headers', { unit: 'bytes', labelName: 'method' });
+const fsLatency = metrics.histogram('fs_operation_duration', 'Filesystem stat/readdir latency (metadata cache misses and uncached stats)', { labelName: 'operation' });
+metrics.gauge('webdav_active_streams', 'File download streams currently open', () => ioScheduler.active);
+metrics.gauge('webdav_queued_reads', 'Downloads waiting for a read permit', () => ioScheduler.queued);
+
+// 请求结束时记录延迟和字节数；字节数按连接累计值的差计算（同一keep-alive连接上的请求依次结算）
+const trackRequest = (req, res) => {
+  const startedAt = performance.now();
+  const socket = req.socket;
+  res.on('close', () => {
+    requestLatency.recordSince(startedAt, req.method);
+    const bytesRead = socket.bytesRead;
+    const bytesWritten = socket.bytesWritten;
+    requestBytes.record(bytesRead - (socket.sdavBytesRead || 0), req.method);
+    responseBytes.record(bytesWritten - (socket.sdavBytesWritten || 0), req.method);
+    socket.sdavBytesRead = bytesRead;
+    socket.sdavBytesWritten = bytesWritten;
+  });
+};
+
+// 文件元数据缓存（stat结果与目录列表）
+// 只缓存监视器覆盖的路径，由监视器事件和本控制器自身的变更精确失效，TTL仅作兜底
+const fileCacheExpiry = parseInt(process.env.FILE_CACHE_EXPIRY);
+const metadataCache = new MetadataCache({
+  maxEntries: parseInt(process.env.METADATA_CACHE_SIZE) || 50000,
+  ttlMs: (Number.isNaN(fileCacheExpiry) ? 60 : fileCacheExpiry) * 1000,
+  isCacheable: (filePath) => Boolean(subscriptionManager) && subscriptionManager.isPathCacheable(filePath),
+  observe: (operation, durationMs) => fsLatency.record(durationMs * 1000, operation)
+});
+const cachedStat = (filePath) => metadataCache.stat(filePath);
+const cachedReaddir = (dirPath) => metadataCache.readdir(dirPath);
+
+// 小文件内容缓存：总字节预算（0表示关闭）和可缓存的最大文件大小
+// 命中时直接返回内存中的Buffer和预先计算的响应头，不打开文件，也不需要读取许可
+const contentCache = new ContentCache({
+  maxBytes: storageConfig.parseSize(process.env.CONTENT_CACHE_SIZE, 64 * 1024 * 1024),
+  maxFileSize: storageConfig.parseSize(process.env.CONTENT_CACHE_MAX_FILE_SIZE, 256 * 1024)
+});
+metrics.counter('content_cache_hits_total', 'Downloads served from the in-memory content cache without reading the file', () => contentCache.stats.hits);
+metrics.counter('content_cache_misses_total', 'Downloads of cacheable files that read the file into the content cache', () => contentCache.stats.misses);
+metrics.counter('content_cache_served_bytes_total', 'Response body bytes served from the content cache', () => contentCache.stats.bytesServed);
+metrics.gauge('content_cache_bytes', 'Bytes held by the content cache', () => contentCache.bytes);
+
 // 设置订阅管理器的函数
 exports.setSubscriptionManager = (manager) => {
   subscriptionManager = manager;
+  metadataCache.clear();
+  contentCache.clear();
+  manager.on('watcherEvent', (eventType, filePath) => {
+    metadataCache.handleFileEvent(eventType, filePath);
+    contentCache.handleFileEvent(eventType, filePath);
+  });
+  manager.on('watcherError', () => {
+    metadataCache.clear();
+    contentCache.clear();
+  });
+};
+
+// 内容哈希索引（ContentHashIndex）：lookup(filePath, stats) 返回与文件当前状态一致的sha256或null，只查询不计算
+let contentHashIndex = null;
+// 去重上传（DEDUP_UPLOAD：reflink默认，不支持时在服务器上复制；hardlink显式启用硬链接；off关闭），依赖内容哈希索引
+let dedupUploader = null;
+
+exports.setContentHashIndex = (index) => {
+  contentHashIndex = index;
+  dedupUploader = new DedupUploader({
+    index,
+    mode: process.env.DEDUP_UPLOAD || 'reflink',
+    fsync: storageConfig.syncOnClose
+  });
+};
+
+const lookupContentHash = (filePath, stats) => (contentHashIndex ? contentHashIndex.lookup(filePath, stats) : null);
+
+// 增量同步查询每页最多返回的条目数
+const SYNC_PAGE_SIZE = parseInt(process.env.SYNC_PAGE_SIZE) || 10000;
+
+// 批量哈希查询每次最多接受的哈希数
+const CONTENT_HASH_QUERY_LIMIT = parseInt(process.env.CONTENT_HASH_QUERY_LIMIT) || 1000;
+const SHA256_PATTERN = /^[0-9a-f]{64}$/;
+
+// 资源的当前ETag：只由inode/大小/mtime生成，后台哈希计算完成前后保持不变
+const etagFor = (filePath, stats) => computeEtag(stats);
+
+// 不经缓存获取文件状态，用于写操作的前置条件判断，不存在时返回null
+const freshStat = async (filePath) => {
+  const startedAt = performance.now();
+  try {
+    return await fs.stat(filePath);
+  } catch (err) {
+    if (err.code === 'ENOENT' || err.code === 'ENOTDIR') {
+      return null;
+    }
+    throw err;
+  } finally {
+    fsLatency.recordSince(startedAt, 'stat');
+  }
+};
+
+// 分块上传暂存区（在createWebDAVHandler中按上传目录创建）
+let chunkedUploads = null;
+
+// 目录列表中隐藏服务器内部使用的暂存目录、状态目录和上传中的临时文件
+const isVisibleEntry = (name) => name !== STAGING_DIR_NAME && name !== STATE_DIR_NAME && !isTempFileName(name);
+
+// 等待I/O调度器分配读取许可；排队已满时返回503，客户端在等待期间断开时放弃
+// 获得许可时返回release函数，否则返回null（响应已处理或连接已关闭）
+const acquireReadPermit = async (req, res) => {
+  const abortController = new AbortController();
+  const onClose = () => abortController.abort();
+  res.on('close', onClose);
+  try {
+    return await ioScheduler.acquire(req.ip || req.socket.remoteAddress, {
+      bytes: storageConfig.readHighWaterMark,
+      signal: abortController.signal
+    });
+  } catch (err) {
+    if (err instanceof QueueFullError) {
+      res.setHeader('Retry-After', '1');
+      res.status(503).send('Service Unavailable: Too many concurrent downloads');
+      return null;
+    }
+    if (err.name === 'AbortError') {
+      return null;
+    }
+    throw err;
+  } finally {
+    res.removeListener('close', onClose);
+  }
+};
+
+// 带 Expect: 100-continue 的去重上传请求，服务器在确定需要请求体时才发送100 Continue（见server.js的checkContinue）
+const sendContinue = (req, res) => {
+  if (req.sdavAwaitingContinue) {
+    req.sdavAwaitingContinue = false;
+    res.writeContinue();
+  }
 };
 
+// 为请求选择响应压缩编码，不压缩时返回null
+const chooseEncoding = (req) => negotiateEncoding(req.headers['accept-encoding'], HTTP_COMPRESSION);
+
+// 获取WebDAV处理相关的指标
+exports.getMetrics = () => ({
+  metadataCache: metadataCache.getStats(),
+  contentCache: contentCache.getStats(),
+  ioScheduler: ioScheduler.getStats(),
+  chunkedUploads: chunkedUploads ? chunkedUploads.getStats() : null,
+  contentHashes: contentHashIndex ? contentHashIndex.getStats() : null,
+  dedupUploads: dedupUploader ? dedupUploader.getStats() : null
+});
+
 // 通知文件更改的函数
-const notifyFileChange = async (eventType, filePath) => {
+// 变更会登记到订阅管理器的变更日志中，监视器随后报告的同一变更不会再次通知；
+// 通知在响应发出之后异步进行，不阻塞请求；stats 为写入完成后的文件状态（文件写入时提供），用于识别回声
+const notifyFileChange = (eventType, filePath, stats) => {
+  // 自身的变更立即失效缓存，不等待监视器事件
+  metadataCache.handleFileEvent(eventType, filePath);
+  contentCache.handleFileEvent(eventType, filePath);
   if (subscriptionManager) {
-    console.log(`Attempting to trigger file event: ${eventType} for ${filePath}`);
-
-    // 确保文件完全写入后再触发事件
-    try {
-      // 使用fs.access来确保文件确实存在且可访问
-      await fs.access(filePath, fs.constants.F_OK);
-
-      // 添加额外的延迟以确保文件系统完全写入，这对rclone特别重要
-      await new Promise(resolve => setTimeout(resolve, 200));
-
-      console.log(`Triggering file event: ${eventType} for ${filePath}`);
-      subscriptionManager.handleFileEvent(eventType, filePath);
-    } catch (accessErr) {
-      console.error(`Error accessing file after write: ${accessErr.message}`);
-      // 即使访问失败也尝试触发事件
-      setTimeout(() => {
-        console.log(`(Delayed) Triggering file event: ${eventType} for ${filePath}`);
-        subscriptionManager.handleFileEvent(eventType, filePath);
-      }, 200);
-    }
+    subscriptionManager.publishLocalChange(eventType, filePath, stats);
+  } else {
+    log.error('subscriptionManager is not set - cannot send WebSocket notification');
+  }
+};
+
+// 服务器端复制/移动/删除目录的通知：操作开始前登记，完成后只发送一条 moved/copied/directoryDeleted 事件，
+// 而不是监视器报告的逐个文件的删除/创建事件；删除目录时 toPath 为null
+const beginFileTransfer = (eventType, fromPath, toPath) => {
+  if (subscriptionManager) {
+    subscriptionManager.beginLocalTransfer(eventType, fromPath, toPath);
+  }
+};
+
+const finishFileTransfer = (eventType, fromPath, toPath, succeeded) => {
+  if (eventType !== 'copied') {
+    metadataCache.invalidateTree(fromPath);
+    contentCache.invalidateTree(fromPath);
+  }
+  if (toPath) {
+    metadataCache.invalidateTree(toPath);
+    contentCache.invalidateTree(toPath);
+  }
+  if (!subscriptionManager) {
+    log.error('subscriptionManager is not set - cannot send WebSocket notification');
+  } else if (succeeded) {
+    subscriptionManager.publishLocalTransfer(eventType, fromPath, toPath);
   } else {
-    console.error("subscriptionManager is not set - cannot send WebSocket notification");
+    subscriptionManager.cancelLocalTransfer(eventType, fromPath, toPath);
   }
 };
 
@@ -84,19 +290,36 @@ const notifyFileChange = async (eventType, filePath) => {
 const createWebDAVHandler = () => {
   // 确保上传目录存在
   fs.ensureDirSync(UPLOAD_DIR);
+  const stagingDir = path.join(UPLOAD_DIR, STAGING_DIR_NAME);
+  const stateDir = path.join(UPLOAD_DIR, STATE_DIR_NAME);
+  if (CHUNKED_UPLOAD_ENABLE) {
+    // 暂存目录与上传目录在同一文件系统内，完成时的rename是原子的
+    chunkedUploads = new ChunkedUploadStore({
+      stagingDir,
+      ttlMs: CHUNKED_UPLOAD_TTL_MS,
+      fsync: storageConfig.syncOnClose,
+      highWaterMark: storageConfig.writeHighWaterMark
+    });
+  }
 
   return async (req, res, next) => {
     const webdavMethods = ['PROPFIND', 'PROPPATCH', 'MKCOL', 'COPY', 'MOVE', 'LOCK', 'UNLOCK', 'PUT', 'DELETE', 'GET', 'HEAD'];
     if (webdavMethods.includes(req.method.toUpperCase())) {
+      trackRequest(req, res);
       let filePath;
+      let pathPart;
       try {
         // 提取路径部分（忽略查询参数）
         const pathEnd = req.url.indexOf('?');
-        const pathPart = pathEnd === -1 ? req.url : req.url.substring(0, pathEnd);
+        pathPart = pathEnd === -1 ? req.url : req.url.substring(0, pathEnd);
         // 安全地解析路径，防止路径遍历攻击
         filePath = safePathJoin(UPLOAD_DIR, pathPart);
+        // 暂存目录和状态目录不对外开放
+        if (isSameOrInside(stagingDir, filePath) || isSameOrInside(stateDir, filePath)) {
+          throw new Error("Forbidden: Staging directory is not accessible");
+        }
       } catch (pathError) {
-        console.error(`Path traversal attempt: ${req.url}`, pathError.message);
+        log.warn(`Path traversal attempt: ${req.url}: ${pathError.message}`);
         if (req.method === 'PROPFIND') {
           const xmlResponse = '<?xml version="1.0" encoding="utf-8"?>' +
             '<D:multistatus xmlns:D="DAV:" xmlns:ns1="http://apache.org/dav/props/" xmlns:ns0="DAV:">' +
@@ -116,234 +339,475 @@ const createWebDAVHandler = () => {
 
       try {
         if (req.method === 'GET' || req.method === 'HEAD') {
-          // 检查文件是否存在
-          const exists = await fs.pathExists(filePath);
-          if (!exists) {
-            // 文件不存在，返回404
-            if (req.method === 'PROPFIND') {
-              const xmlResponse = '<?xml version="1.0" encoding="utf-8"?>' +
-                '<D:multistatus xmlns:D="DAV:" xmlns:ns1="http://apache.org/dav/props/" xmlns:ns0="DAV:">' +
-                '<D:response>' +
-                `<D:href>${req.url}</D:href>` +
-                '<D:propstat><D:prop><D:resourcetype/></D:prop><D:status>HTTP/1.1 404 Not Found</D:status></D:propstat>' +
-                '</D:response>' +
-                '</D:multistatus>';
-              res.status(207); // WebDAV标准要求PROPFIND返回207
-              res.setHeader('Content-Type', 'application/xml; charset=utf-8');
-              res.send(xmlResponse);
-            } else {
-              res.status(404).send('Not Found');
-            }
+          // 获取文件状态（经由元数据缓存），不存在时返回404
+          const stats = await metadataCache.statOrNull(filePath);
+          if (!stats) {
+            res.status(404).send('Not Found');
             return;
           }
 
-          // 文件存在，获取文件状态
-          const stats = await fs.stat(filePath);
-
           if (stats.isDirectory()) {
-            // 返回目录内容
-            const items = await fs.readdir(filePath);
-            const resources = [{
-              path: req.url,
-              isDirectory: true,
-              size: 0,
-              mtime: stats.mtime,
-              ctime: stats.ctime
-            }];
-
-            for (const item of items) {
-              const itemPath = path.join(filePath, item);
-              const itemStats = await fs.stat(itemPath);
-              resources.push({
-                path: path.posix.join(req.url, item).replace(/\\/g, '/'),
-                isDirectory: itemStats.isDirectory(),
-                size: itemStats.size,
-                mtime: itemStats.mtime,
-                ctime: itemStats.ctime
-              });
-            }
-
-            // 生成PROPFIND响应
-            if (req.method === 'PROPFIND') {
-              const xmlResponse = generatePropfindXml(resources);
-              res.status(207);
-              res.setHeader('Content-Type', 'application/xml; charset=utf-8');
-              res.send(xmlResponse);
-            } else {
-              // 简单的目录列表
-              res.json({
-                path: req.url,
-                items: items.map(name => ({
+            // 简单的目录列表，子项状态经由缓存以有界并发获取
+            const items = [];
+            for await (const batch of listDirectory(filePath, {
+              concurrency: PROPFIND_STAT_CONCURRENCY,
+              stat: cachedStat,
+              readdir: cachedReaddir,
+              filter: isVisibleEntry
+            })) {
+              for (const { name, stats: itemStats } of batch) {
+                items.push({
                   name,
                   path: path.posix.join(req.url, name).replace(/\\/g, '/'),
-                  isDirectory: fs.statSync(path.join(filePath, name)).isDirectory()
-                }))
-              });
+                  isDirectory: itemStats.isDirectory()
+                });
+              }
             }
+            // 列表较大且客户端支持时压缩响应体
+            let body = Buffer.from(JSON.stringify({
+              path: req.url,
+              items
+            }));
+            const encoding = body.length >= HTTP_COMPRESSION_MIN_SIZE ? chooseEncoding(req) : null;
+            res.setHeader('Content-Type', 'application/json; charset=utf-8');
+            if (HTTP_COMPRESSION.length > 0) {
+              res.setHeader('Vary', 'Accept-Encoding');
+            }
+            if (encoding) {
+              body = await compressBuffer(encoding, body, compressionOptions);
+              res.setHeader('Content-Encoding', encoding);
+            }
+            res.setHeader('Content-Length', body.length);
+            res.end(body);
           } else {
             // 处理文件下载
             const range = req.headers.range;
             const fileSize = stats.size;
 
-            if (range) {
-              // 处理范围请求
-              const parts = range.replace(/bytes=/, "").split("-");
-              const start = parseInt(parts[0], 10);
-              const end = parts[1] ? parseInt(parts[1], 10) : fileSize - 1;
-              const chunksize = (end - start) + 1;
+            // 验证器：客户端可凭ETag/Last-Modified进行条件请求，内容未变时返回304而不是重新下载
+            const validators = {
+              "ETag": etagFor(filePath, stats),
+              "Last-Modified": stats.mtime.toUTCString(),
+              "Cache-Control": "no-cache"
+            };
+            // 已计算内容哈希的文件附带其sha256，客户端无需下载即可校验
+            const contentHash = lookupContentHash(filePath, stats);
+            const precondition = evaluatePreconditions(req.method, req.headers, stats, validators.ETag);
+            if (precondition === 304) {
+              res.writeHead(304, validators);
+              res.end();
+              return;
+            }
+            if (precondition === 412) {
+              res.status(412).send('Precondition Failed');
+              return;
+            }
 
-              const fileStream = createReadStream(filePath, { start, end });
+            // 内容缓存中的小文件：完整下载直接使用预先计算的响应头和（按编码压缩后的）响应体，HEAD只发送响应头
+            if (!range && contentCache.accepts(fileSize)) {
+              const entry = contentCache.lookup(filePath, stats);
+              const compressible = HTTP_COMPRESSION.length > 0 && fileSize >= HTTP_COMPRESSION_MIN_SIZE &&
+                fileSize <= HTTP_COMPRESSION_MAX_FILE_SIZE && isCompressibleType(getMimeType(filePath));
+              const variant = entry && entry.variants.get((compressible && chooseEncoding(req)) || 'identity');
+              if (variant && variant.etag === validators.ETag) {
+                res.writeHead(200, variant.headers);
+                if (req.method === 'HEAD') {
+                  res.end();
+                  return;
+                }
+                res.end(variant.body);
+                contentCache.recordServed(variant.body.length, true);
+                return;
+              }
+            }
 
-              res.writeHead(206, {
-                "Content-Range": `bytes ${start}-${end}/${fileSize}`,
+            // 解析范围请求：If-Range不成立（文件已变化）时忽略Range返回整个文件；所有范围都无法满足时返回416
+            const ranges = range && isRangeFresh(req.headers['if-range'], validators.ETag, stats)
+              ? parseRangeHeader(range, fileSize)
+              : null;
+            if (ranges && ranges.length === 0) {
+              res.writeHead(416, {
+                "Content-Range": `bytes */${fileSize}`,
                 "Accept-Ranges": "bytes",
-                "Content-Length": chunksize,
-                "Content-Type": "application/octet-stream",
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive" // 保持连接
+                ...validators
               });
+              res.end();
+              return;
+            }
 
-              // 使用传统pipe方法而不是pipeline，因为pipeline在某些情况下可能导致提前关闭
-              fileStream.pipe(res);
-
-              // 添加错误处理
-              fileStream.on('error', (err) => {
-                console.error('File stream error (range request):', err);
-                if (!res.headersSent) {
-                  res.status(500).send('Internal Server Error');
-                }
-              });
+            let multipart = null;
+            const headers = {
+              "Content-Type": "application/octet-stream",
+              "Content-Length": fileSize,
+              "Accept-Ranges": "bytes",
+              ...validators,
+              "Connection": "keep-alive" // 保持连接
+            };
+            if (contentHash) {
+              headers["X-SDAV-Content-SHA256"] = contentHash;
+            }
+            if (ranges && ranges.length === 1) {
+              headers["Content-Range"] = `bytes ${ranges[0].start}-${ranges[0].end}/${fileSize}`;
+              headers["Content-Length"] = ranges[0].end - ranges[0].start + 1;
+            } else if (ranges) {
+              // 多个范围：multipart/byteranges，各部分在发送时依次从文件流式读取
+              multipart = buildMultipartRanges(ranges, fileSize, 'application/octet-stream');
+              headers["Content-Type"] = multipart.contentType;
+              headers["Content-Length"] = multipart.contentLength;
+            }
+            const status = ranges ? 206 : 200;
+
+            // 文本类文件（按扩展名判断）的完整下载在客户端支持时压缩传输；范围请求始终针对原始字节，不压缩
+            let encoding = null;
+            if (HTTP_COMPRESSION.length > 0 && isCompressibleType(getMimeType(filePath))) {
+              headers["Vary"] = "Accept-Encoding";
+              if (!ranges && fileSize >= HTTP_COMPRESSION_MIN_SIZE && fileSize <= HTTP_COMPRESSION_MAX_FILE_SIZE) {
+                encoding = chooseEncoding(req);
+              }
+            }
+            if (encoding) {
+              delete headers["Content-Length"];
+              headers["Content-Encoding"] = encoding;
+              headers["ETag"] = weakEtag(headers["ETag"]);
+            }
 
-              res.on('error', (err) => {
-                console.error('Response stream error (range request):', err);
-                fileStream.destroy();
-              });
+            // HEAD只需要响应头，不读取文件，也不需要读取许可；
+            // 压缩传输的可缓存小文件除外：与GET一样经内容缓存得到压缩后的长度，HEAD与GET的Content-Length一致
+            if (req.method === 'HEAD' && !(encoding && contentCache.accepts(fileSize))) {
+              res.writeHead(status, headers);
+              res.end();
+              return;
+            }
 
-              // 监听客户端断开连接
-              req.on('close', () => {
-                if (!res.finished) {
-                  console.log(`Client disconnected during range download of ${filePath} (may be normal end of transfer)`);
-                  fileStream.destroy(); // 清理资源
+            // 可缓存的小文件从内容缓存返回（未缓存时读入缓存），不需要读取许可
+            if (!multipart && contentCache.accepts(fileSize)) {
+              const cached = contentCache.lookup(filePath, stats);
+              const entry = cached || await contentCache.load(filePath, stats).catch(() => null);
+              if (entry) {
+                let body = entry.body;
+                if (ranges) {
+                  body = entry.body.subarray(ranges[0].start, ranges[0].end + 1);
+                } else {
+                  if (encoding) {
+                    body = await compressBuffer(encoding, entry.body, compressionOptions);
+                    headers["Content-Length"] = body.length;
+                  }
+                  contentCache.addVariant(filePath, entry, encoding || 'identity', { etag: validators.ETag, headers, body });
                 }
-              });
-            } else {
-              // 完整文件下载
-              res.writeHead(200, {
-                "Content-Type": "application/octet-stream",
-                "Content-Length": fileSize,
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive" // 保持连接
-              });
-
-              const fileStream = createReadStream(filePath, {
-                highWaterMark: 1 * 1024 * 1024 // 1MB缓冲区，减少EOF错误
-              });
-
-              // 使用传统pipe方法而不是pipeline，因为pipeline在某些情况下可能导致提前关闭
-              fileStream.pipe(res);
-
-              // 添加错误处理
-              fileStream.on('error', (err) => {
-                console.error('File stream error:', err);
-                if (!res.headersSent) {
-                  res.status(500).send('Internal Server Error');
+                res.writeHead(status, headers);
+                if (req.method === 'HEAD') {
+                  res.end();
+                  return;
                 }
-              });
+                res.end(body);
+                contentCache.recordServed(body.length, Boolean(cached));
+                return;
+              }
+            }
+            if (req.method === 'HEAD') {
+              // 文件在读入缓存前已变化：压缩后的长度未知，与流式GET一样不发送Content-Length
+              res.writeHead(status, headers);
+              res.end();
+              return;
+            }
 
-              res.on('error', (err) => {
-                console.error('Response stream error:', err);
-                fileStream.destroy();
-              });
+            // 下载需要先从I/O调度器获得读取许可
+            const releaseRead = await acquireReadPermit(req, res);
+            if (!releaseRead) {
+              return;
+            }
+            res.writeHead(status, headers);
+
+            if (multipart) {
+              streamMultipartRanges(res, filePath, multipart, { highWaterMark: storageConfig.readHighWaterMark })
+                .catch((err) => {
+                  log.error('File stream error (multipart range request)', { error: err });
+                  res.destroy(err);
+                })
+                .finally(releaseRead);
+              return;
+            }
 
-              // 监听客户端断开连接
-              req.on('close', () => {
-                if (!res.finished) {
-                  console.log(`Client disconnected during download of ${filePath} (may be normal end of transfer)`);
-                  fileStream.destroy(); // 清理资源
-                }
-              });
+            const fileStream = createReadStream(filePath, {
+              start: ranges ? ranges[0].start : 0,
+              end: ranges ? ranges[0].end : Infinity,
+              highWaterMark: storageConfig.readHighWaterMark // 由WEBDAV_READ_BUFFER_SIZE决定，不超过FS_READ_AHEAD
+            });
+
+            // 使用传统pipe方法而不是pipeline，因为pipeline在某些情况下可能导致提前关闭
+            fileStream.on('close', releaseRead); // 流关闭（完成、出错或被销毁）时归还许可
+            if (encoding) {
+              const compressor = createCompressionStream(encoding, { ...compressionOptions, sizeHint: fileSize });
+              res.on('close', () => compressor.destroy());
+              fileStream.pipe(compressor).pipe(res);
+            } else {
+              fileStream.pipe(res);
             }
+
+            // 添加错误处理
+            fileStream.on('error', (err) => {
+              log.error('File stream error', { error: err });
+              // 响应头已经发出，只能中断连接让客户端知道传输不完整
+              res.destroy(err);
+            });
+
+            res.on('error', (err) => {
+              log.error('Response stream error', { error: err });
+              fileStream.destroy();
+            });
+
+            // 监听客户端断开连接
+            req.on('close', () => {
+              if (!res.writableFinished) {
+                log.debug(() => `Client disconnected during download of ${filePath} (may be normal end of transfer)`);
+                fileStream.destroy(); // 清理资源
+              }
+            });
           }
         } else if (req.method === 'PUT') {
           // 处理文件上传
-          const dirPath = path.dirname(filePath);
-          await fs.ensureDir(dirPath);
-
-          const fileExists = await fs.pathExists(filePath);
+          // 条件上传：If-Match 防止覆盖更新的版本，If-None-Match: * 只允许新建
+          const existingStats = await freshStat(filePath);
+          const fileExists = Boolean(existingStats);
+          if (evaluatePreconditions('PUT', req.headers, existingStats, existingStats ? etagFor(filePath, existingStats) : null)) {
+            res.status(412).send('Precondition Failed');
+            return;
+          }
 
-          const writeStream = createWriteStream(filePath, {
-            highWaterMark: 1 * 1024 * 1024 // 1MB缓冲区，减少EOF错误
-          });
+          // 去重上传：客户端声明了内容的SHA-256和大小，且服务器上已有相同内容的文件时，
+          // 以reflink/硬链接生成目标文件，不接收请求体，返回208以区别于正常上传
+          const declared = req.headers['content-range'] === undefined ? parseDeclaredContent(req.headers) : null;
+          if (declared && dedupUploader && dedupUploader.enabled) {
+            await fs.ensureDir(path.dirname(filePath));
+            const deduplicated = await dedupUploader.tryComplete(filePath, declared);
+            if (deduplicated) {
+              log.debug(() => `Upload of ${filePath} completed by ${deduplicated.method} from ${deduplicated.sourcePath}`);
+              const writtenStats = await fs.stat(filePath);
+              res.setHeader('ETag', etagFor(filePath, writtenStats));
+              res.setHeader('X-SDAV-Deduplicated', deduplicated.method);
+              res.status(208).send('Already Reported');
+              if (deduplicated.method !== 'unchanged') {
+                notifyFileChange(fileExists ? 'updated' : 'created', filePath, writtenStats);
+              }
+              return;
+            }
+          }
+          sendContinue(req, res);
+
+          // 可续传的分块上传：带Content-Range的PUT写入暂存文件，最后一块写完后原子替换目标文件，只通知一次
+          if (chunkedUploads && req.headers['content-range'] !== undefined) {
+            const range = parseContentRange(req.headers['content-range']);
+            if (!range) {
+              res.status(400).send('Bad Request: Invalid Content-Range');
+              return;
+            }
+            if (range.query) {
+              // bytes */total：查询已接收的偏移量，以便断线后续传
+              res.setHeader('Upload-Offset', await chunkedUploads.getOffset(filePath));
+              res.status(204).end();
+              return;
+            }
 
-          req.pipe(writeStream);
+            let result;
+            try {
+              result = await chunkedUploads.writeChunk(filePath, req, range);
+            } catch (err) {
+              if (err instanceof UploadConflictError) {
+                res.setHeader('Upload-Offset', err.offset);
+                res.status(409).send(`Conflict: ${err.message}`);
+                return;
+              }
+              throw err;
+            }
 
-          writeStream.on('finish', async () => {
-            await notifyFileChange(fileExists ? 'updated' : 'created', filePath);
+            res.setHeader('Upload-Offset', result.offset);
+            if (!result.complete) {
+              res.status(202).send('Accepted');
+              return;
+            }
+            const writtenStats = await fs.stat(filePath);
+            res.setHeader('ETag', etagFor(filePath, writtenStats));
             res.status(201).send('Created');
-          });
+            notifyFileChange(fileExists ? 'updated' : 'created', filePath, writtenStats);
+            return;
+          }
 
-          writeStream.on('error', (err) => {
-            console.error('Error writing file:', err);
-            if (!res.headersSent) {
-              res.status(500).send('Internal Server Error');
+          const dirPath = path.dirname(filePath);
+          await fs.ensureDir(dirPath);
+
+          // 先写入同目录下的隐藏临时文件，完成后（可选fsync）rename覆盖目标：
+          // 并发的GET和监视器只会看到完整的文件，客户端中断时目标文件保持不变且不发送通知
+          try {
+            await writeFileAtomic(filePath, req, {
+              highWaterMark: storageConfig.writeHighWaterMark,
+              fsync: storageConfig.syncOnClose
+            });
+          } catch (err) {
+            if (err.code === 'ERR_STREAM_PREMATURE_CLOSE' || req.destroyed) {
+              log.info(`Upload of ${filePath} aborted by client, target left unchanged`);
+              return;
             }
-          });
-        } else if (req.method === 'DELETE') {
-          // 处理删除
-          const exists = await fs.pathExists(filePath);
+            throw err;
+          }
 
-          if (exists) {
+          // 返回新版本的ETag，客户端下次可以据此发起条件上传
+          const writtenStats = await fs.stat(filePath);
+          res.setHeader('ETag', etagFor(filePath, writtenStats));
+          res.status(201).send('Created');
+          notifyFileChange(fileExists ? 'updated' : 'created', filePath, writtenStats);
+        } else if (req.method === 'DELETE') {
+          // 处理删除（同样支持If-Match等前置条件）
+          const stats = await freshStat(filePath);
+
+          if (stats && evaluatePreconditions('DELETE', req.headers, stats, etagFor(filePath, stats))) {
+            res.status(412).send('Precondition Failed');
+          } else if (stats && stats.isDirectory()) {
+            // 删除目录：整个子树登记为服务器自身的删除，订阅者只收到一条 directoryDeleted 事件
+            beginFileTransfer('directoryDeleted', filePath, null);
+            let succeeded = false;
+            try {
+              await fs.remove(filePath);
+              succeeded = true;
+            } finally {
+              finishFileTransfer('directoryDeleted', filePath, null, succeeded);
+            }
+            res.status(200).send('OK');
+          } else if (stats) {
             await fs.remove(filePath);
-            await notifyFileChange('deleted', filePath);
             res.status(200).send('OK');
+            notifyFileChange('deleted', filePath);
           } else {
             res.status(404).send('Not Found');
           }
         } else if (req.method === 'MKCOL') {
           // 创建目录
           await fs.ensureDir(filePath);
-          await notifyFileChange('directoryCreated', filePath);
           res.status(201).send('Created');
+          notifyFileChange('directoryCreated', filePath);
         } else if (req.method === 'PROPFIND') {
-          // 属性查询
-          if (await fs.pathExists(filePath)) {
-            const stats = await fs.stat(filePath);
-            const resources = [{
-              path: req.url,
-              isDirectory: stats.isDirectory(),
-              size: stats.size,
-              mtime: stats.mtime,
-              ctime: stats.ctime
-            }];
-            
-            if (stats.isDirectory()) {
-              const items = await fs.readdir(filePath);
-              for (const item of items) {
-                const itemPath = path.join(filePath, item);
-                const itemStats = await fs.stat(itemPath);
-                resources.push({
-                  path: path.posix.join(req.url, item).replace(/\\/g, '/'),
-                  isDirectory: itemStats.isDirectory(),
-                  size: itemStats.size,
-                  mtime: itemStats.mtime,
-                  ctime: itemStats.ctime
-                });
-              }
-            }
-            
-            const xmlResponse = generatePropfindXml(resources);
+          // 属性查询：按Depth头（0、1、infinity）列出资源，multistatus以流的方式分块写出
+          const stats = await metadataCache.statOrNull(filePath);
+          if (stats) {
+            const depth = parseDepth(req.headers.depth);
             res.status(207);
             res.setHeader('Content-Type', 'application/xml; charset=utf-8');
-            res.send(xmlResponse);
+
+            // 列出子项时（Depth不为0）响应可能很大，客户端支持时以流的方式压缩
+            let target = res;
+            const encoding = depth > 0 ? chooseEncoding(req) : null;
+            if (HTTP_COMPRESSION.length > 0) {
+              res.setHeader('Vary', 'Accept-Encoding');
+            }
+            if (encoding) {
+              res.setHeader('Content-Encoding', encoding);
+              target = createCompressionStream(encoding, compressionOptions);
+              target.pipe(res);
+              res.on('close', () => target.destroy());
+            }
+
+            await streamPropfind(target, {
+              filePath,
+              href: pathPart,
+              stats,
+              depth,
+              concurrency: PROPFIND_STAT_CONCURRENCY,
+              stat: cachedStat,
+              readdir: cachedReaddir,
+              filter: isVisibleEntry,
+              contentHash: lookupContentHash
+            });
           } else {
             res.status(404).send('Not Found');
           }
+        } else if (req.method === 'COPY' || req.method === 'MOVE') {
+          // 服务器端复制/移动：MOVE在同一文件系统内为一次rename，COPY优先使用reflink
+          const isMove = req.method === 'MOVE';
+          const eventType = isMove ? 'moved' : 'copied';
+          const destinationPart = parseDestination(req.headers.destination);
+          if (!destinationPart) {
+            res.status(400).send('Bad Request: Destination header required');
+            return;
+          }
+          let destinationPath;
+          try {
+            destinationPath = safePathJoin(UPLOAD_DIR, destinationPart);
+          } catch (pathError) {
+            log.warn(`Path traversal attempt in Destination: ${req.headers.destination}: ${pathError.message}`);
+            res.status(403).send('Forbidden');
+            return;
+          }
+
+          // Depth：MOVE只允许infinity；COPY允许0（只复制集合本身）或infinity
+          const depth = req.headers.depth === undefined ? 'infinity' : String(req.headers.depth).trim().toLowerCase();
+          if (depth !== 'infinity' && (isMove || depth !== '0')) {
+            res.status(400).send('Bad Request: Invalid Depth');
+            return;
+          }
+          const overwrite = String(req.headers.overwrite || 'T').trim().toUpperCase() !== 'F';
+
+          const sourceStats = await freshStat(filePath);
+          if (!sourceStats) {
+            res.status(404).send('Not Found');
+            return;
+          }
+          if (filePath === UPLOAD_DIR || destinationPath === UPLOAD_DIR || filePath === destinationPath) {
+            res.status(403).send('Forbidden');
+            return;
+          }
+          if (sourceStats.isDirectory() && isSameOrInside(filePath, destinationPath)) {
+            res.status(409).send('Conflict: Destination is inside the source collection');
+            return;
+          }
+          // 目标是源的上级目录时，覆盖目标会先删除源本身
+          if (isSameOrInside(destinationPath, filePath)) {
+            res.status(409).send('Conflict: Destination is an ancestor of the source');
+            return;
+          }
+          if (evaluatePreconditions(req.method, req.headers, sourceStats, etagFor(filePath, sourceStats))) {
+            res.status(412).send('Precondition Failed');
+            return;
+          }
+          const destinationParent = await freshStat(path.dirname(destinationPath));
+          if (!destinationParent || !destinationParent.isDirectory()) {
+            res.status(409).send('Conflict: Destination parent does not exist');
+            return;
+          }
+          const destinationExists = Boolean(await freshStat(destinationPath));
+          if (destinationExists && !overwrite) {
+            res.status(412).send('Precondition Failed');
+            return;
+          }
+
+          beginFileTransfer(eventType, filePath, destinationPath);
+          let succeeded = false;
+          try {
+            if (destinationExists) {
+              await fs.remove(destinationPath);
+            }
+            if (isMove) {
+              await moveTree(filePath, destinationPath, { concurrency: PROPFIND_STAT_CONCURRENCY, rootDir: UPLOAD_DIR });
+            } else {
+              await copyTree(filePath, destinationPath, {
+                depth: depth === '0' ? 0 : Infinity,
+                concurrency: PROPFIND_STAT_CONCURRENCY,
+                rootDir: UPLOAD_DIR
+              });
+            }
+            succeeded = true;
+          } finally {
+            finishFileTransfer(eventType, filePath, destinationPath, succeeded);
+          }
+          if (destinationExists) {
+            res.status(204).end();
+          } else {
+            res.status(201).send('Created');
+          }
         } else {
           // 其他WebDAV方法暂时不支持
           res.status(405).send('Method Not Allowed');
         }
       } catch (error) {
-        console.error(`Error processing ${req.method} request for ${req.url}:`, error);
+        log.error(`Error processing ${req.method} request for ${req.url}`, { error });
         if (!res.headersSent) {
           // 对于WebDAV请求，返回WebDAV兼容的错误响应
           if (webdavMethods.includes(req.method.toUpperCase())) {
@@ -370,6 +834,9 @@ const createWebDAVHandler = () => {
             // 对于非WebDAV请求，返回普通错误
             res.status(500).send('Internal Server Error');
           }
+        } else if (!res.writableEnded) {
+          // 流式响应已经开始，无法再返回错误状态，只能中断连接
+          res.destroy(error);
         }
       }
     } else {
@@ -379,38 +846,112 @@ const createWebDAVHandler = () => {
   };
 };
 
-// 生成PROPFIND响应的XML
-function generatePropfindXml(resources) {
-  let xml = '<?xml version="1.0" encoding="utf-8"?>';
-  xml += '<D:multistatus xmlns:D="DAV:" xmlns:ns1="http://apache.org/dav/props/" xmlns:ns0="DAV:">';
-  
-  for (const resource of resources) {
-    xml += '<D:response>';
-    xml += `<D:href>${resource.path}</D:href>`;
-    xml += '<D:propstat>';
-    xml += '<D:prop>';
-    
-    // 基本属性
-    xml += '<D:resourcetype>' + (resource.isDirectory ? '<D:collection/>' : '') + '</D:resourcetype>';
-    xml += `<D:getcontentlength>${resource.size || 0}</D:getcontentlength>`;
-    xml += `<D:getlastmodified>${resource.mtime ? resource.mtime.toUTCString() : ''}</D:getlastmodified>`;
-    xml += '<D:creationdate>' + (resource.ctime ? resource.ctime.toISOString() : '') + '</D:creationdate>';
-    xml += '<D:getetag>"' + (resource.mtime ? resource.mtime.getTime() : Date.now()) + '"</D:getetag>';
-    
-    xml += '</D:prop>';
-    xml += '<D:status>HTTP/1.1 200 OK</D:status>';
-    xml += '</D:propstat>';
-    xml += '</D:response>';
+// 发送JSON响应，较大且客户端支持时压缩
+const sendJson = async (req, res, status, value) => {
+  let body = Buffer.from(JSON.stringify(value));
+  const encoding = body.length >= HTTP_COMPRESSION_MIN_SIZE ? chooseEncoding(req) : null;
+  res.status(status);
+  res.setHeader('Content-Type', 'application/json; charset=utf-8');
+  if (HTTP_COMPRESSION.length > 0) {
+    res.setHeader('Vary', 'Accept-Encoding');
+  }
+  if (encoding) {
+    body = await compressBuffer(encoding, body, compressionOptions);
+    res.setHeader('Content-Encoding', encoding);
+  }
+  res.setHeader('Content-Length', body.length);
+  res.end(body);
+};
+
+// 增量同步：GET /_sdav/changes?path=/docs&token=<令牌>[&limit=N]
+// 不带令牌时只返回当前令牌（客户端应先取令牌再全量列出，之后用令牌获取增量）；
+// 返回 { token, hasMore, added, changed, removed }，hasMore 为true时用新令牌继续获取；
+// 令牌无效或历史已不可用时返回410，客户端需要重新全量同步
+const handleChangesQuery = async (req, res) => {
+  if (!subscriptionManager) {
+    res.status(503).send('Service Unavailable: Change journal is not ready');
+    return;
+  }
+  const eventLog = subscriptionManager.eventLog;
+  const subtree = normalizeRelative(typeof req.query.path === 'string' ? req.query.path : '/');
+  if (subtree.split('/').includes('..')) {
+    res.status(400).send('Bad Request: Invalid path');
+    return;
+  }
+  const requestedLimit = parseInt(req.query.limit);
+  const limit = requestedLimit > 0 ? Math.min(requestedLimit, SYNC_PAGE_SIZE) : SYNC_PAGE_SIZE;
+
+  if (req.query.token === undefined) {
+    await sendJson(req, res, 200, {
+      token: encodeSyncToken(eventLog.epoch, eventLog.lastSeq),
+      hasMore: false,
+      added: [],
+      changed: [],
+      removed: []
+    });
+    return;
+  }
+
+  const since = decodeSyncToken(req.query.token);
+  const changes = since && since.epoch === eventLog.epoch
+    ? collectChanges(eventLog, { subtree, sinceSeq: since.seq, limit })
+    : null;
+  if (!changes) {
+    await sendJson(req, res, 410, {
+      error: 'resyncRequired',
+      reason: since ? 'historyUnavailable' : 'invalidToken'
+    });
+    return;
+  }
+  const { lastSeq, ...delta } = changes;
+  await sendJson(req, res, 200, { token: encodeSyncToken(eventLog.epoch, lastSeq), ...delta });
+};
+
+// 批量哈希查询：POST /_sdav/hashes，请求体 { "sha256": ["<hex>", ...] }
+// 返回 { found: { "<hex>": "/path" }, missing: ["<hex>"] }；路径来自哈希索引，反映最近一次计算的结果
+const handleHashQuery = (req, res) => {
+  if (!contentHashIndex) {
+    res.status(501).send('Not Implemented: Content hash index is disabled');
+    return;
+  }
+  const hashes = req.body && req.body.sha256;
+  if (!Array.isArray(hashes) || !hashes.every(hash => typeof hash === 'string' && SHA256_PATTERN.test(hash.toLowerCase()))) {
+    res.status(400).send('Bad Request: Expected {"sha256": ["<hex>", ...]}');
+    return;
   }
-  
-  xml += '</D:multistatus>';
-  return xml;
-}
+  if (hashes.length > CONTENT_HASH_QUERY_LIMIT) {
+    res.status(413).send(`Payload Too Large: At most ${CONTENT_HASH_QUERY_LIMIT} hashes per request`);
+    return;
+  }
+  const found = {};
+  const missing = [];
+  for (const hash of hashes) {
+    const sha256 = hash.toLowerCase();
+    const [filePath] = contentHashIndex.findPaths(sha256);
+    if (filePath) {
+      found[sha256] = '/' + path.relative(UPLOAD_DIR, filePath).split(path.sep).join('/');
+    } else {
+      missing.push(sha256);
+    }
+  }
+  res.json({ found, missing });
+};
 
 // 将WebDAV服务器集成到Express应用中
 const integrateWithExpress = (app) => {
   const webdavHandler = createWebDAVHandler();
-  
+
+  // 服务器扩展接口（/_sdav 下的非WebDAV方法）
+  app.post('/_sdav/hashes', handleHashQuery);
+  app.get('/_sdav/changes', (req, res) => {
+    handleChangesQuery(req, res).catch((err) => {
+      log.error('Error processing change feed request', { error: err });
+      if (!res.headersSent) {
+        res.status(500).send('Internal Server Error');
+      }
+    });
+  });
+
   // 将WebDAV处理器作为中间件添加到Express应用
   app.use(webdavHandler);
 };
@@ -418,5 +959,7 @@ const integrateWithExpress = (app) => {
 module.exports = {
   integrateWithExpress,
   setUploadDir: exports.setUploadDir,
-  setSubscriptionManager: exports.setSubscriptionManager
+  setSubscriptionManager: exports.setSubscriptionManager,
+  setContentHashIndex: exports.setContentHashIndex,
+  getMetrics: exports.getMetrics
 };
\ No newline at end of file
@@ -0,0 +1,64 @@
+const fs = require('fs');
+const path = require('path');
+const crypto = require('crypto');
+const { pipeline } = require('stream');
+const { promisify } = require('util');
+
+const pipelineAsync = promisify(pipeline);
+
+// 临时文件名：以.开头并以.tmp结尾，监视器会忽略它，目录列表中也不显示
+const TEMP_FILE_PATTERN = /^\..+\.sdav-[0-9a-f]{12}\.tmp$/;
+
+const isTempFileName = (name) => TEMP_FILE_PATTERN.test(name);
+
+const tempPathFor = (targetPath) => path.join(
+  path.dirname(targetPath),
+  `.${path.basename(targetPath)}.sdav-${crypto.randomBytes(6).toString('hex')}.tmp`
+);
+
+// 把文件或目录的内容刷到磁盘
+const syncPath = async (filePath, flags) => {
+  const handle = await fs.promises.open(filePath, flags);
+  try {
+    await handle.sync();
+  } finally {
+    await handle.close();
+  }
+};
+
+// 把数据流写入同目录下的临时文件，完成后（可选fsync）rename覆盖目标文件
+// 读者和监视器只会看到旧文件或完整的新文件；写入失败或客户端中断时删除临时文件，目标文件保持不变
+const writeFileAtomic = async (targetPath, source, options = {}) => {
+  const tempPath = tempPathFor(targetPath);
+  try {
+    await pipelineAsync(source, fs.createWriteStream(tempPath, {
+      flags: 'wx',
+      highWaterMark: options.highWaterMark || 1024 * 1024
+    }));
+    if (options.fsync) {
+      await syncPath(tempPath, 'r+');
+    }
+    await fs.promises.rename(tempPath, targetPath);
+  } catch (err) {
+    await fs.promises.rm(tempPath, { force: true });
+    throw err;
+  }
+
+  if (options.fsync) {
+    // 同步目录项，保证rename本身在断电后也不会丢失（部分平台不支持对目录fsync）
+    try {
+      await syncPath(path.dirname(targetPath), 'r');
+    } catch (err) {
+      if (!['EISDIR', 'EPERM', 'EINVAL', 'EBADF'].includes(err.code)) {
+        throw err;
+      }
+    }
+  }
+};
+
+module.exports = {
+  isTempFileName,
+  tempPathFor,
+  syncPath,
+  writeFileAtomic
+};
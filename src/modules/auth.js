@@ -0,0 +1,216 @@
+const crypto = require('crypto');
+const fs = require('fs');
+
+// HTTP Basic 认证（WebDAV请求和WebSocket认证共用）
+// 验证通过的 Authorization 头原样缓存在有界缓存中：客户端（如rclone）每个请求都发送相同的头，
+// 命中缓存时只需一次Map查找，不再解码和比较；比较使用固定长度摘要的 timingSafeEqual
+// 用户可以来自环境变量（明文密码）或凭据文件（scrypt哈希，只在缓存未命中时计算）
+
+const SCRYPT_PREFIX = '$scrypt$';
+const DEFAULT_SCRYPT_PARAMS = { N: 16384, r: 8, p: 1 };
+const KEY_LENGTH = 32;
+const MAX_CACHED_HEADER_LENGTH = 1024;
+
+const sha256 = (value) => crypto.createHash('sha256').update(value).digest();
+
+// 解析 Authorization 头，返回 { username, password }；不是有效的Basic认证时返回null
+// 密码中可以包含冒号（只按第一个冒号分割）
+const parseBasicAuth = (header) => {
+  const match = /^ *basic +([A-Za-z0-9._~+/-]+=*) *$/i.exec(header || '');
+  if (!match) {
+    return null;
+  }
+  const decoded = Buffer.from(match[1], 'base64').toString('utf8');
+  const separator = decoded.indexOf(':');
+  if (separator === -1) {
+    return null;
+  }
+  return { username: decoded.slice(0, separator), password: decoded.slice(separator + 1) };
+};
+
+// 生成凭据文件中的密码哈希：$scrypt$N$r$p$盐$哈希（盐和哈希为base64）
+const hashPassword = (password, params = DEFAULT_SCRYPT_PARAMS) => {
+  const salt = crypto.randomBytes(16);
+  const { N, r, p } = params;
+  const hash = crypto.scryptSync(password, salt, KEY_LENGTH, { N, r, p, maxmem: 256 * N * r });
+  return `${SCRYPT_PREFIX}${N}$${r}$${p}$${salt.toString('base64')}$${hash.toString('base64')}`;
+};
+
+const parseScryptHash = (value) => {
+  const parts = value.slice(SCRYPT_PREFIX.length).split('$');
+  if (!value.startsWith(SCRYPT_PREFIX) || parts.length !== 5) {
+    return null;
+  }
+  const [N, r, p] = parts.slice(0, 3).map(part => parseInt(part, 10));
+  const salt = Buffer.from(parts[3], 'base64');
+  const hash = Buffer.from(parts[4], 'base64');
+  if (![N, r, p].every(Number.isInteger) || salt.length === 0 || hash.length === 0) {
+    return null;
+  }
+  return { N, r, p, salt, hash };
+};
+
+// 读取凭据文件：每行 用户名:$scrypt$...，空行和 # 开头的行忽略
+const loadCredentialFile = (filePath) => {
+  const users = new Map();
+  const lines = fs.readFileSync(filePath, 'utf8').split(/\r?\n/);
+  lines.forEach((line, index) => {
+    const trimmed = line.trim();
+    if (!trimmed || trimmed.startsWith('#')) {
+      return;
+    }
+    const separator = trimmed.indexOf(':');
+    const verifier = separator > 0 ? parseScryptHash(trimmed.slice(separator + 1)) : null;
+    if (!verifier) {
+      throw new Error(`Invalid credential entry at ${filePath}:${index + 1}`);
+    }
+    users.set(trimmed.slice(0, separator), verifier);
+  });
+  return users;
+};
+
+class Authenticator {
+  constructor(options = {}) {
+    // 明文用户（环境变量）：保存 "用户名:密码" 的摘要，验证时比较固定长度的摘要
+    this.plainUsers = new Map();
+    for (const [username, password] of Object.entries(options.users || {})) {
+      this.plainUsers.set(username, sha256(`${username}:${password}`));
+    }
+    this.hashedUsers = options.hashedUsers || new Map(); // 用户名 -> scrypt参数
+    this.cacheSize = options.cacheSize !== undefined ? options.cacheSize : 256;
+    this.maxPending = options.maxPending || 32;
+    this.cache = new Map(); // 验证通过的 Authorization 头 -> 用户名
+    this.pending = new Map(); // 正在计算scrypt的 Authorization 头 -> 回调列表
+    // 不存在的用户也计算一次scrypt，避免通过响应时间判断用户名是否存在
+    const [anyHashed] = this.hashedUsers.values();
+    this.dummyVerifier = anyHashed ? { ...anyHashed, hash: Buffer.alloc(anyHashed.hash.length) } : null;
+    this.stats = {
+      cacheHits: 0,
+      cacheMisses: 0,
+      failures: 0,
+      hashComputations: 0,
+      rejectedBusy: 0
+    };
+  }
+
+  // 验证 Authorization 头，callback(用户名 或 null, busy)
+  // busy 为true表示同时进行的哈希计算已达上限、凭据尚未验证（不是认证失败），调用方应让客户端稍后重试
+  // 缓存命中和明文用户时同步回调（请求处理无需等待下一轮事件循环），scrypt用户在线程池中计算后异步回调
+  verify(header, callback) {
+    if (typeof header !== 'string' || header.length === 0) {
+      this.stats.failures++;
+      callback(null);
+      return;
+    }
+    const cached = this.cache.get(header);
+    if (cached !== undefined) {
+      this.stats.cacheHits++;
+      callback(cached);
+      return;
+    }
+    this.stats.cacheMisses++;
+    const credentials = parseBasicAuth(header);
+    if (!credentials) {
+      this.stats.failures++;
+      callback(null);
+      return;
+    }
+    const { username, password } = credentials;
+
+    const plainDigest = this.plainUsers.get(username);
+    if (plainDigest) {
+      const ok = crypto.timingSafeEqual(sha256(`${username}:${password}`), plainDigest);
+      this.finish(header, ok ? username : null, [callback]);
+      return;
+    }
+
+    const verifier = this.hashedUsers.get(username) || this.dummyVerifier;
+    if (!verifier) {
+      this.stats.failures++;
+      callback(null);
+      return;
+    }
+    // 同一个头同时只计算一次（rclone启动时会用相同的头同时打开多个连接）
+    const waiting = this.pending.get(header);
+    if (waiting) {
+      waiting.push(callback);
+      return;
+    }
+    // 限制同时进行的哈希计算，以免错误凭据占满libuv线程池、拖慢文件读写
+    if (this.pending.size >= this.maxPending) {
+      this.stats.rejectedBusy++;
+      callback(null, true);
+      return;
+    }
+    const callbacks = [callback];
+    this.pending.set(header, callbacks);
+    this.stats.hashComputations++;
+    const { N, r, p, salt, hash } = verifier;
+    crypto.scrypt(password, salt, hash.length, { N, r, p, maxmem: 256 * N * r }, (err, derived) => {
+      this.pending.delete(header);
+      const ok = !err && crypto.timingSafeEqual(derived, hash) && this.hashedUsers.get(username) === verifier;
+      this.finish(header, ok ? username : null, callbacks);
+    });
+  }
+
+  // 以Promise形式验证
+  authenticate(header) {
+    return new Promise(resolve => this.verify(header, resolve));
+  }
+
+  finish(header, username, callbacks) {
+    if (username === null) {
+      this.stats.failures++;
+    } else if (this.cacheSize > 0 && header.length <= MAX_CACHED_HEADER_LENGTH) {
+      if (this.cache.size >= this.cacheSize) {
+        // 淘汰最早加入的条目（Map按插入顺序迭代）
+        this.cache.delete(this.cache.keys().next().value);
+      }
+      this.cache.set(header, username);
+    }
+    for (const callback of callbacks) {
+      callback(username);
+    }
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      cachedHeaders: this.cache.size,
+      users: this.plainUsers.size + this.hashedUsers.size
+    };
+  }
+}
+
+// 按环境变量创建：设置了 AUTH_USERS_FILE 时只使用凭据文件中的用户，否则使用 USERNAME/PASSWORD
+const createAuthenticator = (env = process.env) => {
+  const cacheSize = parseInt(env.AUTH_CACHE_SIZE);
+  const options = { cacheSize: Number.isNaN(cacheSize) ? 256 : cacheSize };
+  if (env.AUTH_USERS_FILE) {
+    return new Authenticator({ ...options, hashedUsers: loadCredentialFile(env.AUTH_USERS_FILE) });
+  }
+  return new Authenticator({
+    ...options,
+    users: { [env.USERNAME || 'admin']: env.PASSWORD || 'password' }
+  });
+};
+
+module.exports = {
+  Authenticator,
+  parseBasicAuth,
+  hashPassword,
+  loadCredentialFile,
+  createAuthenticator
+};
+
+// 生成凭据文件的一行：node src/modules/auth.js <用户名> [密码]
+// 未在参数中给出密码时从标准输入读取（避免密码出现在进程列表和shell历史中）
+if (require.main === module) {
+  const [username, passwordArg] = process.argv.slice(2);
+  const password = passwordArg !== undefined ? passwordArg : fs.readFileSync(0, 'utf8').replace(/\r?\n$/, '');
+  if (!username || !password || username.includes(':')) {
+    console.error('Usage: node src/modules/auth.js <username> [password]');
+    process.exit(1);
+  }
+  console.log(`${username}:${hashPassword(password)}`);
+}
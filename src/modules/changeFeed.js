@@ -0,0 +1,144 @@
+// 增量同步：“自令牌X以来某个子树下有哪些变化”
+// 基于事件日志（EventLog）：令牌编码日志纪元和序列号，查询时取出序列号之后的事件，按路径合并为最终状态，
+// 返回新增、修改、删除的条目和新的令牌；日志已无法覆盖该令牌（或纪元已变化）时客户端需要重新全量同步
+
+// 不透明的同步令牌：base64url(纪元:序列号)
+const encodeSyncToken = (epoch, seq) => Buffer.from(`${epoch}:${seq}`).toString('base64url');
+
+// 解析同步令牌，格式无效时返回null
+const decodeSyncToken = (token) => {
+  const match = /^([0-9a-f]+):(\d+)$/.exec(Buffer.from(String(token || ''), 'base64url').toString());
+  if (!match) {
+    return null;
+  }
+  return { epoch: match[1], seq: parseInt(match[2], 10) };
+};
+
+// 事件中的相对路径统一为以/分隔、不带首尾/的形式
+const normalizeRelative = (relativePath) => String(relativePath).split('\\').join('/').replace(/^\/+|\/+$/g, '');
+
+const isInSubtree = (subtree, relativePath) => subtree === '' ||
+  relativePath === subtree ||
+  relativePath.startsWith(subtree + '/');
+
+// 收集 sinceSeq 之后 subtree（相对路径，''表示整个上传目录）下的变化
+// 合并后的条目数达到 limit 时在事件边界停止，hasMore 为true，lastSeq 为已处理到的序列号
+// 返回 { lastSeq, hasMore, added, changed, removed }；日志已无法覆盖 sinceSeq 时返回null
+const collectChanges = (eventLog, { subtree = '', sinceSeq, limit = Infinity }) => {
+  const events = eventLog.since(sinceSeq);
+  if (events === null) {
+    return null;
+  }
+  const root = normalizeRelative(subtree);
+  // 路径 -> { createdFirst, exists, isDirectory, size, listContents }
+  // createdFirst：该路径在窗口内的第一个事件是创建，令牌之前客户端不知道它
+  const states = new Map();
+
+  const touch = (relativePath, exists, details, isCreation) => {
+    let state = states.get(relativePath);
+    if (!state) {
+      state = { createdFirst: isCreation };
+      states.set(relativePath, state);
+    }
+    state.exists = exists;
+    state.isDirectory = details.isDirectory;
+    state.size = details.size;
+    state.listContents = Boolean(details.listContents);
+  };
+
+  // 目录被删除或替换时，其下已记录的变化由目录本身的变化代替
+  const dropDescendants = (relativePath) => {
+    const prefix = relativePath + '/';
+    for (const candidate of Array.from(states.keys())) {
+      if (candidate.startsWith(prefix)) {
+        states.delete(candidate);
+      }
+    }
+  };
+
+  let lastSeq = sinceSeq;
+  for (const event of events) {
+    if (states.size >= limit) {
+      break;
+    }
+    lastSeq = event.seq;
+    const target = normalizeRelative(event.path);
+    const source = event.fromPath !== undefined ? normalizeRelative(event.fromPath) : null;
+    const inTarget = isInSubtree(root, target);
+    const size = event.size || 0;
+
+    switch (event.eventType) {
+      case 'created':
+      case 'updated':
+        if (inTarget) {
+          touch(target, true, { isDirectory: false, size }, event.eventType === 'created');
+        }
+        break;
+      case 'deleted':
+        if (inTarget) {
+          touch(target, false, { isDirectory: false, size: 0 }, false);
+        }
+        break;
+      case 'directoryCreated':
+        if (inTarget) {
+          touch(target, true, { isDirectory: true, size: 0 }, true);
+        }
+        break;
+      case 'directoryDeleted':
+        if (inTarget) {
+          dropDescendants(target);
+          touch(target, false, { isDirectory: true, size: 0 }, false);
+        }
+        break;
+      case 'moved':
+      case 'copied':
+        // 整个子树只有一条事件：移入/复制来的目录需要客户端自行列出其内容（listContents）
+        if (event.eventType === 'moved' && source !== null && isInSubtree(root, source)) {
+          dropDescendants(source);
+          touch(source, false, { isDirectory: Boolean(event.isDirectory), size: 0 }, false);
+        }
+        if (inTarget) {
+          dropDescendants(target);
+          touch(target, true, {
+            isDirectory: Boolean(event.isDirectory),
+            size: event.isDirectory ? 0 : size,
+            listContents: Boolean(event.isDirectory)
+          }, true);
+        }
+        break;
+      default:
+        break;
+    }
+  }
+
+  const added = [];
+  const changed = [];
+  const removed = [];
+  for (const [relativePath, state] of states) {
+    const href = '/' + relativePath;
+    if (!state.exists) {
+      removed.push({ path: href, isDirectory: state.isDirectory });
+      continue;
+    }
+    const entry = { path: href, isDirectory: state.isDirectory, size: state.size };
+    if (state.listContents) {
+      entry.listContents = true;
+    }
+    (state.createdFirst ? added : changed).push(entry);
+  }
+
+  return {
+    lastSeq,
+    hasMore: lastSeq < eventLog.lastSeq,
+    added,
+    changed,
+    removed
+  };
+};
+
+module.exports = {
+  encodeSyncToken,
+  decodeSyncToken,
+  collectChanges,
+  normalizeRelative
+};
@@ -0,0 +1,141 @@
+const path = require('path');
+
+// 事件类型归类：同一类的事件互为“回声”
+const EVENT_CLASSES = {
+  created: 'file',
+  updated: 'file',
+  deleted: 'removed',
+  directoryDeleted: 'removed',
+  directoryCreated: 'directory'
+};
+
+// 用于判断监视器看到的文件是否就是服务器自己写入的那个版本
+const statsSignature = (stats) => {
+  if (!stats) {
+    return null;
+  }
+  return `${stats.ino}:${stats.size}:${stats.mtimeMs}`;
+};
+
+// 服务器自身发起的文件变更日志
+// WebDAV控制器完成写入/删除后先在这里登记，随后监视器报告的同一变更（回声）会被抑制，保证每个变更只通知一次
+class ChangeJournal {
+  constructor(options = {}) {
+    this.ttlMs = options.ttlMs !== undefined ? options.ttlMs : 5000;
+    this.entries = new Map(); // filePath -> { sequence, eventClass, signature, expiresAt }
+    this.trees = new Map(); // rootPath -> { sequence, eventClasses, expiresAt }，整个子树的变更（COPY/MOVE）
+    this.sequence = 0;
+    this.stats = {
+      mutationsRecorded: 0,
+      echoesSuppressed: 0
+    };
+  }
+
+  // 登记一次服务器发起的变更，返回其序列号
+  record(eventType, filePath, stats) {
+    const sequence = ++this.sequence;
+    this.stats.mutationsRecorded++;
+    this.prune();
+    // 重新插入以保持按过期时间排序
+    this.entries.delete(filePath);
+    this.entries.set(filePath, {
+      sequence,
+      eventClass: EVENT_CLASSES[eventType] || eventType,
+      signature: statsSignature(stats),
+      expiresAt: Date.now() + this.ttlMs
+    });
+    return sequence;
+  }
+
+  // 登记一次涉及整个子树的变更（例如MOVE/COPY一个目录），子树内属于 eventClasses 的所有监视器事件都视为回声
+  // eventClasses 为事件类别数组（'file'、'removed'、'directory'）；耗时较长的操作可在开始前以 ttlMs=Infinity 登记，完成后再次登记
+  recordTree(rootPath, eventClasses, ttlMs = this.ttlMs) {
+    const sequence = ++this.sequence;
+    this.stats.mutationsRecorded++;
+    this.prune();
+    this.trees.delete(rootPath);
+    this.trees.set(rootPath, {
+      sequence,
+      eventClasses: new Set(eventClasses),
+      expiresAt: Date.now() + ttlMs
+    });
+    return sequence;
+  }
+
+  // 撤销子树登记（操作失败时），之后的监视器事件照常通知
+  forgetTree(rootPath) {
+    this.trees.delete(rootPath);
+  }
+
+  // 判断监视器事件是否是已登记变更的回声；stats为监视器事件发生后文件的当前状态
+  isEcho(eventType, filePath, stats) {
+    if (this.trees.size > 0 && this.isTreeEcho(eventType, filePath)) {
+      this.stats.echoesSuppressed++;
+      return true;
+    }
+
+    const entry = this.entries.get(filePath);
+    if (!entry) {
+      return false;
+    }
+    if (entry.expiresAt <= Date.now()) {
+      this.entries.delete(filePath);
+      return false;
+    }
+    if (entry.eventClass !== (EVENT_CLASSES[eventType] || eventType)) {
+      return false;
+    }
+    // 文件类变更要求内容版本一致，若文件在此之后又被外部修改，则不视为回声
+    if (entry.eventClass === 'file' && entry.signature !== statsSignature(stats)) {
+      return false;
+    }
+
+    this.stats.echoesSuppressed++;
+    return true;
+  }
+
+  // 沿路径向上查找已登记的子树
+  isTreeEcho(eventType, filePath) {
+    const eventClass = EVENT_CLASSES[eventType] || eventType;
+    const now = Date.now();
+    let current = filePath;
+    while (true) {
+      const tree = this.trees.get(current);
+      if (tree && tree.expiresAt > now && tree.eventClasses.has(eventClass)) {
+        return true;
+      }
+      const parent = path.dirname(current);
+      if (parent === current) {
+        return false;
+      }
+      current = parent;
+    }
+  }
+
+  // 清除已过期的记录（Map按插入顺序即过期顺序排列）
+  prune() {
+    const now = Date.now();
+    for (const map of [this.entries, this.trees]) {
+      for (const [filePath, entry] of map) {
+        if (entry.expiresAt > now) {
+          break;
+        }
+        map.delete(filePath);
+      }
+    }
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      lastSequence: this.sequence,
+      pendingEntries: this.entries.size,
+      pendingTrees: this.trees.size
+    };
+  }
+}
+
+module.exports = {
+  ChangeJournal,
+  statsSignature
+};
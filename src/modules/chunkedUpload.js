@@ -0,0 +1,181 @@
+const fs = require('fs');
+const path = require('path');
+const crypto = require('crypto');
+const { pipeline } = require('stream');
+const { promisify } = require('util');
+const { syncPath } = require('./atomicWrite');
+const { createLogger } = require('./logger');
+
+const log = createLogger('ChunkedUpload');
+
+const pipelineAsync = promisify(pipeline);
+
+// 暂存目录名：以.开头，监视器会忽略其中的变化，也不会出现在目录列表中
+const STAGING_DIR_NAME = '.sdav-uploads';
+
+// 解析 Content-Range 请求头：bytes start-end/total 或 bytes */total（查询已接收的偏移量）
+// 每一块都必须声明总大小：总大小未知（/*）的上传无法判断哪一块是最后一块，永远不会完成，
+// 只会在暂存目录中留下数据直到过期，因此与其他无效格式一样返回null
+const parseContentRange = (header) => {
+  const match = /^bytes\s+(?:(\d+)-(\d+)|\*)\/(\d+)$/i.exec(String(header || '').trim());
+  if (!match) {
+    return null;
+  }
+  const total = parseInt(match[3], 10);
+  if (match[1] === undefined) {
+    return { query: true, total };
+  }
+  const start = parseInt(match[1], 10);
+  const end = parseInt(match[2], 10);
+  if (end < start || end >= total) {
+    return null;
+  }
+  return { query: false, start, end, total };
+};
+
+// 偏移量不一致等冲突错误，携带当前已接收的偏移量
+class UploadConflictError extends Error {
+  constructor(message, offset) {
+    super(message);
+    this.name = 'UploadConflictError';
+    this.offset = offset;
+  }
+}
+
+// 可续传的分块上传
+// 每个目标文件对应暂存目录中的一个暂存文件，其大小即已接收的偏移量（服务器重启后仍可续传）；
+// 最后一块写完后原子地rename到目标路径
+class ChunkedUploadStore {
+  constructor(options = {}) {
+    this.stagingDir = options.stagingDir;
+    this.ttlMs = options.ttlMs || 24 * 60 * 60 * 1000;
+    this.fsync = Boolean(options.fsync); // 完成时先fsync暂存文件再rename
+    this.highWaterMark = options.highWaterMark || 1024 * 1024;
+    this.active = new Set(); // 正在写入的暂存文件，同一文件的分块必须串行
+    this.stats = {
+      chunksReceived: 0,
+      bytesReceived: 0,
+      uploadsCompleted: 0,
+      conflicts: 0,
+      expiredRemoved: 0
+    };
+    fs.mkdirSync(this.stagingDir, { recursive: true });
+
+    this.cleanupTimer = setInterval(() => {
+      this.removeExpired().catch(err => log.error(`Cleanup failed: ${err.message}`));
+    }, Math.min(this.ttlMs, 60 * 60 * 1000));
+    this.cleanupTimer.unref();
+  }
+
+  // 暂存文件路径由目标路径的哈希确定，同一目标的后续分块总能找到它
+  stagingPath(filePath) {
+    const digest = crypto.createHash('sha1').update(filePath).digest('hex');
+    return path.join(this.stagingDir, `${digest}.part`);
+  }
+
+  // 已接收的字节数
+  async getOffset(filePath) {
+    try {
+      return (await fs.promises.stat(this.stagingPath(filePath))).size;
+    } catch (err) {
+      if (err.code === 'ENOENT') {
+        return 0;
+      }
+      throw err;
+    }
+  }
+
+  // 写入一个分块；返回 { offset, complete }
+  // 连接中途断开时已写入的部分会保留，客户端可从返回（或查询到）的偏移量继续
+  async writeChunk(filePath, source, range) {
+    const stagingPath = this.stagingPath(filePath);
+    if (this.active.has(stagingPath)) {
+      this.stats.conflicts++;
+      throw new UploadConflictError('Another chunk for this file is in progress', await this.getOffset(filePath));
+    }
+
+    this.active.add(stagingPath);
+    try {
+      const offset = range.start === 0 ? 0 : await this.getOffset(filePath);
+      if (range.start !== offset) {
+        this.stats.conflicts++;
+        throw new UploadConflictError(`Expected chunk at offset ${offset}`, offset);
+      }
+
+      // 从0开始表示（重新）开始上传，截断旧的暂存文件
+      await pipelineAsync(source, fs.createWriteStream(stagingPath, {
+        flags: range.start === 0 ? 'w' : 'r+',
+        start: range.start,
+        highWaterMark: this.highWaterMark
+      }));
+
+      let received = await this.getOffset(filePath);
+      if (received > range.end + 1) {
+        // 请求体比Content-Range声明的长，多出的部分不可信，截断
+        await fs.promises.truncate(stagingPath, range.end + 1);
+        received = range.end + 1;
+      }
+      this.stats.chunksReceived++;
+      this.stats.bytesReceived += received - range.start;
+      if (received !== range.end + 1) {
+        throw new UploadConflictError(`Chunk length does not match Content-Range (received up to ${received})`, received);
+      }
+
+      if (received === range.total) {
+        await fs.promises.mkdir(path.dirname(filePath), { recursive: true });
+        if (this.fsync) {
+          await syncPath(stagingPath, 'r+');
+        }
+        await fs.promises.rename(stagingPath, filePath);
+        this.stats.uploadsCompleted++;
+        return { offset: received, complete: true };
+      }
+      return { offset: received, complete: false };
+    } finally {
+      this.active.delete(stagingPath);
+    }
+  }
+
+  // 放弃上传，删除暂存文件
+  async abort(filePath) {
+    await fs.promises.rm(this.stagingPath(filePath), { force: true });
+  }
+
+  // 删除长时间没有新分块的暂存文件
+  async removeExpired() {
+    const now = Date.now();
+    for (const name of await fs.promises.readdir(this.stagingDir)) {
+      const stagingPath = path.join(this.stagingDir, name);
+      if (this.active.has(stagingPath)) {
+        continue;
+      }
+      try {
+        const stats = await fs.promises.stat(stagingPath);
+        if (now - stats.mtimeMs > this.ttlMs) {
+          await fs.promises.rm(stagingPath, { force: true });
+          this.stats.expiredRemoved++;
+        }
+      } catch (err) {
+        // 已被并发删除或完成
+      }
+    }
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      activeUploads: this.active.size
+    };
+  }
+
+  close() {
+    clearInterval(this.cleanupTimer);
+  }
+}
+
+module.exports = {
+  STAGING_DIR_NAME,
+  ChunkedUploadStore,
+  UploadConflictError,
+  parseContentRange
+};
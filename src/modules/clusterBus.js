@@ -0,0 +1,231 @@
+// 集群模式的事件总线（基于cluster的IPC通道）
+// 主进程拥有唯一的文件监视器、变更日志和事件日志，把规范化后的文件事件广播给所有工作进程；
+// 工作进程只负责HTTP/WebSocket，各自把事件与本进程客户端的订阅匹配，并把自身完成的变更上报给主进程
+
+const { createLogger } = require('./logger');
+
+const hubLog = createLogger('ClusterEventHub');
+const upstreamLog = createLogger('WorkerUpstream');
+
+// 消息类型前缀，区分本总线的消息与其他IPC消息（例如pm2的）
+const MESSAGE_PREFIX = 'sdav:';
+
+const isBusMessage = (message) => Boolean(message) &&
+  typeof message.type === 'string' &&
+  message.type.startsWith(MESSAGE_PREFIX);
+
+// 复制/移动/删除目录影响的子树：移动的源和目标，复制的目标，删除的源
+const transferTrees = (eventType, fromPath, toPath) => {
+  if (eventType === 'moved') {
+    return [['directoryDeleted', fromPath], ['directoryDeleted', toPath]];
+  }
+  return [['directoryDeleted', eventType === 'copied' ? toPath : fromPath]];
+};
+
+// 主进程：把 SubscriptionManager 的事件广播给工作进程，并代为处理工作进程上报的本地变更
+// options.hashIndex 为主进程的内容哈希索引，其条目同步给工作进程的副本
+class ClusterEventHub {
+  constructor(manager, options = {}) {
+    this.manager = manager;
+    this.hashIndex = options.hashIndex || null;
+    this.workers = new Set(); // 已就绪（已收到快照）的工作进程
+    this.workerWatches = new Map(); // worker -> Map(subscriptionPath -> 引用数)，工作进程退出时释放
+    this.pending = []; // 同一轮事件循环内的消息合并为一批发送，减少IPC次数
+    this.flushScheduled = false;
+    this.stats = {
+      eventsBroadcast: 0,
+      batchesSent: 0,
+      messagesFromWorkers: 0
+    };
+
+    manager.on('fileEvent', (event) => {
+      this.stats.eventsBroadcast++;
+      this.enqueue({ type: 'fileEvent', event });
+    });
+    // 原始监视器事件也转发给工作进程，用于使各自的元数据缓存失效
+    manager.on('watcherEvent', (eventType, filePath) => this.enqueue({ type: 'watcherEvent', eventType, filePath }));
+    manager.on('watcherError', (error) => this.enqueue({ type: 'watcherError', message: error.message }));
+    // 原生监视范围变化时同步给工作进程，用于判断路径能否缓存
+    manager.on('watchCoverage', (coverage) => this.enqueue({ type: 'watchCoverage', coverage }));
+    if (this.hashIndex) {
+      this.hashIndex.on('update', (relativePath, entry) => this.enqueue({ type: 'contentHash', path: relativePath, entry }));
+    }
+  }
+
+  // 接管一个工作进程；工作进程注册好消息处理后发送ready，此时再发送事件日志快照
+  addWorker(worker) {
+    worker.on('message', (message) => this.handleWorkerMessage(worker, message));
+    worker.on('exit', () => {
+      this.workers.delete(worker);
+      this.releaseWorkerWatches(worker);
+    });
+  }
+
+  // 订阅的原生监视按工作进程记录引用，工作进程崩溃时不会遗留监视
+  retainWorkerWatch(worker, subscriptionPath) {
+    let watches = this.workerWatches.get(worker);
+    if (!watches) {
+      watches = new Map();
+      this.workerWatches.set(worker, watches);
+    }
+    watches.set(subscriptionPath, (watches.get(subscriptionPath) || 0) + 1);
+    this.manager.retainWatch(subscriptionPath);
+  }
+
+  releaseWorkerWatch(worker, subscriptionPath) {
+    const watches = this.workerWatches.get(worker);
+    const count = watches ? watches.get(subscriptionPath) : 0;
+    if (!count) {
+      return;
+    }
+    if (count === 1) {
+      watches.delete(subscriptionPath);
+    } else {
+      watches.set(subscriptionPath, count - 1);
+    }
+    this.manager.releaseWatch(subscriptionPath);
+  }
+
+  releaseWorkerWatches(worker) {
+    const watches = this.workerWatches.get(worker);
+    if (!watches) {
+      return;
+    }
+    this.workerWatches.delete(worker);
+    for (const [subscriptionPath, count] of watches) {
+      for (let i = 0; i < count; i++) {
+        this.manager.releaseWatch(subscriptionPath);
+      }
+    }
+  }
+
+  handleWorkerMessage(worker, message) {
+    if (!isBusMessage(message)) {
+      return;
+    }
+    this.stats.messagesFromWorkers++;
+    const { eventType, filePath, fromPath, toPath } = message;
+    switch (message.type.slice(MESSAGE_PREFIX.length)) {
+      case 'ready': {
+        // 快照之后的事件经批量消息到达，工作进程按序列号忽略已包含在快照中的部分
+        const eventLog = this.manager.eventLog;
+        this.send(worker, {
+          type: 'sync',
+          epoch: eventLog.epoch,
+          lastSeq: eventLog.lastSeq,
+          events: eventLog.since(eventLog.oldestSeq - 1),
+          coverage: this.manager.watchCoverage,
+          contentHashes: this.hashIndex ? this.hashIndex.snapshot() : null
+        });
+        this.workers.add(worker);
+        break;
+      }
+      case 'localChange':
+        this.invalidateWorkers([[eventType, filePath]]);
+        this.manager.publishLocalChange(eventType, filePath, message.stats);
+        break;
+      case 'beginTransfer':
+        this.manager.beginLocalTransfer(eventType, fromPath, toPath);
+        break;
+      case 'cancelTransfer':
+        // 中途失败的复制/移动也可能已经改动了部分文件
+        this.invalidateWorkers(transferTrees(eventType, fromPath, toPath));
+        this.manager.cancelLocalTransfer(eventType, fromPath, toPath);
+        break;
+      case 'publishTransfer':
+        this.invalidateWorkers(transferTrees(eventType, fromPath, toPath));
+        this.manager.publishLocalTransfer(eventType, fromPath, toPath);
+        break;
+      case 'watchRetain':
+        this.retainWorkerWatch(worker, message.subscriptionPath);
+        break;
+      case 'watchRelease':
+        this.releaseWorkerWatch(worker, message.subscriptionPath);
+        break;
+      default:
+        hubLog.warn(`Unknown message from worker ${worker.process.pid}: ${message.type}`);
+    }
+  }
+
+  // 某个工作进程完成的变更立即通知所有工作进程使各自的元数据/内容缓存失效，
+  // 不等待监视器报告（轮询覆盖的目录最长要等一个轮询间隔），否则经其他工作进程读取会得到旧内容
+  // changes 为 [[eventType, filePath], ...]；'directoryDeleted' 使整个子树失效
+  invalidateWorkers(changes) {
+    for (const [eventType, filePath] of changes) {
+      this.enqueue({ type: 'watcherEvent', eventType, filePath });
+    }
+    this.flush();
+  }
+
+  enqueue(message) {
+    if (this.workers.size === 0) {
+      return;
+    }
+    this.pending.push(message);
+    if (!this.flushScheduled) {
+      this.flushScheduled = true;
+      setImmediate(() => this.flush());
+    }
+  }
+
+  flush() {
+    this.flushScheduled = false;
+    if (this.pending.length === 0) {
+      return;
+    }
+    const batch = { type: 'batch', messages: this.pending };
+    this.pending = [];
+    for (const worker of this.workers) {
+      this.send(worker, batch);
+    }
+    this.stats.batchesSent++;
+  }
+
+  send(worker, message) {
+    if (!worker.isConnected()) {
+      return;
+    }
+    try {
+      worker.send({ ...message, type: MESSAGE_PREFIX + message.type });
+    } catch (err) {
+      hubLog.error(`Failed to send ${message.type} to worker ${worker.process.pid}: ${err.message}`);
+    }
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      workers: this.workers.size
+    };
+  }
+}
+
+// 工作进程：与主进程通信的通道，传给 SubscriptionManager 的 upstream 选项
+class WorkerUpstream {
+  constructor(proc = process) {
+    this.process = proc;
+  }
+
+  // 注册消息处理函数并通知主进程已就绪；handler(type, message)
+  connect(handler) {
+    this.process.on('message', (message) => {
+      if (isBusMessage(message)) {
+        handler(message.type.slice(MESSAGE_PREFIX.length), message);
+      }
+    });
+    this.send('ready');
+  }
+
+  send(type, payload = {}) {
+    if (!this.process.connected) {
+      upstreamLog.error(`IPC channel closed, dropping ${type}`);
+      return;
+    }
+    this.process.send({ ...payload, type: MESSAGE_PREFIX + type });
+  }
+}
+
+module.exports = {
+  ClusterEventHub,
+  WorkerUpstream
+};
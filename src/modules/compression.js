@@ -0,0 +1,76 @@
+const zlib = require('zlib');
+
+// HTTP响应压缩（Content-Encoding）：协商编码并创建压缩流
+
+// 解析Accept-Encoding，按服务器支持的编码（按优先顺序）选出客户端可接受的一个，没有时返回null
+const negotiateEncoding = (acceptEncoding, supported) => {
+  if (!acceptEncoding || supported.length === 0) {
+    return null;
+  }
+  const accepted = new Map();
+  for (const item of String(acceptEncoding).split(',')) {
+    const [name, ...params] = item.trim().toLowerCase().split(';');
+    if (!name) {
+      continue;
+    }
+    let quality = 1;
+    for (const param of params) {
+      const [key, value] = param.trim().split('=');
+      if (key === 'q') {
+        quality = parseFloat(value);
+      }
+    }
+    accepted.set(name, Number.isNaN(quality) ? 0 : quality);
+  }
+
+  let best = null;
+  let bestQuality = 0;
+  for (const encoding of supported) {
+    const quality = accepted.has(encoding) ? accepted.get(encoding) : (accepted.get('*') || 0);
+    if (quality > bestQuality) {
+      best = encoding;
+      bestQuality = quality;
+    }
+  }
+  return best;
+};
+
+// 创建压缩流；level 为gzip级别（1-9），brotli使用适合流式响应的中等质量
+const createCompressionStream = (encoding, options = {}) => {
+  if (encoding === 'br') {
+    return zlib.createBrotliCompress({
+      params: {
+        [zlib.constants.BROTLI_PARAM_QUALITY]: options.brotliQuality || 4,
+        [zlib.constants.BROTLI_PARAM_MODE]: zlib.constants.BROTLI_MODE_TEXT,
+        ...(options.sizeHint ? { [zlib.constants.BROTLI_PARAM_SIZE_HINT]: options.sizeHint } : {})
+      }
+    });
+  }
+  return zlib.createGzip({ level: options.level || 6 });
+};
+
+// 压缩一个完整的响应体（异步，不阻塞事件循环）
+const compressBuffer = (encoding, buffer, options = {}) => new Promise((resolve, reject) => {
+  const callback = (err, result) => (err ? reject(err) : resolve(result));
+  if (encoding === 'br') {
+    zlib.brotliCompress(buffer, {
+      params: {
+        [zlib.constants.BROTLI_PARAM_QUALITY]: options.brotliQuality || 4,
+        [zlib.constants.BROTLI_PARAM_MODE]: zlib.constants.BROTLI_MODE_TEXT,
+        [zlib.constants.BROTLI_PARAM_SIZE_HINT]: buffer.length
+      }
+    }, callback);
+  } else {
+    zlib.gzip(buffer, { level: options.level || 6 }, callback);
+  }
+});
+
+// 压缩后的表示与原始内容字节不同，使用弱ETag（If-None-Match仍可匹配，If-Range/If-Match不会误用）
+const weakEtag = (etag) => (etag.startsWith('W/') ? etag : `W/${etag}`);
+
+module.exports = {
+  negotiateEncoding,
+  createCompressionStream,
+  compressBuffer,
+  weakEtag
+};
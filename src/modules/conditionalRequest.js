@@ -0,0 +1,79 @@
+// HTTP条件请求（RFC 9110 第13节）：ETag/Last-Modified 生成与前置条件判断
+
+// 由文件状态生成强ETag：inode、大小与微秒级mtime任一变化都会改变ETag
+// 只由文件状态生成，不使用后台计算的内容哈希：否则哈希算完后同一个未变化的文件ETag会改变，
+// 客户端缓存和If-Match都会失效；内容哈希另由 X-SDAV-Content-SHA256 头和 oc:checksums 属性提供
+const computeEtag = (stats) => {
+  const mtimeUs = Math.floor(stats.mtimeMs * 1000);
+  return `"${stats.ino.toString(16)}-${stats.size.toString(16)}-${mtimeUs.toString(16)}"`;
+};
+
+// HTTP日期只精确到秒
+const lastModifiedSeconds = (stats) => Math.floor(stats.mtimeMs / 1000);
+
+// 解析 If-Match / If-None-Match 头：返回 '*' 或ETag数组（保留W/前缀）
+const parseEtagList = (header) => {
+  if (header === undefined || header === null) {
+    return null;
+  }
+  const value = String(header).trim();
+  if (value === '*') {
+    return '*';
+  }
+  return value.match(/(W\/)?"[^"]*"/g) || [];
+};
+
+const opaqueTag = (etag) => (etag.startsWith('W/') ? etag.slice(2) : etag);
+
+// 强比较：两者都不能是弱ETag
+const strongMatch = (tags, etag) => tags.some(tag => !tag.startsWith('W/') && tag === etag);
+
+// 弱比较：忽略W/前缀
+const weakMatch = (tags, etag) => tags.some(tag => opaqueTag(tag) === opaqueTag(etag));
+
+const parseHttpDate = (header) => {
+  if (!header) {
+    return null;
+  }
+  const time = Date.parse(header);
+  return Number.isNaN(time) ? null : Math.floor(time / 1000);
+};
+
+// 按RFC 9110 13.2.2 的顺序评估前置条件
+// stats 为资源当前状态（不存在时为null），etag 为其当前ETag
+// 返回应直接响应的状态码（304或412），前置条件全部满足时返回null
+const evaluatePreconditions = (method, headers, stats, etag) => {
+  const isRead = method === 'GET' || method === 'HEAD';
+
+  const ifMatch = parseEtagList(headers['if-match']);
+  if (ifMatch !== null) {
+    if (!stats || (ifMatch !== '*' && !strongMatch(ifMatch, etag))) {
+      return 412;
+    }
+  } else {
+    const ifUnmodifiedSince = parseHttpDate(headers['if-unmodified-since']);
+    if (ifUnmodifiedSince !== null && stats && lastModifiedSeconds(stats) > ifUnmodifiedSince) {
+      return 412;
+    }
+  }
+
+  const ifNoneMatch = parseEtagList(headers['if-none-match']);
+  if (ifNoneMatch !== null) {
+    if (stats && (ifNoneMatch === '*' || weakMatch(ifNoneMatch, etag))) {
+      return isRead ? 304 : 412;
+    }
+  } else if (isRead) {
+    const ifModifiedSince = parseHttpDate(headers['if-modified-since']);
+    if (ifModifiedSince !== null && stats && lastModifiedSeconds(stats) <= ifModifiedSince) {
+      return 304;
+    }
+  }
+
+  return null;
+};
+
+module.exports = {
+  computeEtag,
+  evaluatePreconditions,
+  parseEtagList
+};
@@ -0,0 +1,198 @@
+const fs = require('fs');
+const path = require('path');
+
+// 小文件内容的LRU缓存（按字节预算）：客户端反复下载的配置、词库等小文件直接从内存中的Buffer返回，
+// 不再打开和读取文件。条目记录读取时文件的inode/大小/mtime，与请求时的文件状态不一致即视为过期；
+// 另外由监视器事件和控制器自身的写操作精确失效
+class ContentCache {
+  constructor(options = {}) {
+    this.maxBytes = options.maxBytes !== undefined ? options.maxBytes : 64 * 1024 * 1024;
+    this.maxFileSize = options.maxFileSize !== undefined ? options.maxFileSize : 256 * 1024;
+    this.entries = new Map(); // 文件路径 -> 条目，Map的插入顺序即LRU顺序
+    this.inflight = new Map(); // 文件路径 -> Promise，合并并发的相同读取
+    this.bytes = 0;
+    this.generation = 0; // 每次失效递增，读取期间发生过失效时结果不写入缓存
+    this.stats = {
+      hits: 0,
+      misses: 0,
+      bytesServed: 0,
+      invalidations: 0,
+      evictions: 0
+    };
+  }
+
+  get enabled() {
+    return this.maxBytes > 0 && this.maxFileSize > 0;
+  }
+
+  // 文件是否可以缓存（按大小）
+  accepts(size) {
+    return this.enabled && size <= this.maxFileSize;
+  }
+
+  // 返回与 stats 一致的条目并标记为最近使用，没有或已过期时返回null
+  lookup(filePath, stats) {
+    const entry = this.entries.get(filePath);
+    if (!entry) {
+      return null;
+    }
+    if (!isSameFile(entry.stats, stats)) {
+      this.remove(filePath, entry);
+      return null;
+    }
+    this.entries.delete(filePath);
+    this.entries.set(filePath, entry);
+    return entry;
+  }
+
+  // 读取文件并加入缓存；读取时文件已与 stats 不一致（期间被替换或修改）时返回null，由调用方以流的方式读取
+  load(filePath, stats) {
+    let pending = this.inflight.get(filePath);
+    if (!pending) {
+      const generation = this.generation;
+      pending = readIfUnchanged(filePath, stats).then((body) => {
+        if (!body) {
+          return null;
+        }
+        const entry = {
+          stats: { ino: stats.ino, size: stats.size, mtimeMs: stats.mtimeMs },
+          body,
+          bytes: body.length,
+          variants: new Map() // 表示（编码）-> { etag, headers, body }
+        };
+        if (generation === this.generation) {
+          this.store(filePath, entry);
+        }
+        return entry;
+      }).finally(() => this.inflight.delete(filePath));
+      this.inflight.set(filePath, pending);
+    }
+    return pending;
+  }
+
+  // 为条目记录一种完整响应的表示（预先计算的响应头和响应体，压缩后的响应体计入字节预算）
+  addVariant(filePath, entry, key, variant) {
+    const previous = entry.variants.get(key);
+    const delta = (variant.body === entry.body ? 0 : variant.body.length) -
+      (previous && previous.body !== entry.body ? previous.body.length : 0);
+    entry.variants.set(key, variant);
+    entry.bytes += delta;
+    if (this.entries.get(filePath) === entry) {
+      this.bytes += delta;
+      this.evict();
+    }
+  }
+
+  // 记录一次从内存返回的响应；hit为false表示本次请求读取了文件
+  recordServed(bytes, hit) {
+    if (hit) {
+      this.stats.hits++;
+    } else {
+      this.stats.misses++;
+    }
+    this.stats.bytesServed += bytes;
+  }
+
+  store(filePath, entry) {
+    const previous = this.entries.get(filePath);
+    if (previous) {
+      this.remove(filePath, previous);
+    }
+    if (entry.bytes > this.maxBytes) {
+      return;
+    }
+    this.entries.set(filePath, entry);
+    this.bytes += entry.bytes;
+    this.evict();
+  }
+
+  evict() {
+    while (this.bytes > this.maxBytes && this.entries.size > 0) {
+      const [oldestPath, oldest] = this.entries.entries().next().value;
+      this.remove(oldestPath, oldest);
+      this.stats.evictions++;
+    }
+  }
+
+  remove(filePath, entry) {
+    this.entries.delete(filePath);
+    this.bytes -= entry.bytes;
+  }
+
+  invalidate(filePath) {
+    this.generation++;
+    this.stats.invalidations++;
+    const entry = this.entries.get(filePath);
+    if (entry) {
+      this.remove(filePath, entry);
+    }
+  }
+
+  // 目录被删除或移动：清除整个子树
+  invalidateTree(dirPath) {
+    this.invalidate(dirPath);
+    const prefix = dirPath.endsWith(path.sep) ? dirPath : dirPath + path.sep;
+    for (const [filePath, entry] of Array.from(this.entries)) {
+      if (filePath.startsWith(prefix)) {
+        this.remove(filePath, entry);
+      }
+    }
+  }
+
+  // 根据文件事件类型失效对应的缓存
+  handleFileEvent(eventType, filePath) {
+    if (eventType === 'directoryDeleted') {
+      this.invalidateTree(filePath);
+    } else {
+      this.invalidate(filePath);
+    }
+  }
+
+  clear() {
+    this.generation++;
+    this.stats.invalidations++;
+    this.entries.clear();
+    this.bytes = 0;
+  }
+
+  getStats() {
+    const requests = this.stats.hits + this.stats.misses;
+    return {
+      ...this.stats,
+      entries: this.entries.size,
+      bytes: this.bytes,
+      maxBytes: this.maxBytes,
+      maxFileSize: this.maxFileSize,
+      hitRate: requests === 0 ? 0 : Number((this.stats.hits / requests).toFixed(4))
+    };
+  }
+}
+
+const isSameFile = (a, b) => a.ino === b.ino && a.size === b.size && a.mtimeMs === b.mtimeMs;
+
+// 通过同一个文件描述符确认文件仍与 stats 一致后读取全部内容，不一致时返回null
+const readIfUnchanged = async (filePath, stats) => {
+  const handle = await fs.promises.open(filePath, 'r');
+  try {
+    const current = await handle.stat();
+    if (!isSameFile(current, stats)) {
+      return null;
+    }
+    const body = Buffer.allocUnsafe(current.size);
+    let offset = 0;
+    while (offset < body.length) {
+      const { bytesRead } = await handle.read(body, offset, body.length - offset, offset);
+      if (bytesRead === 0) {
+        return null; // 读取期间文件被截断
+      }
+      offset += bytesRead;
+    }
+    return body;
+  } finally {
+    await handle.close();
+  }
+};
+
+module.exports = {
+  ContentCache
+};
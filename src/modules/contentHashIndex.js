@@ -0,0 +1,545 @@
+const fs = require('fs');
+const path = require('path');
+const EventEmitter = require('events');
+const storageConfig = require('../config/storage');
+const { HashWorkerPool } = require('./hashWorkerPool');
+const { STAGING_DIR_NAME } = require('./chunkedUpload');
+const { createLogger } = require('./logger');
+
+const log = createLogger('ContentHashIndex');
+
+// 服务器内部状态目录（上传目录下）：以.开头，监视器会忽略，不出现在目录列表中，也不能经WebDAV访问
+const STATE_DIR_NAME = '.sdav-state';
+
+// 扫描时pending队列的上限：超过后遍历暂停，等待哈希追上，避免首次建立索引时把整棵树的路径都放进内存
+const MAX_PENDING = 1000;
+// 计算期间文件被修改时，多久后重新计算
+const RETRY_DELAY_MS = 1000;
+
+const isSameEntry = (entry, stats) => Boolean(entry) &&
+  entry.size === stats.size &&
+  entry.mtimeMs === stats.mtimeMs &&
+  entry.ino === stats.ino;
+
+// 持久化的内容哈希索引：相对路径 -> { size, mtimeMs, ino, sha256 }
+// - 查询时用文件当前的 size/mtime/inode 校验条目，不一致的条目视为不存在，不会返回过期的哈希
+// - 后台在工作线程中计算哈希：启动时遍历监视范围，只为新增或变化的文件计算（重启后从上次的进度继续），
+//   之后由 SubscriptionManager 的文件事件增量更新
+// - 索引以JSON行追加写入文件，加载时和行数过多时压缩重写
+// - replica 模式（集群工作进程）不计算哈希也不写文件，由主进程经IPC同步
+// 条目变化时发出 'update' (relativePath, entry|null)
+class ContentHashIndex extends EventEmitter {
+  constructor(options = {}) {
+    super();
+    this.rootDir = path.resolve(options.rootDir);
+    this.roots = (options.roots || [this.rootDir]).map(root => path.resolve(root));
+    this.filePath = options.filePath || null;
+    this.replica = Boolean(options.replica);
+    this.isIgnored = options.isIgnored || (() => false); // (filePath, isDirectory) => boolean
+    this.concurrency = options.concurrency || 1;
+    this.pool = null;
+    this.hashFile = options.hashFile || ((filePath) => {
+      if (!this.pool) {
+        this.pool = new HashWorkerPool({ size: this.concurrency, highWaterMark: storageConfig.readHighWaterMark });
+      }
+      return this.pool.hash(filePath);
+    });
+
+    this.entries = new Map();
+    this.byHash = new Map(); // sha256 -> Set(relativePath)
+    this.byInode = new Map(); // inode -> relativePath，硬链接（例如去重上传生成的文件）直接沿用已有的哈希
+    this.pending = new Set(); // 等待计算的绝对路径
+    this.active = 0;
+    this.capacityWaiters = [];
+    this.idleWaiters = [];
+    this.scanning = 0;
+    this.stream = null;
+    this.linesSinceCompaction = 0;
+    this.compacting = false;
+    this.pendingLines = [];
+    this.closed = false;
+    this.stats = {
+      filesHashed: 0,
+      bytesHashed: 0,
+      hashErrors: 0,
+      hashRetries: 0,
+      hardlinksReused: 0,
+      scans: 0
+    };
+  }
+
+  // 加载持久化的索引并开始后台扫描
+  start() {
+    if (this.replica) {
+      return;
+    }
+    if (this.filePath) {
+      this.load();
+    }
+    this.scanRoots();
+  }
+
+  scanRoots() {
+    Promise.all(this.roots.map(root => this.scanTree(root, { prune: true })))
+      .then(() => this.waitForIdle())
+      .then(() => {
+        if (!this.closed) {
+          log.info(`Index up to date: ${this.entries.size} files, ${this.stats.filesHashed} hashed since start`);
+        }
+      })
+      .catch(err => log.error(`Scan failed: ${err.message}`));
+  }
+
+  // 接入 SubscriptionManager：主进程/单进程按文件事件更新索引，工作进程接收主进程同步的条目
+  attach(manager) {
+    if (this.replica) {
+      manager.on('contentHashSync', (entries) => this.reset(entries));
+      manager.on('contentHashUpdate', (relativePath, entry) => this.apply(relativePath, entry));
+      return;
+    }
+    manager.on('fileEvent', (notification) => this.handleNotification(notification));
+    // 监视器出错时可能漏报事件，重新扫描一遍（只计算变化的文件）
+    manager.on('watcherError', () => this.scanRoots());
+  }
+
+  toRelative(filePath) {
+    const relativePath = path.relative(this.rootDir, filePath);
+    if (relativePath === '' || relativePath.startsWith('..') || path.isAbsolute(relativePath)) {
+      return null;
+    }
+    return relativePath;
+  }
+
+  // 文件当前内容的sha256（十六进制），没有与 stats 一致的条目时返回null；只查询索引，不触发计算
+  lookup(filePath, stats) {
+    const relativePath = this.toRelative(filePath);
+    const entry = relativePath === null ? null : this.entries.get(relativePath);
+    return stats && isSameEntry(entry, stats) ? entry.sha256 : null;
+  }
+
+  // 索引中内容为该哈希的文件（绝对路径），条目由文件事件保持更新，使用前如需确定仍然有效应再stat校验
+  findPaths(sha256) {
+    const paths = this.byHash.get(sha256);
+    return paths ? Array.from(paths, relativePath => path.join(this.rootDir, relativePath)) : [];
+  }
+
+  // 处理 SubscriptionManager 发出的通知（路径相对于上传目录）
+  handleNotification(notification) {
+    const relativePath = notification.path;
+    const filePath = path.join(this.rootDir, relativePath);
+    switch (notification.eventType) {
+      case 'created':
+      case 'updated':
+        this.enqueue(filePath);
+        break;
+      case 'deleted':
+      case 'directoryDeleted':
+        this.removeTree(relativePath);
+        break;
+      case 'directoryCreated':
+      case 'copied':
+        this.scanTree(filePath).catch(err => log.error(`Scan of ${filePath} failed: ${err.message}`));
+        break;
+      case 'moved':
+        // rename不改变inode和mtime，条目跟随移动后仍然有效；随后的扫描只重新计算不一致的文件
+        this.moveTree(notification.fromPath, relativePath);
+        this.scanTree(filePath).catch(err => log.error(`Scan of ${filePath} failed: ${err.message}`));
+        break;
+      default:
+        break;
+    }
+  }
+
+  // 遍历目录（或单个文件），把不在索引中或已变化的文件加入计算队列
+  // prune 为true时同时删除索引中已不存在的文件的条目（启动或重新扫描时）
+  async scanTree(rootPath, options = {}) {
+    this.scanning++;
+    this.stats.scans++;
+    const seen = options.prune ? new Set() : null;
+    try {
+      const stack = [rootPath];
+      while (stack.length > 0 && !this.closed) {
+        const current = stack.pop();
+        let stats;
+        try {
+          stats = await fs.promises.stat(current);
+        } catch (err) {
+          continue;
+        }
+        if (stats.isDirectory()) {
+          if (current !== rootPath && this.isIgnored(current, true)) {
+            continue;
+          }
+          let names;
+          try {
+            names = await fs.promises.readdir(current);
+          } catch (err) {
+            continue;
+          }
+          names.forEach(name => stack.push(path.join(current, name)));
+        } else if (stats.isFile() && !this.isIgnored(current, false)) {
+          const relativePath = this.toRelative(current);
+          if (relativePath === null) {
+            continue;
+          }
+          if (seen) {
+            seen.add(relativePath);
+          }
+          if (!isSameEntry(this.entries.get(relativePath), stats)) {
+            await this.waitForCapacity();
+            this.enqueue(current);
+          }
+        }
+      }
+      if (seen && !this.closed) {
+        // 遍历期间新建的文件可能没有被看到，删除前再确认一次文件确实不存在
+        const rootRelative = path.relative(this.rootDir, rootPath);
+        for (const relativePath of Array.from(this.entries.keys())) {
+          if (seen.has(relativePath) || (rootRelative !== '' && relativePath !== rootRelative && !isInsideRelative(rootRelative, relativePath))) {
+            continue;
+          }
+          try {
+            await fs.promises.stat(path.join(this.rootDir, relativePath));
+          } catch (err) {
+            if (err.code === 'ENOENT' || err.code === 'ENOTDIR') {
+              this.remove(relativePath);
+            }
+          }
+        }
+      }
+    } finally {
+      this.scanning--;
+    }
+  }
+
+  enqueue(filePath) {
+    if (this.replica || this.closed) {
+      return;
+    }
+    this.pending.add(filePath);
+    this.pump();
+  }
+
+  pump() {
+    while (this.active < this.concurrency && this.pending.size > 0) {
+      const filePath = this.pending.values().next().value;
+      this.pending.delete(filePath);
+      this.active++;
+      this.hashPath(filePath)
+        .catch((err) => {
+          this.stats.hashErrors++;
+          log.error(`Could not hash ${filePath}: ${err.message}`);
+        })
+        .finally(() => {
+          this.active--;
+          this.notifyWaiters();
+          this.pump();
+        });
+    }
+  }
+
+  async hashPath(filePath) {
+    const relativePath = this.toRelative(filePath);
+    if (relativePath === null) {
+      return;
+    }
+    let stats;
+    try {
+      stats = await fs.promises.stat(filePath);
+    } catch (err) {
+      if (err.code === 'ENOENT' || err.code === 'ENOTDIR') {
+        this.remove(relativePath);
+        return;
+      }
+      throw err;
+    }
+    if (!stats.isFile() || this.isIgnored(filePath, false) || isSameEntry(this.entries.get(relativePath), stats)) {
+      return;
+    }
+    const linked = this.entries.get(this.byInode.get(stats.ino));
+    if (isSameEntry(linked, stats)) {
+      this.stats.hardlinksReused++;
+      this.set(relativePath, linked);
+      return;
+    }
+
+    let result;
+    try {
+      result = await this.hashFile(filePath);
+    } catch (err) {
+      if (err.code === 'ENOENT') {
+        this.remove(relativePath);
+        return;
+      }
+      throw err;
+    }
+    if (this.closed) {
+      return;
+    }
+    if (!result) {
+      // 计算期间文件被修改：稍后重新计算（写入完成后通常还会收到updated事件）
+      this.stats.hashRetries++;
+      setTimeout(() => this.enqueue(filePath), RETRY_DELAY_MS).unref();
+      return;
+    }
+    this.stats.filesHashed++;
+    this.stats.bytesHashed += result.size;
+    this.set(relativePath, result);
+  }
+
+  set(relativePath, entry) {
+    const record = { size: entry.size, mtimeMs: entry.mtimeMs, ino: entry.ino, sha256: entry.sha256 };
+    this.store(relativePath, record);
+    this.writeRecord({ p: relativePath, s: record.size, m: record.mtimeMs, i: record.ino, h: record.sha256 });
+    this.emit('update', relativePath, record);
+  }
+
+  remove(relativePath) {
+    if (!this.entries.has(relativePath)) {
+      return;
+    }
+    this.store(relativePath, null);
+    this.writeRecord({ p: relativePath });
+    this.emit('update', relativePath, null);
+  }
+
+  removeTree(relativePath) {
+    this.remove(relativePath);
+    for (const candidate of Array.from(this.entries.keys())) {
+      if (isInsideRelative(relativePath, candidate)) {
+        this.remove(candidate);
+      }
+    }
+  }
+
+  moveTree(fromRelative, toRelative) {
+    this.removeTree(toRelative);
+    for (const [candidate, entry] of Array.from(this.entries)) {
+      if (candidate === fromRelative || isInsideRelative(fromRelative, candidate)) {
+        this.remove(candidate);
+        this.set(toRelative + candidate.slice(fromRelative.length), entry);
+      }
+    }
+  }
+
+  // 只更新内存中的条目和哈希反查表
+  store(relativePath, entry) {
+    const previous = this.entries.get(relativePath);
+    if (previous) {
+      const paths = this.byHash.get(previous.sha256);
+      paths.delete(relativePath);
+      if (paths.size === 0) {
+        this.byHash.delete(previous.sha256);
+      }
+      if (this.byInode.get(previous.ino) === relativePath) {
+        this.byInode.delete(previous.ino);
+      }
+    }
+    if (!entry) {
+      this.entries.delete(relativePath);
+      return;
+    }
+    this.entries.set(relativePath, entry);
+    this.byInode.set(entry.ino, relativePath);
+    let paths = this.byHash.get(entry.sha256);
+    if (!paths) {
+      paths = new Set();
+      this.byHash.set(entry.sha256, paths);
+    }
+    paths.add(relativePath);
+  }
+
+  // 集群工作进程：用主进程索引的快照替换本地内容
+  reset(entries) {
+    this.entries.clear();
+    this.byHash.clear();
+    this.byInode.clear();
+    for (const [relativePath, entry] of entries || []) {
+      this.store(relativePath, entry);
+    }
+  }
+
+  // 集群工作进程：应用主进程的一条更新（entry为null表示删除）
+  apply(relativePath, entry) {
+    this.store(relativePath, entry);
+  }
+
+  // 可经IPC传递的快照
+  snapshot() {
+    return Array.from(this.entries);
+  }
+
+  waitForCapacity() {
+    if (this.pending.size < MAX_PENDING) {
+      return Promise.resolve();
+    }
+    return new Promise(resolve => this.capacityWaiters.push(resolve));
+  }
+
+  // 等待队列中的文件全部计算完成
+  waitForIdle() {
+    if (this.active === 0 && this.pending.size === 0) {
+      return Promise.resolve();
+    }
+    return new Promise(resolve => this.idleWaiters.push(resolve));
+  }
+
+  notifyWaiters() {
+    if (this.pending.size < MAX_PENDING) {
+      this.capacityWaiters.splice(0).forEach(resolve => resolve());
+    }
+    if (this.active === 0 && this.pending.size === 0) {
+      this.idleWaiters.splice(0).forEach(resolve => resolve());
+    }
+  }
+
+  // 从磁盘加载索引，并压缩索引文件
+  load() {
+    let content = '';
+    try {
+      content = fs.readFileSync(this.filePath, 'utf8');
+    } catch (err) {
+      if (err.code !== 'ENOENT') {
+        log.error(`Could not read hash index ${this.filePath}: ${err.message}`);
+      }
+    }
+
+    for (const line of content.split('\n')) {
+      if (!line) {
+        continue;
+      }
+      try {
+        const record = JSON.parse(line);
+        if (typeof record.p !== 'string') {
+          continue;
+        }
+        this.store(record.p, record.h ? { size: record.s, mtimeMs: record.m, ino: record.i, sha256: record.h } : null);
+      } catch (err) {
+        // 忽略写入中断造成的不完整行
+      }
+    }
+
+    log.info(`Loaded ${this.entries.size} hashes from ${this.filePath}`);
+    fs.mkdirSync(path.dirname(this.filePath), { recursive: true });
+    fs.writeFileSync(this.filePath, this.serialize());
+    this.openStream();
+  }
+
+  openStream() {
+    this.stream = fs.createWriteStream(this.filePath, { flags: 'a' });
+    this.stream.on('error', (err) => log.error(`Write error: ${err.message}`));
+  }
+
+  serialize() {
+    const lines = [JSON.stringify({ algorithm: 'sha256' })];
+    for (const [relativePath, entry] of this.entries) {
+      lines.push(JSON.stringify({ p: relativePath, s: entry.size, m: entry.mtimeMs, i: entry.ino, h: entry.sha256 }));
+    }
+    return lines.join('\n') + '\n';
+  }
+
+  writeRecord(record) {
+    if (!this.filePath || this.replica) {
+      return;
+    }
+    const line = JSON.stringify(record);
+    if (this.compacting) {
+      this.pendingLines.push(line);
+      return;
+    }
+    if (!this.stream) {
+      return;
+    }
+    this.stream.write(line + '\n');
+    this.linesSinceCompaction++;
+    // 追加的行数超过条目数时重写文件，保持文件大小与索引大小相当
+    if (this.linesSinceCompaction >= Math.max(1000, this.entries.size)) {
+      this.compact();
+    }
+  }
+
+  // 将当前索引写入临时文件后原子替换索引文件
+  compact() {
+    this.compacting = true;
+    this.linesSinceCompaction = 0;
+    const tempPath = `${this.filePath}.tmp`;
+    const oldStream = this.stream;
+
+    fs.promises.writeFile(tempPath, this.serialize())
+      .then(() => new Promise(resolve => oldStream.end(resolve)))
+      .then(() => fs.promises.rename(tempPath, this.filePath))
+      .catch(err => log.error(`Compaction failed: ${err.message}`))
+      .finally(() => {
+        this.compacting = false;
+        if (this.closed) {
+          return;
+        }
+        this.openStream();
+        const pending = this.pendingLines;
+        this.pendingLines = [];
+        pending.forEach(line => {
+          this.stream.write(line + '\n');
+          this.linesSinceCompaction++;
+        });
+      });
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      entries: this.entries.size,
+      distinctHashes: this.byHash.size,
+      pending: this.pending.size + this.active,
+      scanning: this.scanning > 0,
+      replica: this.replica,
+      persistent: Boolean(this.filePath) && !this.replica,
+      workers: this.pool ? this.pool.getStats() : null
+    };
+  }
+
+  close() {
+    this.closed = true;
+    this.pending.clear();
+    this.notifyWaiters();
+    this.capacityWaiters.splice(0).forEach(resolve => resolve());
+    if (this.pool) {
+      this.pool.close();
+    }
+    if (this.stream) {
+      this.stream.end();
+      this.stream = null;
+    }
+  }
+}
+
+// 相对路径 childPath 是否位于 parentPath 之下（不含自身）
+const isInsideRelative = (parentPath, childPath) => childPath.startsWith(parentPath + path.sep);
+
+// 按环境变量为 SubscriptionManager 创建内容哈希索引并接入其事件；CONTENT_HASH_ENABLE=false 时返回null
+// 集群工作进程（有upstream）中创建的是主进程索引的副本
+const createContentHashIndex = (manager) => {
+  if (process.env.CONTENT_HASH_ENABLE === 'false') {
+    return null;
+  }
+  const replica = Boolean(manager.upstream);
+  const stateDir = path.join(manager.uploadDir, STATE_DIR_NAME);
+  const excludedDirs = [stateDir, path.join(manager.uploadDir, STAGING_DIR_NAME)];
+  const index = new ContentHashIndex({
+    rootDir: manager.uploadDir,
+    roots: manager.watchRoots,
+    filePath: replica ? null : (process.env.CONTENT_HASH_INDEX_FILE || path.join(stateDir, 'content-hashes.jsonl')),
+    replica,
+    concurrency: parseInt(process.env.CONTENT_HASH_WORKERS) || 1,
+    isIgnored: (filePath, isDirectory) => excludedDirs.some(dir => filePath === dir || filePath.startsWith(dir + path.sep)) ||
+      manager.isIgnoredPath(filePath, isDirectory)
+  });
+  index.attach(manager);
+  index.start();
+  return index;
+};
+
+module.exports = {
+  STATE_DIR_NAME,
+  ContentHashIndex,
+  createContentHashIndex
+};
@@ -0,0 +1,172 @@
+const fs = require('fs');
+const { tempPathFor, syncPath } = require('./atomicWrite');
+
+// 去重上传：客户端在PUT请求头中预先声明内容的SHA-256和大小，
+// 如果内容哈希索引中已有相同内容的文件，就在服务器上由它生成目标文件（reflink或复制），不再接收请求体
+const HASH_HEADER = 'x-sdav-content-sha256';
+const SIZE_HEADER = 'x-sdav-content-size';
+
+const DEDUP_MODES = ['reflink', 'hardlink', 'off'];
+
+// reflink/硬链接不被支持（文件系统或跨设备）时的错误码，此时回退为普通复制
+const UNSUPPORTED_LINK_ERRORS = ['ENOTSUP', 'EOPNOTSUPP', 'ENOSYS', 'EXDEV', 'EINVAL', 'EPERM', 'EMLINK'];
+
+// 解析声明的内容：{ sha256, size }；未声明或格式无效时返回null
+// 大小优先取 X-SDAV-Content-Size，未提供时使用 Content-Length
+const parseDeclaredContent = (headers) => {
+  const sha256 = String(headers[HASH_HEADER] || '').trim().toLowerCase();
+  if (!/^[0-9a-f]{64}$/.test(sha256)) {
+    return null;
+  }
+  const sizeHeader = headers[SIZE_HEADER] !== undefined ? headers[SIZE_HEADER] : headers['content-length'];
+  if (!/^\d+$/.test(String(sizeHeader || '').trim())) {
+    return null;
+  }
+  return { sha256, size: parseInt(sizeHeader, 10) };
+};
+
+const isSameFile = (a, b) => a.ino === b.ino && a.size === b.size && a.mtimeMs === b.mtimeMs;
+
+class DedupUploader {
+  constructor(options = {}) {
+    this.index = options.index; // ContentHashIndex（或集群工作进程中的副本）
+    // reflink（默认）：reflink（写时复制），文件系统不支持时在服务器上复制；
+    // hardlink：reflink不支持时使用硬链接（与源文件共享inode，原地修改其中一个会同时改变另一个），再不行时复制；
+    // off：关闭
+    this.mode = DEDUP_MODES.includes(options.mode) ? options.mode : 'reflink';
+    this.fsync = Boolean(options.fsync);
+    this.stats = {
+      uploadsShortCircuited: 0,
+      bytesSaved: 0,
+      reflinks: 0,
+      hardlinks: 0,
+      copies: 0,
+      misses: 0,
+      linkUnsupported: 0
+    };
+  }
+
+  get enabled() {
+    return this.mode !== 'off' && Boolean(this.index);
+  }
+
+  // 尝试由已有内容完成上传，成功时返回 { method, sourcePath }，否则返回null（调用方应正常接收请求体）
+  // 目标文件本身已是声明的内容时 method 为 'unchanged'，不做任何修改
+  async tryComplete(targetPath, declared) {
+    if (!this.enabled) {
+      return null;
+    }
+    const candidates = this.index.findPaths(declared.sha256);
+    if (candidates.includes(targetPath) && await this.hasContent(targetPath, declared)) {
+      this.recordHit('unchanged', declared);
+      return { method: 'unchanged', sourcePath: targetPath };
+    }
+    for (const sourcePath of candidates) {
+      if (sourcePath === targetPath) {
+        continue;
+      }
+      const sourceStats = await this.hasContent(sourcePath, declared);
+      if (!sourceStats) {
+        continue;
+      }
+      const method = await this.linkAtomic(sourcePath, sourceStats, targetPath);
+      if (method) {
+        this.recordHit(method, declared);
+        return { method, sourcePath };
+      }
+    }
+    this.stats.misses++;
+    return null;
+  }
+
+  // 索引条目必须与文件当前状态一致，才能确定其内容仍是声明的内容；一致时返回文件状态，否则返回null
+  async hasContent(filePath, declared) {
+    let stats;
+    try {
+      stats = await fs.promises.stat(filePath);
+    } catch (err) {
+      return null;
+    }
+    if (!stats.isFile() || stats.size !== declared.size || this.index.lookup(filePath, stats) !== declared.sha256) {
+      return null;
+    }
+    return stats;
+  }
+
+  recordHit(method, declared) {
+    this.stats.uploadsShortCircuited++;
+    this.stats.bytesSaved += declared.size;
+    if (method === 'reflink') {
+      this.stats.reflinks++;
+    } else if (method === 'hardlink') {
+      this.stats.hardlinks++;
+    } else if (method === 'copy') {
+      this.stats.copies++;
+    }
+  }
+
+  // 在目标目录中生成源文件的reflink（或按模式生成硬链接、复制），确认源文件未在此期间变化后rename覆盖目标
+  // 返回使用的方式；源文件已变化时返回false
+  async linkAtomic(sourcePath, sourceStats, targetPath) {
+    const tempPath = tempPathFor(targetPath);
+    let method = null;
+    try {
+      try {
+        await fs.promises.copyFile(sourcePath, tempPath, fs.constants.COPYFILE_EXCL | fs.constants.COPYFILE_FICLONE_FORCE);
+        method = 'reflink';
+      } catch (err) {
+        if (!UNSUPPORTED_LINK_ERRORS.includes(err.code)) {
+          throw err;
+        }
+      }
+      if (!method) {
+        this.stats.linkUnsupported++;
+      }
+      if (!method && this.mode === 'hardlink') {
+        await fs.promises.rm(tempPath, { force: true });
+        try {
+          await fs.promises.link(sourcePath, tempPath);
+          method = 'hardlink';
+        } catch (err) {
+          if (!UNSUPPORTED_LINK_ERRORS.includes(err.code)) {
+            throw err;
+          }
+        }
+      }
+      if (!method) {
+        await fs.promises.rm(tempPath, { force: true });
+        await fs.promises.copyFile(sourcePath, tempPath, fs.constants.COPYFILE_EXCL);
+        method = 'copy';
+      }
+
+      // 复制/链接期间源文件被修改时放弃（硬链接与源文件是同一个inode，直接比较即可）
+      const currentStats = await fs.promises.stat(method === 'hardlink' ? tempPath : sourcePath);
+      if (!isSameFile(currentStats, sourceStats)) {
+        await fs.promises.rm(tempPath, { force: true });
+        return false;
+      }
+      if (this.fsync && method !== 'hardlink') {
+        await syncPath(tempPath, 'r+');
+      }
+      await fs.promises.rename(tempPath, targetPath);
+      return method;
+    } catch (err) {
+      await fs.promises.rm(tempPath, { force: true });
+      throw err;
+    }
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      mode: this.mode
+    };
+  }
+}
+
+module.exports = {
+  HASH_HEADER,
+  SIZE_HEADER,
+  DedupUploader,
+  parseDeclaredContent
+};
@@ -0,0 +1,143 @@
+const { createLogger } = require('./logger');
+
+const log = createLogger('EventCoalescer');
+
+// 合并同一路径上连续的两个事件，返回合并后的事件类型；返回 null 表示两者相互抵消
+const mergeEventTypes = (previous, next) => {
+  if (previous === null) {
+    return next;
+  }
+
+  if (previous === 'created') {
+    if (next === 'updated' || next === 'created') {
+      return 'created'; // 新建后的写入仍然是新建
+    }
+    if (next === 'deleted') {
+      return null; // 新建后立即删除，订阅者无需知道
+    }
+  }
+
+  if (previous === 'updated') {
+    if (next === 'updated' || next === 'created') {
+      return 'updated';
+    }
+  }
+
+  if (previous === 'deleted' && (next === 'created' || next === 'updated')) {
+    return 'updated'; // 编辑器“写临时文件再重命名”式保存
+  }
+
+  if (previous === 'directoryCreated' && next === 'directoryDeleted') {
+    return null;
+  }
+
+  return next;
+};
+
+// 文件事件合并器：在每个路径的时间窗口内合并突发事件，窗口结束后只输出一次最终事件
+class EventCoalescer {
+  constructor(onFlush, options = {}) {
+    this.onFlush = onFlush;
+    this.windowMs = options.windowMs !== undefined ? options.windowMs : 100;
+    // 持续写入的路径最多延迟 maxWaitMs 就必须输出一次，避免通知被无限推迟
+    this.maxWaitMs = Math.max(options.maxWaitMs !== undefined ? options.maxWaitMs : 1000, this.windowMs);
+    this.pending = new Map(); // filePath -> { eventType, firstAt, timer }
+    this.stats = {
+      eventsReceived: 0,
+      eventsEmitted: 0,
+      eventsAbsorbed: 0, // 被合并进已有待处理事件的事件数
+      eventsCancelled: 0 // 相互抵消后被丢弃的事件组数（例如新建后立即删除）
+    };
+  }
+
+  // 接收一个原始事件
+  push(eventType, filePath) {
+    this.stats.eventsReceived++;
+
+    if (this.windowMs <= 0) {
+      this.emit(eventType, filePath);
+      return;
+    }
+
+    const now = Date.now();
+    const entry = this.pending.get(filePath);
+
+    if (!entry) {
+      this.pending.set(filePath, {
+        eventType,
+        firstAt: now,
+        timer: this.schedule(filePath, this.windowMs)
+      });
+      return;
+    }
+
+    this.stats.eventsAbsorbed++;
+    entry.eventType = mergeEventTypes(entry.eventType, eventType);
+
+    // 重新开始窗口，但不超过最大等待时间
+    clearTimeout(entry.timer);
+    const remaining = this.maxWaitMs - (now - entry.firstAt);
+    entry.timer = this.schedule(filePath, Math.max(0, Math.min(this.windowMs, remaining)));
+  }
+
+  schedule(filePath, delay) {
+    const timer = setTimeout(() => this.flush(filePath), delay);
+    if (timer.unref) {
+      timer.unref();
+    }
+    return timer;
+  }
+
+  // 立即输出某个路径上的待处理事件
+  flush(filePath) {
+    const entry = this.pending.get(filePath);
+    if (!entry) {
+      return;
+    }
+    clearTimeout(entry.timer);
+    this.pending.delete(filePath);
+
+    if (entry.eventType === null) {
+      this.stats.eventsCancelled++;
+      return;
+    }
+    this.emit(entry.eventType, filePath);
+  }
+
+  // 立即输出所有待处理事件
+  flushAll() {
+    for (const filePath of Array.from(this.pending.keys())) {
+      this.flush(filePath);
+    }
+  }
+
+  emit(eventType, filePath) {
+    this.stats.eventsEmitted++;
+    try {
+      this.onFlush(eventType, filePath);
+    } catch (error) {
+      log.error(`Error handling ${eventType} for ${filePath}`, { error });
+    }
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      pendingPaths: this.pending.size,
+      windowMs: this.windowMs
+    };
+  }
+
+  // 丢弃所有待处理事件并清除定时器
+  close() {
+    for (const entry of this.pending.values()) {
+      clearTimeout(entry.timer);
+    }
+    this.pending.clear();
+  }
+}
+
+module.exports = {
+  EventCoalescer,
+  mergeEventTypes
+};
@@ -0,0 +1,195 @@
+const fs = require('fs');
+const crypto = require('crypto');
+const { createLogger } = require('./logger');
+
+const log = createLogger('EventLog');
+
+// 可重放的文件事件日志
+// 每个发出的事件分配单调递增的序列号并保存在有界环形缓冲区中，可选地追加写入磁盘文件，
+// 以便客户端重连后按序列号补发错过的事件
+class EventLog {
+  constructor(options = {}) {
+    this.capacity = options.capacity || 10000;
+    this.filePath = options.filePath || null;
+    this.buffer = new Array(this.capacity);
+    this.start = 0; // 最早事件在环形缓冲区中的位置
+    this.count = 0;
+    this.lastSeq = 0;
+    // 日志纪元：序列号只在同一纪元内可比较（未持久化时每次启动都会变化）
+    this.epoch = crypto.randomBytes(6).toString('hex');
+    this.stream = null;
+    this.linesSinceCompaction = 0;
+    this.compacting = false;
+    this.pendingLines = [];
+
+    if (this.filePath) {
+      this.load();
+    }
+  }
+
+  // 最早仍可重放的序列号
+  get oldestSeq() {
+    return this.count === 0 ? this.lastSeq + 1 : this.buffer[this.start].seq;
+  }
+
+  // 追加事件并分配序列号
+  append(event) {
+    event.seq = ++this.lastSeq;
+    this.store(event);
+
+    if (this.filePath) {
+      this.writeLine(JSON.stringify(event));
+    }
+    return event;
+  }
+
+  // 集群工作进程：保存主进程已分配序列号的事件（副本日志）
+  // 重复的事件被忽略；序列号不连续时清空缓冲区，早于缺口的 sinceSeq 会得到 null（要求重新同步）
+  adopt(event) {
+    if (event.seq <= this.lastSeq) {
+      return false;
+    }
+    if (event.seq !== this.lastSeq + 1) {
+      this.start = 0;
+      this.count = 0;
+    }
+    this.lastSeq = event.seq;
+    this.store(event);
+    return true;
+  }
+
+  // 集群工作进程：用主进程日志的快照替换本地内容（events 为以 lastSeq 结尾的连续事件）
+  reset(epoch, lastSeq, events) {
+    this.epoch = epoch;
+    this.start = 0;
+    this.count = 0;
+    events.forEach(event => this.store(event));
+    this.lastSeq = lastSeq;
+  }
+
+  store(event) {
+    const index = (this.start + this.count) % this.capacity;
+    this.buffer[index] = event;
+    if (this.count < this.capacity) {
+      this.count++;
+    } else {
+      this.start = (this.start + 1) % this.capacity;
+    }
+  }
+
+  // 返回序列号大于 sinceSeq 的所有事件；若缓冲区已无法覆盖该范围则返回 null
+  since(sinceSeq) {
+    if (sinceSeq >= this.lastSeq) {
+      return [];
+    }
+    if (sinceSeq < this.oldestSeq - 1) {
+      return null;
+    }
+    const events = [];
+    for (let i = sinceSeq + 1 - this.oldestSeq; i < this.count; i++) {
+      events.push(this.buffer[(this.start + i) % this.capacity]);
+    }
+    return events;
+  }
+
+  // 从磁盘加载最近的事件，并压缩日志文件
+  load() {
+    let content = '';
+    try {
+      content = fs.readFileSync(this.filePath, 'utf8');
+    } catch (err) {
+      if (err.code !== 'ENOENT') {
+        log.error(`Could not read event log ${this.filePath}: ${err.message}`);
+      }
+    }
+
+    for (const line of content.split('\n')) {
+      if (!line) {
+        continue;
+      }
+      try {
+        const record = JSON.parse(line);
+        if (record.epoch) {
+          this.epoch = record.epoch;
+        } else if (typeof record.seq === 'number' && record.seq > this.lastSeq) {
+          this.lastSeq = record.seq;
+          this.store(record);
+        }
+      } catch (err) {
+        // 忽略写入中断造成的不完整行
+      }
+    }
+
+    log.info(`Loaded ${this.count} events (last seq ${this.lastSeq}) from ${this.filePath}`);
+    fs.writeFileSync(this.filePath, this.serialize());
+    this.stream = fs.createWriteStream(this.filePath, { flags: 'a' });
+    this.stream.on('error', (err) => log.error(`Write error: ${err.message}`));
+  }
+
+  serialize() {
+    const lines = [JSON.stringify({ epoch: this.epoch })];
+    for (let i = 0; i < this.count; i++) {
+      lines.push(JSON.stringify(this.buffer[(this.start + i) % this.capacity]));
+    }
+    return lines.join('\n') + '\n';
+  }
+
+  writeLine(line) {
+    if (this.compacting) {
+      this.pendingLines.push(line);
+      return;
+    }
+    if (!this.stream) {
+      return;
+    }
+    this.stream.write(line + '\n');
+    this.linesSinceCompaction++;
+    // 文件行数超过缓冲区容量时重写文件，保持磁盘占用有界
+    if (this.linesSinceCompaction >= this.capacity) {
+      this.compact();
+    }
+  }
+
+  // 将当前缓冲区内容写入临时文件后原子替换日志文件
+  compact() {
+    this.compacting = true;
+    this.linesSinceCompaction = 0;
+    const tempPath = `${this.filePath}.tmp`;
+    const oldStream = this.stream;
+
+    fs.promises.writeFile(tempPath, this.serialize())
+      .then(() => new Promise(resolve => oldStream.end(resolve)))
+      .then(() => fs.promises.rename(tempPath, this.filePath))
+      .catch(err => log.error(`Compaction failed: ${err.message}`))
+      .finally(() => {
+        this.stream = fs.createWriteStream(this.filePath, { flags: 'a' });
+        this.stream.on('error', (err) => log.error(`Write error: ${err.message}`));
+        this.compacting = false;
+        const pending = this.pendingLines;
+        this.pendingLines = [];
+        pending.forEach(line => this.writeLine(line));
+      });
+  }
+
+  getStats() {
+    return {
+      epoch: this.epoch,
+      lastSeq: this.lastSeq,
+      oldestSeq: this.oldestSeq,
+      bufferedEvents: this.count,
+      capacity: this.capacity,
+      persistent: Boolean(this.filePath)
+    };
+  }
+
+  close() {
+    if (this.stream) {
+      this.stream.end();
+      this.stream = null;
+    }
+  }
+}
+
+module.exports = {
+  EventLog
+};
@@ -0,0 +1,92 @@
+const fs = require('fs');
+const path = require('path');
+
+// 服务器端的复制/移动（WebDAV COPY/MOVE），避免客户端下载后重新上传
+
+// 复制单个文件：优先使用reflink（写时复制，支持的文件系统上为零拷贝），不支持时内核自动退回普通复制
+const copyFile = (source, destination) =>
+  fs.promises.copyFile(source, destination, fs.constants.COPYFILE_FICLONE);
+
+// 复制文件或目录树；depth 为0时只复制集合本身（不含子项）
+// 符号链接按原目标字符串重建；设置了 options.rootDir 时，在新位置解析后指向其外部的链接
+// （例如复制到不同深度的相对链接）不复制，避免借复制链接访问上传目录之外的文件
+// 返回 { files, directories } 复制数量
+const copyTree = async (source, destination, options = {}) => {
+  const depth = options.depth === undefined ? Infinity : options.depth;
+  const concurrency = options.concurrency || 32;
+  const counts = { files: 0, directories: 0 };
+
+  const copyEntry = async (from, to, remainingDepth) => {
+    const stats = await fs.promises.lstat(from);
+    if (stats.isSymbolicLink()) {
+      const target = await fs.promises.readlink(from);
+      if (options.rootDir && !isSameOrInside(options.rootDir, path.resolve(path.dirname(to), target))) {
+        return;
+      }
+      await fs.promises.symlink(target, to);
+      counts.files++;
+      return;
+    }
+    if (!stats.isDirectory()) {
+      await copyFile(from, to);
+      counts.files++;
+      return;
+    }
+
+    await fs.promises.mkdir(to);
+    counts.directories++;
+    if (remainingDepth <= 0) {
+      return;
+    }
+    const names = await fs.promises.readdir(from);
+    for (let i = 0; i < names.length; i += concurrency) {
+      await Promise.all(names.slice(i, i + concurrency).map(name =>
+        copyEntry(path.join(from, name), path.join(to, name), remainingDepth - 1)));
+    }
+  };
+
+  await copyEntry(source, destination, depth);
+  return counts;
+};
+
+// 移动文件或目录树：同一文件系统内为一次rename；跨文件系统（EXDEV）时退回复制后删除
+// 返回 { renamed } 表示是否通过rename完成
+const moveTree = async (source, destination, options = {}) => {
+  try {
+    await fs.promises.rename(source, destination);
+    return { renamed: true };
+  } catch (err) {
+    if (err.code !== 'EXDEV') {
+      throw err;
+    }
+  }
+  await copyTree(source, destination, options);
+  await fs.promises.rm(source, { recursive: true, force: true });
+  return { renamed: false };
+};
+
+// 判断 child 是否位于 parent 之内（或相同）
+const isSameOrInside = (parent, child) => {
+  const relative = path.relative(parent, child);
+  return relative === '' || (!relative.startsWith('..') && !path.isAbsolute(relative));
+};
+
+// 从Destination请求头中取出路径部分（去掉协议、主机和查询参数），与请求URL的处理方式保持一致
+const parseDestination = (header) => {
+  if (!header) {
+    return null;
+  }
+  let destination = String(header).trim().replace(/^[a-z][a-z0-9+.-]*:\/\/[^/]*/i, '');
+  const queryStart = destination.indexOf('?');
+  if (queryStart !== -1) {
+    destination = destination.substring(0, queryStart);
+  }
+  return destination || '/';
+};
+
+module.exports = {
+  copyTree,
+  moveTree,
+  isSameOrInside,
+  parseDestination
+};
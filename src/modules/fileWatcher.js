@@ -0,0 +1,350 @@
+const fs = require('fs');
+const path = require('path');
+const EventEmitter = require('events');
+const { PollingScanner } = require('./pollingScanner');
+const { createLogger } = require('./logger');
+
+const log = createLogger('FileWatcher');
+
+// 文件监视器：按需的原生监视（chokidar/inotify）加轮询扫描兜底
+// - auto（默认）：只为有订阅者的目录注册原生监视（按订阅引用计数），其余冷目录由轮询扫描器覆盖；
+//   注册前检查inotify预算，不足时该目录继续由轮询覆盖
+// - native：启动时原生监视所有监视路径（原来的行为）
+// - polling：完全不使用原生监视
+// 事件以 'event' (eventType, filePath) 发出，原生监视覆盖范围变化时发出 'coverage'
+const WATCHER_MODES = ['auto', 'native', 'polling'];
+
+const CHOKIDAR_EVENTS = {
+  add: 'created',
+  change: 'updated',
+  unlink: 'deleted',
+  addDir: 'directoryCreated',
+  unlinkDir: 'directoryDeleted'
+};
+
+const isInside = (parentPath, childPath) => {
+  const relative = path.relative(parentPath, childPath);
+  return relative === '' || (!relative.startsWith('..') && !path.isAbsolute(relative));
+};
+
+// 路径的变化是否会被报告：在原生监视范围内，或由轮询扫描器覆盖（有延迟）
+// coverage 为 getCoverage() 的结果，可以跨进程传递
+const isPathCovered = (coverage, filePath) => {
+  if (!coverage) {
+    return false;
+  }
+  if (coverage.polling) {
+    return true;
+  }
+  return coverage.roots.some(root => (root.recursive
+    ? isInside(root.path, filePath)
+    : filePath === root.path || path.dirname(filePath) === root.path));
+};
+
+// 系统允许的inotify监视数（仅Linux，其他平台返回null）
+const readInotifyLimit = () => {
+  try {
+    return parseInt(fs.readFileSync('/proc/sys/fs/inotify/max_user_watches', 'utf8'), 10);
+  } catch (err) {
+    return null;
+  }
+};
+
+// 本进程已使用的inotify监视数（仅Linux，其他平台返回null）
+const countInotifyWatches = () => {
+  let fds;
+  try {
+    fds = fs.readdirSync('/proc/self/fd');
+  } catch (err) {
+    return null;
+  }
+  let count = 0;
+  for (const fd of fds) {
+    try {
+      if (fs.readlinkSync(`/proc/self/fd/${fd}`) !== 'anon_inode:inotify') {
+        continue;
+      }
+      count += fs.readFileSync(`/proc/self/fdinfo/${fd}`, 'utf8')
+        .split('\n')
+        .filter(line => line.startsWith('inotify wd:'))
+        .length;
+    } catch (err) {
+      // 文件描述符已关闭
+    }
+  }
+  return count;
+};
+
+class FileWatcher extends EventEmitter {
+  constructor(options = {}) {
+    super();
+    this.roots = options.roots.map(root => path.resolve(root));
+    this.mode = WATCHER_MODES.includes(options.mode) ? options.mode : 'auto';
+    this.isIgnored = options.isIgnored || (() => false); // (filePath, isDirectory) => boolean
+    this.pollIntervalMs = options.pollIntervalMs !== undefined ? options.pollIntervalMs : 10000;
+    this.pollConcurrency = options.pollConcurrency || 16;
+    this.budgetRatio = options.budgetRatio || 0.8; // 本进程最多使用系统inotify限制的比例
+    this.loadChokidar = options.loadChokidar || (() => require('chokidar')); // 只在需要原生监视时加载
+    this.readInotifyLimit = options.readInotifyLimit || readInotifyLimit;
+    this.countInotifyWatches = options.countInotifyWatches || countInotifyWatches;
+
+    this.watches = new Map(); // key -> { path, recursive, refs, state, watcher }，state: pending/active/polling/closed
+    this.scanner = null;
+    this.stats = {
+      nativeStarted: 0,
+      nativeFailed: 0,
+      budgetFallbacks: 0
+    };
+  }
+
+  start() {
+    if (this.mode === 'polling' || (this.mode === 'auto' && this.pollIntervalMs > 0)) {
+      this.scanner = new PollingScanner({
+        roots: this.roots,
+        intervalMs: this.pollIntervalMs || 10000,
+        concurrency: this.pollConcurrency,
+        isIgnored: this.isIgnored,
+        isExcluded: (filePath) => this.activeWatches().some(watch => watch.recursive && isInside(watch.path, filePath)),
+        isEntryCovered: (filePath) => this.activeWatches().some(watch => !watch.recursive &&
+          (filePath === watch.path || path.dirname(filePath) === watch.path)),
+        onEvent: (eventType, filePath) => this.emit('event', eventType, filePath)
+      });
+      this.scanner.start();
+    }
+    if (this.mode === 'native') {
+      for (const root of this.roots) {
+        this.addWatch({ path: root, recursive: true });
+      }
+    }
+  }
+
+  // 订阅需要某个目录的及时通知时调用；recursive为false时只监视目录的直接子项
+  acquire(target) {
+    if (this.mode === 'auto') {
+      this.addWatch(target);
+    }
+  }
+
+  // 对应的订阅取消时调用，引用归零后关闭原生监视，该目录回到轮询覆盖
+  release(target) {
+    if (this.mode !== 'auto') {
+      return;
+    }
+    const watch = this.watches.get(`${target.recursive ? 'r' : 's'}:${target.path}`);
+    if (watch && --watch.refs === 0) {
+      this.closeWatch(watch);
+    }
+  }
+
+  addWatch(target) {
+    const key = `${target.recursive ? 'r' : 's'}:${target.path}`;
+    let watch = this.watches.get(key);
+    if (!watch) {
+      watch = { key, path: target.path, recursive: target.recursive, refs: 0, state: 'pending', watcher: null };
+      this.watches.set(key, watch);
+      this.startNative(watch).catch((err) => {
+        log.error(`Could not watch ${watch.path}: ${err.message}`);
+        this.fallBackToPolling(watch);
+      });
+    }
+    watch.refs++;
+  }
+
+  async startNative(watch) {
+    if (this.mode === 'auto') {
+      const needed = watch.recursive ? await this.estimateDirectories(watch.path) : 1;
+      if (watch.state !== 'pending') {
+        return; // 估算期间订阅已取消
+      }
+      const limit = this.readInotifyLimit();
+      const inUse = this.countInotifyWatches();
+      if (limit !== null && inUse !== null && inUse + needed > limit * this.budgetRatio) {
+        log.warn(`inotify budget exhausted (${inUse} in use, ${needed} needed, limit ${limit}), polling ${watch.path} instead`);
+        this.stats.budgetFallbacks++;
+        watch.state = 'polling';
+        return;
+      }
+    }
+
+    const chokidar = this.loadChokidar();
+    watch.watcher = chokidar.watch(watch.path, {
+      persistent: true,
+      ignoreInitial: true, // 忽略初始扫描事件
+      ignorePermissionErrors: true,
+      usePolling: false,
+      depth: watch.recursive ? undefined : 0,
+      awaitWriteFinish: false, // 禁用等待写入完成以减少延迟，突发事件由eventCoalescer合并
+      ignored: (filePath, stats) => this.isIgnored(filePath, Boolean(stats && stats.isDirectory()))
+    });
+    for (const [name, eventType] of Object.entries(CHOKIDAR_EVENTS)) {
+      watch.watcher.on(name, (filePath) => this.handleNativeEvent(watch, eventType, filePath));
+    }
+    watch.watcher
+      .on('error', (error) => this.handleNativeError(watch, error))
+      .on('ready', () => {
+        if (watch.state === 'pending') {
+          // 就绪后轮询扫描器才跳过该目录，避免注册期间的变化无人报告
+          watch.state = 'active';
+          this.stats.nativeStarted++;
+          this.emit('coverage', this.getCoverage());
+        }
+      });
+  }
+
+  // 嵌套的原生监视会收到相同的事件，只由覆盖该路径的最外层（递归优先）监视报告
+  handleNativeEvent(watch, eventType, filePath) {
+    let reporter = null;
+    for (const candidate of this.activeWatches()) {
+      const covers = candidate.recursive
+        ? isInside(candidate.path, filePath)
+        : filePath === candidate.path || path.dirname(filePath) === candidate.path;
+      if (covers && (!reporter ||
+          (candidate.recursive && !reporter.recursive) ||
+          (candidate.recursive === reporter.recursive && candidate.path.length < reporter.path.length))) {
+        reporter = candidate;
+      }
+    }
+    if (reporter === watch) {
+      this.emit('event', eventType, filePath);
+    }
+  }
+
+  handleNativeError(watch, error) {
+    if (error.code === 'ENOSPC' || error.code === 'EMFILE') {
+      // 系统监视数或文件描述符耗尽：放弃该目录的原生监视，改由轮询覆盖
+      log.error(`Native watch on ${watch.path} failed (${error.code}), falling back to polling`);
+      this.stats.nativeFailed++;
+      this.fallBackToPolling(watch);
+      return;
+    }
+    this.emit('error', error);
+  }
+
+  fallBackToPolling(watch) {
+    const wasActive = watch.state === 'active';
+    watch.state = 'polling';
+    if (watch.watcher) {
+      watch.watcher.close();
+      watch.watcher = null;
+    }
+    if (wasActive) {
+      if (this.scanner) {
+        this.scanner.rebaseline(watch.path);
+      }
+      this.emit('coverage', this.getCoverage());
+    }
+  }
+
+  closeWatch(watch) {
+    const wasActive = watch.state === 'active';
+    watch.state = 'closed';
+    this.watches.delete(watch.key);
+    if (watch.watcher) {
+      watch.watcher.close();
+    }
+    if (wasActive) {
+      if (this.scanner) {
+        // 原生监视期间的变化已经报告过，扫描器静默更新该目录的索引
+        this.scanner.rebaseline(watch.path);
+      }
+      this.emit('coverage', this.getCoverage());
+    }
+  }
+
+  activeWatches() {
+    const active = [];
+    for (const watch of this.watches.values()) {
+      if (watch.state === 'active') {
+        active.push(watch);
+      }
+    }
+    return active;
+  }
+
+  // 估算递归监视一个目录需要的inotify数量（目录数），优先使用扫描器的索引
+  async estimateDirectories(rootPath) {
+    const indexed = this.scanner ? this.scanner.countIndexedDirectories(rootPath) : null;
+    if (indexed !== null) {
+      return indexed;
+    }
+    const limit = this.readInotifyLimit() || Infinity;
+    let count = 0;
+    const pending = [rootPath];
+    while (pending.length > 0 && count <= limit) {
+      const dirPath = pending.pop();
+      let dirents;
+      try {
+        dirents = await fs.promises.readdir(dirPath, { withFileTypes: true });
+      } catch (err) {
+        continue;
+      }
+      count++;
+      for (const dirent of dirents) {
+        const childPath = path.join(dirPath, dirent.name);
+        if (dirent.isDirectory() && !this.isIgnored(childPath, true)) {
+          pending.push(childPath);
+        }
+      }
+    }
+    return count;
+  }
+
+  // 当前的覆盖范围（可序列化）：是否有轮询兜底，以及已就绪的原生监视根
+  getCoverage() {
+    return {
+      polling: Boolean(this.scanner),
+      roots: this.activeWatches().map(watch => ({ path: watch.path, recursive: watch.recursive }))
+    };
+  }
+
+  getStats() {
+    const watchedDirectories = new Set();
+    let pendingRoots = 0;
+    let pollingRoots = 0;
+    for (const watch of this.watches.values()) {
+      if (watch.state === 'active' && typeof watch.watcher.getWatched === 'function') {
+        Object.keys(watch.watcher.getWatched()).forEach(dir => watchedDirectories.add(dir));
+      } else if (watch.state === 'pending') {
+        pendingRoots++;
+      } else if (watch.state === 'polling') {
+        pollingRoots++;
+      }
+    }
+    const limit = this.readInotifyLimit();
+    const inUse = this.countInotifyWatches();
+    return {
+      ...this.stats,
+      mode: this.mode,
+      nativeRoots: this.activeWatches().length,
+      pendingRoots,
+      pollingRoots,
+      watchedDirectories: watchedDirectories.size,
+      inotify: limit === null ? null : {
+        limit,
+        inUse,
+        remaining: inUse === null ? null : limit - inUse,
+        budget: Math.floor(limit * this.budgetRatio)
+      },
+      polling: this.scanner ? this.scanner.getStats() : null
+    };
+  }
+
+  close() {
+    if (this.scanner) {
+      this.scanner.close();
+    }
+    for (const watch of this.watches.values()) {
+      if (watch.watcher) {
+        watch.watcher.close();
+      }
+    }
+    this.watches.clear();
+  }
+}
+
+module.exports = {
+  FileWatcher,
+  isPathCovered,
+  readInotifyLimit,
+  countInotifyWatches
+};
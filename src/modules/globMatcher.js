@@ -0,0 +1,103 @@
+// glob模式匹配，用于可配置的监视忽略规则
+
+// 把glob模式编译为正则：* 匹配除/以外的任意字符，** 匹配任意层级，? 匹配单个字符，
+// [abc]/[!abc] 为字符类，{a,b} 为备选
+const globToRegExp = (glob) => {
+  let source = '';
+  let braceDepth = 0;
+  for (let i = 0; i < glob.length; i++) {
+    const char = glob[i];
+    if (char === '*') {
+      if (glob[i + 1] === '*') {
+        // "**/" 可以匹配零个或多个目录
+        if (glob[i + 2] === '/') {
+          source += '(?:.*/)?';
+          i += 2;
+        } else {
+          source += '.*';
+          i += 1;
+        }
+      } else {
+        source += '[^/]*';
+      }
+    } else if (char === '?') {
+      source += '[^/]';
+    } else if (char === '[') {
+      const end = glob.indexOf(']', i + 1);
+      if (end === -1) {
+        source += '\\[';
+      } else {
+        let body = glob.slice(i + 1, end).replace(/\\/g, '\\\\');
+        if (body.startsWith('!')) {
+          body = '^' + body.slice(1);
+        }
+        source += `[${body}]`;
+        i = end;
+      }
+    } else if (char === '{') {
+      braceDepth++;
+      source += '(?:';
+    } else if (char === '}' && braceDepth > 0) {
+      braceDepth--;
+      source += ')';
+    } else if (char === ',' && braceDepth > 0) {
+      source += '|';
+    } else {
+      source += char.replace(/[.+^$()|\\]/g, '\\$&');
+    }
+  }
+  return new RegExp(`^${source}$`);
+};
+
+// 解析逗号分隔的模式列表（环境变量），空值返回null
+const parsePatternList = (value) => {
+  if (value === undefined || value === null || value.trim() === '') {
+    return null;
+  }
+  return value.split(',').map(pattern => pattern.trim()).filter(Boolean);
+};
+
+// 创建类似.gitignore的忽略规则匹配函数 (relativePath, isDirectory) => boolean
+// - 不含/的模式匹配任意层级的文件或目录名（例如 node_modules、*.tmp）
+// - 含/的模式相对于根目录匹配整个路径（例如 backups/**/*.bak）
+// - 以/结尾的模式只匹配目录
+// 路径本身或它的任一上级目录被匹配时即被忽略
+const createIgnoreMatcher = (patterns) => {
+  const rules = patterns.map((pattern) => {
+    const directoryOnly = pattern.endsWith('/');
+    const body = pattern.replace(/^\/+/, '').replace(/\/+$/, '');
+    return {
+      directoryOnly,
+      anchored: body.includes('/'),
+      regex: globToRegExp(body)
+    };
+  });
+
+  return (relativePath, isDirectory = false) => {
+    if (rules.length === 0) {
+      return false;
+    }
+    const segments = relativePath.replace(/\\/g, '/').split('/').filter(segment => segment && segment !== '.');
+    let prefix = '';
+    for (let i = 0; i < segments.length; i++) {
+      prefix = prefix ? `${prefix}/${segments[i]}` : segments[i];
+      // 上级路径一定是目录，最后一段只有调用者确认时才算目录
+      const segmentIsDirectory = i < segments.length - 1 || isDirectory;
+      for (const rule of rules) {
+        if (rule.directoryOnly && !segmentIsDirectory) {
+          continue;
+        }
+        if (rule.regex.test(rule.anchored ? prefix : segments[i])) {
+          return true;
+        }
+      }
+    }
+    return false;
+  };
+};
+
+module.exports = {
+  globToRegExp,
+  parsePatternList,
+  createIgnoreMatcher
+};
@@ -0,0 +1,48 @@
+const fs = require('fs');
+const crypto = require('crypto');
+const { parentPort, isMainThread, workerData } = require('worker_threads');
+
+// 计算文件内容的SHA-256，同时返回哈希时的文件状态（size/mtimeMs/ino）
+// 哈希前后的fstat不一致（计算期间文件被修改）时返回null，由调用方稍后重试
+const hashFile = async (filePath, highWaterMark = 1024 * 1024) => {
+  const handle = await fs.promises.open(filePath, 'r');
+  try {
+    const before = await handle.stat();
+    if (!before.isFile()) {
+      return null;
+    }
+    const hash = crypto.createHash('sha256');
+    const stream = handle.createReadStream({ highWaterMark, autoClose: false });
+    for await (const chunk of stream) {
+      hash.update(chunk);
+    }
+    const after = await handle.stat();
+    if (after.size !== before.size || after.mtimeMs !== before.mtimeMs) {
+      return null;
+    }
+    return {
+      size: after.size,
+      mtimeMs: after.mtimeMs,
+      ino: after.ino,
+      sha256: hash.digest('hex')
+    };
+  } finally {
+    await handle.close();
+  }
+};
+
+// 作为工作线程运行时：逐个处理主线程发来的 { id, filePath }，回复 { id, result } 或 { id, error }
+if (!isMainThread && parentPort) {
+  const highWaterMark = (workerData && workerData.highWaterMark) || undefined;
+  parentPort.on('message', async ({ id, filePath }) => {
+    try {
+      parentPort.postMessage({ id, result: await hashFile(filePath, highWaterMark) });
+    } catch (err) {
+      parentPort.postMessage({ id, error: { message: err.message, code: err.code } });
+    }
+  });
+}
+
+module.exports = {
+  hashFile
+};
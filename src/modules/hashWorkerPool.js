@@ -0,0 +1,112 @@
+const path = require('path');
+const { Worker } = require('worker_threads');
+
+const WORKER_SCRIPT = path.join(__dirname, 'hashWorker.js');
+
+// 哈希工作线程池：文件内容哈希在工作线程中计算，不阻塞主线程的事件循环
+// 线程按需启动；每个线程同时只处理一个文件，多出的请求排队；线程意外退出时其任务以错误结束，下次按需重建
+class HashWorkerPool {
+  constructor(options = {}) {
+    this.size = options.size || 1;
+    this.highWaterMark = options.highWaterMark || 1024 * 1024;
+    this.workers = []; // { worker, task }
+    this.queue = []; // 等待空闲线程的任务
+    this.nextId = 1;
+    this.closed = false;
+  }
+
+  // 返回 { size, mtimeMs, ino, sha256 }，计算期间文件被修改时返回null
+  hash(filePath) {
+    if (this.closed) {
+      return Promise.reject(new Error('Hash worker pool is closed'));
+    }
+    return new Promise((resolve, reject) => {
+      this.queue.push({ id: this.nextId++, filePath, resolve, reject });
+      this.dispatch();
+    });
+  }
+
+  dispatch() {
+    while (this.queue.length > 0) {
+      let slot = this.workers.find(candidate => !candidate.task);
+      if (!slot && this.workers.length < this.size) {
+        slot = this.spawn();
+      }
+      if (!slot) {
+        return;
+      }
+      slot.task = this.queue.shift();
+      slot.worker.ref(); // 有任务时线程保持进程存活，空闲时不影响退出
+      slot.worker.postMessage({ id: slot.task.id, filePath: slot.task.filePath });
+    }
+  }
+
+  spawn() {
+    const slot = {
+      worker: new Worker(WORKER_SCRIPT, { workerData: { highWaterMark: this.highWaterMark } }),
+      task: null
+    };
+    slot.worker.unref();
+    slot.worker.on('message', (message) => {
+      const task = slot.task;
+      if (!task || message.id !== task.id) {
+        return;
+      }
+      slot.task = null;
+      slot.worker.unref();
+      if (message.error) {
+        const error = new Error(message.error.message);
+        error.code = message.error.code;
+        task.reject(error);
+      } else {
+        task.resolve(message.result);
+      }
+      this.dispatch();
+    });
+    const onFailure = (err) => {
+      const index = this.workers.indexOf(slot);
+      if (index === -1) {
+        return;
+      }
+      this.workers.splice(index, 1);
+      if (slot.task) {
+        slot.task.reject(err || new Error('Hash worker exited'));
+        slot.task = null;
+      }
+      if (!this.closed) {
+        this.dispatch();
+      }
+    };
+    slot.worker.on('error', onFailure);
+    slot.worker.on('exit', () => onFailure(null));
+    this.workers.push(slot);
+    return slot;
+  }
+
+  getStats() {
+    return {
+      threads: this.workers.length,
+      busy: this.workers.filter(slot => slot.task).length,
+      queued: this.queue.length
+    };
+  }
+
+  close() {
+    this.closed = true;
+    const error = new Error('Hash worker pool is closed');
+    this.queue.forEach(task => task.reject(error));
+    this.queue = [];
+    const workers = this.workers;
+    this.workers = [];
+    for (const slot of workers) {
+      if (slot.task) {
+        slot.task.reject(error);
+      }
+      slot.worker.terminate();
+    }
+  }
+}
+
+module.exports = {
+  HashWorkerPool
+};
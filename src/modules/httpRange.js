@@ -0,0 +1,132 @@
+const fs = require('fs');
+const crypto = require('crypto');
+
+// HTTP范围请求（RFC 9110 第14节，原RFC 7233）
+
+// 单个请求最多接受的范围数，超过时忽略Range头返回整个文件（防止用大量小范围放大开销）
+const MAX_RANGES = 100;
+
+// 解析Range请求头
+// 返回null表示忽略该头（无效语法或不支持的单位，按规范应返回整个文件），
+// 返回空数组表示所有范围都无法满足（应返回416），否则返回按起点排序并合并重叠部分后的 [{ start, end }]
+const parseRangeHeader = (header, size) => {
+  const match = /^\s*bytes\s*=\s*(.+)$/i.exec(String(header || ''));
+  if (!match) {
+    return null;
+  }
+  const specs = match[1].split(',').map(spec => spec.trim()).filter(Boolean);
+  if (specs.length === 0 || specs.length > MAX_RANGES) {
+    return null;
+  }
+
+  const ranges = [];
+  for (const spec of specs) {
+    const parts = /^(\d*)\s*-\s*(\d*)$/.exec(spec);
+    if (!parts || (parts[1] === '' && parts[2] === '')) {
+      return null;
+    }
+    if (parts[1] === '') {
+      // 后缀范围：最后n个字节
+      const suffixLength = parseInt(parts[2], 10);
+      if (suffixLength > 0 && size > 0) {
+        ranges.push({ start: Math.max(0, size - suffixLength), end: size - 1 });
+      }
+      continue;
+    }
+    const start = parseInt(parts[1], 10);
+    const end = parts[2] === '' ? Infinity : parseInt(parts[2], 10);
+    if (end < start) {
+      return null;
+    }
+    if (start < size) {
+      ranges.push({ start, end: Math.min(end, size - 1) });
+    }
+  }
+
+  if (ranges.length <= 1) {
+    return ranges;
+  }
+  ranges.sort((a, b) => a.start - b.start);
+  const merged = [ranges[0]];
+  for (const range of ranges.slice(1)) {
+    const last = merged[merged.length - 1];
+    if (range.start <= last.end + 1) {
+      last.end = Math.max(last.end, range.end);
+    } else {
+      merged.push(range);
+    }
+  }
+  return merged;
+};
+
+// 判断If-Range是否仍然成立：成立时按Range返回部分内容，否则返回整个文件
+// If-Range可以是强ETag（强比较）或HTTP日期（与Last-Modified完全相同）
+const isRangeFresh = (ifRange, etag, stats) => {
+  if (ifRange === undefined || ifRange === null) {
+    return true;
+  }
+  const value = String(ifRange).trim();
+  if (value.startsWith('"') || value.startsWith('W/')) {
+    return !value.startsWith('W/') && value === etag;
+  }
+  const date = Date.parse(value);
+  return !Number.isNaN(date) && Math.floor(date / 1000) === Math.floor(stats.mtimeMs / 1000);
+};
+
+// 构建multipart/byteranges响应的各部分头和总长度，数据本身在发送时才从文件读取
+const buildMultipartRanges = (ranges, size, contentType) => {
+  const boundary = crypto.randomBytes(12).toString('hex');
+  const parts = ranges.map(range => ({
+    ...range,
+    header: `\r\n--${boundary}\r\nContent-Type: ${contentType}\r\nContent-Range: bytes ${range.start}-${range.end}/${size}\r\n\r\n`
+  }));
+  const trailer = `\r\n--${boundary}--\r\n`;
+  const contentLength = parts.reduce(
+    (total, part) => total + Buffer.byteLength(part.header) + (part.end - part.start + 1),
+    Buffer.byteLength(trailer)
+  );
+  return {
+    contentType: `multipart/byteranges; boundary=${boundary}`,
+    contentLength,
+    parts,
+    trailer
+  };
+};
+
+// 依次把各个范围从文件流式写入响应（不在内存中缓冲整个响应）
+// 客户端断开时停止，返回是否完整发送
+const streamMultipartRanges = async (res, filePath, multipart, options = {}) => {
+  for (const part of multipart.parts) {
+    if (res.destroyed) {
+      return false;
+    }
+    res.write(part.header);
+    const fileStream = fs.createReadStream(filePath, {
+      start: part.start,
+      end: part.end,
+      highWaterMark: options.highWaterMark
+    });
+    await new Promise((resolve, reject) => {
+      const onClose = () => fileStream.destroy();
+      res.on('close', onClose);
+      fileStream.on('error', reject);
+      fileStream.on('close', () => {
+        res.removeListener('close', onClose);
+        resolve();
+      });
+      fileStream.pipe(res, { end: false });
+    });
+  }
+  if (res.destroyed) {
+    return false;
+  }
+  res.end(multipart.trailer);
+  return true;
+};
+
+module.exports = {
+  parseRangeHeader,
+  isRangeFresh,
+  buildMultipartRanges,
+  streamMultipartRanges
+};
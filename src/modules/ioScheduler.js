@@ -0,0 +1,199 @@
+// 文件读取流的I/O调度器
+// 限制全局和每个客户端（IP）同时打开的读取流数量，并以有界的缓冲区预算为每个流预留读缓冲；
+// 超出限制的请求按客户端轮转排队（公平队列），避免单个客户端的大量并发传输占满磁盘和内存
+
+// 排队请求过多时拒绝新请求
+class QueueFullError extends Error {
+  constructor(message) {
+    super(message);
+    this.name = 'QueueFullError';
+  }
+}
+
+// 最近多少次的排队等待时间用于计算分位数
+const WAIT_SAMPLE_SIZE = 1024;
+
+class IoScheduler {
+  constructor(options = {}) {
+    this.maxConcurrent = options.maxConcurrent || 32;
+    this.maxPerClient = options.maxPerClient || this.maxConcurrent;
+    this.maxQueueLength = options.maxQueueLength || 1000;
+    this.bufferBudget = options.bufferBudget || Infinity;
+
+    this.active = 0;
+    this.reservedBytes = 0;
+    this.activeByClient = new Map(); // clientKey -> 正在进行的流数量
+    this.queues = new Map(); // clientKey -> 等待中的请求（FIFO），Map顺序即轮转顺序
+    this.queued = 0;
+
+    this.waitSamples = [];
+    this.waitSampleIndex = 0;
+    this.stats = {
+      granted: 0,
+      queuedTotal: 0,
+      rejected: 0,
+      aborted: 0,
+      maxWaitMs: 0
+    };
+  }
+
+  // 申请一个读取流的许可，bytes 为该流的读缓冲大小
+  // 返回的Promise在获得许可时解析为release函数（只能调用一次）；
+  // signal 中止时从队列中移除并以 AbortError 拒绝
+  acquire(clientKey, options = {}) {
+    // 单个请求的缓冲不能超过总预算，否则永远无法满足
+    const bytes = Math.min(options.bytes || 0, this.bufferBudget);
+    const request = { clientKey, bytes, enqueuedAt: Date.now() };
+
+    if (this.queued === 0 && this.canGrant(request)) {
+      return Promise.resolve(this.grant(request));
+    }
+    if (this.queued >= this.maxQueueLength) {
+      this.stats.rejected++;
+      return Promise.reject(new QueueFullError(`I/O queue is full (${this.queued} waiting)`));
+    }
+
+    return new Promise((resolve, reject) => {
+      request.resolve = resolve;
+      request.reject = reject;
+      let queue = this.queues.get(clientKey);
+      if (!queue) {
+        queue = [];
+        this.queues.set(clientKey, queue);
+      }
+      queue.push(request);
+      this.queued++;
+      this.stats.queuedTotal++;
+
+      if (options.signal) {
+        const onAbort = () => {
+          if (this.removeQueued(request)) {
+            this.stats.aborted++;
+            const error = new Error('Request aborted while waiting for I/O');
+            error.name = 'AbortError';
+            reject(error);
+          }
+        };
+        if (options.signal.aborted) {
+          onAbort();
+          return;
+        }
+        options.signal.addEventListener('abort', onAbort, { once: true });
+        request.cleanup = () => options.signal.removeEventListener('abort', onAbort);
+      }
+
+      // 排在前面的请求可能只是受限于各自客户端的上限，空闲的许可可以立即分给这个请求
+      this.dispatch();
+    });
+  }
+
+  canGrant(request) {
+    return this.active < this.maxConcurrent &&
+      (this.activeByClient.get(request.clientKey) || 0) < this.maxPerClient &&
+      this.reservedBytes + request.bytes <= this.bufferBudget;
+  }
+
+  grant(request) {
+    this.active++;
+    this.reservedBytes += request.bytes;
+    this.activeByClient.set(request.clientKey, (this.activeByClient.get(request.clientKey) || 0) + 1);
+    this.stats.granted++;
+    this.recordWait(Date.now() - request.enqueuedAt);
+
+    let released = false;
+    return () => {
+      if (released) {
+        return;
+      }
+      released = true;
+      this.active--;
+      this.reservedBytes -= request.bytes;
+      const count = this.activeByClient.get(request.clientKey) - 1;
+      if (count === 0) {
+        this.activeByClient.delete(request.clientKey);
+      } else {
+        this.activeByClient.set(request.clientKey, count);
+      }
+      this.dispatch();
+    };
+  }
+
+  // 按客户端轮转，依次为每个客户端队首的请求分配许可
+  dispatch() {
+    let progressed = true;
+    while (progressed && this.queued > 0 && this.active < this.maxConcurrent) {
+      progressed = false;
+      for (const [clientKey, queue] of Array.from(this.queues)) {
+        const request = queue[0];
+        if (!this.canGrant(request)) {
+          continue;
+        }
+        queue.shift();
+        this.queued--;
+        // 移到轮转顺序末尾，下一个许可优先给其他客户端
+        this.queues.delete(clientKey);
+        if (queue.length > 0) {
+          this.queues.set(clientKey, queue);
+        }
+        if (request.cleanup) {
+          request.cleanup();
+        }
+        request.resolve(this.grant(request));
+        progressed = true;
+        if (this.active >= this.maxConcurrent) {
+          break;
+        }
+      }
+    }
+  }
+
+  removeQueued(request) {
+    const queue = this.queues.get(request.clientKey);
+    const index = queue ? queue.indexOf(request) : -1;
+    if (index === -1) {
+      return false;
+    }
+    queue.splice(index, 1);
+    this.queued--;
+    if (queue.length === 0) {
+      this.queues.delete(request.clientKey);
+    }
+    // 队首的请求可能一直在阻塞预算，移除后重新调度
+    this.dispatch();
+    return true;
+  }
+
+  recordWait(waitMs) {
+    if (this.waitSamples.length < WAIT_SAMPLE_SIZE) {
+      this.waitSamples.push(waitMs);
+    } else {
+      this.waitSamples[this.waitSampleIndex] = waitMs;
+      this.waitSampleIndex = (this.waitSampleIndex + 1) % WAIT_SAMPLE_SIZE;
+    }
+    if (waitMs > this.stats.maxWaitMs) {
+      this.stats.maxWaitMs = waitMs;
+    }
+  }
+
+  getStats() {
+    const sorted = this.waitSamples.slice().sort((a, b) => a - b);
+    const percentile = (p) => (sorted.length === 0 ? 0 : sorted[Math.min(sorted.length - 1, Math.floor(sorted.length * p))]);
+    return {
+      ...this.stats,
+      activeStreams: this.active,
+      queuedRequests: this.queued,
+      activeClients: this.activeByClient.size,
+      reservedBytes: this.reservedBytes,
+      maxConcurrent: this.maxConcurrent,
+      maxPerClient: this.maxPerClient,
+      bufferBudget: this.bufferBudget === Infinity ? null : this.bufferBudget,
+      waitP50Ms: percentile(0.5),
+      waitP99Ms: percentile(0.99)
+    };
+  }
+}
+
+module.exports = {
+  IoScheduler,
+  QueueFullError
+};
@@ -0,0 +1,267 @@
+const fs = require('fs');
+const storageConfig = require('../config/storage');
+
+// 结构化日志：级别、惰性构建消息、逐事件调试日志的采样，以及异步缓冲输出
+// 热路径（每个文件事件、每条WebSocket消息）的日志在默认的info级别下只有一次级别比较的开销，
+// 消息可以传函数，只在该级别启用时才构建（避免序列化整条通知）
+const LEVELS = { error: 0, warn: 1, info: 2, debug: 3, trace: 4 };
+
+const parseLevel = (value, fallback) => Object.prototype.hasOwnProperty.call(LEVELS, value) ? value : fallback;
+
+// 写入失败后重试的间隔（毫秒），用于非阻塞管道暂时写满（EAGAIN）的情况
+const RETRY_DELAY_MS = 10;
+
+// 异步缓冲输出：日志行先放入内存缓冲，在下一轮事件循环中合并为一次 fs.write（在libuv线程池中执行，
+// 不像 console.log 写管道/文件那样阻塞事件循环）；同一时刻最多一个写入在进行，其间的新行继续累积
+// 缓冲超过 maxBufferBytes（输出跟不上）时丢弃新行并计数，恢复后输出一条丢弃统计
+class BufferedSink {
+  constructor(options = {}) {
+    this.fd = options.fd === undefined ? 1 : options.fd;
+    this.maxBufferBytes = options.maxBufferBytes || 4 * 1024 * 1024;
+    this.lines = [];
+    this.bytes = 0;
+    this.writing = false;
+    this.scheduled = false;
+    this.dropped = 0;
+    this.stats = { linesWritten: 0, linesDropped: 0, writes: 0, writeErrors: 0 };
+  }
+
+  push(line) {
+    if (this.bytes + line.length > this.maxBufferBytes) {
+      this.dropped++;
+      this.stats.linesDropped++;
+      return false;
+    }
+    this.lines.push(line);
+    this.bytes += line.length;
+    this.stats.linesWritten++;
+    if (!this.scheduled && !this.writing) {
+      this.scheduled = true;
+      setImmediate(() => {
+        this.scheduled = false;
+        this.flush();
+      });
+    }
+    return true;
+  }
+
+  // 取出缓冲中的全部行（以及待报告的丢弃统计）
+  takeChunk() {
+    if (this.dropped > 0) {
+      this.lines.push(`${new Date().toISOString()} WARN  [Logger] Dropped ${this.dropped} log lines, log output too slow\n`);
+      this.dropped = 0;
+    }
+    const chunk = Buffer.from(this.lines.join(''));
+    this.lines = [];
+    this.bytes = 0;
+    return chunk;
+  }
+
+  flush() {
+    if (this.writing || (this.lines.length === 0 && this.dropped === 0)) {
+      return;
+    }
+    this.writing = true;
+    this.writeChunk(this.takeChunk(), 0);
+  }
+
+  writeChunk(chunk, offset) {
+    this.stats.writes++;
+    fs.write(this.fd, chunk, offset, chunk.length - offset, null, (err, written) => {
+      if (err && err.code === 'EAGAIN') {
+        setTimeout(() => this.writeChunk(chunk, offset), RETRY_DELAY_MS).unref();
+        return;
+      }
+      if (err) {
+        // 输出已不可用（如管道被关闭），丢弃这一块，不能再通过日志报告
+        this.stats.writeErrors++;
+      } else if (offset + written < chunk.length) {
+        this.writeChunk(chunk, offset + written);
+        return;
+      }
+      this.writing = false;
+      this.flush();
+    });
+  }
+
+  // 进程退出时同步写出剩余的行（正在进行的异步写入无法等待）
+  flushSync() {
+    if (this.lines.length === 0 && this.dropped === 0) {
+      return;
+    }
+    const chunk = this.takeChunk();
+    let offset = 0;
+    try {
+      while (offset < chunk.length) {
+        offset += fs.writeSync(this.fd, chunk, offset, chunk.length - offset);
+      }
+    } catch (err) {
+      this.stats.writeErrors++;
+    }
+  }
+
+  getStats() {
+    return { ...this.stats, bufferedBytes: this.bytes };
+  }
+}
+
+// 字段值的文本形式：错误对象输出调用栈
+const formatValue = (value) => {
+  if (value instanceof Error) {
+    return value.stack || value.message;
+  }
+  return typeof value === 'string' ? value : JSON.stringify(value);
+};
+
+// 日志输出：当前级别、格式、采样计数，以及 stdout（info及以下）和 stderr（warn、error）两个输出
+class LogOutput {
+  constructor(options = {}) {
+    this.format = options.format === 'json' ? 'json' : 'text';
+    this.sampleEvery = options.sampleEvery > 0 ? options.sampleEvery : 100;
+    this.stdout = options.stdout || new BufferedSink({ fd: 1, maxBufferBytes: options.maxBufferBytes });
+    this.stderr = options.stderr || new BufferedSink({ fd: 2, maxBufferBytes: options.maxBufferBytes });
+    this.sampleCounters = new Map(); // 采样键 -> 已出现的次数
+    this.setLevel(options.level);
+  }
+
+  setLevel(level) {
+    this.level = parseLevel(level, 'info');
+    this.threshold = LEVELS[this.level];
+  }
+
+  isEnabled(level) {
+    return LEVELS[level] <= this.threshold;
+  }
+
+  // 采样：同一键每 sampleEvery 次只放行一次（第1、N+1、2N+1…次），返回是否放行
+  shouldSample(key) {
+    const count = (this.sampleCounters.get(key) || 0) + 1;
+    this.sampleCounters.set(key, count === this.sampleEvery ? 0 : count);
+    return count === 1;
+  }
+
+  write(level, scope, message, fields) {
+    const time = new Date().toISOString();
+    let line;
+    if (this.format === 'json') {
+      const record = { time, level, scope, pid: process.pid, msg: message };
+      if (fields) {
+        for (const key of Object.keys(fields)) {
+          record[key] = fields[key] instanceof Error ? formatValue(fields[key]) : fields[key];
+        }
+      }
+      line = JSON.stringify(record) + '\n';
+    } else {
+      line = `${time} ${level.toUpperCase().padEnd(5)} [${scope}] ${message}`;
+      if (fields) {
+        for (const key of Object.keys(fields)) {
+          line += ` ${key}=${formatValue(fields[key])}`;
+        }
+      }
+      line += '\n';
+    }
+    (LEVELS[level] <= LEVELS.warn ? this.stderr : this.stdout).push(line);
+  }
+
+  flushSync() {
+    this.stdout.flushSync();
+    this.stderr.flushSync();
+  }
+
+  getStats() {
+    const stdout = this.stdout.getStats ? this.stdout.getStats() : {};
+    const stderr = this.stderr.getStats ? this.stderr.getStats() : {};
+    return {
+      level: this.level,
+      format: this.format,
+      linesWritten: (stdout.linesWritten || 0) + (stderr.linesWritten || 0),
+      linesDropped: (stdout.linesDropped || 0) + (stderr.linesDropped || 0),
+      writeErrors: (stdout.writeErrors || 0) + (stderr.writeErrors || 0)
+    };
+  }
+}
+
+// 带作用域的日志记录器；message 可以是字符串或返回字符串的函数，fields 为附加的键值
+class Logger {
+  constructor(scope, output) {
+    this.scope = scope;
+    this.output = output;
+  }
+
+  isEnabled(level) {
+    return this.output.isEnabled(level);
+  }
+
+  log(level, message, fields) {
+    if (!this.output.isEnabled(level)) {
+      return;
+    }
+    this.output.write(level, this.scope, typeof message === 'function' ? message() : message, fields);
+  }
+
+  error(message, fields) {
+    this.log('error', message, fields);
+  }
+
+  warn(message, fields) {
+    this.log('warn', message, fields);
+  }
+
+  info(message, fields) {
+    this.log('info', message, fields);
+  }
+
+  debug(message, fields) {
+    this.log('debug', message, fields);
+  }
+
+  trace(message, fields) {
+    this.log('trace', message, fields);
+  }
+
+  // 逐事件的调试日志：debug级别下同一键每 LOG_SAMPLE_EVERY 条输出一条，trace级别下全部输出
+  sampledDebug(key, message, fields) {
+    const output = this.output;
+    if (!output.isEnabled('debug')) {
+      return;
+    }
+    if (!output.isEnabled('trace')) {
+      if (!output.shouldSample(`${this.scope}:${key}`)) {
+        return;
+      }
+      fields = { ...fields, sampled: `1/${output.sampleEvery}` };
+    }
+    output.write('debug', this.scope, typeof message === 'function' ? message() : message, fields);
+  }
+}
+
+// 进程内共享的日志输出，首次使用时按环境变量创建，退出时同步写出缓冲中的日志
+let defaultOutput = null;
+
+const getDefaultOutput = () => {
+  if (!defaultOutput) {
+    defaultOutput = new LogOutput({
+      level: process.env.LOG_LEVEL,
+      format: process.env.LOG_FORMAT,
+      sampleEvery: parseInt(process.env.LOG_SAMPLE_EVERY),
+      maxBufferBytes: storageConfig.parseSize(process.env.LOG_BUFFER_LIMIT, 4 * 1024 * 1024)
+    });
+    process.on('exit', () => defaultOutput.flushSync());
+  }
+  return defaultOutput;
+};
+
+const createLogger = (scope, output) => new Logger(scope, output || getDefaultOutput());
+
+// 运行时调整共享输出的级别（基准测试等）
+const setLogLevel = (level) => getDefaultOutput().setLevel(level);
+
+module.exports = {
+  LEVELS,
+  BufferedSink,
+  LogOutput,
+  Logger,
+  createLogger,
+  getDefaultOutput,
+  setLogLevel
+};
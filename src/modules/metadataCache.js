@@ -0,0 +1,160 @@
+const fs = require('fs');
+const path = require('path');
+const { performance } = require('perf_hooks');
+
+// 文件元数据（stat结果与目录列表）的有界LRU缓存
+// 以解析后的绝对路径为键，由订阅管理器的监视器事件精确失效，并以TTL兜底
+class MetadataCache {
+  constructor(options = {}) {
+    this.maxEntries = options.maxEntries || 50000;
+    this.ttlMs = options.ttlMs !== undefined ? options.ttlMs : 60000;
+    // 判断路径是否可以缓存（只有监视器覆盖的路径才能保证及时失效）
+    this.isCacheable = options.isCacheable || (() => true);
+    // 实际的文件系统调用（未命中时）完成后调用 observe(operation, durationMs)，用于统计stat/readdir耗时
+    this.observe = options.observe || null;
+    this.entries = new Map(); // key -> { value, error, expiresAt }，Map的插入顺序即LRU顺序
+    this.inflight = new Map(); // key -> Promise，合并并发的相同请求
+    this.stats = {
+      hits: 0,
+      misses: 0,
+      invalidations: 0,
+      evictions: 0
+    };
+  }
+
+  // 获取文件状态，不存在时抛出与fs.stat相同的错误
+  stat(filePath) {
+    return this.lookup(`s:${filePath}`, filePath, () => this.timed('stat', fs.promises.stat(filePath)));
+  }
+
+  // 获取目录中的文件名列表
+  readdir(dirPath) {
+    return this.lookup(`l:${dirPath}`, dirPath, () => this.timed('readdir', fs.promises.readdir(dirPath)));
+  }
+
+  timed(operation, promise) {
+    if (this.observe) {
+      const startedAt = performance.now();
+      const done = () => this.observe(operation, performance.now() - startedAt);
+      promise.then(done, done);
+    }
+    return promise;
+  }
+
+  // 获取文件状态，不存在时返回null
+  async statOrNull(filePath) {
+    try {
+      return await this.stat(filePath);
+    } catch (err) {
+      if (err.code === 'ENOENT' || err.code === 'ENOTDIR') {
+        return null;
+      }
+      throw err;
+    }
+  }
+
+  async lookup(key, filePath, load) {
+    const entry = this.entries.get(key);
+    if (entry) {
+      if (entry.expiresAt > Date.now()) {
+        this.stats.hits++;
+        // 移到末尾，标记为最近使用
+        this.entries.delete(key);
+        this.entries.set(key, entry);
+        if (entry.error) {
+          throw entry.error;
+        }
+        return entry.value;
+      }
+      this.entries.delete(key);
+    }
+
+    this.stats.misses++;
+    if (!this.isCacheable(filePath)) {
+      return load();
+    }
+
+    let pending = this.inflight.get(key);
+    if (!pending) {
+      const generation = this.stats.invalidations;
+      pending = load().then(
+        (value) => {
+          this.store(key, { value }, generation);
+          return value;
+        },
+        (error) => {
+          // 不存在的路径也缓存（rclone会反复检查不存在的文件），其他错误不缓存
+          if (error.code === 'ENOENT' || error.code === 'ENOTDIR') {
+            this.store(key, { error }, generation);
+          }
+          throw error;
+        }
+      ).finally(() => this.inflight.delete(key));
+      this.inflight.set(key, pending);
+    }
+    return pending;
+  }
+
+  store(key, entry, generation) {
+    // 加载期间发生过失效时，结果可能已经过时，不写入缓存
+    if (generation !== this.stats.invalidations) {
+      return;
+    }
+    entry.expiresAt = Date.now() + this.ttlMs;
+    this.entries.delete(key);
+    this.entries.set(key, entry);
+    while (this.entries.size > this.maxEntries) {
+      this.entries.delete(this.entries.keys().next().value);
+      this.stats.evictions++;
+    }
+  }
+
+  // 某个路径发生变化：清除它自身以及父目录的状态和列表
+  invalidate(filePath) {
+    const parent = path.dirname(filePath);
+    this.stats.invalidations++;
+    this.entries.delete(`s:${filePath}`);
+    this.entries.delete(`l:${filePath}`);
+    this.entries.delete(`s:${parent}`);
+    this.entries.delete(`l:${parent}`);
+  }
+
+  // 目录被删除或移动：清除整个子树
+  invalidateTree(dirPath) {
+    this.invalidate(dirPath);
+    const prefix = dirPath.endsWith(path.sep) ? dirPath : dirPath + path.sep;
+    for (const key of Array.from(this.entries.keys())) {
+      if (key.startsWith(`s:${prefix}`) || key.startsWith(`l:${prefix}`)) {
+        this.entries.delete(key);
+      }
+    }
+  }
+
+  // 根据文件事件类型失效对应的缓存
+  handleFileEvent(eventType, filePath) {
+    if (eventType === 'directoryDeleted') {
+      this.invalidateTree(filePath);
+    } else {
+      this.invalidate(filePath);
+    }
+  }
+
+  clear() {
+    this.stats.invalidations++;
+    this.entries.clear();
+  }
+
+  getStats() {
+    const lookups = this.stats.hits + this.stats.misses;
+    return {
+      ...this.stats,
+      entries: this.entries.size,
+      maxEntries: this.maxEntries,
+      hitRate: lookups === 0 ? 0 : Number((this.stats.hits / lookups).toFixed(4))
+    };
+  }
+}
+
+module.exports = {
+  MetadataCache
+};
@@ -0,0 +1,288 @@
+const { performance, monitorEventLoopDelay } = require('perf_hooks');
+
+// 低开销的运行指标：HDR风格的直方图（延迟、字节数）和按需采集的计数/测量值，
+// 以Prometheus文本格式（/metrics）和JSON快照（WebSocket getMetrics）导出同一份数据
+
+// 直方图桶：小于 2^(SUB_BITS+1) 的值每个值一个桶；之后每个2的幂区间再等分为 2^SUB_BITS 个桶，
+// 相对误差不超过 1/2^SUB_BITS（12.5%），记录一个值只需几次整数运算，内存固定
+const SUB_BITS = 3;
+const SUB_COUNT = 1 << SUB_BITS;
+const LINEAR_LIMIT = SUB_COUNT * 2;
+const MAX_EXPONENT = 52;
+const BUCKET_COUNT = LINEAR_LIMIT + (MAX_EXPONENT - SUB_BITS) * SUB_COUNT;
+
+const bucketIndex = (value) => {
+  if (value < LINEAR_LIMIT) {
+    return value;
+  }
+  if (value < 0x80000000) {
+    // 常见情况只用整数位运算
+    const exponent = 31 - Math.clz32(value);
+    return LINEAR_LIMIT + ((exponent - SUB_BITS - 1) << SUB_BITS) + ((value >>> (exponent - SUB_BITS)) - SUB_COUNT);
+  }
+  const exponent = Math.min(MAX_EXPONENT, Math.floor(Math.log2(value)));
+  const mantissa = Math.floor(value / 2 ** (exponent - SUB_BITS)); // [SUB_COUNT, 2*SUB_COUNT)
+  return Math.min(BUCKET_COUNT - 1, LINEAR_LIMIT + (exponent - SUB_BITS - 1) * SUB_COUNT + (mantissa - SUB_COUNT));
+};
+
+// 桶内最大的值（百分位数按桶的上界报告）
+const bucketUpperBound = (index) => {
+  if (index < LINEAR_LIMIT) {
+    return index;
+  }
+  const offset = index - LINEAR_LIMIT;
+  const exponent = Math.floor(offset / SUB_COUNT) + SUB_BITS + 1;
+  const mantissa = (offset % SUB_COUNT) + SUB_COUNT;
+  return (mantissa + 1) * 2 ** (exponent - SUB_BITS) - 1;
+};
+
+// 记录非负整数（微秒、字节）的直方图
+class Histogram {
+  constructor() {
+    this.counts = new Float64Array(BUCKET_COUNT);
+    this.count = 0;
+    this.sum = 0;
+    this.min = Infinity;
+    this.max = 0;
+  }
+
+  record(value) {
+    value = value > 0 ? Math.round(value) : 0;
+    this.counts[bucketIndex(value)]++;
+    this.count++;
+    this.sum += value;
+    if (value < this.min) {
+      this.min = value;
+    }
+    if (value > this.max) {
+      this.max = value;
+    }
+  }
+
+  // 第q分位（0-1）的值，误差在所在桶的宽度之内
+  percentile(q) {
+    if (this.count === 0) {
+      return 0;
+    }
+    const rank = Math.max(1, Math.ceil(this.count * q));
+    let seen = 0;
+    for (let i = 0; i < BUCKET_COUNT; i++) {
+      seen += this.counts[i];
+      if (seen >= rank) {
+        return Math.min(bucketUpperBound(i), this.max);
+      }
+    }
+    return this.max;
+  }
+
+  // 小于 2^exponent 的值的个数（2的幂恰好是桶的边界，结果是精确的）
+  countBelowPowerOfTwo(exponent) {
+    const limit = bucketIndex(2 ** exponent);
+    let total = 0;
+    for (let i = 0; i < limit; i++) {
+      total += this.counts[i];
+    }
+    return total;
+  }
+
+  // scale 把记录的整数换算为导出的单位（例如微秒 -> 秒）
+  snapshot(scale = 1) {
+    const round = (value) => (scale === 1 ? value : Number((value * scale).toPrecision(6)));
+    return {
+      count: this.count,
+      sum: round(this.sum),
+      min: this.count === 0 ? 0 : round(this.min),
+      max: round(this.max),
+      p50: round(this.percentile(0.5)),
+      p90: round(this.percentile(0.9)),
+      p99: round(this.percentile(0.99)),
+      p999: round(this.percentile(0.999))
+    };
+  }
+}
+
+// 导出单位：延迟以微秒记录、以秒导出；字节数原样导出
+// buckets 为Prometheus直方图 le 边界对应的2的幂指数（以记录的整数单位计）
+const UNITS = {
+  seconds: { scale: 1e-6, buckets: [7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25] },
+  bytes: { scale: 1, buckets: [6, 8, 10, 12, 14, 16, 18, 20, 22, 24, 26, 28, 30, 32, 34] }
+};
+
+// 同名、按一个标签区分的一组直方图
+class HistogramFamily {
+  constructor(name, help, options = {}) {
+    this.name = name;
+    this.help = help;
+    this.unit = UNITS[options.unit] ? options.unit : 'seconds';
+    this.labelName = options.labelName || null;
+    this.histograms = new Map(); // 标签值（无标签时为''）-> Histogram
+  }
+
+  get(labelValue = '') {
+    let histogram = this.histograms.get(labelValue);
+    if (!histogram) {
+      histogram = new Histogram();
+      this.histograms.set(labelValue, histogram);
+    }
+    return histogram;
+  }
+
+  // 记录原始整数值（延迟为微秒，字节数为字节）
+  record(value, labelValue = '') {
+    this.get(labelValue).record(value);
+  }
+
+  // 记录从 startedAt（performance.now()）到现在经过的时间
+  recordSince(startedAt, labelValue = '') {
+    this.get(labelValue).record((performance.now() - startedAt) * 1000);
+  }
+}
+
+// 测量值/计数：collect() 在导出时调用，返回数值，或 [[标签值, 数值], ...]
+class Collector {
+  constructor(name, help, type, collect, labelName) {
+    this.name = name;
+    this.help = help;
+    this.type = type;
+    this.collect = collect;
+    this.labelName = labelName || null;
+  }
+
+  values() {
+    const value = this.collect();
+    return Array.isArray(value) ? value : [['', value]];
+  }
+}
+
+const escapeLabel = (value) => String(value).replace(/\\/g, '\\\\').replace(/"/g, '\\"').replace(/\n/g, '\\n');
+
+const formatLabels = (pairs) => {
+  const parts = pairs.filter(([name]) => name).map(([name, value]) => `${name}="${escapeLabel(value)}"`);
+  return parts.length > 0 ? `{${parts.join(',')}}` : '';
+};
+
+const formatNumber = (value) => (Number.isFinite(value) ? String(value) : (value > 0 ? '+Inf' : '0'));
+
+// 指标注册表；enabled 为false时直方图不记录（用于测量插桩本身的开销）
+class MetricsRegistry {
+  constructor(options = {}) {
+    this.prefix = options.prefix !== undefined ? options.prefix : 'sdav_';
+    this.enabled = options.enabled !== false;
+    this.histograms = new Map();
+    this.collectors = new Map();
+  }
+
+  // 获取（必要时创建）直方图；禁用时返回不记录的直方图
+  histogram(name, help, options = {}) {
+    if (!this.enabled) {
+      return NOOP_FAMILY;
+    }
+    let family = this.histograms.get(name);
+    if (!family) {
+      family = new HistogramFamily(this.prefix + name, help, options);
+      this.histograms.set(name, family);
+    }
+    return family;
+  }
+
+  gauge(name, help, collect, labelName) {
+    this.collectors.set(name, new Collector(this.prefix + name, help, 'gauge', collect, labelName));
+  }
+
+  counter(name, help, collect, labelName) {
+    this.collectors.set(name, new Collector(this.prefix + name, help, 'counter', collect, labelName));
+  }
+
+  // JSON快照：{ histograms: { 名称: { 标签值: 统计 } }, gauges: { 名称: 数值 或 { 标签值: 数值 } } }
+  snapshot() {
+    const histograms = {};
+    for (const [name, family] of this.histograms) {
+      const scale = UNITS[family.unit].scale;
+      const byLabel = {};
+      for (const [labelValue, histogram] of family.histograms) {
+        byLabel[labelValue || 'all'] = histogram.snapshot(scale);
+      }
+      histograms[`${name}_${family.unit}`] = byLabel;
+    }
+    const gauges = {};
+    for (const [name, collector] of this.collectors) {
+      const values = collector.values();
+      gauges[name] = collector.labelName ? Object.fromEntries(values) : values[0][1];
+    }
+    return { histograms, gauges };
+  }
+
+  // Prometheus文本格式（version 0.0.4）
+  toPrometheus() {
+    const lines = [];
+    for (const collector of this.collectors.values()) {
+      lines.push(`# HELP ${collector.name} ${collector.help}`, `# TYPE ${collector.name} ${collector.type}`);
+      for (const [labelValue, value] of collector.values()) {
+        lines.push(`${collector.name}${formatLabels([[collector.labelName, labelValue]])} ${formatNumber(value)}`);
+      }
+    }
+    for (const family of this.histograms.values()) {
+      const { scale, buckets } = UNITS[family.unit];
+      const name = `${family.name}_${family.unit}`;
+      lines.push(`# HELP ${name} ${family.help}`, `# TYPE ${name} histogram`);
+      for (const [labelValue, histogram] of family.histograms) {
+        const label = [family.labelName, labelValue];
+        for (const exponent of buckets) {
+          const le = Number((2 ** exponent * scale).toPrecision(6));
+          lines.push(`${name}_bucket${formatLabels([label, ['le', le]])} ${histogram.countBelowPowerOfTwo(exponent)}`);
+        }
+        lines.push(`${name}_bucket${formatLabels([label, ['le', '+Inf']])} ${histogram.count}`);
+        lines.push(`${name}_sum${formatLabels([label])} ${Number((histogram.sum * scale).toPrecision(9))}`);
+        lines.push(`${name}_count${formatLabels([label])} ${histogram.count}`);
+      }
+    }
+    return lines.join('\n') + '\n';
+  }
+}
+
+const NOOP_HISTOGRAM = { record() {} };
+const NOOP_FAMILY = {
+  get: () => NOOP_HISTOGRAM,
+  record() {},
+  recordSince() {}
+};
+
+// 事件循环延迟：以 windowMs 为窗口统计，导出最近一个完整窗口的平均值、p99和最大值
+const monitorEventLoopLag = (registry, windowMs = 10000) => {
+  const monitor = monitorEventLoopDelay({ resolution: 20 });
+  monitor.enable();
+  let last = { mean: 0, p99: 0, max: 0 };
+  const timer = setInterval(() => {
+    // 纳秒 -> 秒
+    last = {
+      mean: monitor.count > 0 ? monitor.mean / 1e9 : 0,
+      p99: monitor.count > 0 ? monitor.percentile(99) / 1e9 : 0,
+      max: monitor.count > 0 ? monitor.max / 1e9 : 0
+    };
+    monitor.reset();
+  }, windowMs);
+  timer.unref();
+  registry.gauge('event_loop_lag_seconds', `Event loop delay over the last ${windowMs / 1000}s window`,
+    () => [['mean', last.mean], ['p99', last.p99], ['max', last.max]], 'stat');
+  return () => {
+    clearInterval(timer);
+    monitor.disable();
+  };
+};
+
+// 进程内共享的注册表（METRICS_ENABLE=false 时不记录直方图）
+let defaultRegistry = null;
+
+const getDefaultRegistry = () => {
+  if (!defaultRegistry) {
+    defaultRegistry = new MetricsRegistry({ enabled: process.env.METRICS_ENABLE !== 'false' });
+  }
+  return defaultRegistry;
+};
+
+module.exports = {
+  Histogram,
+  MetricsRegistry,
+  monitorEventLoopLag,
+  getDefaultRegistry
+};
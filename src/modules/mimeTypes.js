@@ -0,0 +1,46 @@
+const path = require('path');
+
+// 简单的MIME类型映射
+const MIME_TYPES = {
+  '.txt': 'text/plain',
+  '.md': 'text/markdown',
+  '.csv': 'text/csv',
+  '.html': 'text/html',
+  '.htm': 'text/html',
+  '.css': 'text/css',
+  '.js': 'application/javascript',
+  '.json': 'application/json',
+  '.xml': 'application/xml',
+  '.pdf': 'application/pdf',
+  '.jpg': 'image/jpeg',
+  '.jpeg': 'image/jpeg',
+  '.png': 'image/png',
+  '.gif': 'image/gif',
+  '.svg': 'image/svg+xml',
+  '.mp4': 'video/mp4',
+  '.avi': 'video/x-msvideo',
+  '.mov': 'video/quicktime',
+  '.zip': 'application/zip',
+  '.rar': 'application/vnd.rar',
+  '.doc': 'application/msword',
+  '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+  '.xls': 'application/vnd.ms-excel',
+  '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+};
+
+// 可压缩的（文本类）内容类型
+const COMPRESSIBLE_TYPE_PATTERN = /^(text\/|application\/(json|xml|javascript)|image\/svg\+xml)/;
+
+// 根据文件扩展名获取MIME类型，未知扩展名返回null
+const getMimeType = (filePath) => {
+  const ext = path.extname(filePath).toLowerCase();
+  return MIME_TYPES[ext] || null;
+};
+
+const isCompressibleType = (mimeType) => Boolean(mimeType) && COMPRESSIBLE_TYPE_PATTERN.test(mimeType);
+
+module.exports = {
+  MIME_TYPES,
+  getMimeType,
+  isCompressibleType
+};
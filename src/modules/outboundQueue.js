@@ -0,0 +1,164 @@
+const path = require('path');
+
+// resyncRequired 消息中最多列出的目录数，超过后只提示客户端全量重新同步
+const MAX_SUMMARY_DIRECTORIES = 100;
+
+// 单个WebSocket客户端的有界发送队列
+// 客户端的 bufferedAmount 低于高水位时直接发送；否则排队，队列溢出后丢弃事件，
+// 待客户端追上后只发送一条 resyncRequired 消息（附带受影响目录的汇总）
+class OutboundQueue {
+  constructor(client, options = {}) {
+    this.client = client;
+    this.highWaterMark = options.highWaterMark || 1024 * 1024;
+    this.maxQueueLength = options.maxQueueLength || 1000;
+    this.onError = options.onError || (() => {});
+    this.queue = [];
+    this.resyncPending = false;
+    this.droppedDirectories = new Set();
+    this.droppedSinceResync = 0;
+    this.lastSentSeq = undefined;
+    this.closed = false; // 客户端出错后关闭，不再排队和发送
+    this.stats = {
+      framesSent: 0,
+      framesDropped: 0,
+      resyncsSent: 0,
+      maxQueueDepth: 0
+    };
+    this.onSent = (err) => {
+      if (err) {
+        this.fail(err);
+      } else if (this.queue.length > 0 || this.resyncPending) {
+        this.drain();
+      }
+    };
+  }
+
+  // 放入一帧通知，relativePath 用于生成溢出时的目录汇总，seq 为事件序列号
+  // 排队之后总是尝试drain：不只依赖发送回调推进队列，某个回调丢失时队列也不会停滞
+  // （客户端缓冲区仍高于高水位时drain不发送，由之后的发送回调继续）
+  push(frame, relativePath, seq) {
+    if (this.closed) {
+      return;
+    }
+    if (this.resyncPending) {
+      this.drop(1, relativePath);
+      this.drain();
+      return;
+    }
+
+    if (this.queue.length === 0 && this.client.bufferedAmount < this.highWaterMark) {
+      this.send(frame, seq);
+      return;
+    }
+
+    if (this.queue.length >= this.maxQueueLength) {
+      // 溢出：丢弃积压的事件，改为稍后发送一次 resyncRequired
+      for (const entry of this.queue) {
+        this.drop(1, entry.relativePath);
+      }
+      this.drop(1, relativePath);
+      this.queue = [];
+      this.resyncPending = true;
+      this.drain();
+      return;
+    }
+
+    this.queue.push({ frame, relativePath, seq });
+    if (this.queue.length > this.stats.maxQueueDepth) {
+      this.stats.maxQueueDepth = this.queue.length;
+    }
+    this.drain();
+  }
+
+  drop(count, relativePath) {
+    this.stats.framesDropped += count;
+    this.droppedSinceResync += count;
+    if (relativePath !== undefined && this.droppedDirectories.size <= MAX_SUMMARY_DIRECTORIES) {
+      const directory = path.posix.dirname(relativePath.replace(/\\/g, '/'));
+      this.droppedDirectories.add(directory === '.' ? '/' : '/' + directory);
+    }
+  }
+
+  // 在客户端缓冲区低于高水位时继续发送积压的帧
+  drain() {
+    if (this.closed) {
+      return;
+    }
+    while (this.queue.length > 0 && this.client.bufferedAmount < this.highWaterMark) {
+      const entry = this.queue.shift();
+      if (!this.send(entry.frame, entry.seq)) {
+        return;
+      }
+    }
+
+    if (this.queue.length === 0 && this.resyncPending && this.client.bufferedAmount < this.highWaterMark) {
+      const message = {
+        type: 'resyncRequired',
+        reason: 'slowConsumer',
+        droppedEvents: this.droppedSinceResync,
+        timestamp: new Date().toISOString()
+      };
+      if (this.lastSentSeq !== undefined) {
+        // 客户端可以用该序列号重新订阅（sinceSeq）来补发丢弃的事件
+        message.resumeFromSeq = this.lastSentSeq;
+      }
+      if (this.droppedDirectories.size <= MAX_SUMMARY_DIRECTORIES) {
+        message.directories = Array.from(this.droppedDirectories);
+      }
+      this.resyncPending = false;
+      this.droppedDirectories.clear();
+      this.droppedSinceResync = 0;
+      if (this.send(JSON.stringify(message))) {
+        this.stats.resyncsSent++;
+      }
+    }
+  }
+
+  send(frame, seq) {
+    if (this.client.readyState !== 1) { // WebSocket.OPEN
+      return false;
+    }
+    try {
+      this.client.send(frame, { binary: false }, this.onSent);
+      this.stats.framesSent++;
+      if (seq !== undefined) {
+        this.lastSentSeq = seq;
+      }
+      return true;
+    } catch (error) {
+      this.fail(error);
+      return false;
+    }
+  }
+
+  // 发送出错（套接字错误）：关闭队列并通知调用方
+  fail(error) {
+    if (this.closed) {
+      return;
+    }
+    this.close();
+    this.onError(error);
+  }
+
+  // 丢弃积压的帧，此后的push不再发送（客户端出错或已取消所有订阅）
+  close() {
+    this.closed = true;
+    this.queue = [];
+    this.resyncPending = false;
+    this.droppedDirectories.clear();
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      queueDepth: this.queue.length,
+      bufferedAmount: this.client.bufferedAmount || 0,
+      resyncPending: this.resyncPending,
+      closed: this.closed
+    };
+  }
+}
+
+module.exports = {
+  OutboundQueue
+};
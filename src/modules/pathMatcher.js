@@ -0,0 +1,321 @@
+const path = require('path');
+
+// 检查路径是否与订阅模式匹配（原始实现，作为索引匹配的语义基准）
+// filePath 为相对于上传目录的路径（例如 "file.txt", "subdir/file.txt"）
+// subscriptionPath 为绝对订阅路径（例如 "/file.txt", "/subdir/**"）
+function isPathMatch(filePath, subscriptionPath) {
+  // 规范化路径分隔符
+  const normalizedFilePath = filePath.replace(/\\/g, '/').replace(/^\.\//, '');
+  const normalizedSubscriptionPath = subscriptionPath.replace(/\\/g, '/').replace(/^\.\//, '');
+
+  // 如果订阅路径是根路径 "/"
+  if (normalizedSubscriptionPath === '/' || normalizedSubscriptionPath === '') {
+    return true; // 根路径匹配所有文件
+  }
+
+  // 如果订阅路径以 /** 结尾，表示递归匹配所有子路径
+  if (normalizedSubscriptionPath.endsWith('/**')) {
+    const basePath = normalizedSubscriptionPath.slice(0, -3); // 移除 /**
+
+    // 处理根路径情况
+    if (basePath === '' || basePath === '/') {
+      return true; // / 匹配所有路径
+    }
+
+    // 去除basePath的前导斜杠进行比较
+    const basePathNoLeadingSlash = basePath.replace(/^\/+/, '');
+
+    return normalizedFilePath === basePathNoLeadingSlash ||
+           normalizedFilePath.startsWith(basePathNoLeadingSlash + '/');
+  }
+
+  // 如果订阅路径以 /* 结尾，表示匹配直接子项
+  if (normalizedSubscriptionPath.endsWith('/*')) {
+    const parentPath = normalizedSubscriptionPath.slice(0, -2); // 移除 /*
+
+    // 处理根路径情况
+    if (parentPath === '' || parentPath === '/') {
+      // / 匹配所有顶级路径 (files/dirs directly under root)
+      const fileParts = normalizedFilePath.split('/');
+      return fileParts.length === 1; // Only one part means it's directly under root
+    }
+
+    const parentPathNoLeadingSlash = parentPath.replace(/^\/+/, '');
+    const fileParentPath = path.dirname(normalizedFilePath).replace(/\\/g, '/');
+
+    return fileParentPath === parentPathNoLeadingSlash;
+  }
+
+  // 精确匹配
+  const subscriptionPathWithoutLeadingSlash = normalizedSubscriptionPath.replace(/^\/+/, '');
+
+  // 处理订阅路径为单个目录的情况（例如 "/rime" 应该匹配 "rime/file.txt" 或 "/rime/" 应该匹配 "rime/file.txt"）
+  if (!subscriptionPathWithoutLeadingSlash.includes('*')) {
+    // 如果订阅路径以目录名结尾（不含文件名），检查文件路径是否在该目录下
+    if (subscriptionPathWithoutLeadingSlash.endsWith('/')) {
+      const directoryName = subscriptionPathWithoutLeadingSlash.replace(/\/$/, ''); // 移除末尾的斜杠
+      // 检查文件路径是否在订阅目录下
+      if (normalizedFilePath === directoryName ||
+          normalizedFilePath.startsWith(directoryName + '/')) {
+        return true;
+      }
+    } else {
+      // 如果订阅路径不以斜杠结尾，检查是否精确匹配或作为目录前缀
+      if (normalizedFilePath === subscriptionPathWithoutLeadingSlash) {
+        return true; // 精确匹配
+      }
+
+      // 检查文件路径是否在订阅目录下（例如订阅 "rime" 匹配 "rime/filename.txt"）
+      if (normalizedFilePath.startsWith(subscriptionPathWithoutLeadingSlash + '/')) {
+        return true;
+      }
+    }
+  }
+
+  return normalizedFilePath === subscriptionPathWithoutLeadingSlash;
+}
+
+// 规范化的相对路径：不以斜杠开头或结尾，且不含空段（"a//b"）
+const isCleanRelativePath = (relativePath) => {
+  return relativePath === '' ||
+    (!relativePath.startsWith('/') && !relativePath.endsWith('/') && !relativePath.includes('//'));
+};
+
+// 把订阅模式解析为 { kind, segments }
+// kind: exact（精确路径，同时覆盖其子路径）、direct（/* 直接子项）、recursive（/** 递归）
+// 无法放入前缀树的非规范模式返回 null，由 isPathMatch 兜底
+const parseSubscriptionPattern = (subscriptionPath) => {
+  const normalized = subscriptionPath.replace(/\\/g, '/').replace(/^\.\//, '');
+
+  if (normalized === '/' || normalized === '') {
+    return { kind: 'recursive', segments: [] };
+  }
+
+  let kind;
+  let base;
+  if (normalized.endsWith('/**')) {
+    kind = 'recursive';
+    base = normalized.slice(0, -3);
+  } else if (normalized.endsWith('/*')) {
+    kind = 'direct';
+    base = normalized.slice(0, -2);
+  } else {
+    kind = 'exact';
+    base = normalized;
+    if (base.includes('*')) {
+      return null;
+    }
+  }
+
+  if (base === '' || base === '/') {
+    return { kind, segments: [] };
+  }
+
+  base = base.replace(/^\/+/, '');
+  // 精确订阅 "/rime/" 与 "/rime" 等价
+  if (kind === 'exact' && base.endsWith('/')) {
+    base = base.slice(0, -1);
+  }
+
+  if (base === '' || !isCleanRelativePath(base)) {
+    return null;
+  }
+
+  return { kind, segments: base.split('/') };
+};
+
+const createNode = () => ({
+  children: new Map(),
+  exact: new Map(),
+  direct: new Map(),
+  recursive: new Map()
+});
+
+const isNodeEmpty = (node) => {
+  return node.children.size === 0 && node.exact.size === 0 &&
+    node.direct.size === 0 && node.recursive.size === 0;
+};
+
+const addToBucket = (bucket, client, subscriptionPath) => {
+  let paths = bucket.get(client);
+  if (!paths) {
+    paths = new Set();
+    bucket.set(client, paths);
+  }
+  paths.add(subscriptionPath);
+};
+
+const removeFromBucket = (bucket, client, subscriptionPath) => {
+  const paths = bucket.get(client);
+  if (!paths || !paths.delete(subscriptionPath)) {
+    return false;
+  }
+  if (paths.size === 0) {
+    bucket.delete(client);
+  }
+  return true;
+};
+
+const collectBucket = (result, bucket) => {
+  for (const [client, paths] of bucket) {
+    let matched = result.get(client);
+    if (!matched) {
+      matched = [];
+      result.set(client, matched);
+    }
+    for (const subscriptionPath of paths) {
+      matched.push(subscriptionPath);
+    }
+  }
+};
+
+// 基于路径段前缀树的订阅索引
+// 在 subscribe/unsubscribe 时维护，每个文件事件的匹配开销约为其路径深度
+class SubscriptionIndex {
+  constructor() {
+    this.root = createNode();
+    this.fallback = new Map(); // 非规范模式：client -> Set<subscriptionPath>
+    this.size = 0;
+  }
+
+  // 添加订阅（subscriptionPath 应为 validateSubscriptionPath 规范化后的路径）
+  add(client, subscriptionPath) {
+    const pattern = parseSubscriptionPattern(subscriptionPath);
+    if (!pattern) {
+      addToBucket(this.fallback, client, subscriptionPath);
+      this.size++;
+      return;
+    }
+
+    let node = this.root;
+    for (const segment of pattern.segments) {
+      let child = node.children.get(segment);
+      if (!child) {
+        child = createNode();
+        node.children.set(segment, child);
+      }
+      node = child;
+    }
+    addToBucket(node[pattern.kind], client, subscriptionPath);
+    this.size++;
+  }
+
+  // 移除订阅，返回是否存在该订阅
+  remove(client, subscriptionPath) {
+    const pattern = parseSubscriptionPattern(subscriptionPath);
+    if (!pattern) {
+      const removed = removeFromBucket(this.fallback, client, subscriptionPath);
+      if (removed) {
+        this.size--;
+      }
+      return removed;
+    }
+
+    // 记录沿途节点以便清理空分支
+    const trail = [this.root];
+    let node = this.root;
+    for (const segment of pattern.segments) {
+      node = node.children.get(segment);
+      if (!node) {
+        return false;
+      }
+      trail.push(node);
+    }
+
+    if (!removeFromBucket(node[pattern.kind], client, subscriptionPath)) {
+      return false;
+    }
+    this.size--;
+
+    for (let i = trail.length - 1; i > 0; i--) {
+      if (!isNodeEmpty(trail[i])) {
+        break;
+      }
+      trail[i - 1].children.delete(pattern.segments[i - 1]);
+    }
+    return true;
+  }
+
+  // 移除客户端的一组订阅
+  removeClient(client, subscriptionPaths) {
+    for (const subscriptionPath of subscriptionPaths) {
+      this.remove(client, subscriptionPath);
+    }
+  }
+
+  // 查找匹配相对路径的所有订阅，返回 Map<client, subscriptionPath[]>
+  match(relativePath) {
+    const result = new Map();
+    const normalizedFilePath = relativePath.replace(/\\/g, '/').replace(/^\.\//, '');
+
+    if (!isCleanRelativePath(normalizedFilePath)) {
+      // 非规范的事件路径（极少出现）退回到逐个比较，保证与 isPathMatch 完全一致
+      this.walkAll((client, subscriptionPath) => {
+        if (isPathMatch(relativePath, subscriptionPath)) {
+          collectBucket(result, new Map([[client, [subscriptionPath]]]));
+        }
+      });
+      return result;
+    }
+
+    const segments = normalizedFilePath === '' ? [] : normalizedFilePath.split('/');
+    let node = this.root;
+
+    collectBucket(result, node.recursive);
+    collectBucket(result, node.exact);
+    if (segments.length <= 1) {
+      collectBucket(result, node.direct);
+    }
+
+    for (let i = 0; i < segments.length; i++) {
+      node = node.children.get(segments[i]);
+      if (!node) {
+        break;
+      }
+      collectBucket(result, node.recursive);
+      collectBucket(result, node.exact);
+      if (i === segments.length - 2) {
+        collectBucket(result, node.direct);
+      }
+    }
+
+    for (const [client, paths] of this.fallback) {
+      for (const subscriptionPath of paths) {
+        if (isPathMatch(relativePath, subscriptionPath)) {
+          collectBucket(result, new Map([[client, [subscriptionPath]]]));
+        }
+      }
+    }
+
+    return result;
+  }
+
+  // 遍历索引中的所有订阅
+  walkAll(callback) {
+    const stack = [this.root];
+    while (stack.length > 0) {
+      const node = stack.pop();
+      for (const bucket of [node.exact, node.direct, node.recursive]) {
+        for (const [client, paths] of bucket) {
+          for (const subscriptionPath of paths) {
+            callback(client, subscriptionPath);
+          }
+        }
+      }
+      for (const child of node.children.values()) {
+        stack.push(child);
+      }
+    }
+    for (const [client, paths] of this.fallback) {
+      for (const subscriptionPath of paths) {
+        callback(client, subscriptionPath);
+      }
+    }
+  }
+}
+
+module.exports = {
+  isPathMatch,
+  parseSubscriptionPattern,
+  SubscriptionIndex
+};
@@ -0,0 +1,201 @@
+const fs = require('fs');
+const path = require('path');
+const { createLogger } = require('./logger');
+
+const log = createLogger('PollingScanner');
+
+// 轮询扫描器：为没有原生监视（inotify）的冷目录发现变化
+// 维护 路径 -> { isDirectory, mtimeMs, size } 的索引；目录的mtime未变化时沿用已知的子项列表而不重新readdir，
+// 每轮只需对已知条目stat即可发现修改，新增/删除的条目由所在目录mtime的变化发现
+class PollingScanner {
+  constructor(options = {}) {
+    this.roots = options.roots;
+    this.intervalMs = options.intervalMs || 10000;
+    this.concurrency = options.concurrency || 16; // 同时进行的stat数量
+    this.isIgnored = options.isIgnored || (() => false); // (filePath, isDirectory) => boolean
+    // (filePath) => true 时跳过该路径及其子树（由原生监视负责）
+    this.isExcluded = options.isExcluded || (() => false);
+    // (filePath) => true 时只更新索引不报告事件（所在目录的直接子项由原生监视负责）
+    this.isEntryCovered = options.isEntryCovered || (() => false);
+    this.onEvent = options.onEvent;
+
+    this.entries = new Map();
+    this.children = new Map(); // dirPath -> Set(name)
+    this.rebaselineRoots = new Set(); // 下一轮只静默重建索引的子树（原生监视刚结束，期间的变化已报告过）
+    this.activeStats = 0;
+    this.waiting = [];
+    this.timer = null;
+    this.closed = false;
+    this.stats = {
+      scans: 0,
+      eventsEmitted: 0,
+      lastScanMs: 0
+    };
+  }
+
+  // 首轮扫描只建立索引（与监视器的ignoreInitial一致），此后每轮结束后等待 intervalMs 再开始下一轮
+  start() {
+    this.runScan(true);
+  }
+
+  runScan(silent) {
+    this.scan(silent)
+      .catch(err => log.error(`Scan failed: ${err.message}`))
+      .finally(() => {
+        if (!this.closed) {
+          this.timer = setTimeout(() => this.runScan(false), this.intervalMs);
+          this.timer.unref();
+        }
+      });
+  }
+
+  rebaseline(rootPath) {
+    this.rebaselineRoots.add(rootPath);
+  }
+
+  async scan(silent) {
+    const startedAt = Date.now();
+    const rebaselining = Array.from(this.rebaselineRoots);
+    await Promise.all(this.roots.map(root => this.checkEntry(root, silent)));
+    rebaselining.forEach(root => this.rebaselineRoots.delete(root));
+    this.stats.scans++;
+    this.stats.lastScanMs = Date.now() - startedAt;
+  }
+
+  isRebaselining(filePath) {
+    for (const root of this.rebaselineRoots) {
+      const relative = path.relative(root, filePath);
+      if (!relative.startsWith('..') && !path.isAbsolute(relative)) {
+        return true;
+      }
+    }
+    return false;
+  }
+
+  // 检查一个条目：与索引比较并报告变化，目录继续检查其子项
+  async checkEntry(filePath, silent) {
+    if (this.closed || this.isExcluded(filePath)) {
+      return;
+    }
+    const quiet = silent || (this.rebaselineRoots.size > 0 && this.isRebaselining(filePath));
+    let previous = this.entries.get(filePath);
+    const stats = await this.statLimited(filePath);
+
+    if (!stats) {
+      if (previous) {
+        this.removeEntry(filePath);
+        this.report(previous.isDirectory ? 'directoryDeleted' : 'deleted', filePath, quiet);
+      }
+      return;
+    }
+
+    const isDirectory = stats.isDirectory();
+    if (previous && previous.isDirectory !== isDirectory) {
+      // 文件被同名目录替换（或相反）
+      this.removeEntry(filePath);
+      this.report(previous.isDirectory ? 'directoryDeleted' : 'deleted', filePath, quiet);
+      previous = undefined;
+    }
+    this.entries.set(filePath, { isDirectory, mtimeMs: stats.mtimeMs, size: stats.size });
+
+    if (!previous) {
+      this.report(isDirectory ? 'directoryCreated' : 'created', filePath, quiet);
+    } else if (!isDirectory && (previous.mtimeMs !== stats.mtimeMs || previous.size !== stats.size)) {
+      this.report('updated', filePath, quiet);
+    }
+
+    if (isDirectory) {
+      await this.checkChildren(filePath, quiet, !previous || previous.mtimeMs !== stats.mtimeMs);
+    }
+  }
+
+  async checkChildren(dirPath, quiet, listingChanged) {
+    const known = this.children.get(dirPath);
+    let names = known;
+    if (listingChanged || !known) {
+      try {
+        const dirents = await fs.promises.readdir(dirPath, { withFileTypes: true });
+        names = new Set(dirents
+          .filter(dirent => !this.isIgnored(path.join(dirPath, dirent.name), dirent.isDirectory()))
+          .map(dirent => dirent.name));
+      } catch (err) {
+        return; // 目录刚被删除，下一轮会在上级目录发现
+      }
+      this.children.set(dirPath, names);
+    }
+    // 已消失的旧子项也要检查一次，以报告删除并清理索引
+    const toCheck = known && names !== known ? new Set([...known, ...names]) : names;
+    await Promise.all(Array.from(toCheck, name => this.checkEntry(path.join(dirPath, name), quiet)));
+  }
+
+  removeEntry(filePath) {
+    const names = this.children.get(filePath);
+    if (names) {
+      names.forEach(name => this.removeEntry(path.join(filePath, name)));
+      this.children.delete(filePath);
+    }
+    this.entries.delete(filePath);
+  }
+
+  report(eventType, filePath, quiet) {
+    if (quiet || this.isEntryCovered(filePath)) {
+      return;
+    }
+    this.stats.eventsEmitted++;
+    this.onEvent(eventType, filePath);
+  }
+
+  // 有界并发的stat，不存在时返回null
+  async statLimited(filePath) {
+    if (this.activeStats >= this.concurrency) {
+      await new Promise(resolve => this.waiting.push(resolve)); // 名额由完成的stat直接转交
+    } else {
+      this.activeStats++;
+    }
+    try {
+      return await fs.promises.stat(filePath);
+    } catch (err) {
+      return null;
+    } finally {
+      const next = this.waiting.shift();
+      if (next) {
+        next();
+      } else {
+        this.activeStats--;
+      }
+    }
+  }
+
+  // 索引中某个目录下（含自身）的目录数量，用于估算原生监视需要的inotify数量；未索引时返回null
+  countIndexedDirectories(rootPath) {
+    const root = this.entries.get(rootPath);
+    if (!root) {
+      return null;
+    }
+    if (!root.isDirectory) {
+      return 0;
+    }
+    let count = 1;
+    for (const name of this.children.get(rootPath) || []) {
+      count += this.countIndexedDirectories(path.join(rootPath, name)) || 0;
+    }
+    return count;
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      intervalMs: this.intervalMs,
+      indexedEntries: this.entries.size
+    };
+  }
+
+  close() {
+    this.closed = true;
+    clearTimeout(this.timer);
+  }
+}
+
+module.exports = {
+  PollingScanner
+};
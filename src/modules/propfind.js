@@ -0,0 +1,201 @@
+const fs = require('fs');
+const path = require('path');
+const { computeEtag } = require('./conditionalRequest');
+const { createLogger } = require('./logger');
+
+const log = createLogger('PROPFIND');
+
+const MULTISTATUS_OPEN = '<?xml version="1.0" encoding="utf-8"?>' +
+  '<D:multistatus xmlns:D="DAV:" xmlns:ns1="http://apache.org/dav/props/" xmlns:ns0="DAV:" xmlns:oc="http://owncloud.org/ns">';
+const MULTISTATUS_CLOSE = '</D:multistatus>';
+
+// 每批拼接多少个<D:response>后写入响应
+const WRITE_BATCH_SIZE = 256;
+
+const escapeXml = (value) => String(value)
+  .replace(/&/g, '&amp;')
+  .replace(/</g, '&lt;')
+  .replace(/>/g, '&gt;');
+
+// 解析Depth请求头：0、1或infinity；未提供时沿用以往的行为（列出直接子项）
+const parseDepth = (header) => {
+  if (header === undefined || header === null || header === '') {
+    return 1;
+  }
+  const value = String(header).trim().toLowerCase();
+  if (value === '0') {
+    return 0;
+  }
+  if (value === 'infinity') {
+    return Infinity;
+  }
+  return 1;
+};
+
+// 生成单个资源的<D:response>片段
+const formatPropfindResponse = (resource) => {
+  let xml = '<D:response>';
+  xml += `<D:href>${escapeXml(resource.path)}</D:href>`;
+  xml += '<D:propstat>';
+  xml += '<D:prop>';
+
+  // 基本属性
+  xml += '<D:resourcetype>' + (resource.isDirectory ? '<D:collection/>' : '') + '</D:resourcetype>';
+  xml += `<D:getcontentlength>${resource.size || 0}</D:getcontentlength>`;
+  xml += `<D:getlastmodified>${resource.mtime ? resource.mtime.toUTCString() : ''}</D:getlastmodified>`;
+  xml += '<D:creationdate>' + (resource.ctime ? resource.ctime.toISOString() : '') + '</D:creationdate>';
+  xml += '<D:getetag>' + escapeXml(resource.etag || `"${resource.mtime ? resource.mtime.getTime() : Date.now()}"`) + '</D:getetag>';
+  // 已计算的内容哈希，沿用ownCloud的checksums属性格式（"算法:值"），同步客户端可据此校验而无需下载
+  if (resource.contentHash) {
+    xml += `<oc:checksums><oc:checksum>SHA256:${resource.contentHash}</oc:checksum></oc:checksums>`;
+  }
+
+  xml += '</D:prop>';
+  xml += '<D:status>HTTP/1.1 200 OK</D:status>';
+  xml += '</D:propstat>';
+  xml += '</D:response>';
+  return xml;
+};
+
+// 由文件状态构建资源描述，contentHash 为已缓存的内容哈希（可选）
+const toResource = (href, stats, contentHash) => ({
+  path: href,
+  isDirectory: stats.isDirectory(),
+  size: stats.isDirectory() ? 0 : stats.size,
+  mtime: stats.mtime,
+  ctime: stats.ctime,
+  etag: computeEtag(stats),
+  contentHash: contentHash || null
+});
+
+// 列出目录的直接子项，按批（有界并发）获取文件状态
+// 每批产出 [{ name, filePath, stats }]，在stat之前消失的条目会被跳过
+// options.readdir/options.stat 可替换为带缓存的实现；未提供readdir时以opendir流式读取目录
+async function* listDirectory(dirPath, options = {}) {
+  const concurrency = options.concurrency || 32;
+  const filter = options.filter || (() => true);
+  const statFn = options.stat || ((filePath) => fs.promises.stat(filePath));
+  const names = options.readdir
+    ? await options.readdir(dirPath)
+    : readNames(await fs.promises.opendir(dirPath, { bufferSize: Math.max(32, concurrency) }));
+
+  let pending = [];
+  const statBatch = async (batchNames) => {
+    const results = await Promise.all(batchNames.map(async (name) => {
+      const filePath = path.join(dirPath, name);
+      try {
+        return { name, filePath, stats: await statFn(filePath) };
+      } catch (err) {
+        return null;
+      }
+    }));
+    return results.filter(Boolean);
+  };
+
+  for await (const name of names) {
+    if (!filter(name)) {
+      continue;
+    }
+    pending.push(name);
+    if (pending.length >= concurrency) {
+      yield await statBatch(pending);
+      pending = [];
+    }
+  }
+  if (pending.length > 0) {
+    yield await statBatch(pending);
+  }
+}
+
+async function* readNames(dir) {
+  for await (const entry of dir) {
+    yield entry.name;
+  }
+}
+
+const directoryKey = (stats) => `${stats.dev}:${stats.ino}`;
+
+// 以流的方式把multistatus写入响应，避免在内存中拼接整个XML
+// depth 为0、1或Infinity；Infinity时按广度优先遍历整个子树
+// stat会跟随符号链接，因此按 dev:inode 记录已遍历的目录，指向祖先目录的链接（循环）和重复的别名只列出、不再进入
+// contentHash(filePath, stats) 可返回已缓存的内容哈希，作为oc:checksums属性返回
+const streamPropfind = async (res, { filePath, href, stats, depth, concurrency, filter, stat, readdir, contentHash }) => {
+  const hashFor = contentHash || (() => null);
+  let aborted = false;
+  const onClose = () => { aborted = true; };
+  res.on('close', onClose);
+
+  const write = async (chunk) => {
+    if (!res.write(chunk) && !aborted) {
+      await new Promise(resolve => {
+        const done = () => {
+          res.removeListener('drain', done);
+          res.removeListener('close', done);
+          resolve();
+        };
+        res.on('drain', done);
+        res.on('close', done);
+      });
+    }
+  };
+
+  try {
+    await write(MULTISTATUS_OPEN + formatPropfindResponse(toResource(href, stats, hashFor(filePath, stats))));
+
+    if (stats.isDirectory() && depth > 0) {
+      const queue = [{ dirPath: filePath, href, depth }];
+      const visited = new Set([directoryKey(stats)]);
+      while (queue.length > 0 && !aborted) {
+        const current = queue.shift();
+        let chunk = '';
+        let chunkCount = 0;
+
+        try {
+          for await (const batch of listDirectory(current.dirPath, { concurrency, filter, stat, readdir })) {
+            for (const { name, filePath: childPath, stats: childStats } of batch) {
+              const childHref = path.posix.join(current.href, name);
+              chunk += formatPropfindResponse(toResource(childHref, childStats, hashFor(childPath, childStats)));
+              chunkCount++;
+              if (childStats.isDirectory() && current.depth > 1 && !visited.has(directoryKey(childStats))) {
+                visited.add(directoryKey(childStats));
+                queue.push({ dirPath: childPath, href: childHref, depth: current.depth - 1 });
+              }
+            }
+            if (chunkCount >= WRITE_BATCH_SIZE) {
+              await write(chunk);
+              chunk = '';
+              chunkCount = 0;
+            }
+            if (aborted) {
+              break;
+            }
+          }
+        } catch (err) {
+          // 响应已经开始，遍历过程中消失或无权限的目录直接跳过
+          log.error(`Skipping ${current.dirPath}: ${err.message}`);
+        }
+
+        if (chunk) {
+          await write(chunk);
+        }
+      }
+    }
+
+    if (!aborted) {
+      res.end(MULTISTATUS_CLOSE);
+    }
+  } finally {
+    res.removeListener('close', onClose);
+  }
+};
+
+module.exports = {
+  MULTISTATUS_OPEN,
+  MULTISTATUS_CLOSE,
+  escapeXml,
+  parseDepth,
+  formatPropfindResponse,
+  listDirectory,
+  streamPropfind,
+  toResource
+};
@@ -1,66 +1,227 @@
-const chokidar = require('chokidar');
 const path = require('path');
+const { performance } = require('perf_hooks');
 const fs = require('fs');
+const EventEmitter = require('events');
+const { isPathMatch, SubscriptionIndex } = require('./pathMatcher');
+const { EventCoalescer } = require('./eventCoalescer');
+const { ChangeJournal } = require('./changeJournal');
+const { OutboundQueue } = require('./outboundQueue');
+const { EventLog } = require('./eventLog');
+const { MIME_TYPES } = require('./mimeTypes');
+const { FileWatcher, isPathCovered } = require('./fileWatcher');
+const { createIgnoreMatcher, parsePatternList } = require('./globMatcher');
+const { createLogger } = require('./logger');
+const { getDefaultRegistry } = require('./metrics');
+
+const log = createLogger('SubscriptionManager');
+
+// 默认的监视忽略规则（glob，相对于上传目录，语义类似.gitignore），可用 WATCH_IGNORE 替换
+const DEFAULT_WATCH_IGNORE = [
+  '.*', // 以.开头的文件/目录（如 .git, .DS_Store, 上传暂存目录和临时文件）
+  'node_modules',
+  'venv/', 'virtualenv/', '__pycache__/', // Python虚拟环境和缓存目录
+  '*.log', '*.tmp', '*.cache' // 常见的临时文件扩展名
+];
+
+// 客户端提供的事件序列号是否有效（非负整数）
+const isValidSeq = (seq) => Number.isInteger(seq) && seq >= 0;
 
 // 存储客户端订阅信息
-class SubscriptionManager {
-  constructor(uploadDir) {
+// 监视器的原始事件（合并之前）以 'watcherEvent' 事件转发，供元数据缓存等及时失效；
+// 每个写入事件日志的通知以 'fileEvent' 事件转发，集群模式下由主进程广播给工作进程
+// options.upstream: 集群工作进程与主进程的通道（见 clusterBus.js），设置时本进程不启动监视器，
+// 文件事件由主进程推送，自身完成的变更上报给主进程登记和发布
+// options.metrics: 记录分发延迟和匹配耗时的指标注册表（见 metrics.js），默认为进程共享的注册表
+class SubscriptionManager extends EventEmitter {
+  constructor(uploadDir, options = {}) {
+    super();
     this.uploadDir = uploadDir;
+    this.upstream = options.upstream || null;
 
     // 从环境变量获取要监听的特定路径，如果没有则默认监听整个上传目录
     const watchPathsEnv = process.env.WATCH_PATHS || '';
     if (watchPathsEnv) {
       // 解析环境变量中的多个路径（用逗号分隔）
       this.watchPaths = watchPathsEnv.split(',').map(p => p.trim()).filter(p => p);
-      console.log(`[SubscriptionManager] Watching specific paths: ${this.watchPaths.join(', ')}`);
+      log.info(`Watching specific paths: ${this.watchPaths.join(', ')}`);
     } else {
       this.watchPaths = [this.uploadDir]; // 默认监听整个上传目录
-      console.log(`[SubscriptionManager] Watching default upload directory: ${this.uploadDir}`);
+      log.info(`Watching default upload directory: ${this.uploadDir}`);
     }
 
+    // 监视范围的绝对路径，以及可配置的忽略规则
+    this.watchRoots = (this.watchPaths.length > 0 ? this.watchPaths : [this.uploadDir]).map(p => path.resolve(p));
+    this.ignoreMatcher = createIgnoreMatcher(parsePatternList(process.env.WATCH_IGNORE) || DEFAULT_WATCH_IGNORE);
+    // 文件变化会被报告的范围（原生监视根和是否有轮询兜底），工作进程中由主进程同步
+    this.watchCoverage = null;
+
     this.subscriptions = new Map(); // 存储WebSocket客户端与其订阅路径的映射
-    this.watcher = null;
+    this.subscriptionIndex = new SubscriptionIndex(); // 订阅路径前缀树索引，用于快速匹配文件事件
+    this.fileWatcher = null;
     this.clientInfo = new Map(); // 存储客户端信息，包括连接时间、订阅数等
+    this.outboundQueues = new Map(); // 每个客户端的有界发送队列，防止慢速客户端积压内存
+
+    // 发送队列配置：客户端缓冲超过高水位后开始排队，队列超过上限后改发resyncRequired
+    this.outboundHighWaterMark = parseInt(process.env.WS_HIGH_WATER_MARK) || 1024 * 1024;
+    this.outboundMaxQueueLength = parseInt(process.env.WS_MAX_QUEUE_LENGTH) || 1000;
     this.performanceMetrics = {
       totalNotificationsSent: 0,
       totalFileEvents: 0,
       totalMatchesFound: 0,
+      totalEventsReplayed: 0,
       startTime: Date.now()
     };
-    this.initWatcher();
+    const metrics = options.metrics || getDefaultRegistry();
+    this.fanoutLatency = metrics.histogram('event_fanout', 'Time from handling a file event to queueing it for every matching client');
+    this.matchLatency = metrics.histogram('event_match', 'Subscription matcher time per file event');
+
+    // 合并同一路径的突发事件（例如大文件上传期间的连续change），窗口为0时不合并
+    const coalesceWindowMs = parseInt(process.env.EVENT_COALESCE_WINDOW_MS);
+    const coalesceMaxWaitMs = parseInt(process.env.EVENT_COALESCE_MAX_WAIT_MS);
+    this.eventCoalescer = new EventCoalescer(
+      (eventType, filePath) => this.handleWatcherEvent(eventType, filePath),
+      {
+        windowMs: Number.isNaN(coalesceWindowMs) ? 100 : coalesceWindowMs,
+        maxWaitMs: Number.isNaN(coalesceMaxWaitMs) ? 1000 : coalesceMaxWaitMs
+      }
+    );
+
+    // 可重放的事件日志，客户端重连后可通过 sinceSeq 补发错过的事件
+    // 工作进程中是主进程日志的副本（序列号和纪元由主进程分配），不写文件
+    this.eventLog = new EventLog({
+      capacity: parseInt(process.env.EVENT_LOG_SIZE) || 10000,
+      filePath: this.upstream ? null : (process.env.EVENT_LOG_FILE || null)
+    });
+
+    // 记录服务器自身发起的变更，用于抑制监视器随后报告的重复事件
+    const journalTtlMs = parseInt(process.env.CHANGE_JOURNAL_TTL_MS);
+    this.changeJournal = new ChangeJournal({
+      ttlMs: Number.isNaN(journalTtlMs) ? 5000 : journalTtlMs
+    });
+
+    if (this.upstream) {
+      this.upstream.connect((type, message) => this.handleUpstreamMessage(type, message));
+    } else {
+      this.initWatcher();
+    }
+  }
+
+  // 处理主进程推送的消息（仅工作进程）
+  handleUpstreamMessage(type, message) {
+    if (type === 'sync') {
+      this.eventLog.reset(message.epoch, message.lastSeq, message.events);
+      this.watchCoverage = message.coverage;
+      if (message.contentHashes) {
+        this.emit('contentHashSync', message.contentHashes);
+      }
+      log.info(`Synced event log from primary: epoch ${message.epoch}, last seq ${message.lastSeq}, ${message.events.length} events`);
+    } else if (type === 'batch') {
+      for (const item of message.messages) {
+        if (item.type === 'fileEvent') {
+          this.receiveEvent(item.event);
+        } else if (item.type === 'watcherEvent') {
+          this.emit('watcherEvent', item.eventType, item.filePath);
+        } else if (item.type === 'watcherError') {
+          this.emit('watcherError', new Error(item.message));
+        } else if (item.type === 'watchCoverage') {
+          this.watchCoverage = item.coverage;
+        } else if (item.type === 'contentHash') {
+          this.emit('contentHashUpdate', item.path, item.entry);
+        }
+      }
+    }
+  }
+
+  // 处理主进程广播的通知（已分配序列号）：写入副本日志并分发给本进程的订阅者
+  receiveEvent(notification) {
+    const startedAt = performance.now();
+    if (!this.eventLog.adopt(notification)) {
+      return; // 已包含在同步快照中
+    }
+    this.performanceMetrics.totalFileEvents++;
+    this.dispatchNotification(notification);
+    this.fanoutLatency.recordSince(startedAt);
   }
 
   // 初始化文件监视器
   initWatcher() {
-    // 根据环境变量配置决定监视哪些路径
-    const watchTargets = this.watchPaths.length > 0 ? this.watchPaths : [this.uploadDir];
-
-    // 监视指定路径或默认的上传目录
-    this.watcher = chokidar.watch(watchTargets, {
-      persistent: true,
-      ignoreInitial: true, // 忽略初始扫描事件
-      ignorePermissionErrors: true,
-      usePolling: false, // 禁用轮询，改用文件系统事件（更高效）
-      interval: 100, // 减少轮询间隔（仅在usePolling=true时生效）
-      binaryInterval: 300, // 二进制文件轮询间隔
-      awaitWriteFinish: false, // 禁用等待写入完成以减少延迟
-      ignored: [
-        /(^|[\/\\])\../, // 忽略以.开头的文件/目录（如 .git, .DS_Store 等）
-        /tmp/, /temp/, // 忽略临时目录
-        /node_modules/, // 忽略node_modules
-        /venv/, /virtualenv/, /env/, /.env/, // 忽略Python虚拟环境目录
-        /\.log$/, /\.tmp$/, /\.cache$/ // 忽略常见的临时文件扩展名
-      ]
+    const pollIntervalMs = parseInt(process.env.WATCH_POLL_INTERVAL_MS);
+    this.fileWatcher = new FileWatcher({
+      roots: this.watchRoots,
+      mode: process.env.WATCHER_BACKEND || 'auto',
+      isIgnored: (filePath, isDirectory) => this.isIgnoredPath(filePath, isDirectory),
+      pollIntervalMs: Number.isNaN(pollIntervalMs) ? 10000 : pollIntervalMs,
+      pollConcurrency: parseInt(process.env.WATCH_POLL_CONCURRENCY) || 16,
+      budgetRatio: parseFloat(process.env.WATCH_INOTIFY_BUDGET) || 0.8
     });
 
     // 监听文件变化事件
-    this.watcher
-      .on('add', (filePath) => this.handleFileEvent('created', filePath))
-      .on('change', (filePath) => this.handleFileEvent('updated', filePath))
-      .on('unlink', (filePath) => this.handleFileEvent('deleted', filePath))
-      .on('addDir', (dirPath) => this.handleFileEvent('directoryCreated', dirPath))
-      .on('unlinkDir', (dirPath) => this.handleFileEvent('directoryDeleted', dirPath))
-      .on('error', (error) => console.error('Watcher error:', error));
+    this.fileWatcher
+      .on('event', (eventType, filePath) => this.queueFileEvent(eventType, filePath))
+      .on('coverage', (coverage) => {
+        this.watchCoverage = coverage;
+        this.emit('watchCoverage', coverage);
+      })
+      .on('error', (error) => {
+        log.error('Watcher error', { error });
+        // 监视器出错时可能漏报事件，通知依赖它失效的缓存
+        this.emit('watcherError', error);
+      });
+    this.fileWatcher.start();
+    this.watchCoverage = this.fileWatcher.getCoverage();
+    log.info(`File watcher started in ${this.fileWatcher.mode} mode`);
+  }
+
+  // 检查路径是否被忽略规则排除（规则相对于上传目录匹配）
+  isIgnoredPath(filePath, isDirectory = false) {
+    const relativePath = path.relative(this.uploadDir, filePath);
+    if (relativePath.startsWith('..') || path.isAbsolute(relativePath)) {
+      return this.ignoreMatcher(filePath, isDirectory);
+    }
+    return this.ignoreMatcher(relativePath, isDirectory);
+  }
+
+  // 订阅路径需要的原生监视目标：/a/** 和 /a 递归监视 /a，/a/* 只监视 /a 的直接子项；限制在监视范围内
+  watchTargetsFor(subscriptionPath) {
+    let basePath = subscriptionPath;
+    let recursive = true;
+    if (basePath.endsWith('/**')) {
+      basePath = basePath.slice(0, -3);
+    } else if (basePath.endsWith('/*')) {
+      basePath = basePath.slice(0, -2);
+      recursive = false;
+    }
+    const absoluteBase = path.join(this.uploadDir, basePath);
+    const targets = [];
+    for (const root of this.watchRoots) {
+      const relative = path.relative(root, absoluteBase);
+      if (relative === '' || (!relative.startsWith('..') && !path.isAbsolute(relative))) {
+        return [{ path: absoluteBase, recursive }];
+      }
+      // 订阅范围包含整个监视路径（例如订阅 / 而只监视部分目录）
+      const inverse = path.relative(absoluteBase, root);
+      if (recursive && !inverse.startsWith('..') && !path.isAbsolute(inverse)) {
+        targets.push({ path: root, recursive: true });
+      }
+    }
+    return targets;
+  }
+
+  // 订阅增加时为其目录保留原生监视，工作进程中由主进程按各进程的引用计数管理
+  retainWatch(subscriptionPath) {
+    if (this.upstream) {
+      this.upstream.send('watchRetain', { subscriptionPath });
+    } else if (this.fileWatcher) {
+      this.watchTargetsFor(subscriptionPath).forEach(target => this.fileWatcher.acquire(target));
+    }
+  }
+
+  releaseWatch(subscriptionPath) {
+    if (this.upstream) {
+      this.upstream.send('watchRelease', { subscriptionPath });
+    } else if (this.fileWatcher) {
+      this.watchTargetsFor(subscriptionPath).forEach(target => this.fileWatcher.release(target));
+    }
   }
 
   // 验证订阅路径是否有效
@@ -105,98 +266,188 @@ class SubscriptionManager {
     return { valid: true, normalizedPath };
   }
 
-  // 处理文件事件
-  handleFileEvent(eventType, filePath) {
-    // 检查文件路径是否在我们想要监视的路径范围内
+  // 将监视器事件放入合并队列，窗口结束后再交给handleFileEvent
+  queueFileEvent(eventType, filePath) {
     if (!this.isPathInWatchedDirectories(filePath)) {
-      // 如果不在指定的监视路径内，直接返回，不处理该事件
       return;
     }
+    this.emit('watcherEvent', eventType, filePath);
+    this.eventCoalescer.push(eventType, filePath);
+  }
 
-    console.log(`[SubscriptionManager] Handling file event: ${eventType} for path: ${filePath}`);
+  // 处理合并后的监视器事件：如果是服务器自身变更的回声则丢弃
+  handleWatcherEvent(eventType, filePath) {
+    const stats = this.statPath(filePath);
+    if (this.changeJournal.isEcho(eventType, filePath, stats)) {
+      log.sampledDebug('echo', () => `Suppressed watcher echo: ${eventType} for path: ${filePath}`);
+      return;
+    }
+    this.handleFileEvent(eventType, filePath, stats);
+  }
+
+  // 发布服务器自身（WebDAV控制器）完成的变更，通知在当前请求的响应路径之外异步进行
+  // stats 为写入完成后文件的状态（控制器已有，可选）：变更日志立即登记，监视器的回声无论何时处理都会被识别；
+  // 未提供时先登记，文件类变更在获取文件状态后以实际版本重新登记
+  publishLocalChange(eventType, filePath, stats) {
+    const signature = stats ? { ino: stats.ino, size: stats.size, mtimeMs: stats.mtimeMs } : null;
+    if (this.upstream) {
+      this.upstream.send('localChange', { eventType, filePath, stats: signature });
+      return;
+    }
+    const sequence = this.changeJournal.record(eventType, filePath, signature);
+    log.debug(() => `Local change #${sequence}: ${eventType} for path: ${filePath}`);
+    fs.stat(filePath, (err, current) => {
+      if (!signature && !err) {
+        this.changeJournal.record(eventType, filePath, current);
+      }
+      this.handleFileEvent(eventType, filePath, err ? null : current);
+    });
+  }
+
+  // 服务器端MOVE/COPY（或删除目录，eventType为'directoryDeleted'、toPath为null）开始前调用：把源/目标子树登记到变更日志，
+  // 操作期间及完成后监视器报告的逐个文件的删除/创建事件都被视为回声
+  beginLocalTransfer(eventType, fromPath, toPath) {
+    if (this.upstream) {
+      // IPC通道有序，登记总是先于主进程处理同一操作产生的监视器事件（监视器事件本身还要经过合并窗口）
+      this.upstream.send('beginTransfer', { eventType, fromPath, toPath });
+      return;
+    }
+    this.recordTransfer(eventType, fromPath, toPath, Infinity);
+  }
+
+  // 服务器端MOVE/COPY/删除目录失败时调用：撤销登记，此后的监视器事件照常通知
+  cancelLocalTransfer(eventType, fromPath, toPath) {
+    if (this.upstream) {
+      this.upstream.send('cancelTransfer', { eventType, fromPath, toPath });
+      return;
+    }
+    this.changeJournal.forgetTree(fromPath);
+    if (toPath) {
+      this.changeJournal.forgetTree(toPath);
+    }
+  }
+
+  recordTransfer(eventType, fromPath, toPath, ttlMs) {
+    if (eventType === 'directoryDeleted') {
+      return this.changeJournal.recordTree(fromPath, ['removed'], ttlMs);
+    }
+    if (eventType === 'moved') {
+      this.changeJournal.recordTree(fromPath, ['removed'], ttlMs);
+    }
+    return this.changeJournal.recordTree(toPath, ['file', 'directory', 'removed'], ttlMs);
+  }
+
+  // 发布服务器自身完成的MOVE/COPY：只发送一条 moved/copied 事件（附带 fromPath）；删除目录只发送一条 directoryDeleted 事件
+  publishLocalTransfer(eventType, fromPath, toPath) {
+    if (this.upstream) {
+      this.upstream.send('publishTransfer', { eventType, fromPath, toPath });
+      return;
+    }
+    // 重新登记，回声抑制从操作完成时起再持续一个TTL
+    const sequence = this.recordTransfer(eventType, fromPath, toPath, this.changeJournal.ttlMs);
+    if (eventType === 'directoryDeleted') {
+      log.debug(() => `Local change #${sequence}: ${eventType} for path: ${fromPath}`);
+      setImmediate(() => this.handleFileEvent(eventType, fromPath, null));
+      return;
+    }
+    fs.stat(toPath, (err, stats) => {
+      log.debug(() => `Local change #${sequence}: ${eventType} from ${fromPath} to ${toPath}`);
+      this.handleFileEvent(eventType, toPath, err ? null : stats, { fromPath });
+    });
+  }
+
+  // 获取文件状态，不存在时返回null
+  statPath(filePath) {
+    try {
+      return fs.statSync(filePath);
+    } catch (err) {
+      return null;
+    }
+  }
+
+  // 处理文件事件（stats未提供时自行获取）
+  // details.fromPath 为 moved/copied 事件的源路径，订阅源路径或目标路径的客户端都会收到通知
+  handleFileEvent(eventType, filePath, stats, details = {}) {
+    const fromPath = details.fromPath;
+    // 检查文件路径是否在我们想要监视的路径范围内
+    if (!this.isPathInWatchedDirectories(filePath) &&
+        !(fromPath && this.isPathInWatchedDirectories(fromPath))) {
+      // 如果不在指定的监视路径内，直接返回，不处理该事件
+      return;
+    }
+    const startedAt = performance.now();
 
     // 更新性能指标
     this.performanceMetrics.totalFileEvents++;
 
     // 将绝对路径转换为相对于上传目录的路径
     const relativePath = path.relative(this.uploadDir, filePath);
-    console.log(`[SubscriptionManager] Converted to relative path: ${relativePath}`);
+    log.sampledDebug('fileEvent', () => `Handling file event: ${eventType} for path: ${relativePath}`);
 
     // 获取文件统计信息（大小等）
-    let fileSize = 0;
-    try {
-      const stats = fs.statSync(filePath);
-      fileSize = stats.size;
-    } catch (err) {
-      console.log(`[SubscriptionManager] Could not get file stats for ${filePath}: ${err.message}`);
+    if (stats === undefined) {
+      stats = this.statPath(filePath);
     }
+    const fileSize = stats ? stats.size : 0;
+
+    // 每个事件只构建一次通知并写入事件日志（分配序列号），即使当前没有订阅者也要记录以便重放
+    const notification = {
+      type: 'fileChange',
+      eventType,
+      path: relativePath,
+      timestamp: new Date().toISOString(),
+      size: fileSize
+    };
+    if (fromPath) {
+      notification.fromPath = path.relative(this.uploadDir, fromPath);
+      notification.isDirectory = Boolean(stats && stats.isDirectory());
+    }
+
+    // 添加MIME类型（如果可能的话）
+    const ext = path.extname(filePath).toLowerCase();
+    if (ext) {
+      notification.mimeType = MIME_TYPES[ext] || 'application/octet-stream';
+    }
+    this.eventLog.append(notification);
+    this.emit('fileEvent', notification);
+    this.dispatchNotification(notification);
+    this.fanoutLatency.recordSince(startedAt);
+  }
 
-    // 遍历所有订阅者，检查他们的订阅路径是否匹配
+  // 把通知分发给订阅了其路径（或moved/copied的源路径）的本进程客户端
+  dispatchNotification(notification) {
+    const relativePath = notification.path;
+
+    // 通过订阅索引查找匹配的订阅者（开销与路径深度相关，而非订阅总数）
     let matchesFound = 0;
-    console.log(`[SubscriptionManager] Total subscriptions to check: ${this.subscriptions.size}`);
-
-    for (const [client, subscriptions] of this.subscriptions.entries()) {
-      console.log(`[SubscriptionManager] Checking client with ${subscriptions.size} subscriptions`);
-      for (const subscriptionPath of subscriptions) {
-        console.log(`[SubscriptionManager] Checking subscription path: ${subscriptionPath} against file path: ${relativePath}`);
-        if (this.isPathMatch(relativePath, subscriptionPath)) {
-          console.log(`[SubscriptionManager] Path match found! Sending notification for ${eventType} of ${relativePath}`);
-
-          // 向订阅者发送通知
-          const notification = {
-            type: 'fileChange',
-            eventType,
-            path: relativePath,
-            timestamp: new Date().toISOString(),
-            size: fileSize
-          };
-
-          // 添加MIME类型（如果可能的话）
-          const ext = path.extname(filePath).toLowerCase();
-          if (ext) {
-            // 简单的MIME类型映射
-            const mimeTypes = {
-              '.txt': 'text/plain',
-              '.html': 'text/html',
-              '.htm': 'text/html',
-              '.css': 'text/css',
-              '.js': 'application/javascript',
-              '.json': 'application/json',
-              '.xml': 'application/xml',
-              '.pdf': 'application/pdf',
-              '.jpg': 'image/jpeg',
-              '.jpeg': 'image/jpeg',
-              '.png': 'image/png',
-              '.gif': 'image/gif',
-              '.svg': 'image/svg+xml',
-              '.mp4': 'video/mp4',
-              '.avi': 'video/x-msvideo',
-              '.mov': 'video/quicktime',
-              '.zip': 'application/zip',
-              '.rar': 'application/vnd.rar',
-              '.doc': 'application/msword',
-              '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-              '.xls': 'application/vnd.ms-excel',
-              '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            };
-
-            const mimeType = mimeTypes[ext] || 'application/octet-stream';
-            notification.mimeType = mimeType;
-          }
-
-          this.notifyClient(client, notification);
-          matchesFound++;
+    const matchStartedAt = performance.now();
+    const matches = this.subscriptionIndex.match(relativePath);
+    if (notification.fromPath !== undefined) {
+      // 合并源路径的匹配结果，同一客户端仍只收到一帧
+      for (const [client, matchedPaths] of this.subscriptionIndex.match(notification.fromPath)) {
+        const existing = matches.get(client);
+        matches.set(client, existing ? Array.from(new Set([...existing, ...matchedPaths])) : matchedPaths);
+      }
+    }
+    this.matchLatency.recordSince(matchStartedAt);
+
+    if (matches.size > 0) {
+      // 序列化一次，所有匹配的客户端共享同一个已编码的帧
+      const payload = JSON.stringify(notification);
+      const frame = Buffer.from(payload);
+      log.trace(() => `Broadcasting to ${matches.size} clients: ${payload}`);
+
+      // 一个客户端即使有多个订阅匹配，也只收到一帧；经由发送队列处理慢速客户端
+      for (const [client, matchedPaths] of matches) {
+        matchesFound += matchedPaths.length;
+        if (client.readyState === 1) { // WebSocket.OPEN
+          this.getOutboundQueue(client).push(frame, relativePath, notification.seq);
           this.performanceMetrics.totalNotificationsSent++; // 更新通知计数
-
-          // 不break，允许一个事件触发多个订阅（例如，多个路径都匹配）
-          // break; // 找到匹配就退出内层循环
-        } else {
-          console.log(`[SubscriptionManager] No match for subscription path: ${subscriptionPath} and file path: ${relativePath}`);
         }
       }
     }
 
-    console.log(`[SubscriptionManager] Matches found: ${matchesFound}, Total notifications sent: ${this.performanceMetrics.totalNotificationsSent}`);
+    log.sampledDebug('dispatch', () => `Event #${notification.seq} ${notification.path}: matched ${matches.size} of ${this.subscriptions.size} clients, ${matchesFound} subscriptions`);
 
     // 更新匹配计数
     this.performanceMetrics.totalMatchesFound += matchesFound;
@@ -218,99 +469,67 @@ class SubscriptionManager {
     });
   }
 
-  // 检查路径是否与订阅模式匹配（优化版本）
-  isPathMatch(filePath, subscriptionPath) {
-    // 规范化路径分隔符
-    const normalizedFilePath = filePath.replace(/\\/g, '/').replace(/^\.\//, '');
-    const normalizedSubscriptionPath = subscriptionPath.replace(/\\/g, '/').replace(/^\.\//, '');
-
-    // 如果订阅路径是根路径 "/"
-    if (normalizedSubscriptionPath === '/' || normalizedSubscriptionPath === '') {
-      return true; // 根路径匹配所有文件
-    }
-
-    // 如果订阅路径以 /** 结尾，表示递归匹配所有子路径
-    if (normalizedSubscriptionPath.endsWith('/**')) {
-      const basePath = normalizedSubscriptionPath.slice(0, -3); // 移除 /**
-
-      // 处理根路径情况
-      if (basePath === '' || basePath === '/') {
-        return true; // / 匹配所有路径
-      }
+  // 检查路径的变化是否一定会被监视器报告（在监视范围内、未被忽略，且由原生监视或轮询覆盖），只有这样的路径才能安全缓存
+  // 轮询覆盖的冷目录最多延迟 WATCH_POLL_INTERVAL_MS 报告，缓存的陈旧时间以此为界
+  isPathCacheable(filePath) {
+    return this.isPathInWatchedDirectories(filePath) &&
+      !this.isIgnoredPath(filePath) &&
+      isPathCovered(this.watchCoverage, filePath);
+  }
 
-      // 去除basePath的前导斜杠进行比较
-      const basePathNoLeadingSlash = basePath.replace(/^\/+/, '');
+  // 检查路径是否与订阅模式匹配
+  isPathMatch(filePath, subscriptionPath) {
+    return isPathMatch(filePath, subscriptionPath);
+  }
 
-      return normalizedFilePath === basePathNoLeadingSlash ||
-             normalizedFilePath.startsWith(basePathNoLeadingSlash + '/');
+  // 向客户端发送通知
+  notifyClient(client, message) {
+    if (client && client.readyState === 1) { // WebSocket.OPEN
+      const payload = JSON.stringify(message);
+      log.trace(() => `Sending message to client: ${payload}`);
+      this.sendFrame(client, payload);
+    } else {
+      log.debug(() => `Cannot send message to client - client not connected or invalid: ${client ? client.readyState : 'null'}`);
     }
+  }
 
-    // 如果订阅路径以 /* 结尾，表示匹配直接子项
-    if (normalizedSubscriptionPath.endsWith('/*')) {
-      const parentPath = normalizedSubscriptionPath.slice(0, -2); // 移除 /*
-
-      // 处理根路径情况
-      if (parentPath === '' || parentPath === '/') {
-        // / 匹配所有顶级路径 (files/dirs directly under root)
-        const fileParts = normalizedFilePath.split('/');
-        return fileParts.length === 1; // Only one part means it's directly under root
-      }
-
-      const parentPathNoLeadingSlash = parentPath.replace(/^\/+/, '');
-      const fileParentPath = path.dirname(normalizedFilePath).replace(/\\/g, '/');
-
-      return fileParentPath === parentPathNoLeadingSlash;
+  // 向客户端发送已编码的帧（Buffer以文本帧发送，多个客户端复用同一Buffer无需重复编码）
+  sendFrame(client, frame) {
+    if (!client || client.readyState !== 1) { // WebSocket.OPEN
+      return false;
     }
-
-    // 精确匹配 - need to adjust for how relative paths are calculated
-    // filePath is relative to upload dir (e.g., "file.txt", "subdir/file.txt")
-    // subscriptionPath is absolute (e.g., "/file.txt", "/subdir/**")
-    const subscriptionPathWithoutLeadingSlash = normalizedSubscriptionPath.replace(/^\/+/, '');
-
-    // 处理订阅路径为单个目录的情况（例如 "/rime" 应该匹配 "rime/file.txt" 或 "/rime/" 应该匹配 "rime/file.txt"）
-    if (!subscriptionPathWithoutLeadingSlash.includes('*')) {
-      // 如果订阅路径以目录名结尾（不含文件名），检查文件路径是否在该目录下
-      if (subscriptionPathWithoutLeadingSlash.endsWith('/')) {
-        const directoryName = subscriptionPathWithoutLeadingSlash.replace(/\/$/, ''); // 移除末尾的斜杠
-        // 检查文件路径是否在订阅目录下
-        if (normalizedFilePath === directoryName ||
-            normalizedFilePath.startsWith(directoryName + '/')) {
-          return true;
-        }
-      } else {
-        // 如果订阅路径不以斜杠结尾，检查是否精确匹配或作为目录前缀
-        if (normalizedFilePath === subscriptionPathWithoutLeadingSlash) {
-          return true; // 精确匹配
-        }
-
-        // 检查文件路径是否在订阅目录下（例如订阅 "rime" 匹配 "rime/filename.txt"）
-        if (normalizedFilePath.startsWith(subscriptionPathWithoutLeadingSlash + '/')) {
-          return true;
-        }
-      }
+    try {
+      client.send(frame, { binary: false });
+      return true;
+    } catch (error) {
+      log.warn(`Error sending notification to client: ${error.message}`);
+      // 如果发送失败，移除该客户端
+      this.unsubscribeAll(client);
+      return false;
     }
-
-    return normalizedFilePath === subscriptionPathWithoutLeadingSlash;
   }
 
-  // 向客户端发送通知
-  notifyClient(client, message) {
-    if (client && client.readyState === 1) { // WebSocket.OPEN
-      try {
-        client.send(JSON.stringify(message));
-        console.log(`[SubscriptionManager] Sent message to client: ${JSON.stringify(message)}`);
-      } catch (error) {
-        console.error('Error sending notification to client:', error.message);
-        // 如果发送失败，移除该客户端
-        this.unsubscribeAll(client);
-      }
-    } else {
-      console.log(`[SubscriptionManager] Cannot send message to client - client not connected or invalid: ${client ? client.readyState : 'null'}`);
+  // 获取（必要时创建）客户端的发送队列
+  getOutboundQueue(client) {
+    let queue = this.outboundQueues.get(client);
+    if (!queue) {
+      queue = new OutboundQueue(client, {
+        highWaterMark: this.outboundHighWaterMark,
+        maxQueueLength: this.outboundMaxQueueLength,
+        onError: (error) => {
+          log.warn(`Error sending notification to client: ${error.message}`);
+          this.unsubscribeAll(client);
+        }
+      });
+      this.outboundQueues.set(client, queue);
     }
+    return queue;
   }
 
   // 客户端订阅特定路径
-  subscribe(client, subscriptionPath) {
+  // options.sinceSeq: 客户端最后收到的事件序列号，订阅成功后补发此后错过且匹配该订阅的事件
+  // options.epoch: 该序列号所属的日志纪元（来自之前的subscriptionConfirmed），不一致时要求重新同步
+  subscribe(client, subscriptionPath, options = {}) {
     // 验证订阅路径
     const validation = this.validateSubscriptionPath(subscriptionPath);
     if (!validation.valid) {
@@ -323,6 +542,16 @@ class SubscriptionManager {
       return false;
     }
 
+    // sinceSeq 只接受非负整数（未提供表示不补发）；其他值传给事件日志会得到错误的补发范围
+    if (options.sinceSeq !== undefined && options.sinceSeq !== null && !isValidSeq(options.sinceSeq)) {
+      this.notifyClient(client, {
+        type: 'subscriptionError',
+        path: subscriptionPath,
+        message: 'Subscription failed: sinceSeq must be a non-negative integer'
+      });
+      return false;
+    }
+
     // 使用规范化后的路径
     const normalizedPath = validation.normalizedPath;
 
@@ -344,10 +573,16 @@ class SubscriptionManager {
         path: normalizedPath,
         message: `Already subscribed to ${normalizedPath}`
       });
+      // 已订阅的客户端也可以带 sinceSeq 再次订阅来补发事件（例如收到 resyncRequired 之后）
+      if (isValidSeq(options.sinceSeq)) {
+        this.replayEvents(client, normalizedPath, options.sinceSeq, options.epoch);
+      }
       return true;
     }
 
     clientSubscriptions.add(normalizedPath);
+    this.subscriptionIndex.add(client, normalizedPath);
+    this.retainWatch(normalizedPath);
 
     // 更新客户端信息
     const clientInfo = this.clientInfo.get(client);
@@ -355,21 +590,60 @@ class SubscriptionManager {
       clientInfo.subscriptionCount = clientSubscriptions.size;
     }
 
-    // 发送确认消息
+    // 发送确认消息（附带当前序列号，供客户端断线重连时使用）
     this.notifyClient(client, {
       type: 'subscriptionConfirmed',
       path: normalizedPath,
-      message: `Successfully subscribed to ${normalizedPath}`
+      message: `Successfully subscribed to ${normalizedPath}`,
+      epoch: this.eventLog.epoch,
+      lastSeq: this.eventLog.lastSeq
     });
 
+    if (isValidSeq(options.sinceSeq)) {
+      this.replayEvents(client, normalizedPath, options.sinceSeq, options.epoch);
+    }
+
     return true;
   }
 
+  // 补发 sinceSeq 之后匹配该订阅的事件；日志已无法覆盖时发送 resyncRequired
+  replayEvents(client, subscriptionPath, sinceSeq, epoch) {
+    const missed = (epoch === undefined || epoch === this.eventLog.epoch) ? this.eventLog.since(sinceSeq) : null;
+    if (missed === null) {
+      this.notifyClient(client, {
+        type: 'resyncRequired',
+        reason: 'historyUnavailable',
+        path: subscriptionPath,
+        epoch: this.eventLog.epoch,
+        lastSeq: this.eventLog.lastSeq,
+        timestamp: new Date().toISOString()
+      });
+      return 0;
+    }
+
+    const queue = this.getOutboundQueue(client);
+    let replayed = 0;
+    for (const event of missed) {
+      if (isPathMatch(event.path, subscriptionPath) ||
+          (event.fromPath !== undefined && isPathMatch(event.fromPath, subscriptionPath))) {
+        queue.push(Buffer.from(JSON.stringify(event)), event.path, event.seq);
+        replayed++;
+      }
+    }
+    this.performanceMetrics.totalEventsReplayed += replayed;
+    log.info(`Replayed ${replayed} of ${missed.length} missed events for ${subscriptionPath} since seq ${sinceSeq}`);
+    return replayed;
+  }
+
   // 客户端取消订阅特定路径
   unsubscribe(client, subscriptionPath) {
     if (this.subscriptions.has(client)) {
       const clientSubscriptions = this.subscriptions.get(client);
       const success = clientSubscriptions.delete(subscriptionPath);
+      if (success) {
+        this.subscriptionIndex.remove(client, subscriptionPath);
+        this.releaseWatch(subscriptionPath);
+      }
 
       // 更新客户端信息
       const clientInfo = this.clientInfo.get(client);
@@ -381,6 +655,7 @@ class SubscriptionManager {
       if (clientSubscriptions.size === 0) {
         this.subscriptions.delete(client);
         this.clientInfo.delete(client);
+        this.removeOutboundQueue(client);
       }
 
       if (success) {
@@ -408,9 +683,22 @@ class SubscriptionManager {
   // 客户端取消所有订阅
   unsubscribeAll(client) {
     if (this.subscriptions.has(client)) {
+      const clientSubscriptions = this.subscriptions.get(client);
+      this.subscriptionIndex.removeClient(client, clientSubscriptions);
+      clientSubscriptions.forEach(subscriptionPath => this.releaseWatch(subscriptionPath));
       this.subscriptions.delete(client);
       this.clientInfo.delete(client);
     }
+    this.removeOutboundQueue(client);
+  }
+
+  // 关闭并移除客户端的发送队列，积压的帧随之丢弃
+  removeOutboundQueue(client) {
+    const queue = this.outboundQueues.get(client);
+    if (queue) {
+      queue.close();
+      this.outboundQueues.delete(client);
+    }
   }
 
   // 获取客户端的所有订阅
@@ -423,19 +711,56 @@ class SubscriptionManager {
 
   // 获取客户端信息
   getClientInfo(client) {
-    return this.clientInfo.get(client) || null;
+    const info = this.clientInfo.get(client);
+    if (!info) {
+      return null;
+    }
+    const queue = this.outboundQueues.get(client);
+    return {
+      ...info,
+      outbound: queue ? queue.getStats() : null
+    };
   }
 
   // 获取性能指标
   getPerformanceMetrics() {
     return {
       ...this.performanceMetrics,
+      pid: process.pid,
+      role: this.upstream ? 'worker' : 'primary',
       uptime: Date.now() - this.performanceMetrics.startTime,
+      eventCoalescing: this.eventCoalescer.getStats(),
+      changeJournal: this.changeJournal.getStats(),
+      outboundQueues: this.getOutboundQueueMetrics(),
+      eventLog: this.eventLog.getStats(),
+      watcher: this.fileWatcher ? this.fileWatcher.getStats() : null,
       activeSubscriptions: this.getActiveSubscriptionCount(),
       activeClients: this.getActiveClientCount()
     };
   }
 
+  // 汇总所有客户端发送队列的状态
+  getOutboundQueueMetrics() {
+    const totals = {
+      queuedFrames: 0,
+      framesDropped: 0,
+      resyncsSent: 0,
+      congestedClients: 0,
+      highWaterMark: this.outboundHighWaterMark,
+      maxQueueLength: this.outboundMaxQueueLength
+    };
+    for (const queue of this.outboundQueues.values()) {
+      const stats = queue.getStats();
+      totals.queuedFrames += stats.queueDepth;
+      totals.framesDropped += stats.framesDropped;
+      totals.resyncsSent += stats.resyncsSent;
+      if (stats.queueDepth > 0 || stats.resyncPending) {
+        totals.congestedClients++;
+      }
+    }
+    return totals;
+  }
+
   // 获取活跃订阅数量
   getActiveSubscriptionCount() {
     let count = 0;
@@ -452,8 +777,10 @@ class SubscriptionManager {
 
   // 关闭监视器
   close() {
-    if (this.watcher) {
-      this.watcher.close();
+    this.eventCoalescer.close();
+    this.eventLog.close();
+    if (this.fileWatcher) {
+      this.fileWatcher.close();
     }
   }
 }
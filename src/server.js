@@ -6,8 +6,12 @@ const path = require("path");
 const cors = require("cors");
 const helmet = require("helmet");
 require("dotenv").config();
-const { basicAuthMiddleware } = require("./config/auth");
+const { authenticator, basicAuthMiddleware, BUSY_RETRY_AFTER_SECONDS } = require("./config/auth");
 const SubscriptionManager = require('./modules/subscriptions');
+const { WorkerUpstream } = require('./modules/clusterBus');
+const { createContentHashIndex } = require('./modules/contentHashIndex');
+const { createLogger } = require('./modules/logger');
+const { getDefaultRegistry, monitorEventLoopLag } = require('./modules/metrics');
 
 // 配置
 const PORT = process.env.PORT || 3000;
@@ -21,9 +25,14 @@ const HTTP_RETRY_DELAY_MS = parseInt(process.env.HTTP_RETRY_DELAY_MS) || 2000; /
 const HTTP_IDLE_CONN_TIMEOUT = parseInt(process.env.HTTP_IDLE_CONN_TIMEOUT) || 120; // 空闲连接超时
 const HTTP_MAX_IDLE_CONNS = parseInt(process.env.HTTP_MAX_IDLE_CONNS) || 100; // 最大空闲连接数
 const HTTP_MAX_IDLE_CONNS_PER_HOST = parseInt(process.env.HTTP_MAX_IDLE_CONNS_PER_HOST) || 10; // 每个主机的最大空闲连接数
-const FS_SYNC_ON_CLOSE = process.env.FS_SYNC_ON_CLOSE === 'true'; // 关闭时同步文件
-const FS_READ_AHEAD = process.env.FS_READ_AHEAD || '128M'; // 设置读取预加载
-const FS_BUFFER_MULTIPLE = parseInt(process.env.FS_BUFFER_MULTIPLE) || 4; // 缓冲区倍数
+// 由 clusterServer.js 启动的工作进程：文件监视器在主进程中，文件事件经IPC接收
+const IS_CLUSTER_WORKER = process.env.SDAV_CLUSTER_WORKER === 'true' && typeof process.send === 'function';
+// 日志（LOG_LEVEL、LOG_FORMAT等）见 ./modules/logger.js；每条WebSocket消息和pong只在debug/trace级别记录
+const log = createLogger('Server');
+// Prometheus文本格式指标的路径（经过与其他请求相同的认证）；放在/_sdav下，不会遮住上传目录中名为metrics的文件
+const METRICS_PATH = process.env.METRICS_PATH || '/_sdav/metrics';
+const metricsRegistry = getDefaultRegistry();
+// 文件系统读写配置（FS_SYNC_ON_CLOSE、FS_READ_AHEAD、FS_BUFFER_MULTIPLE、WEBDAV_READ_BUFFER_SIZE）见 ./config/storage.js
 
 // 确保上传目录存在
 const absoluteUploadDir = path.resolve(ENV_UPLOAD_DIR);
@@ -31,14 +40,42 @@ fs.ensureDirSync(absoluteUploadDir);
 
 // 传递UPLOAD_DIR给控制器
 const webdavController = require("./controllers/webdavController");
-const { integrateWithExpress, setUploadDir, setSubscriptionManager } = webdavController;
+const { integrateWithExpress, setUploadDir, setSubscriptionManager, setContentHashIndex } = webdavController;
 // 设置UPLOAD_DIR
 setUploadDir(absoluteUploadDir);
 
 const app = express();
 const server = http.createServer(app);
+// WebSocket消息压缩（permessage-deflate）：文件变更通知的JSON高度重复，保留压缩上下文时压缩效果很好
+// 使用较低的压缩级别和较小的窗口，限制每个连接的内存和CPU开销；小于阈值的消息不压缩
+const WS_PERMESSAGE_DEFLATE = process.env.WS_PERMESSAGE_DEFLATE !== 'false';
+const WS_DEFLATE_THRESHOLD = parseInt(process.env.WS_DEFLATE_THRESHOLD) || 128; // 通知帧平均约240字节，保留上下文时仍能压缩到约30字节（见bench/compression.bench.js）
 // 创建WebSocket服务器并将其附加到同一个HTTP服务器
-const wss = new WebSocket.Server({ server });
+const wss = new WebSocket.Server({
+  server,
+  // 连接时携带的 Authorization 头在握手阶段验证（凭据文件用户的哈希计算是异步的），结果记录在请求上
+  verifyClient: (info, done) => {
+    if (!info.req.headers.authorization) {
+      done(true);
+      return;
+    }
+    authenticator.verify(info.req.headers.authorization, (username, busy) => {
+      if (busy) {
+        done(false, 503, 'Service Unavailable', { 'Retry-After': String(BUSY_RETRY_AFTER_SECONDS) });
+        return;
+      }
+      info.req.sdavUser = username;
+      done(true);
+    });
+  },
+  perMessageDeflate: WS_PERMESSAGE_DEFLATE ? {
+    zlibDeflateOptions: { level: 3, memLevel: 7 },
+    serverMaxWindowBits: 10,
+    clientNoContextTakeover: true,
+    concurrencyLimit: 10,
+    threshold: WS_DEFLATE_THRESHOLD
+  } : false
+});
 
 // 中间件
 app.use(helmet());
@@ -46,17 +83,13 @@ app.use(cors());
 app.use(express.json());
 app.use(express.urlencoded({ extended: true }));
 
-// 使用身份验证中间件 - 但需要特殊处理WebDAV请求
-app.use((req, res, next) => {
-  // 检查是否是WebDAV请求
-  const webdavMethods = ['PROPFIND', 'PROPPATCH', 'MKCOL', 'COPY', 'MOVE', 'LOCK', 'UNLOCK', 'PUT', 'DELETE', 'GET', 'HEAD'];
-  if (webdavMethods.includes(req.method.toUpperCase())) {
-    // 对WebDAV请求应用基本认证
-    basicAuthMiddleware(req, res, next);
-  } else {
-    // 对非WebDAV请求也应用认证
-    basicAuthMiddleware(req, res, next);
-  }
+// 所有请求（WebDAV和运行指标）都需要认证
+app.use(basicAuthMiddleware);
+
+// 运行指标（直方图、连接和订阅状态、事件循环延迟），与WebSocket getMetrics消息的instrumentation字段是同一份数据
+app.get(METRICS_PATH, (req, res) => {
+  res.setHeader('Content-Type', 'text/plain; version=0.0.4; charset=utf-8');
+  res.send(metricsRegistry.toPrometheus());
 });
 
 // 初始化WebDAV服务器
@@ -88,13 +121,44 @@ app.use((req, res) => {
   }
 });
 
-// 由于我们使用单个实例的fork模式，直接初始化完整的订阅管理器
-subscriptionManager = new SubscriptionManager(absoluteUploadDir);
-console.log(`[${new Date().toISOString()}] Subscription manager initialized in process ${process.pid}`);
+// 单进程模式下由本进程监视文件；集群工作进程只匹配和推送主进程广播的事件
+subscriptionManager = new SubscriptionManager(absoluteUploadDir, IS_CLUSTER_WORKER ? { upstream: new WorkerUpstream() } : {});
+log.info(`Subscription manager initialized in ${IS_CLUSTER_WORKER ? 'cluster worker' : 'standalone'} process ${process.pid}`);
 
 // 设置订阅管理器到WebDAV控制器
 setSubscriptionManager(subscriptionManager);
 
+// 导出时采集的测量值和计数
+let openSockets = 0;
+metricsRegistry.gauge('http_open_sockets', 'Open HTTP connections, including upgraded WebSockets', () => openSockets);
+metricsRegistry.gauge('ws_clients', 'Connected WebSocket clients', () => wss.clients.size);
+metricsRegistry.gauge('ws_buffered_bytes', 'Bytes waiting in WebSocket send buffers (sum of bufferedAmount)', () => {
+  let total = 0;
+  for (const client of wss.clients) {
+    total += client.bufferedAmount;
+  }
+  return total;
+});
+metricsRegistry.gauge('ws_queued_frames', 'Notifications queued for congested WebSocket clients', () => subscriptionManager.getOutboundQueueMetrics().queuedFrames);
+metricsRegistry.gauge('subscriptions', 'Active subscriptions', () => subscriptionManager.getActiveSubscriptionCount());
+metricsRegistry.gauge('subscribed_clients', 'Clients with at least one subscription', () => subscriptionManager.getActiveClientCount());
+metricsRegistry.counter('file_events_total', 'File events handled', () => subscriptionManager.performanceMetrics.totalFileEvents);
+metricsRegistry.counter('notifications_sent_total', 'Notifications queued to clients', () => subscriptionManager.performanceMetrics.totalNotificationsSent);
+metricsRegistry.counter('auth_cache_hits_total', 'Requests authenticated from the verified-credential cache', () => authenticator.stats.cacheHits);
+metricsRegistry.counter('auth_failures_total', 'Rejected or missing credentials', () => authenticator.stats.failures);
+metricsRegistry.counter('auth_busy_total', 'Credential checks deferred because too many hashes were in flight', () => authenticator.stats.rejectedBusy);
+metricsRegistry.gauge('process_resident_memory_bytes', 'Resident set size of this process', () => process.memoryUsage.rss());
+monitorEventLoopLag(metricsRegistry);
+
+// 内容哈希索引：单进程模式下由本进程在工作线程中计算，集群工作进程持有主进程索引的副本
+const contentHashIndex = createContentHashIndex(subscriptionManager);
+if (contentHashIndex) {
+  setContentHashIndex(contentHashIndex);
+}
+
+// 认证进行中每个连接最多暂存的消息数
+const MAX_DEFERRED_MESSAGES = 100;
+
 // 增强WebSocket日志记录
 wss.on("connection", (ws, req) => {
   const clientId = `client_${Date.now()}_${Math.random().toString(36).substr(2, 9)}`;
@@ -102,13 +166,13 @@ wss.on("connection", (ws, req) => {
   // 为每个连接维护认证状态
   let isAuthenticated = false;
 
-  // 检查请求头中的认证信息（可选，仍可接受连接时认证）
-  const authHeader = req.headers.authorization;
-  if (authHeader && isValidAuth(authHeader)) {
+  // 检查请求头中的认证信息（握手时已验证，可选，仍可接受连接时认证）
+  const authenticatedByHeader = Boolean(req.sdavUser);
+  if (authenticatedByHeader) {
     isAuthenticated = true;
-    console.log(`[${new Date().toISOString()}] New WebSocket client [${clientId}] connected with authentication from ${req.socket.remoteAddress}`);
+    log.info(`New WebSocket client [${clientId}] connected with authentication from ${req.socket.remoteAddress}`);
   } else {
-    console.log(`[${new Date().toISOString()}] New WebSocket client [${clientId}] connected without authentication from ${req.socket.remoteAddress}`);
+    log.info(`New WebSocket client [${clientId}] connected without authentication from ${req.socket.remoteAddress}`);
     // 发送需要认证的消息
     ws.send(JSON.stringify({
       type: "auth_required",
@@ -130,13 +194,18 @@ wss.on("connection", (ws, req) => {
   // 标记是否已经发送过认证成功的消息，防止重复发送
   let hasSentAuthSuccess = false;
 
+  // 凭据文件用户的验证是异步的：验证完成前到达的消息（例如紧跟在authenticate之后的subscribe）
+  // 先暂存，验证完成后按顺序处理，而不是以未认证拒绝
+  let authPending = false;
+  const deferredMessages = [];
+
   // WebSocket心跳机制
   ws.isAlive = true;
 
   // 设置定时器，定期发送ping消息
   const heartbeatInterval = setInterval(() => {
     if (ws.isAlive === false) {
-      console.log(`[${new Date().toISOString()}] Client [${clientId}] heartbeat timeout, terminating connection`);
+      log.info(`Client [${clientId}] heartbeat timeout, terminating connection`);
       ws.terminate();
       subscriptionManager.unsubscribeAll(ws);
       return;
@@ -146,7 +215,7 @@ wss.on("connection", (ws, req) => {
     try {
       ws.ping();
     } catch (e) {
-      console.error(`[${new Date().toISOString()}] Error sending ping to client [${clientId}]:`, e.message);
+      log.warn(`Error sending ping to client [${clientId}]: ${e.message}`);
       ws.terminate();
       subscriptionManager.unsubscribeAll(ws);
     }
@@ -155,11 +224,11 @@ wss.on("connection", (ws, req) => {
   // 监听pong消息，重置alive标志
   ws.on('pong', () => {
     ws.isAlive = true;
-    console.log(`[${new Date().toISOString()}] Received pong from client [${clientId}], connection alive`);
+    log.trace(() => `Received pong from client [${clientId}], connection alive`);
   });
 
-  ws.on("message", (message) => {
-    console.log(`[${new Date().toISOString()}] Received message from client [${clientId}]: ${message.toString()}`);
+  const handleMessage = (message) => {
+    log.debug(() => `Received message from client [${clientId}]: ${message.toString()}`);
 
     // 解析消息并响应
     try {
@@ -169,32 +238,48 @@ wss.on("connection", (ws, req) => {
       if (parsedMessage.type === "authenticate") {
         const { username, password } = parsedMessage;
         if (username && password) {
-          // 创建基本认证头部字符串并验证
+          // 创建基本认证头部字符串并验证（与HTTP请求共用已验证凭据缓存）
           const credentials = Buffer.from(`${username}:${password}`).toString('base64');
-          const authString = `Basic ${credentials}`;
-          if (isValidAuth(authString)) {
-            isAuthenticated = true;
-            ws.send(JSON.stringify({
-              type: "auth_success",
-              message: "Authentication successful"
-            }));
-            hasSentAuthSuccess = true;
-            console.log(`[${new Date().toISOString()}] Client [${clientId}] authenticated successfully`);
-
-            // 认证成功后发送欢迎消息（仅在之前未发送的情况下）
-            if (!authHeader || !isValidAuth(authHeader)) {
+          authPending = true;
+          authenticator.verify(`Basic ${credentials}`, (verifiedUser, busy) => {
+            authPending = false;
+            if (ws.readyState !== WebSocket.OPEN) {
+              deferredMessages.length = 0;
+              return;
+            }
+            if (busy) {
+              // 凭据尚未验证（不是认证失败），客户端应稍后重新发送authenticate
+              ws.send(JSON.stringify({
+                type: "auth_busy",
+                message: "Authentication is busy, please retry",
+                retryAfter: BUSY_RETRY_AFTER_SECONDS
+              }));
+              log.warn(`Client [${clientId}] authentication deferred: server busy`);
+            } else if (verifiedUser !== null) {
+              isAuthenticated = true;
               ws.send(JSON.stringify({
-                type: "connected",
-                message: "Successfully connected to SDAV WebSocket server"
+                type: "auth_success",
+                message: "Authentication successful"
               }));
+              hasSentAuthSuccess = true;
+              log.info(`Client [${clientId}] authenticated successfully`);
+
+              // 认证成功后发送欢迎消息（仅在之前未发送的情况下）
+              if (!authenticatedByHeader) {
+                ws.send(JSON.stringify({
+                  type: "connected",
+                  message: "Successfully connected to SDAV WebSocket server"
+                }));
+              }
+            } else {
+              ws.send(JSON.stringify({
+                type: "auth_failed",
+                message: "Authentication failed"
+              }));
+              log.warn(`Client [${clientId}] authentication failed`);
             }
-          } else {
-            ws.send(JSON.stringify({
-              type: "auth_failed",
-              message: "Authentication failed"
-            }));
-            console.log(`[${new Date().toISOString()}] Client [${clientId}] authentication failed`);
-          }
+            processDeferredMessages();
+          });
         } else {
           ws.send(JSON.stringify({
             type: "auth_error",
@@ -211,9 +296,12 @@ wss.on("connection", (ws, req) => {
       } else if (parsedMessage.type === "subscribe") {
         // 客户端订阅特定路径的更新
         const subscriptionPath = parsedMessage.path || "/";
-        const success = subscriptionManager.subscribe(ws, subscriptionPath);
+        const success = subscriptionManager.subscribe(ws, subscriptionPath, {
+          sinceSeq: parsedMessage.sinceSeq,
+          epoch: parsedMessage.epoch
+        });
         if (success) {
-          console.log(`[${new Date().toISOString()}] Client [${clientId}] subscribed to: ${subscriptionPath}`);
+          log.info(`Client [${clientId}] subscribed to: ${subscriptionPath}`);
         } else {
           // 订阅失败时发送错误消息
           ws.send(JSON.stringify({
@@ -227,7 +315,7 @@ wss.on("connection", (ws, req) => {
         if (subscriptionPath) {
           const success = subscriptionManager.unsubscribe(ws, subscriptionPath);
           if (success) {
-            console.log(`[${new Date().toISOString()}] Client [${clientId}] unsubscribed from: ${subscriptionPath}`);
+            log.info(`Client [${clientId}] unsubscribed from: ${subscriptionPath}`);
           } else {
             // 取消订阅失败时发送错误消息
             ws.send(JSON.stringify({
@@ -239,15 +327,19 @@ wss.on("connection", (ws, req) => {
       } else if (parsedMessage.type === "getSubscriptions") {
         // 客户端获取其所有订阅
         const clientSubscriptions = subscriptionManager.getClientSubscriptions(ws);
-        console.log(`[${new Date().toISOString()}] Client [${clientId}] requested subscriptions list (${clientSubscriptions.length} subscriptions)`);
+        log.debug(`Client [${clientId}] requested subscriptions list (${clientSubscriptions.length} subscriptions)`);
         ws.send(JSON.stringify({
           type: "subscriptionsList",
           subscriptions: clientSubscriptions
         }));
       } else if (parsedMessage.type === "getMetrics") {
         // 客户端请求性能指标
-        const metrics = subscriptionManager.getPerformanceMetrics();
-        console.log(`[${new Date().toISOString()}] Client [${clientId}] requested performance metrics`);
+        const metrics = {
+          ...subscriptionManager.getPerformanceMetrics(),
+          webdav: webdavController.getMetrics(),
+          instrumentation: metricsRegistry.snapshot()
+        };
+        log.debug(`Client [${clientId}] requested performance metrics`);
         ws.send(JSON.stringify({
           type: "metrics",
           metrics: metrics
@@ -255,24 +347,46 @@ wss.on("connection", (ws, req) => {
       } else if (parsedMessage.type === "getClientInfo") {
         // 客户端请求自身信息
         const clientInfo = subscriptionManager.getClientInfo(ws);
-        console.log(`[${new Date().toISOString()}] Client [${clientId}] requested client info`);
+        log.debug(`Client [${clientId}] requested client info`);
         ws.send(JSON.stringify({
           type: "clientInfo",
           clientInfo: clientInfo
         }));
       }
     } catch (e) {
-      console.error(`[${new Date().toISOString()}] Error parsing WebSocket message from client [${clientId}]:`, e.message);
+      log.warn(`Error parsing WebSocket message from client [${clientId}]: ${e.message}`);
       // 发送格式错误消息
       ws.send(JSON.stringify({
         type: "error",
         message: "Invalid message format. Please send a valid JSON message."
       }));
     }
+  };
+
+  // 处理认证期间暂存的消息；其中再次出现authenticate时，其后的消息继续等待该次验证
+  const processDeferredMessages = () => {
+    while (!authPending && deferredMessages.length > 0) {
+      handleMessage(deferredMessages.shift());
+    }
+  };
+
+  ws.on("message", (message) => {
+    if (authPending) {
+      if (deferredMessages.length >= MAX_DEFERRED_MESSAGES) {
+        ws.send(JSON.stringify({
+          type: "error",
+          message: "Too many messages while authenticating"
+        }));
+        return;
+      }
+      deferredMessages.push(message);
+      return;
+    }
+    handleMessage(message);
   });
 
   ws.on("close", () => {
-    console.log(`[${new Date().toISOString()}] WebSocket client [${clientId}] disconnected`);
+    log.info(`WebSocket client [${clientId}] disconnected`);
     clearInterval(heartbeatInterval); // 清除心跳定时器
     subscriptionManager.unsubscribeAll(ws);
   });
@@ -281,31 +395,15 @@ wss.on("connection", (ws, req) => {
   ws.on("error", (error) => {
     // 忽略连接重置错误，这些是正常的网络状况
     if (error.code === 'ECONNRESET' || error.code === 'EPIPE') {
-      console.log(`[${new Date().toISOString()}] Client [${clientId}] connection reset:`, error.message);
+      log.info(`Client [${clientId}] connection reset: ${error.message}`);
     } else {
-      console.error(`[${new Date().toISOString()}] WebSocket error for client [${clientId}]:`, error.message);
+      log.error(`WebSocket error for client [${clientId}]: ${error.message}`);
     }
     clearInterval(heartbeatInterval); // 清除心跳定时器
     subscriptionManager.unsubscribeAll(ws);
   });
 });
 
-// 验证认证头的辅助函数
-function isValidAuth(authHeader) {
-  const USERNAME = process.env.USERNAME || "admin";
-  const PASSWORD = process.env.PASSWORD || "password";
-
-  if (!authHeader || !authHeader.startsWith('Basic ')) {
-    return false;
-  }
-
-  const base64Credentials = authHeader.split(' ')[1];
-  const credentials = Buffer.from(base64Credentials, 'base64').toString('ascii');
-  const [username, password] = credentials.split(':');
-
-  return username === USERNAME && password === PASSWORD;
-}
-
 // 将subscriptionManager暴露到全局，以便控制器可以访问
 global.subscriptionManager = subscriptionManager;
 
@@ -321,6 +419,9 @@ server.maxHeadersCount = 200; // 增加最大头部数量以支持rclone的复
 
 // 针对大文件下载优化TCP设置
 server.on('connection', (socket) => {
+  openSockets++;
+  socket.once('close', () => openSockets--);
+
   // 启用TCP_NODELAY以减少延迟
   socket.setNoDelay(true);
 
@@ -334,7 +435,7 @@ server.on('connection', (socket) => {
   socket.on('error', (err) => {
     // 忽略连接重置错误，这些是正常的网络状况
     if (err.code !== 'ECONNRESET' && err.code !== 'EPIPE') {
-      console.error('Socket error:', err);
+      log.error('Socket error', { error: err });
     }
   });
 });
@@ -343,16 +444,28 @@ server.on('connection', (socket) => {
 // 注意：Express本身不直接支持这些选项，但我们可以通过底层HTTP服务器设置它们
 // 这些设置主要影响Node.js的HTTP客户端行为，对于服务器端接收连接也有帮助
 
+// 带 Expect: 100-continue 且声明了内容哈希的PUT先不发送100 Continue：
+// 服务器已有相同内容时直接完成上传，客户端无需发送请求体（去重上传，见webdavController）
+server.on('checkContinue', (req, res) => {
+  if (req.method === 'PUT' && req.headers['x-sdav-content-sha256']) {
+    req.sdavAwaitingContinue = true;
+  } else {
+    res.writeContinue();
+  }
+  server.emit('request', req, res);
+});
+
 // 启动服务器
 server.listen({ port: PORT, host: HOST }, () => {
-  console.log(`[${new Date().toISOString()}] SDAV server running at http://${HOST}:${PORT}/`);
-  console.log(`[${new Date().toISOString()}] Upload directory: ${ENV_UPLOAD_DIR}`);
-  console.log(`[${new Date().toISOString()}] Server timeout settings - timeout: ${TIMEOUT}ms, keepAliveTimeout: ${server.keepAliveTimeout}ms`);
+  log.info(`SDAV server running at http://${HOST}:${PORT}/`);
+  log.info(`Upload directory: ${ENV_UPLOAD_DIR}`);
+  log.info(`Server timeout settings - timeout: ${TIMEOUT}ms, keepAliveTimeout: ${server.keepAliveTimeout}ms`);
 
   // 定期输出性能指标
   setInterval(() => {
     const metrics = subscriptionManager.getPerformanceMetrics();
-    console.log(`[${new Date().toISOString()}] Performance Metrics - Events: ${metrics.totalFileEvents}, Notifications: ${metrics.totalNotificationsSent}, Matches: ${metrics.totalMatchesFound}, Active Clients: ${metrics.activeClients}, Active Subscriptions: ${metrics.activeSubscriptions}`);
+    const cacheStats = webdavController.getMetrics().metadataCache;
+    log.info(`Performance Metrics [${process.pid}] - Events: ${metrics.totalFileEvents}, Coalesced: ${metrics.eventCoalescing.eventsAbsorbed}, Notifications: ${metrics.totalNotificationsSent}, Matches: ${metrics.totalMatchesFound}, Active Clients: ${metrics.activeClients}, Active Subscriptions: ${metrics.activeSubscriptions}, Metadata Cache Hit Rate: ${cacheStats.hitRate}`);
   }, 30000); // 每30秒输出一次
 });
 
@@ -0,0 +1,46 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { Readable } = require('stream');
+const { writeFileAtomic, isTempFileName } = require('../src/modules/atomicWrite');
+
+const withTempDir = async (fn) => {
+  const root = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-atomic-'));
+  try {
+    await fn(root);
+  } finally {
+    fs.rmSync(root, { recursive: true, force: true });
+  }
+};
+
+test('writeFileAtomic replaces the target only once the stream completes', () => withTempDir(async (root) => {
+  const target = path.join(root, 'a.txt');
+  fs.writeFileSync(target, 'old');
+  const inode = fs.statSync(target).ino;
+
+  await writeFileAtomic(target, Readable.from([Buffer.from('new '), Buffer.from('content')]), { fsync: true });
+  assert.strictEqual(fs.readFileSync(target, 'utf8'), 'new content');
+  assert.notStrictEqual(fs.statSync(target).ino, inode);
+  assert.deepStrictEqual(fs.readdirSync(root), ['a.txt']);
+}));
+
+test('writeFileAtomic leaves the target untouched when the upload is aborted', () => withTempDir(async (root) => {
+  const target = path.join(root, 'a.txt');
+  fs.writeFileSync(target, 'old');
+
+  const source = new Readable({ read() {} });
+  source.push('partial');
+  setImmediate(() => source.destroy(new Error('client went away')));
+
+  await assert.rejects(writeFileAtomic(target, source), /client went away/);
+  assert.strictEqual(fs.readFileSync(target, 'utf8'), 'old');
+  assert.deepStrictEqual(fs.readdirSync(root), ['a.txt']);
+}));
+
+test('isTempFileName recognises in-progress upload files', () => {
+  assert.strictEqual(isTempFileName('.movie.mp4.sdav-0123456789ab.tmp'), true);
+  assert.strictEqual(isTempFileName('movie.mp4'), false);
+  assert.strictEqual(isTempFileName('.hidden.tmp'), false);
+});
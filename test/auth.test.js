@@ -0,0 +1,102 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { Authenticator, parseBasicAuth, hashPassword, loadCredentialFile } = require('../src/modules/auth');
+
+const basic = (username, password) => `Basic ${Buffer.from(`${username}:${password}`).toString('base64')}`;
+
+// 测试中使用较小的scrypt参数
+const FAST_SCRYPT = { N: 1024, r: 8, p: 1 };
+
+// 由密码生成凭据文件中一行对应的验证参数
+const loadVerifier = (password) => {
+  const dir = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-auth-'));
+  try {
+    fs.writeFileSync(path.join(dir, 'users'), `user:${hashPassword(password, FAST_SCRYPT)}\n`);
+    return loadCredentialFile(path.join(dir, 'users')).get('user');
+  } finally {
+    fs.rmSync(dir, { recursive: true, force: true });
+  }
+};
+
+test('parseBasicAuth splits on the first colon and rejects other schemes', () => {
+  assert.deepStrictEqual(parseBasicAuth(basic('admin', 'pa:ss')), { username: 'admin', password: 'pa:ss' });
+  assert.deepStrictEqual(parseBasicAuth(`basic  ${Buffer.from('u:').toString('base64')}`), { username: 'u', password: '' });
+  assert.strictEqual(parseBasicAuth('Bearer abc'), null);
+  assert.strictEqual(parseBasicAuth(`Basic ${Buffer.from('nocolon').toString('base64')}`), null);
+  assert.strictEqual(parseBasicAuth(undefined), null);
+});
+
+test('Authenticator caches verified headers in a bounded cache', () => {
+  const authenticator = new Authenticator({ users: { admin: 'secret' }, cacheSize: 2 });
+  const results = [];
+  const header = basic('admin', 'secret');
+  authenticator.verify(header, user => results.push(user));
+  authenticator.verify(header, user => results.push(user));
+  authenticator.verify(basic('admin', 'wrong'), user => results.push(user));
+  authenticator.verify(basic('nobody', 'secret'), user => results.push(user));
+  authenticator.verify(undefined, user => results.push(user));
+  // 明文用户同步回调
+  assert.deepStrictEqual(results, ['admin', 'admin', null, null, null]);
+  assert.strictEqual(authenticator.stats.cacheHits, 1);
+  assert.strictEqual(authenticator.stats.failures, 3);
+  assert.strictEqual(authenticator.cache.size, 1); // 失败的凭据不缓存
+
+  // 同一个用户的不同头（例如 "basic" 小写）分别缓存，超出上限时淘汰最早的
+  authenticator.verify(`basic ${header.slice(6)}`, () => {});
+  authenticator.verify(` Basic ${header.slice(6)}`, () => {});
+  assert.strictEqual(authenticator.cache.size, 2);
+  assert.strictEqual(authenticator.cache.has(header), false);
+});
+
+test('Authenticator verifies users from a hashed credential file once per header', async () => {
+  const dir = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-auth-'));
+  const filePath = path.join(dir, 'users');
+  try {
+    fs.writeFileSync(filePath, [
+      '# SDAV users',
+      `alice:${hashPassword('wonderland', FAST_SCRYPT)}`,
+      '',
+      `bob:${hashPassword('builder:42', FAST_SCRYPT)}`
+    ].join('\n'));
+    const authenticator = new Authenticator({ hashedUsers: loadCredentialFile(filePath) });
+
+    // 同时到达的相同头只计算一次哈希
+    const header = basic('alice', 'wonderland');
+    const concurrent = await Promise.all([authenticator.authenticate(header), authenticator.authenticate(header)]);
+    assert.deepStrictEqual(concurrent, ['alice', 'alice']);
+    assert.strictEqual(authenticator.stats.hashComputations, 1);
+
+    assert.strictEqual(await authenticator.authenticate(header), 'alice');
+    assert.strictEqual(authenticator.stats.hashComputations, 1); // 命中缓存
+    assert.strictEqual(await authenticator.authenticate(basic('bob', 'builder:42')), 'bob');
+    assert.strictEqual(await authenticator.authenticate(basic('bob', 'builder')), null);
+    // 不存在的用户同样计算一次哈希
+    assert.strictEqual(await authenticator.authenticate(basic('mallory', 'wonderland')), null);
+    assert.strictEqual(authenticator.stats.hashComputations, 4);
+    assert.strictEqual(authenticator.getStats().users, 2);
+
+    fs.writeFileSync(filePath, 'carol:not-a-hash\n');
+    assert.throws(() => loadCredentialFile(filePath), /users:1/);
+  } finally {
+    fs.rmSync(dir, { recursive: true, force: true });
+  }
+});
+
+test('Authenticator reports busy instead of failing when too many hashes are in flight', async () => {
+  const hashedUsers = new Map([['alice', loadVerifier('wonderland')], ['bob', loadVerifier('builder')]]);
+  const authenticator = new Authenticator({ hashedUsers, maxPending: 1 });
+  const first = authenticator.authenticate(basic('alice', 'wonderland'));
+  const results = [];
+  authenticator.verify(basic('bob', 'builder'), (user, busy) => results.push([user, busy]));
+  assert.deepStrictEqual(results, [[null, true]]);
+  assert.strictEqual(authenticator.stats.rejectedBusy, 1);
+  assert.strictEqual(authenticator.stats.failures, 0);
+
+  assert.strictEqual(await first, 'alice');
+  // 计算完成后重试即可通过
+  assert.strictEqual(await authenticator.authenticate(basic('bob', 'builder')), 'bob');
+  assert.strictEqual(authenticator.stats.failures, 0);
+});
@@ -0,0 +1,78 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const { EventLog } = require('../src/modules/eventLog');
+const { encodeSyncToken, decodeSyncToken, collectChanges } = require('../src/modules/changeFeed');
+
+const createLog = (events) => {
+  const eventLog = new EventLog({ capacity: 100 });
+  events.forEach(event => eventLog.append({ type: 'fileChange', size: 0, ...event }));
+  return eventLog;
+};
+
+const paths = (entries) => entries.map(entry => entry.path).sort();
+
+test('sync tokens round-trip and reject garbage', () => {
+  const token = encodeSyncToken('a1b2c3', 42);
+  assert.deepStrictEqual(decodeSyncToken(token), { epoch: 'a1b2c3', seq: 42 });
+  assert.strictEqual(decodeSyncToken('not-a-token'), null);
+  assert.strictEqual(decodeSyncToken(undefined), null);
+});
+
+test('collectChanges collapses events per path into added, changed and removed', () => {
+  const eventLog = createLog([
+    { eventType: 'created', path: 'docs/old.txt' } // 令牌之前
+  ]);
+  const sinceSeq = eventLog.lastSeq;
+  [
+    { eventType: 'created', path: 'docs/new.txt', size: 3 },
+    { eventType: 'updated', path: 'docs/new.txt', size: 5 },
+    { eventType: 'updated', path: 'docs/old.txt', size: 7 },
+    { eventType: 'created', path: 'docs/tmp.txt' },
+    { eventType: 'deleted', path: 'docs/tmp.txt' },
+    { eventType: 'created', path: 'photos/a.jpg' },
+    { eventType: 'deleted', path: 'docs/gone.txt' }
+  ].forEach(event => eventLog.append({ type: 'fileChange', size: 0, ...event }));
+
+  const changes = collectChanges(eventLog, { subtree: '/docs', sinceSeq });
+  assert.deepStrictEqual(changes.added, [{ path: '/docs/new.txt', isDirectory: false, size: 5 }]);
+  assert.deepStrictEqual(changes.changed, [{ path: '/docs/old.txt', isDirectory: false, size: 7 }]);
+  assert.deepStrictEqual(paths(changes.removed), ['/docs/gone.txt', '/docs/tmp.txt']);
+  assert.strictEqual(changes.lastSeq, eventLog.lastSeq);
+  assert.strictEqual(changes.hasMore, false);
+});
+
+test('collectChanges handles directory removals and tree moves', () => {
+  const eventLog = createLog([]);
+  [
+    { eventType: 'updated', path: 'docs/a/1.txt' },
+    { eventType: 'directoryDeleted', path: 'docs/a' },
+    { eventType: 'moved', path: 'archive/b', fromPath: 'docs/b', isDirectory: true },
+    { eventType: 'copied', path: 'docs/c', fromPath: 'templates/c', isDirectory: true }
+  ].forEach(event => eventLog.append({ type: 'fileChange', size: 0, ...event }));
+
+  const docs = collectChanges(eventLog, { subtree: 'docs', sinceSeq: 0 });
+  assert.deepStrictEqual(docs.added, [{ path: '/docs/c', isDirectory: true, size: 0, listContents: true }]);
+  assert.deepStrictEqual(docs.changed, []);
+  assert.deepStrictEqual(docs.removed, [{ path: '/docs/a', isDirectory: true }, { path: '/docs/b', isDirectory: true }]);
+
+  const archive = collectChanges(eventLog, { subtree: '/archive/', sinceSeq: 0 });
+  assert.deepStrictEqual(archive.added, [{ path: '/archive/b', isDirectory: true, size: 0, listContents: true }]);
+  assert.deepStrictEqual(archive.removed, []);
+});
+
+test('collectChanges pages through large deltas and reports lost history', () => {
+  const eventLog = new EventLog({ capacity: 5 });
+  for (let i = 0; i < 8; i++) {
+    eventLog.append({ type: 'fileChange', eventType: 'created', path: `f${i}.txt`, size: 0 });
+  }
+  assert.strictEqual(collectChanges(eventLog, { sinceSeq: 1 }), null);
+
+  const first = collectChanges(eventLog, { sinceSeq: 3, limit: 2 });
+  assert.deepStrictEqual(paths(first.added), ['/f3.txt', '/f4.txt']);
+  assert.strictEqual(first.hasMore, true);
+  const second = collectChanges(eventLog, { sinceSeq: first.lastSeq, limit: 2 });
+  assert.deepStrictEqual(paths(second.added), ['/f5.txt', '/f6.txt']);
+  const last = collectChanges(eventLog, { sinceSeq: second.lastSeq, limit: 2 });
+  assert.deepStrictEqual(paths(last.added), ['/f7.txt']);
+  assert.strictEqual(last.hasMore, false);
+});
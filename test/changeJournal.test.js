@@ -0,0 +1,57 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const { ChangeJournal } = require('../src/modules/changeJournal');
+
+const fakeStats = (size, mtimeMs) => ({ ino: 7, size, mtimeMs });
+
+test('ChangeJournal suppresses the watcher echo of a recorded write', () => {
+  const journal = new ChangeJournal({ ttlMs: 1000 });
+  const sequence = journal.record('created', '/up/a.txt', fakeStats(10, 1));
+  assert.strictEqual(sequence, 1);
+
+  // 监视器可能报告 add 和 change，只要文件版本未变都属于回声
+  assert.strictEqual(journal.isEcho('created', '/up/a.txt', fakeStats(10, 1)), true);
+  assert.strictEqual(journal.isEcho('updated', '/up/a.txt', fakeStats(10, 1)), true);
+  assert.strictEqual(journal.getStats().echoesSuppressed, 2);
+});
+
+test('ChangeJournal lets later external changes through', () => {
+  const journal = new ChangeJournal({ ttlMs: 1000 });
+  journal.record('updated', '/up/a.txt', fakeStats(10, 1));
+  assert.strictEqual(journal.isEcho('updated', '/up/a.txt', fakeStats(12, 2)), false);
+  assert.strictEqual(journal.isEcho('deleted', '/up/a.txt', null), false);
+  assert.strictEqual(journal.isEcho('updated', '/up/b.txt', fakeStats(10, 1)), false);
+});
+
+test('ChangeJournal treats directory removal as an echo of a DELETE', () => {
+  const journal = new ChangeJournal({ ttlMs: 1000 });
+  journal.record('deleted', '/up/dir', null);
+  assert.strictEqual(journal.isEcho('directoryDeleted', '/up/dir', null), true);
+  journal.record('directoryCreated', '/up/new', fakeStats(0, 1));
+  assert.strictEqual(journal.isEcho('directoryCreated', '/up/new', fakeStats(0, 5)), true);
+});
+
+test('ChangeJournal entries expire after the TTL', () => {
+  const journal = new ChangeJournal({ ttlMs: 0 });
+  journal.record('created', '/up/a.txt', fakeStats(10, 1));
+  assert.strictEqual(journal.isEcho('created', '/up/a.txt', fakeStats(10, 1)), false);
+  journal.prune();
+  assert.strictEqual(journal.getStats().pendingEntries, 0);
+});
+
+test('ChangeJournal suppresses every watcher event under a recorded COPY/MOVE subtree', () => {
+  const journal = new ChangeJournal({ ttlMs: 1000 });
+  journal.record('deleted', '/up/dir', null);
+  journal.recordTree('/up/old', ['removed']);
+  journal.recordTree('/up/new', ['file', 'directory', 'removed']);
+
+  assert.strictEqual(journal.isEcho('deleted', '/up/old/a/b.txt', null), true);
+  assert.strictEqual(journal.isEcho('directoryDeleted', '/up/old', null), true);
+  assert.strictEqual(journal.isEcho('created', '/up/old/a/b.txt', fakeStats(1, 1)), false);
+  assert.strictEqual(journal.isEcho('created', '/up/new/a/b.txt', fakeStats(1, 1)), true);
+  assert.strictEqual(journal.isEcho('directoryCreated', '/up/new/a', fakeStats(0, 1)), true);
+  assert.strictEqual(journal.isEcho('created', '/up/newer.txt', fakeStats(1, 1)), false);
+
+  journal.forgetTree('/up/new');
+  assert.strictEqual(journal.isEcho('created', '/up/new/a/b.txt', fakeStats(1, 1)), false);
+});
@@ -0,0 +1,63 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { Readable } = require('stream');
+const { ChunkedUploadStore, UploadConflictError, parseContentRange } = require('../src/modules/chunkedUpload');
+
+const withStore = async (fn) => {
+  const root = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-chunked-'));
+  const store = new ChunkedUploadStore({ stagingDir: path.join(root, '.sdav-uploads') });
+  try {
+    await fn(store, root);
+  } finally {
+    store.close();
+    fs.rmSync(root, { recursive: true, force: true });
+  }
+};
+
+test('parseContentRange accepts chunk ranges and offset queries', () => {
+  assert.deepStrictEqual(parseContentRange('bytes 0-9/100'), { query: false, start: 0, end: 9, total: 100 });
+  // 总大小未知的分块无法完成上传，不接受
+  assert.strictEqual(parseContentRange('bytes 10-19/*'), null);
+  assert.deepStrictEqual(parseContentRange('bytes */100'), { query: true, total: 100 });
+  assert.strictEqual(parseContentRange('bytes 10-5/100'), null);
+  assert.strictEqual(parseContentRange('bytes 0-100/100'), null);
+  assert.strictEqual(parseContentRange('items 0-1/2'), null);
+});
+
+test('ChunkedUploadStore assembles chunks and renames into place on the last one', () => withStore(async (store, root) => {
+  const target = path.join(root, 'videos', 'movie.bin');
+
+  assert.deepStrictEqual(
+    await store.writeChunk(target, Readable.from([Buffer.from('hello ')]), { start: 0, end: 5, total: 11 }),
+    { offset: 6, complete: false });
+  assert.strictEqual(fs.existsSync(target), false);
+  assert.strictEqual(await store.getOffset(target), 6);
+
+  assert.deepStrictEqual(
+    await store.writeChunk(target, Readable.from([Buffer.from('world')]), { start: 6, end: 10, total: 11 }),
+    { offset: 11, complete: true });
+  assert.strictEqual(fs.readFileSync(target, 'utf8'), 'hello world');
+  assert.strictEqual(await store.getOffset(target), 0);
+  assert.strictEqual(store.getStats().uploadsCompleted, 1);
+}));
+
+test('ChunkedUploadStore rejects out-of-order chunks and keeps partial data for resuming', () => withStore(async (store, root) => {
+  const target = path.join(root, 'a.bin');
+  await store.writeChunk(target, Readable.from([Buffer.from('abcd')]), { start: 0, end: 3, total: 10 });
+
+  await assert.rejects(
+    store.writeChunk(target, Readable.from([Buffer.from('zz')]), { start: 8, end: 9, total: 10 }),
+    (err) => err instanceof UploadConflictError && err.offset === 4);
+
+  // 请求体比声明的短（例如连接中断）：保留已写入的部分，返回新的偏移量
+  await assert.rejects(
+    store.writeChunk(target, Readable.from([Buffer.from('ef')]), { start: 4, end: 7, total: 10 }),
+    (err) => err instanceof UploadConflictError && err.offset === 6);
+
+  const result = await store.writeChunk(target, Readable.from([Buffer.from('ghij')]), { start: 6, end: 9, total: 10 });
+  assert.strictEqual(result.complete, true);
+  assert.strictEqual(fs.readFileSync(target, 'utf8'), 'abcdefghij');
+}));
@@ -0,0 +1,191 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const EventEmitter = require('events');
+const { ClusterEventHub, WorkerUpstream } = require('../src/modules/clusterBus');
+const { EventLog } = require('../src/modules/eventLog');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const SubscriptionManager = require('../src/modules/subscriptions');
+const { MetadataCache } = require('../src/modules/metadataCache');
+const { ContentCache } = require('../src/modules/contentCache');
+
+// 模拟主进程中的 SubscriptionManager，只保留事件总线用到的部分
+const createManager = () => {
+  const manager = new EventEmitter();
+  manager.eventLog = new EventLog({ capacity: 100 });
+  manager.calls = [];
+  manager.publishLocalChange = (...args) => manager.calls.push(['publishLocalChange', ...args]);
+  manager.beginLocalTransfer = (...args) => manager.calls.push(['beginLocalTransfer', ...args]);
+  manager.cancelLocalTransfer = (...args) => manager.calls.push(['cancelLocalTransfer', ...args]);
+  manager.publishLocalTransfer = (...args) => manager.calls.push(['publishLocalTransfer', ...args]);
+  manager.retainWatch = (...args) => manager.calls.push(['retainWatch', ...args]);
+  manager.releaseWatch = (...args) => manager.calls.push(['releaseWatch', ...args]);
+  manager.watchCoverage = { polling: true, roots: [] };
+  return manager;
+};
+
+// 模拟 cluster.Worker 和工作进程的 process，两端的 send 直接投递到对端
+const createChannel = (pid) => {
+  const worker = new EventEmitter();
+  const child = new EventEmitter();
+  worker.process = { pid };
+  worker.received = [];
+  worker.isConnected = () => true;
+  worker.send = (message) => {
+    worker.received.push(message);
+    child.emit('message', JSON.parse(JSON.stringify(message)));
+  };
+  child.connected = true;
+  child.send = (message) => worker.emit('message', JSON.parse(JSON.stringify(message)));
+  return { worker, child };
+};
+
+const nextTick = () => new Promise(resolve => setImmediate(resolve));
+
+test('ClusterEventHub sends a log snapshot on ready and batches later events', async () => {
+  const manager = createManager();
+  const hub = new ClusterEventHub(manager);
+  manager.emit('fileEvent', manager.eventLog.append({ eventType: 'created', path: 'a.txt' }));
+
+  const { worker, child } = createChannel(101);
+  hub.addWorker(worker);
+  const received = [];
+  new WorkerUpstream(child).connect((type, message) => received.push([type, message]));
+
+  assert.strictEqual(received[0][0], 'sync');
+  assert.strictEqual(received[0][1].epoch, manager.eventLog.epoch);
+  assert.strictEqual(received[0][1].lastSeq, 1);
+  assert.deepStrictEqual(received[0][1].events.map(event => event.path), ['a.txt']);
+
+  manager.emit('watcherEvent', 'updated', '/data/b.txt');
+  manager.emit('fileEvent', manager.eventLog.append({ eventType: 'updated', path: 'b.txt' }));
+  manager.emit('watcherError', new Error('boom'));
+  assert.strictEqual(received.length, 1);
+  await nextTick();
+
+  assert.strictEqual(received.length, 2);
+  assert.strictEqual(received[1][0], 'batch');
+  assert.deepStrictEqual(received[1][1].messages.map(item => item.type), ['watcherEvent', 'fileEvent', 'watcherError']);
+  assert.strictEqual(received[1][1].messages[1].event.seq, 2);
+  assert.strictEqual(hub.getStats().batchesSent, 1);
+});
+
+test('ClusterEventHub applies local changes reported by workers', () => {
+  const manager = createManager();
+  const hub = new ClusterEventHub(manager);
+  const { worker, child } = createChannel(102);
+  hub.addWorker(worker);
+  const upstream = new WorkerUpstream(child);
+  upstream.connect(() => {});
+
+  upstream.send('localChange', { eventType: 'created', filePath: '/data/a.txt', stats: { ino: 7, size: 3, mtimeMs: 1000.5 } });
+  upstream.send('beginTransfer', { eventType: 'moved', fromPath: '/data/a', toPath: '/data/b' });
+  upstream.send('publishTransfer', { eventType: 'moved', fromPath: '/data/a', toPath: '/data/b' });
+  worker.emit('message', { type: 'unrelated' });
+
+  assert.deepStrictEqual(manager.calls, [
+    ['publishLocalChange', 'created', '/data/a.txt', { ino: 7, size: 3, mtimeMs: 1000.5 }],
+    ['beginLocalTransfer', 'moved', '/data/a', '/data/b'],
+    ['publishLocalTransfer', 'moved', '/data/a', '/data/b']
+  ]);
+});
+
+test('ClusterEventHub stops broadcasting to workers that exited', async () => {
+  const manager = createManager();
+  const hub = new ClusterEventHub(manager);
+  const { worker, child } = createChannel(103);
+  hub.addWorker(worker);
+  new WorkerUpstream(child).connect(() => {});
+  worker.emit('exit');
+
+  manager.emit('fileEvent', manager.eventLog.append({ eventType: 'created', path: 'a.txt' }));
+  await nextTick();
+  assert.strictEqual(worker.received.length, 1); // 只有快照
+  assert.strictEqual(hub.getStats().workers, 0);
+});
+
+test('ClusterEventHub releases the watches of a worker that exited', () => {
+  const manager = createManager();
+  const hub = new ClusterEventHub(manager);
+  const { worker, child } = createChannel(104);
+  hub.addWorker(worker);
+  const upstream = new WorkerUpstream(child);
+  upstream.connect(() => {});
+
+  upstream.send('watchRetain', { subscriptionPath: '/docs/**' });
+  upstream.send('watchRetain', { subscriptionPath: '/docs/**' });
+  upstream.send('watchRetain', { subscriptionPath: '/photos/*' });
+  upstream.send('watchRelease', { subscriptionPath: '/photos/*' });
+  // 未保留过的路径不会被释放
+  upstream.send('watchRelease', { subscriptionPath: '/other' });
+  manager.calls.length = 0;
+
+  worker.emit('exit');
+  assert.deepStrictEqual(manager.calls, [
+    ['releaseWatch', '/docs/**'],
+    ['releaseWatch', '/docs/**']
+  ]);
+});
+
+test('ClusterEventHub replicates the content hash index to workers', async () => {
+  const manager = createManager();
+  const hashIndex = new EventEmitter();
+  hashIndex.snapshot = () => [['a.txt', { size: 1, mtimeMs: 1, ino: 1, sha256: 'aa' }]];
+  const hub = new ClusterEventHub(manager, { hashIndex });
+  const { worker, child } = createChannel(105);
+  hub.addWorker(worker);
+  const received = [];
+  new WorkerUpstream(child).connect((type, message) => received.push([type, message]));
+
+  assert.deepStrictEqual(received[0][1].contentHashes, hashIndex.snapshot());
+  hashIndex.emit('update', 'a.txt', null);
+  await nextTick();
+  assert.deepStrictEqual(received[1][1].messages, [{ type: 'contentHash', path: 'a.txt', entry: null }]);
+});
+
+test('A write through one worker invalidates the caches of its sibling before reads', async () => {
+  const uploadDir = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-cluster-'));
+  const filePath = path.join(uploadDir, 'default.yaml');
+  fs.writeFileSync(filePath, 'version: 1\n');
+  const hub = new ClusterEventHub(createManager());
+
+  // 两个工作进程，各自持有与控制器相同接线的元数据缓存和内容缓存
+  const workers = [201, 202].map((pid) => {
+    const { worker, child } = createChannel(pid);
+    hub.addWorker(worker);
+    const manager = new SubscriptionManager(uploadDir, { upstream: new WorkerUpstream(child) });
+    const metadataCache = new MetadataCache();
+    const contentCache = new ContentCache();
+    manager.on('watcherEvent', (eventType, changedPath) => {
+      metadataCache.handleFileEvent(eventType, changedPath);
+      contentCache.handleFileEvent(eventType, changedPath);
+    });
+    // 与控制器的GET相同：经元数据缓存stat，再按stat查找或读入内容
+    const read = async () => {
+      const stats = await metadataCache.stat(filePath);
+      const entry = contentCache.lookup(filePath, stats) || await contentCache.load(filePath, stats);
+      return entry.body.toString();
+    };
+    return { manager, read };
+  });
+  const [writer, sibling] = workers;
+  try {
+    assert.strictEqual(await sibling.read(), 'version: 1\n');
+
+    // 同一inode内原地改写且大小不变：只有失效能让兄弟进程看到新内容
+    fs.writeFileSync(filePath, 'version: 2\n');
+    writer.manager.publishLocalChange('updated', filePath);
+    assert.strictEqual(await sibling.read(), 'version: 2\n');
+
+    // 复制/移动使目标子树失效
+    fs.writeFileSync(filePath, 'version: 3\n');
+    writer.manager.publishLocalTransfer('moved', path.join(uploadDir, 'old.yaml'), filePath);
+    assert.strictEqual(await sibling.read(), 'version: 3\n');
+  } finally {
+    for (const { manager } of workers) {
+      manager.close();
+    }
+    fs.rmSync(uploadDir, { recursive: true, force: true });
+  }
+});
@@ -0,0 +1,56 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const zlib = require('zlib');
+const { Readable } = require('stream');
+const { negotiateEncoding, createCompressionStream, compressBuffer, weakEtag } = require('../src/modules/compression');
+const { getMimeType, isCompressibleType } = require('../src/modules/mimeTypes');
+
+test('negotiateEncoding picks the first supported encoding the client accepts', () => {
+  assert.strictEqual(negotiateEncoding('gzip, deflate, br', ['br', 'gzip']), 'br');
+  assert.strictEqual(negotiateEncoding('gzip', ['br', 'gzip']), 'gzip');
+  assert.strictEqual(negotiateEncoding('identity', ['br', 'gzip']), null);
+  assert.strictEqual(negotiateEncoding(undefined, ['br', 'gzip']), null);
+  assert.strictEqual(negotiateEncoding('gzip, br', []), null);
+});
+
+test('negotiateEncoding honours q-values and wildcards', () => {
+  assert.strictEqual(negotiateEncoding('br;q=0.5, gzip', ['br', 'gzip']), 'gzip');
+  assert.strictEqual(negotiateEncoding('br;q=0, gzip;q=0.1', ['br', 'gzip']), 'gzip');
+  assert.strictEqual(negotiateEncoding('*', ['br', 'gzip']), 'br');
+  assert.strictEqual(negotiateEncoding('*, br;q=0', ['br', 'gzip']), 'gzip');
+});
+
+test('compressBuffer and createCompressionStream round-trip', async () => {
+  const body = Buffer.from(JSON.stringify({ items: Array.from({ length: 200 }, (_, i) => ({ name: `file${i}.txt` })) }));
+
+  const gzipped = await compressBuffer('gzip', body);
+  assert.ok(gzipped.length < body.length);
+  assert.deepStrictEqual(zlib.gunzipSync(gzipped), body);
+
+  const brotli = await compressBuffer('br', body);
+  assert.deepStrictEqual(zlib.brotliDecompressSync(brotli), body);
+
+  const chunks = [];
+  await new Promise((resolve, reject) => {
+    Readable.from([body.subarray(0, 100), body.subarray(100)])
+      .pipe(createCompressionStream('br', { sizeHint: body.length }))
+      .on('data', chunk => chunks.push(chunk))
+      .on('end', resolve)
+      .on('error', reject);
+  });
+  assert.deepStrictEqual(zlib.brotliDecompressSync(Buffer.concat(chunks)), body);
+});
+
+test('weakEtag marks the compressed representation as weak', () => {
+  assert.strictEqual(weakEtag('"abc"'), 'W/"abc"');
+  assert.strictEqual(weakEtag('W/"abc"'), 'W/"abc"');
+});
+
+test('isCompressibleType accepts text formats and skips already compressed media', () => {
+  assert.strictEqual(isCompressibleType(getMimeType('/a/notes.txt')), true);
+  assert.strictEqual(isCompressibleType(getMimeType('/a/data.json')), true);
+  assert.strictEqual(isCompressibleType(getMimeType('/a/icon.svg')), true);
+  assert.strictEqual(isCompressibleType(getMimeType('/a/photo.jpg')), false);
+  assert.strictEqual(isCompressibleType(getMimeType('/a/archive.zip')), false);
+  assert.strictEqual(isCompressibleType(getMimeType('/a/unknown.bin')), false);
+});
@@ -0,0 +1,51 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const { computeEtag, evaluatePreconditions, parseEtagList } = require('../src/modules/conditionalRequest');
+
+const fakeStats = (size, mtimeMs, ino = 42) => ({ ino, size, mtimeMs });
+
+test('computeEtag changes with inode, size and sub-second mtime', () => {
+  const etag = computeEtag(fakeStats(10, 1000.5));
+  assert.match(etag, /^"[0-9a-f]+-[0-9a-f]+-[0-9a-f]+"$/);
+  assert.notStrictEqual(computeEtag(fakeStats(10, 1000.6)), etag);
+  assert.notStrictEqual(computeEtag(fakeStats(11, 1000.5)), etag);
+  assert.notStrictEqual(computeEtag(fakeStats(10, 1000.5, 43)), etag);
+  assert.strictEqual(computeEtag(fakeStats(10, 1000.5)), etag);
+});
+
+test('parseEtagList handles lists, weak tags and the wildcard', () => {
+  assert.strictEqual(parseEtagList(undefined), null);
+  assert.strictEqual(parseEtagList(' * '), '*');
+  assert.deepStrictEqual(parseEtagList('"a", W/"b",  "c,d"'), ['"a"', 'W/"b"', '"c,d"']);
+});
+
+test('GET revalidation answers 304 for a matching ETag or an unchanged date', () => {
+  const stats = fakeStats(10, Date.parse('2024-01-01T00:00:00Z') + 300);
+  const etag = computeEtag(stats);
+
+  assert.strictEqual(evaluatePreconditions('GET', { 'if-none-match': etag }, stats, etag), 304);
+  assert.strictEqual(evaluatePreconditions('HEAD', { 'if-none-match': `"x", W/${etag}` }, stats, etag), 304);
+  assert.strictEqual(evaluatePreconditions('GET', { 'if-none-match': '"other"' }, stats, etag), null);
+  assert.strictEqual(evaluatePreconditions('GET', { 'if-modified-since': 'Mon, 01 Jan 2024 00:00:00 GMT' }, stats, etag), 304);
+  assert.strictEqual(evaluatePreconditions('GET', { 'if-modified-since': 'Sun, 31 Dec 2023 23:59:59 GMT' }, stats, etag), null);
+  // If-None-Match 存在时忽略 If-Modified-Since
+  assert.strictEqual(evaluatePreconditions('GET', {
+    'if-none-match': '"other"',
+    'if-modified-since': 'Mon, 01 Jan 2024 00:00:00 GMT'
+  }, stats, etag), null);
+  assert.strictEqual(evaluatePreconditions('GET', {}, stats, etag), null);
+});
+
+test('conditional writes fail with 412 instead of clobbering a newer version', () => {
+  const stats = fakeStats(10, 5000);
+  const etag = computeEtag(stats);
+
+  assert.strictEqual(evaluatePreconditions('PUT', { 'if-match': etag }, stats, etag), null);
+  assert.strictEqual(evaluatePreconditions('PUT', { 'if-match': '"stale"' }, stats, etag), 412);
+  // If-Match 使用强比较
+  assert.strictEqual(evaluatePreconditions('PUT', { 'if-match': `W/${etag}` }, stats, etag), 412);
+  assert.strictEqual(evaluatePreconditions('PUT', { 'if-match': '*' }, null, null), 412);
+  assert.strictEqual(evaluatePreconditions('PUT', { 'if-none-match': '*' }, stats, etag), 412);
+  assert.strictEqual(evaluatePreconditions('PUT', { 'if-none-match': '*' }, null, null), null);
+  assert.strictEqual(evaluatePreconditions('PUT', { 'if-unmodified-since': new Date(0).toUTCString() }, stats, etag), 412);
+});
@@ -0,0 +1,94 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { ContentCache } = require('../src/modules/contentCache');
+
+const withDir = async (fn) => {
+  const dir = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-content-'));
+  try {
+    await fn(dir);
+  } finally {
+    fs.rmSync(dir, { recursive: true, force: true });
+  }
+};
+
+test('ContentCache serves loaded files until they change on disk', async () => {
+  await withDir(async (dir) => {
+    const filePath = path.join(dir, 'default.yaml');
+    fs.writeFileSync(filePath, 'schema_list:\n  - luna_pinyin\n');
+    const cache = new ContentCache({ maxBytes: 1024, maxFileSize: 256 });
+    const stats = fs.statSync(filePath);
+
+    assert.strictEqual(cache.lookup(filePath, stats), null);
+    const [first, second] = await Promise.all([cache.load(filePath, stats), cache.load(filePath, stats)]);
+    assert.strictEqual(first, second); // 并发读取合并为一次
+    assert.strictEqual(first.body.toString(), 'schema_list:\n  - luna_pinyin\n');
+    assert.strictEqual(cache.lookup(filePath, stats), first);
+    assert.strictEqual(cache.bytes, stats.size);
+
+    // 文件被替换后，旧的状态不再匹配新内容：读取时放弃，查找时淘汰
+    fs.writeFileSync(`${filePath}.tmp`, 'schema_list:\n  - double_pinyin\n');
+    fs.renameSync(`${filePath}.tmp`, filePath);
+    assert.strictEqual(await cache.load(filePath, stats), null);
+    assert.strictEqual(cache.lookup(filePath, fs.statSync(filePath)), null);
+    assert.strictEqual(cache.bytes, 0);
+
+    assert.strictEqual(cache.accepts(256), true);
+    assert.strictEqual(cache.accepts(257), false);
+    assert.strictEqual(new ContentCache({ maxBytes: 0 }).accepts(1), false);
+  });
+});
+
+test('ContentCache evicts least recently used files to stay within its byte budget', async () => {
+  await withDir(async (dir) => {
+    const cache = new ContentCache({ maxBytes: 250, maxFileSize: 100 });
+    const files = {};
+    for (const name of ['a', 'b', 'c']) {
+      files[name] = path.join(dir, name);
+      fs.writeFileSync(files[name], name.repeat(100));
+      await cache.load(files[name], fs.statSync(files[name]));
+    }
+    // 加入c时淘汰最早的a
+    assert.deepStrictEqual(Array.from(cache.entries.keys()), [files.b, files.c]);
+    assert.strictEqual(cache.bytes, 200);
+
+    // 压缩后的表示也计入预算；访问过的b保留，c被淘汰
+    const entryB = cache.lookup(files.b, fs.statSync(files.b));
+    cache.addVariant(files.b, entryB, 'gzip', { etag: '"b"', headers: {}, body: Buffer.alloc(60) });
+    assert.deepStrictEqual(Array.from(cache.entries.keys()), [files.b]);
+    assert.strictEqual(cache.bytes, 160);
+    assert.strictEqual(cache.getStats().evictions, 2);
+  });
+});
+
+test('ContentCache is invalidated by file events and ignores loads that raced an invalidation', async () => {
+  await withDir(async (dir) => {
+    fs.mkdirSync(path.join(dir, 'rime'));
+    const cache = new ContentCache();
+    const paths = ['rime/a.yaml', 'rime/b.yaml', 'scal.json'].map(name => path.join(dir, name));
+    for (const filePath of paths) {
+      fs.writeFileSync(filePath, 'x');
+      await cache.load(filePath, fs.statSync(filePath));
+    }
+
+    cache.handleFileEvent('updated', paths[2]);
+    assert.strictEqual(cache.entries.has(paths[2]), false);
+    cache.handleFileEvent('directoryDeleted', path.join(dir, 'rime'));
+    assert.strictEqual(cache.entries.size, 0);
+    assert.strictEqual(cache.bytes, 0);
+
+    // 读取期间收到变更事件：本次读取的结果仍返回给调用方，但不写入缓存
+    const loading = cache.load(paths[2], fs.statSync(paths[2]));
+    cache.handleFileEvent('updated', paths[2]);
+    assert.ok(await loading);
+    assert.strictEqual(cache.entries.size, 0);
+
+    cache.recordServed(10, true);
+    cache.recordServed(30, false);
+    const stats = cache.getStats();
+    assert.strictEqual(stats.hitRate, 0.5);
+    assert.strictEqual(stats.bytesServed, 40);
+  });
+});
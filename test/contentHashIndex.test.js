@@ -0,0 +1,170 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const crypto = require('crypto');
+const EventEmitter = require('events');
+const { ContentHashIndex } = require('../src/modules/contentHashIndex');
+const { HashWorkerPool } = require('../src/modules/hashWorkerPool');
+const { hashFile } = require('../src/modules/hashWorker');
+
+const sha256 = (content) => crypto.createHash('sha256').update(content).digest('hex');
+
+const createTree = () => {
+  const root = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-hashes-'));
+  fs.mkdirSync(path.join(root, 'docs', 'deep'), { recursive: true });
+  fs.writeFileSync(path.join(root, 'a.txt'), 'alpha');
+  fs.writeFileSync(path.join(root, 'docs', 'b.txt'), 'beta');
+  fs.writeFileSync(path.join(root, 'docs', 'deep', 'c.txt'), 'alpha');
+  return root;
+};
+
+// 记录被计算的文件，直接在主线程中计算
+const createIndex = (root, options = {}) => {
+  const hashed = [];
+  const index = new ContentHashIndex({
+    rootDir: root,
+    hashFile: (filePath) => {
+      hashed.push(path.relative(root, filePath));
+      return hashFile(filePath);
+    },
+    ...options
+  });
+  return { index, hashed };
+};
+
+const scanAndWait = async (index) => {
+  await index.scanTree(index.rootDir, { prune: true });
+  await index.waitForIdle();
+};
+
+test('hashFile returns the digest together with the stats it was taken at', async () => {
+  const root = createTree();
+  try {
+    const filePath = path.join(root, 'a.txt');
+    const stats = fs.statSync(filePath);
+    assert.deepStrictEqual(await hashFile(filePath), {
+      size: stats.size,
+      mtimeMs: stats.mtimeMs,
+      ino: stats.ino,
+      sha256: sha256('alpha')
+    });
+  } finally {
+    fs.rmSync(root, { recursive: true, force: true });
+  }
+});
+
+test('HashWorkerPool hashes files off the main thread', async () => {
+  const root = createTree();
+  const pool = new HashWorkerPool({ size: 2 });
+  try {
+    const results = await Promise.all(['a.txt', 'docs/b.txt', 'docs/deep/c.txt'].map(name => pool.hash(path.join(root, name))));
+    assert.deepStrictEqual(results.map(result => result.sha256), [sha256('alpha'), sha256('beta'), sha256('alpha')]);
+    await assert.rejects(pool.hash(path.join(root, 'missing.txt')), { code: 'ENOENT' });
+    assert.strictEqual(pool.getStats().threads, 2);
+  } finally {
+    pool.close();
+    fs.rmSync(root, { recursive: true, force: true });
+  }
+});
+
+test('ContentHashIndex only answers lookups for unchanged files', async () => {
+  const root = createTree();
+  const { index } = createIndex(root);
+  try {
+    await scanAndWait(index);
+    const filePath = path.join(root, 'a.txt');
+    assert.strictEqual(index.lookup(filePath, fs.statSync(filePath)), sha256('alpha'));
+    assert.deepStrictEqual(index.findPaths(sha256('alpha')).sort(), [filePath, path.join(root, 'docs', 'deep', 'c.txt')]);
+
+    fs.writeFileSync(filePath, 'changed');
+    assert.strictEqual(index.lookup(filePath, fs.statSync(filePath)), null);
+  } finally {
+    index.close();
+    fs.rmSync(root, { recursive: true, force: true });
+  }
+});
+
+test('ContentHashIndex follows file events', async () => {
+  const root = createTree();
+  const { index, hashed } = createIndex(root);
+  const manager = new EventEmitter();
+  index.attach(manager);
+  const updates = [];
+  index.on('update', (relativePath, entry) => updates.push([relativePath, entry && entry.sha256]));
+  try {
+    await scanAndWait(index);
+    hashed.length = 0;
+
+    fs.writeFileSync(path.join(root, 'docs', 'b.txt'), 'gamma');
+    manager.emit('fileEvent', { eventType: 'updated', path: 'docs/b.txt' });
+    await index.waitForIdle();
+    assert.deepStrictEqual(hashed, ['docs/b.txt']);
+    assert.strictEqual(index.findPaths(sha256('beta')).length, 0);
+
+    // rename保留inode和mtime，条目跟随移动而不重新计算
+    fs.renameSync(path.join(root, 'docs'), path.join(root, 'archive'));
+    manager.emit('fileEvent', { eventType: 'moved', path: 'archive', fromPath: 'docs' });
+    await new Promise(resolve => setTimeout(resolve, 20));
+    await index.waitForIdle();
+    assert.deepStrictEqual(hashed, ['docs/b.txt']);
+    const moved = path.join(root, 'archive', 'b.txt');
+    assert.strictEqual(index.lookup(moved, fs.statSync(moved)), sha256('gamma'));
+
+    fs.rmSync(path.join(root, 'archive'), { recursive: true });
+    manager.emit('fileEvent', { eventType: 'directoryDeleted', path: 'archive' });
+    assert.deepStrictEqual(Array.from(index.entries.keys()), ['a.txt']);
+    assert.deepStrictEqual(updates.slice(-2).sort(), [[path.join('archive', 'b.txt'), null], [path.join('archive', 'deep', 'c.txt'), null]]);
+  } finally {
+    index.close();
+    fs.rmSync(root, { recursive: true, force: true });
+  }
+});
+
+test('ContentHashIndex resumes from its persisted file after a restart', async () => {
+  const root = createTree();
+  const indexFile = path.join(root, '.sdav-state', 'content-hashes.jsonl');
+  const isIgnored = (filePath) => path.basename(filePath).startsWith('.');
+  const first = createIndex(root, { filePath: indexFile, isIgnored });
+  try {
+    first.index.load();
+    await scanAndWait(first.index);
+    assert.strictEqual(first.hashed.length, 3);
+    first.index.close();
+
+    // 停机期间的变化：一个文件被修改，一个被删除
+    fs.writeFileSync(path.join(root, 'docs', 'b.txt'), 'changed while down');
+    fs.rmSync(path.join(root, 'a.txt'));
+
+    const second = createIndex(root, { filePath: indexFile, isIgnored });
+    second.index.load();
+    assert.strictEqual(second.index.entries.size, 3);
+    await scanAndWait(second.index);
+    assert.deepStrictEqual(second.hashed, [path.join('docs', 'b.txt')]);
+    assert.deepStrictEqual(Array.from(second.index.entries.keys()).sort(), [path.join('docs', 'b.txt'), path.join('docs', 'deep', 'c.txt')]);
+    second.index.close();
+  } finally {
+    fs.rmSync(root, { recursive: true, force: true });
+  }
+});
+
+test('ContentHashIndex replicas apply snapshots and updates without hashing', () => {
+  const manager = new EventEmitter();
+  const index = new ContentHashIndex({
+    rootDir: '/data',
+    replica: true,
+    hashFile: () => assert.fail('replicas never hash')
+  });
+  index.attach(manager);
+  const entry = { size: 5, mtimeMs: 1000, ino: 7, sha256: sha256('alpha') };
+
+  manager.emit('contentHashSync', [['a.txt', entry]]);
+  manager.emit('contentHashUpdate', 'b.txt', { ...entry, ino: 8 });
+  manager.emit('fileEvent', { eventType: 'created', path: 'c.txt' });
+  assert.strictEqual(index.lookup('/data/a.txt', { size: 5, mtimeMs: 1000, ino: 7 }), sha256('alpha'));
+  assert.deepStrictEqual(index.findPaths(sha256('alpha')), ['/data/a.txt', '/data/b.txt']);
+
+  manager.emit('contentHashUpdate', 'a.txt', null);
+  assert.deepStrictEqual(index.findPaths(sha256('alpha')), ['/data/b.txt']);
+});
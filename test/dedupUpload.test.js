@@ -0,0 +1,113 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const crypto = require('crypto');
+const { ContentHashIndex } = require('../src/modules/contentHashIndex');
+const { hashFile } = require('../src/modules/hashWorker');
+const { DedupUploader, parseDeclaredContent } = require('../src/modules/dedupUpload');
+
+const CONTENT = 'installer bytes';
+const SHA256 = crypto.createHash('sha256').update(CONTENT).digest('hex');
+
+const createIndexedTree = async () => {
+  const root = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-dedup-'));
+  fs.mkdirSync(path.join(root, 'a'));
+  fs.mkdirSync(path.join(root, 'b'));
+  fs.writeFileSync(path.join(root, 'a', 'setup.exe'), CONTENT);
+  const hashed = [];
+  const index = new ContentHashIndex({
+    rootDir: root,
+    hashFile: (filePath) => {
+      hashed.push(path.relative(root, filePath));
+      return hashFile(filePath);
+    }
+  });
+  await index.scanTree(root);
+  await index.waitForIdle();
+  return { root, index, hashed };
+};
+
+test('parseDeclaredContent reads the declared hash and size', () => {
+  assert.deepStrictEqual(parseDeclaredContent({ 'x-sdav-content-sha256': SHA256.toUpperCase(), 'x-sdav-content-size': '15' }), {
+    sha256: SHA256,
+    size: 15
+  });
+  assert.deepStrictEqual(parseDeclaredContent({ 'x-sdav-content-sha256': SHA256, 'content-length': '15' }), { sha256: SHA256, size: 15 });
+  assert.strictEqual(parseDeclaredContent({ 'x-sdav-content-sha256': 'abc', 'content-length': '15' }), null);
+  assert.strictEqual(parseDeclaredContent({ 'x-sdav-content-sha256': SHA256 }), null);
+});
+
+test('DedupUploader completes an upload from identical stored content', async () => {
+  const { root, index, hashed } = await createIndexedTree();
+  const uploader = new DedupUploader({ index });
+  try {
+    const target = path.join(root, 'b', 'setup.exe');
+    const result = await uploader.tryComplete(target, { sha256: SHA256, size: CONTENT.length });
+    assert.ok(['reflink', 'copy'].includes(result.method));
+    assert.strictEqual(result.sourcePath, path.join(root, 'a', 'setup.exe'));
+    // 默认模式不使用硬链接：目标是独立的文件，原地修改不会影响源文件
+    assert.notStrictEqual(fs.statSync(target).ino, fs.statSync(result.sourcePath).ino);
+    assert.strictEqual(fs.readFileSync(target, 'utf8'), CONTENT);
+    assert.deepStrictEqual(fs.readdirSync(path.join(root, 'b')), ['setup.exe']); // 没有遗留临时文件
+
+    // 目标文件被索引后再次上传到同一路径：内容未变，不做修改
+    index.enqueue(target);
+    await index.waitForIdle();
+    assert.strictEqual((await uploader.tryComplete(target, { sha256: SHA256, size: CONTENT.length })).method, 'unchanged');
+
+    const stats = uploader.getStats();
+    assert.strictEqual(stats.uploadsShortCircuited, 2);
+    assert.strictEqual(stats.bytesSaved, CONTENT.length * 2);
+    assert.strictEqual(stats.hardlinks, 0);
+    assert.deepStrictEqual(hashed, [path.join('a', 'setup.exe'), path.join('b', 'setup.exe')]);
+  } finally {
+    index.close();
+    fs.rmSync(root, { recursive: true, force: true });
+  }
+});
+
+test('DedupUploader uses hardlinks only when explicitly enabled', async () => {
+  const { root, index, hashed } = await createIndexedTree();
+  const uploader = new DedupUploader({ index, mode: 'hardlink' });
+  try {
+    const source = path.join(root, 'a', 'setup.exe');
+    const target = path.join(root, 'b', 'setup.exe');
+    const result = await uploader.tryComplete(target, { sha256: SHA256, size: CONTENT.length });
+    assert.ok(['reflink', 'hardlink'].includes(result.method));
+    if (result.method === 'hardlink') {
+      assert.strictEqual(fs.statSync(target).ino, fs.statSync(source).ino);
+      // 硬链接与源文件是同一个inode，索引直接沿用已有的哈希
+      index.enqueue(target);
+      await index.waitForIdle();
+      assert.deepStrictEqual(hashed, [path.join('a', 'setup.exe')]);
+    }
+    assert.strictEqual(new DedupUploader({ index, mode: 'auto' }).mode, 'reflink');
+  } finally {
+    index.close();
+    fs.rmSync(root, { recursive: true, force: true });
+  }
+});
+
+test('DedupUploader falls back to a normal upload when the content is unknown or stale', async () => {
+  const { root, index } = await createIndexedTree();
+  const uploader = new DedupUploader({ index });
+  try {
+    const target = path.join(root, 'b', 'setup.exe');
+    assert.strictEqual(await uploader.tryComplete(target, { sha256: SHA256, size: CONTENT.length + 1 }), null);
+    assert.strictEqual(await uploader.tryComplete(target, { sha256: 'ab'.repeat(32), size: CONTENT.length }), null);
+
+    // 源文件已被修改但尚未重新计算哈希时不能使用
+    fs.writeFileSync(path.join(root, 'a', 'setup.exe'), 'INSTALLER BYTES');
+    assert.strictEqual(await uploader.tryComplete(target, { sha256: SHA256, size: CONTENT.length }), null);
+    assert.strictEqual(fs.existsSync(target), false);
+    assert.strictEqual(uploader.getStats().misses, 3);
+
+    const disabled = new DedupUploader({ index, mode: 'off' });
+    assert.strictEqual(disabled.enabled, false);
+  } finally {
+    index.close();
+    fs.rmSync(root, { recursive: true, force: true });
+  }
+});
@@ -0,0 +1,57 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const { EventCoalescer, mergeEventTypes } = require('../src/modules/eventCoalescer');
+
+const collect = (options) => {
+  const emitted = [];
+  const coalescer = new EventCoalescer((eventType, filePath) => emitted.push([eventType, filePath]), options);
+  return { coalescer, emitted };
+};
+
+test('mergeEventTypes folds common event runs', () => {
+  assert.strictEqual(mergeEventTypes('created', 'updated'), 'created');
+  assert.strictEqual(mergeEventTypes('created', 'deleted'), null);
+  assert.strictEqual(mergeEventTypes('updated', 'deleted'), 'deleted');
+  assert.strictEqual(mergeEventTypes('deleted', 'created'), 'updated');
+  assert.strictEqual(mergeEventTypes('directoryCreated', 'directoryDeleted'), null);
+  assert.strictEqual(mergeEventTypes(null, 'created'), 'created');
+});
+
+test('EventCoalescer emits one event per path per window', () => {
+  const { coalescer, emitted } = collect({ windowMs: 50 });
+  coalescer.push('created', '/up/a.txt');
+  coalescer.push('updated', '/up/a.txt');
+  coalescer.push('updated', '/up/a.txt');
+  coalescer.push('created', '/up/b.txt');
+  coalescer.push('deleted', '/up/b.txt');
+  coalescer.flushAll();
+
+  assert.deepStrictEqual(emitted, [['created', '/up/a.txt']]);
+  const stats = coalescer.getStats();
+  assert.strictEqual(stats.eventsReceived, 5);
+  assert.strictEqual(stats.eventsAbsorbed, 3);
+  assert.strictEqual(stats.eventsCancelled, 1);
+  assert.strictEqual(stats.eventsEmitted, 1);
+  assert.strictEqual(stats.pendingPaths, 0);
+});
+
+test('EventCoalescer with a zero window passes events straight through', () => {
+  const { coalescer, emitted } = collect({ windowMs: 0 });
+  coalescer.push('created', '/up/a.txt');
+  coalescer.push('updated', '/up/a.txt');
+  assert.deepStrictEqual(emitted, [['created', '/up/a.txt'], ['updated', '/up/a.txt']]);
+});
+
+test('EventCoalescer flushes after the window and honours maxWait', async () => {
+  const { coalescer, emitted } = collect({ windowMs: 20, maxWaitMs: 60 });
+  coalescer.push('updated', '/up/big.bin');
+  const interval = setInterval(() => coalescer.push('updated', '/up/big.bin'), 10);
+  await new Promise(resolve => setTimeout(resolve, 120));
+  clearInterval(interval);
+  await new Promise(resolve => setTimeout(resolve, 40));
+  coalescer.close();
+
+  // 持续写入期间也至少输出一次，且远少于原始事件数
+  assert.ok(emitted.length >= 2, `emitted ${emitted.length}`);
+  assert.ok(emitted.length < coalescer.getStats().eventsReceived);
+});
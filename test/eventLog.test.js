@@ -0,0 +1,69 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { EventLog } = require('../src/modules/eventLog');
+
+test('EventLog assigns monotonic sequence numbers and replays missed events', () => {
+  const log = new EventLog({ capacity: 5 });
+  for (let i = 0; i < 3; i++) {
+    log.append({ eventType: 'created', path: `f${i}.txt` });
+  }
+  assert.strictEqual(log.lastSeq, 3);
+  assert.deepStrictEqual(log.since(1).map(event => event.seq), [2, 3]);
+  assert.deepStrictEqual(log.since(3), []);
+  assert.deepStrictEqual(log.since(0).map(event => event.path), ['f0.txt', 'f1.txt', 'f2.txt']);
+});
+
+test('EventLog reports a gap once the ring buffer has wrapped past sinceSeq', () => {
+  const log = new EventLog({ capacity: 3 });
+  for (let i = 0; i < 10; i++) {
+    log.append({ eventType: 'updated', path: 'a.txt' });
+  }
+  assert.strictEqual(log.oldestSeq, 8);
+  assert.deepStrictEqual(log.since(7).map(event => event.seq), [8, 9, 10]);
+  assert.strictEqual(log.since(6), null);
+});
+
+test('EventLog restores sequence and epoch from its file', () => {
+  const dir = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-eventlog-'));
+  const filePath = path.join(dir, 'events.log');
+  const first = new EventLog({ capacity: 10, filePath });
+  first.append({ eventType: 'created', path: 'a.txt' });
+  first.append({ eventType: 'deleted', path: 'b.txt' });
+  first.close();
+
+  return new Promise(resolve => setTimeout(resolve, 50)).then(() => {
+    const second = new EventLog({ capacity: 10, filePath });
+    assert.strictEqual(second.epoch, first.epoch);
+    assert.strictEqual(second.lastSeq, 2);
+    assert.deepStrictEqual(second.since(1).map(event => event.path), ['b.txt']);
+    assert.strictEqual(second.append({ eventType: 'created', path: 'c.txt' }).seq, 3);
+    second.close();
+    fs.rmSync(dir, { recursive: true, force: true });
+  });
+});
+
+test('EventLog replica adopts primary sequence numbers and detects gaps', () => {
+  const primary = new EventLog({ capacity: 10 });
+  for (let i = 0; i < 3; i++) {
+    primary.append({ eventType: 'created', path: `f${i}.txt` });
+  }
+
+  const replica = new EventLog({ capacity: 10 });
+  replica.reset(primary.epoch, primary.lastSeq, primary.since(primary.oldestSeq - 1));
+  assert.strictEqual(replica.epoch, primary.epoch);
+  assert.deepStrictEqual(replica.since(1).map(event => event.seq), [2, 3]);
+
+  // 快照之后广播的事件按序追加，重复的事件被忽略
+  assert.strictEqual(replica.adopt(primary.append({ eventType: 'updated', path: 'f0.txt' })), true);
+  assert.strictEqual(replica.adopt({ seq: 4, eventType: 'updated', path: 'f0.txt' }), false);
+  assert.deepStrictEqual(replica.since(2).map(event => event.seq), [3, 4]);
+
+  // 缺口之前的历史不再可用
+  replica.adopt({ seq: 7, eventType: 'deleted', path: 'f1.txt' });
+  assert.strictEqual(replica.lastSeq, 7);
+  assert.deepStrictEqual(replica.since(6).map(event => event.seq), [7]);
+  assert.strictEqual(replica.since(4), null);
+});
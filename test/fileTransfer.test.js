@@ -0,0 +1,67 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { copyTree, moveTree, isSameOrInside, parseDestination } = require('../src/modules/fileTransfer');
+
+const withTempDir = async (fn) => {
+  const root = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-transfer-'));
+  try {
+    await fn(root);
+  } finally {
+    fs.rmSync(root, { recursive: true, force: true });
+  }
+};
+
+const createTree = (root) => {
+  fs.mkdirSync(path.join(root, 'src', 'deep'), { recursive: true });
+  fs.writeFileSync(path.join(root, 'src', 'a.txt'), 'a');
+  fs.writeFileSync(path.join(root, 'src', 'deep', 'b.txt'), 'bb');
+};
+
+test('parseDestination strips the scheme, host and query', () => {
+  assert.strictEqual(parseDestination('http://host:8080/dir/file%20name.txt?x=1'), '/dir/file%20name.txt');
+  assert.strictEqual(parseDestination('/dir/file.txt'), '/dir/file.txt');
+  assert.strictEqual(parseDestination('https://host'), '/');
+  assert.strictEqual(parseDestination(undefined), null);
+});
+
+test('isSameOrInside detects nested destinations', () => {
+  assert.strictEqual(isSameOrInside('/up/a', '/up/a'), true);
+  assert.strictEqual(isSameOrInside('/up/a', '/up/a/b'), true);
+  assert.strictEqual(isSameOrInside('/up/a', '/up/ab'), false);
+});
+
+test('copyTree copies a whole collection, or only the collection at depth 0', () => withTempDir(async (root) => {
+  createTree(root);
+
+  const counts = await copyTree(path.join(root, 'src'), path.join(root, 'copy'));
+  assert.deepStrictEqual(counts, { files: 2, directories: 2 });
+  assert.strictEqual(fs.readFileSync(path.join(root, 'copy', 'deep', 'b.txt'), 'utf8'), 'bb');
+  assert.strictEqual(fs.readFileSync(path.join(root, 'src', 'a.txt'), 'utf8'), 'a');
+
+  await copyTree(path.join(root, 'src'), path.join(root, 'shallow'), { depth: 0 });
+  assert.deepStrictEqual(fs.readdirSync(path.join(root, 'shallow')), []);
+}));
+
+test('copyTree skips symlinks that would point outside the root at their new depth', () => withTempDir(async (root) => {
+  const uploadDir = path.join(root, 'uploads');
+  createTree(uploadDir);
+  fs.symlinkSync(path.join('..', '..', 'a.txt'), path.join(uploadDir, 'src', 'deep', 'up.txt'));
+  fs.symlinkSync('b.txt', path.join(uploadDir, 'src', 'deep', 'same.txt'));
+
+  // deep/up.txt 在原位置指向 uploads/a.txt，复制到上一层后会指向 uploads 之外
+  await copyTree(path.join(uploadDir, 'src', 'deep'), path.join(uploadDir, 'shallow'), { rootDir: uploadDir });
+  assert.deepStrictEqual(fs.readdirSync(path.join(uploadDir, 'shallow')).sort(), ['b.txt', 'same.txt']);
+  assert.strictEqual(fs.readlinkSync(path.join(uploadDir, 'shallow', 'same.txt')), 'b.txt');
+}));
+
+test('moveTree renames a collection in place', () => withTempDir(async (root) => {
+  createTree(root);
+  const inode = fs.statSync(path.join(root, 'src', 'a.txt')).ino;
+
+  assert.deepStrictEqual(await moveTree(path.join(root, 'src'), path.join(root, 'moved')), { renamed: true });
+  assert.strictEqual(fs.existsSync(path.join(root, 'src')), false);
+  assert.strictEqual(fs.statSync(path.join(root, 'moved', 'a.txt')).ino, inode);
+}));
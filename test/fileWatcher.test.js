@@ -0,0 +1,115 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const EventEmitter = require('events');
+const { FileWatcher, isPathCovered } = require('../src/modules/fileWatcher');
+
+// 模拟chokidar：记录创建的监视实例，测试中手动触发ready和文件事件
+const createFakeChokidar = () => {
+  const instances = [];
+  return {
+    instances,
+    watch(watchPath, options) {
+      const instance = new EventEmitter();
+      instance.path = watchPath;
+      instance.options = options;
+      instance.closed = false;
+      instance.close = () => {
+        instance.closed = true;
+      };
+      instance.getWatched = () => ({ [watchPath]: [] });
+      instances.push(instance);
+      return instance;
+    }
+  };
+};
+
+const createWatcher = (chokidar, options = {}) => new FileWatcher({
+  roots: ['/data'],
+  mode: 'auto',
+  pollIntervalMs: 0,
+  loadChokidar: () => chokidar,
+  readInotifyLimit: () => 1000,
+  countInotifyWatches: () => 0,
+  ...options
+});
+
+const settle = () => new Promise(resolve => setImmediate(resolve));
+
+test('FileWatcher registers native watches lazily with reference counting', async () => {
+  const chokidar = createFakeChokidar();
+  const watcher = createWatcher(chokidar);
+  watcher.estimateDirectories = async () => 10;
+  const coverage = [];
+  watcher.on('coverage', value => coverage.push(value));
+  watcher.start();
+  assert.strictEqual(chokidar.instances.length, 0);
+
+  watcher.acquire({ path: '/data/docs', recursive: true });
+  watcher.acquire({ path: '/data/docs', recursive: true });
+  await settle();
+  assert.strictEqual(chokidar.instances.length, 1);
+  assert.strictEqual(isPathCovered(watcher.getCoverage(), '/data/docs/a.txt'), false); // 就绪前仍未覆盖
+
+  chokidar.instances[0].emit('ready');
+  assert.deepStrictEqual(coverage.pop(), { polling: false, roots: [{ path: '/data/docs', recursive: true }] });
+  assert.strictEqual(isPathCovered(watcher.getCoverage(), '/data/docs/a/b.txt'), true);
+  assert.strictEqual(isPathCovered(watcher.getCoverage(), '/data/other.txt'), false);
+
+  watcher.release({ path: '/data/docs', recursive: true });
+  assert.strictEqual(chokidar.instances[0].closed, false);
+  watcher.release({ path: '/data/docs', recursive: true });
+  assert.strictEqual(chokidar.instances[0].closed, true);
+  assert.deepStrictEqual(coverage.pop(), { polling: false, roots: [] });
+  watcher.close();
+});
+
+test('FileWatcher reports nested watch events once', async () => {
+  const chokidar = createFakeChokidar();
+  const watcher = createWatcher(chokidar);
+  watcher.estimateDirectories = async () => 1;
+  const events = [];
+  watcher.on('event', (eventType, filePath) => events.push([eventType, filePath]));
+  watcher.start();
+
+  watcher.acquire({ path: '/data', recursive: true });
+  watcher.acquire({ path: '/data/docs', recursive: false });
+  await settle();
+  chokidar.instances.forEach(instance => instance.emit('ready'));
+  const outer = chokidar.instances.find(instance => instance.path === '/data');
+  const inner = chokidar.instances.find(instance => instance.path === '/data/docs');
+
+  // 两个实例都收到同一个变化，只由外层的递归监视报告
+  inner.emit('add', '/data/docs/a.txt');
+  outer.emit('add', '/data/docs/a.txt');
+  assert.deepStrictEqual(events, [['created', '/data/docs/a.txt']]);
+
+  watcher.release({ path: '/data', recursive: true });
+  inner.emit('change', '/data/docs/a.txt');
+  assert.deepStrictEqual(events[1], ['updated', '/data/docs/a.txt']);
+  watcher.close();
+});
+
+test('FileWatcher falls back to polling when the inotify budget is exhausted', async () => {
+  const chokidar = createFakeChokidar();
+  const watcher = createWatcher(chokidar, { countInotifyWatches: () => 790 });
+  watcher.estimateDirectories = async () => 20;
+  watcher.start();
+
+  watcher.acquire({ path: '/data/big', recursive: true });
+  await settle();
+  assert.strictEqual(chokidar.instances.length, 0);
+  const stats = watcher.getStats();
+  assert.strictEqual(stats.budgetFallbacks, 1);
+  assert.strictEqual(stats.pollingRoots, 1);
+  assert.deepStrictEqual(stats.inotify, { limit: 1000, inUse: 790, remaining: 210, budget: 800 });
+
+  // ENOSPC 同样回退
+  watcher.acquire({ path: '/data/small', recursive: false });
+  await settle();
+  chokidar.instances[0].emit('ready');
+  chokidar.instances[0].emit('error', Object.assign(new Error('limit'), { code: 'ENOSPC' }));
+  assert.strictEqual(chokidar.instances[0].closed, true);
+  assert.strictEqual(watcher.getStats().nativeFailed, 1);
+  assert.deepStrictEqual(watcher.getCoverage().roots, []);
+  watcher.close();
+});
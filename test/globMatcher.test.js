@@ -0,0 +1,40 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const { globToRegExp, parsePatternList, createIgnoreMatcher } = require('../src/modules/globMatcher');
+
+test('globToRegExp supports *, **, ?, classes and alternatives', () => {
+  assert.ok(globToRegExp('*.log').test('server.log'));
+  assert.ok(!globToRegExp('*.log').test('logs/server.log'));
+  assert.ok(globToRegExp('backups/**/*.bak').test('backups/a/b/db.bak'));
+  assert.ok(globToRegExp('backups/**/*.bak').test('backups/db.bak'));
+  assert.ok(globToRegExp('file?.txt').test('file1.txt'));
+  assert.ok(!globToRegExp('file?.txt').test('file10.txt'));
+  assert.ok(globToRegExp('[!a]*.txt').test('b.txt'));
+  assert.ok(!globToRegExp('[!a]*.txt').test('a.txt'));
+  assert.ok(globToRegExp('*.{jpg,png}').test('photo.png'));
+  assert.ok(!globToRegExp('a.b').test('axb'));
+});
+
+test('createIgnoreMatcher matches names at any depth and ignores descendants', () => {
+  const isIgnored = createIgnoreMatcher(['.*', 'node_modules', '*.tmp', 'venv/', 'build/output']);
+  assert.ok(isIgnored('.git'));
+  assert.ok(isIgnored('project/.git/config'));
+  assert.ok(isIgnored('project/node_modules/pkg/index.js'));
+  assert.ok(isIgnored('a/b/upload.tmp'));
+  assert.ok(isIgnored('build/output/app.js'));
+  assert.ok(!isIgnored('src/build/output/app.js')); // 含/的模式相对于根目录
+  // 只按完整名称匹配，不再因为路径中包含 tmp、env 等片段而被忽略
+  assert.ok(!isIgnored('templates/environment.txt'));
+  assert.ok(!isIgnored('tmpfiles/data.json'));
+  // 以/结尾的模式只匹配目录
+  assert.ok(isIgnored('project/venv', true));
+  assert.ok(!isIgnored('project/venv', false));
+  assert.ok(isIgnored('project/venv/lib/site.py'));
+});
+
+test('parsePatternList splits comma separated patterns', () => {
+  assert.deepStrictEqual(parsePatternList(' *.log, node_modules ,,'), ['*.log', 'node_modules']);
+  assert.strictEqual(parsePatternList(''), null);
+  assert.strictEqual(parsePatternList(undefined), null);
+  assert.deepStrictEqual(createIgnoreMatcher([])('anything'), false);
+});
@@ -0,0 +1,65 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { Writable } = require('stream');
+const { parseRangeHeader, isRangeFresh, buildMultipartRanges, streamMultipartRanges } = require('../src/modules/httpRange');
+
+test('parseRangeHeader handles single, open-ended, suffix and multiple ranges', () => {
+  assert.deepStrictEqual(parseRangeHeader('bytes=0-9', 100), [{ start: 0, end: 9 }]);
+  assert.deepStrictEqual(parseRangeHeader('bytes=90-', 100), [{ start: 90, end: 99 }]);
+  assert.deepStrictEqual(parseRangeHeader('bytes=-500', 100), [{ start: 0, end: 99 }]);
+  assert.deepStrictEqual(parseRangeHeader('bytes=95-200', 100), [{ start: 95, end: 99 }]);
+  assert.deepStrictEqual(parseRangeHeader('bytes=50-59, 0-9', 100), [{ start: 0, end: 9 }, { start: 50, end: 59 }]);
+  // 重叠和相邻的范围合并
+  assert.deepStrictEqual(parseRangeHeader('bytes=0-9,10-19,15-30', 100), [{ start: 0, end: 30 }]);
+});
+
+test('parseRangeHeader distinguishes ignorable from unsatisfiable ranges', () => {
+  assert.strictEqual(parseRangeHeader('items=0-9', 100), null);
+  assert.strictEqual(parseRangeHeader('bytes=9-0', 100), null);
+  assert.strictEqual(parseRangeHeader('bytes=abc', 100), null);
+  assert.deepStrictEqual(parseRangeHeader('bytes=100-', 100), []);
+  assert.deepStrictEqual(parseRangeHeader('bytes=-0', 100), []);
+  assert.deepStrictEqual(parseRangeHeader('bytes=0-', 0), []);
+});
+
+test('isRangeFresh compares strong ETags and exact dates', () => {
+  const stats = { mtimeMs: Date.parse('2024-01-01T00:00:00Z') + 250 };
+  assert.strictEqual(isRangeFresh(undefined, '"a"', stats), true);
+  assert.strictEqual(isRangeFresh('"a"', '"a"', stats), true);
+  assert.strictEqual(isRangeFresh('"b"', '"a"', stats), false);
+  assert.strictEqual(isRangeFresh('W/"a"', '"a"', stats), false);
+  assert.strictEqual(isRangeFresh('Mon, 01 Jan 2024 00:00:00 GMT', '"a"', stats), true);
+  assert.strictEqual(isRangeFresh('Sun, 31 Dec 2023 00:00:00 GMT', '"a"', stats), false);
+});
+
+test('streamMultipartRanges writes exactly the advertised Content-Length', async () => {
+  const root = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-range-'));
+  const filePath = path.join(root, 'data.bin');
+  fs.writeFileSync(filePath, 'abcdefghijklmnopqrstuvwxyz');
+
+  try {
+    const multipart = buildMultipartRanges([{ start: 0, end: 2 }, { start: 23, end: 25 }], 26, 'text/plain');
+    const chunks = [];
+    const res = new Writable({
+      highWaterMark: 4,
+      write(chunk, encoding, callback) {
+        chunks.push(Buffer.from(chunk));
+        setImmediate(callback);
+      }
+    });
+    const finished = new Promise(resolve => res.on('finish', resolve));
+    assert.strictEqual(await streamMultipartRanges(res, filePath, multipart), true);
+    await finished;
+
+    const body = Buffer.concat(chunks).toString();
+    assert.strictEqual(Buffer.byteLength(body), multipart.contentLength);
+    const boundary = multipart.contentType.split('boundary=')[1];
+    assert.match(body, new RegExp(`Content-Range: bytes 0-2/26\\r\\n\\r\\nabc\\r\\n--${boundary}\\r\\n`));
+    assert.match(body, new RegExp(`Content-Range: bytes 23-25/26\\r\\n\\r\\nxyz\\r\\n--${boundary}--\\r\\n$`));
+  } finally {
+    fs.rmSync(root, { recursive: true, force: true });
+  }
+});
@@ -0,0 +1,58 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const { IoScheduler, QueueFullError } = require('../src/modules/ioScheduler');
+
+test('IoScheduler enforces global and per-client limits', async () => {
+  const scheduler = new IoScheduler({ maxConcurrent: 3, maxPerClient: 2 });
+  const releaseA1 = await scheduler.acquire('a');
+  await scheduler.acquire('a');
+
+  let a3Granted = false;
+  scheduler.acquire('a').then(() => { a3Granted = true; });
+  // a 已达到每客户端上限，但 b 仍可以立即获得空闲的许可
+  await scheduler.acquire('b');
+  await new Promise(setImmediate);
+  assert.strictEqual(a3Granted, false);
+  assert.strictEqual(scheduler.getStats().activeStreams, 3);
+  assert.strictEqual(scheduler.getStats().queuedRequests, 1);
+
+  releaseA1();
+  await new Promise(setImmediate);
+  assert.strictEqual(a3Granted, true);
+  releaseA1(); // 重复释放无效
+  assert.strictEqual(scheduler.getStats().activeStreams, 3);
+});
+
+test('IoScheduler hands out freed slots round-robin across clients', async () => {
+  const scheduler = new IoScheduler({ maxConcurrent: 1 });
+  const release = await scheduler.acquire('x');
+  const order = [];
+  const waiters = ['a', 'a', 'a', 'b', 'b', 'c'].map((client, i) =>
+    scheduler.acquire(client).then((done) => {
+      order.push(client);
+      setImmediate(done);
+    }));
+
+  release();
+  await Promise.all(waiters);
+  assert.deepStrictEqual(order, ['a', 'b', 'c', 'a', 'b', 'a']);
+});
+
+test('IoScheduler bounds reserved buffers, queue length and drops aborted waiters', async () => {
+  const scheduler = new IoScheduler({ maxConcurrent: 10, maxQueueLength: 1, bufferBudget: 100 });
+  const release = await scheduler.acquire('a', { bytes: 80 });
+
+  const controller = new AbortController();
+  const waiting = scheduler.acquire('b', { bytes: 40, signal: controller.signal });
+  await assert.rejects(scheduler.acquire('c', { bytes: 10 }), QueueFullError);
+
+  controller.abort();
+  await assert.rejects(waiting, { name: 'AbortError' });
+  assert.strictEqual(scheduler.getStats().queuedRequests, 0);
+
+  release();
+  assert.strictEqual(scheduler.getStats().reservedBytes, 0);
+  const stats = scheduler.getStats();
+  assert.strictEqual(stats.rejected, 1);
+  assert.strictEqual(stats.aborted, 1);
+});
@@ -0,0 +1,598 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+SDAV负载测试与基准测试脚本
+在 test.py 单客户端功能测试的基础上，用 asyncio 同时驱动：
+  - 数千个WebSocket订阅者（混合 /**、/* 和精确路径订阅）
+  - 并发的 PUT / GET / PROPFIND 请求
+报告吞吐量、事件到通知的延迟和各HTTP方法的 p50/p99 延迟，以及服务器进程的内存（RSS），
+结果保存为JSON，可用 --compare 比较两次提交的结果
+默认在临时 UPLOAD_DIR 上启动本地服务器（node src/server.js），也可用 --url 测试已运行的服务器
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import shlex
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_arguments(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='SDAV负载测试与基准测试脚本')
+
+    # 服务器配置
+    parser.add_argument('--url', '-u', type=str, default=os.getenv('TEST_URL', ''),
+                        help='已运行的服务器地址（例如 http://localhost:3000）；不指定时启动本地服务器')
+    parser.add_argument('--username', '-n', type=str,
+                        default=os.getenv('TEST_USERNAME', 'bench'),
+                        help='用户名 (默认: bench)')
+    parser.add_argument('--password', '-p', type=str,
+                        default=os.getenv('TEST_PASSWORD', 'bench'),
+                        help='密码 (默认: bench)')
+    parser.add_argument('--server-cmd', type=str,
+                        default=os.getenv('BENCH_SERVER_CMD', 'node src/server.js'),
+                        help='启动本地服务器的命令，在仓库根目录执行 (默认: node src/server.js)')
+    parser.add_argument('--server-env', action='append', default=[], metavar='KEY=VALUE',
+                        help='传给本地服务器的环境变量，可重复 (例如 --server-env WORKER_COUNT=4)')
+    parser.add_argument('--ws-path', type=str, default=os.getenv('WS_PATH', '/ws'),
+                        help='WebSocket路径 (默认: /ws)')
+
+    # 负载配置
+    parser.add_argument('--subscribers', type=int, default=int(os.getenv('BENCH_SUBSCRIBERS', '2000')),
+                        help='WebSocket订阅者数量，按 /**、/*、精确路径轮流分配 (默认: 2000)')
+    parser.add_argument('--root-subscribers', type=int, default=10,
+                        help='额外订阅 /** 根目录、接收全部事件的订阅者数量 (默认: 10)')
+    parser.add_argument('--dirs', type=int, default=100, help='测试目录数量 (默认: 100)')
+    parser.add_argument('--files-per-dir', type=int, default=10, help='每个目录中被写入的文件数量 (默认: 10)')
+    parser.add_argument('--file-size', type=int, default=4096, help='PUT的文件大小，字节 (默认: 4096)')
+    parser.add_argument('--writers', type=int, default=8, help='并发PUT数量 (默认: 8)')
+    parser.add_argument('--readers', type=int, default=8, help='并发GET数量 (默认: 8)')
+    parser.add_argument('--listers', type=int, default=4, help='并发PROPFIND数量 (默认: 4)')
+    parser.add_argument('--duration', type=float, default=float(os.getenv('BENCH_DURATION', '30')),
+                        help='负载持续时间，秒 (默认: 30)')
+    parser.add_argument('--settle', type=float, default=3.0,
+                        help='负载结束后等待剩余通知到达的时间，秒 (默认: 3)')
+    parser.add_argument('--connect-concurrency', type=int, default=200,
+                        help='同时建立的WebSocket连接数量 (默认: 200)')
+    parser.add_argument('--seed', type=int, default=1, help='随机数种子 (默认: 1)')
+
+    # 输出
+    parser.add_argument('--label', type=str, default='', help='写入结果文件的标签')
+    parser.add_argument('--output', '-o', type=str, default='',
+                        help='结果JSON路径 (默认: load_test_<提交>_<时间>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help='比较两个结果JSON，不运行测试')
+    parser.add_argument('--debug', action='store_true',
+                        default=(os.getenv('DEBUG', '').lower() in ('true', '1', 'yes')),
+                        help='输出服务器日志和调试信息')
+
+    return parser.parse_args(argv)
+
+
+def percentiles(values):
+    """最近秩百分位数（毫秒），values 为秒"""
+    if not values:
+        return {'count': 0, 'p50': 0, 'p90': 0, 'p99': 0, 'max': 0, 'mean': 0}
+    ordered = sorted(values)
+    count = len(ordered)
+
+    def rank(q):
+        return round(ordered[max(0, min(count - 1, int(q * count + 0.999999) - 1))] * 1000, 3)
+
+    return {
+        'count': count,
+        'p50': rank(0.5),
+        'p90': rank(0.9),
+        'p99': rank(0.99),
+        'max': round(ordered[-1] * 1000, 3),
+        'mean': round(sum(ordered) / count * 1000, 3)
+    }
+
+
+def git_revision():
+    """当前提交和工作区是否有未提交的修改"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip() != ''
+        return {'commit': commit, 'dirty': dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': 'unknown', 'dirty': False}
+
+
+def raise_file_limit():
+    """数千个连接需要较高的文件描述符上限"""
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft != resource.RLIM_INFINITY and (hard == resource.RLIM_INFINITY or soft < hard):
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def process_tree_rss(pid):
+    """进程及其子进程（集群工作进程）的RSS之和，字节；不支持 /proc 时返回 None"""
+    try:
+        children = {}
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    # 进程名可能包含空格，从最后一个 ')' 之后解析
+                    fields = f.read().rsplit(')', 1)[1].split()
+                children.setdefault(int(fields[1]), []).append(int(entry))
+            except (OSError, IndexError):
+                continue
+        total = 0
+        pending = [pid]
+        while pending:
+            current = pending.pop()
+            try:
+                with open(f'/proc/{current}/status') as f:
+                    for line in f:
+                        if line.startswith('VmRSS:'):
+                            total += int(line.split()[1]) * 1024
+                            break
+            except OSError:
+                continue
+            pending.extend(children.get(current, []))
+        return total
+    except OSError:
+        return None
+
+
+class LocalServer:
+    """在临时 UPLOAD_DIR 上启动的本地服务器"""
+
+    def __init__(self, command, username, password, extra_env, debug=False):
+        self.command = command
+        self.port = free_port()
+        self.upload_dir = tempfile.mkdtemp(prefix='sdav-load-')
+        self.env = {
+            **os.environ,
+            'PORT': str(self.port),
+            'HOST': '127.0.0.1',
+            'UPLOAD_DIR': self.upload_dir,
+            'USERNAME': username,
+            'PASSWORD': password,
+            'LOG_LEVEL': 'debug' if debug else 'warn'
+        }
+        for item in extra_env:
+            key, _, value = item.partition('=')
+            self.env[key] = value
+        self.debug = debug
+        self.process = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def start(self):
+        output = None if self.debug else subprocess.DEVNULL
+        self.process = subprocess.Popen(shlex.split(self.command), cwd=REPO_ROOT, env=self.env,
+                                        stdout=output, stderr=output)
+
+    def rss(self):
+        return process_tree_rss(self.process.pid) if self.process else None
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        shutil.rmtree(self.upload_dir, ignore_errors=True)
+
+
+class LoadTester:
+    def __init__(self, args, server_url, server=None):
+        self.args = args
+        self.server_url = server_url.rstrip('/')
+        self.ws_url = self.server_url.replace('http', 'ws', 1) + args.ws_path
+        self.server = server
+        credentials = base64.b64encode(f'{args.username}:{args.password}'.encode()).decode()
+        self.headers = {
+            'Authorization': f'Basic {credentials}',
+            'User-Agent': 'SSync Load Tester 0.1.0'
+        }
+        self.random = random.Random(args.seed)
+        self.payload = bytes(self.random.getrandbits(8) for _ in range(args.file_size))
+
+        # 被写入的文件：路径（与通知中的相对路径格式一致）-> (写入开始时间, 代数)
+        self.files = [f'bench/dir{d}/file{f}.txt' for d in range(args.dirs) for f in range(args.files_per_dir)]
+        self.issued = {}
+        self.busy = set()  # 正在写入的文件，同一文件不并发写入，以免通知无法对应到写入
+        self.delivered = set()  # 至少一个订阅者收到通知的 (路径, 代数)
+
+        self.generation = 0
+        self.writes = 0
+        self.running = False  # 负载阶段：工作协程继续发请求
+        self.recording = False  # 记录延迟：负载阶段和之后等待剩余通知的时间
+        self.sockets = []
+        self.notifications = 0
+        self.notify_latencies = []
+        self.http_latencies = {'PUT': [], 'GET': [], 'PROPFIND': []}
+        self.http_errors = {'PUT': 0, 'GET': 0, 'PROPFIND': 0}
+        self.subscribe_failures = 0
+        self.rss_samples = []
+        self.loop_lag = []
+
+    def subscription_for(self, index):
+        """第 index 个订阅者的订阅路径：按 /**、/*、精确路径轮流分配到各个目录"""
+        directory = index % self.args.dirs
+        kind = (index // self.args.dirs) % 3
+        if kind == 0:
+            return f'/bench/dir{directory}/**'
+        if kind == 1:
+            return f'/bench/dir{directory}/*'
+        return f'/bench/dir{directory}/file{(index // (self.args.dirs * 3)) % self.args.files_per_dir}.txt'
+
+    async def wait_until_ready(self, session, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.server and self.server.process.poll() is not None:
+                raise RuntimeError(f'服务器进程已退出 (退出码: {self.server.process.returncode})')
+            try:
+                async with session.request('PROPFIND', self.server_url + '/', headers={'Depth': '0'}) as response:
+                    await response.read()
+                    if response.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+        raise RuntimeError('等待服务器启动超时')
+
+    async def prepare_files(self, session):
+        """创建测试目录并写入初始文件，之后的PUT都是覆盖写"""
+        for collection in ['/bench/'] + [f'/bench/dir{d}/' for d in range(self.args.dirs)]:
+            async with session.request('MKCOL', self.server_url + collection) as response:
+                await response.read()
+                if response.status not in (200, 201, 204, 405):
+                    raise RuntimeError(f'MKCOL {collection} 失败 (状态码: {response.status})')
+        semaphore = asyncio.Semaphore(32)
+
+        async def put(file_path):
+            async with semaphore:
+                async with session.put(f'{self.server_url}/{file_path}', data=self.payload) as response:
+                    await response.read()
+
+        await asyncio.gather(*(put(file_path) for file_path in self.files))
+
+    async def subscriber(self, session, subscription, semaphore, ready):
+        """单个订阅者：连接（请求头认证）、订阅，然后记录每个通知的延迟"""
+        try:
+            async with semaphore:
+                ws = await session.ws_connect(self.ws_url, headers=self.headers, heartbeat=None,
+                                              max_msg_size=0)
+                await ws.send_str(json.dumps({'type': 'subscribe', 'path': subscription}))
+                while True:
+                    message = await ws.receive()
+                    if message.type != aiohttp.WSMsgType.TEXT:
+                        raise RuntimeError(f'订阅 {subscription} 时连接关闭')
+                    data = json.loads(message.data)
+                    if data.get('type') == 'subscriptionConfirmed':
+                        break
+                    if data.get('type') in ('subscriptionError', 'error'):
+                        raise RuntimeError(data.get('message'))
+        except Exception as e:
+            self.subscribe_failures += 1
+            if self.args.debug:
+                print(f'[DEBUG] 订阅失败: {subscription}: {e}')
+            ready.release()
+            return
+        self.sockets.append(ws)
+        ready.release()
+
+        seen = {}  # 路径 -> 本订阅者已记录的代数
+        async for message in ws:
+            if message.type != aiohttp.WSMsgType.TEXT:
+                break
+            received_at = time.perf_counter()
+            data = json.loads(message.data)
+            if data.get('type') != 'fileChange':
+                continue
+            self.notifications += 1
+            file_path = data.get('path', '').lstrip('/').replace('\\', '/')
+            issued = self.issued.get(file_path)
+            if issued is None or seen.get(file_path) == issued[1]:
+                continue
+            seen[file_path] = issued[1]
+            self.delivered.add((file_path, issued[1]))
+            if self.recording:
+                self.notify_latencies.append(received_at - issued[0])
+
+    async def timed_request(self, session, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            async with session.request(method, url, **kwargs) as response:
+                await response.read()
+                ok = response.status < 400
+        except aiohttp.ClientError:
+            ok = False
+        if not self.recording:
+            return
+        if ok:
+            self.http_latencies[method].append(time.perf_counter() - started)
+        else:
+            self.http_errors[method] += 1
+
+    async def writer(self, session):
+        while self.running:
+            file_path = self.random.choice(self.files)
+            if file_path in self.busy:
+                await asyncio.sleep(0)
+                continue
+            self.busy.add(file_path)
+            self.generation += 1
+            self.writes += 1
+            self.issued[file_path] = (time.perf_counter(), self.generation)
+            await self.timed_request(session, 'PUT', f'{self.server_url}/{file_path}', data=self.payload)
+            self.busy.discard(file_path)
+
+    async def reader(self, session):
+        while self.running:
+            await self.timed_request(session, 'GET', f'{self.server_url}/{self.random.choice(self.files)}')
+
+    async def lister(self, session):
+        while self.running:
+            directory = self.random.randrange(self.args.dirs)
+            await self.timed_request(session, 'PROPFIND', f'{self.server_url}/bench/dir{directory}/',
+                                     headers={'Depth': '1'})
+
+    async def sample_server(self, interval=1.0):
+        """每秒采样服务器RSS，同时记录本进程事件循环的延迟（过高说明测试客户端本身已饱和）"""
+        while self.running:
+            expected = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            self.loop_lag.append(max(0.0, time.perf_counter() - expected))
+            rss = self.server.rss() if self.server else None
+            if rss:
+                self.rss_samples.append(rss)
+
+    async def fetch_server_metrics(self, session):
+        """通过WebSocket getMetrics 获取服务器端的运行指标"""
+        try:
+            async with session.ws_connect(self.ws_url, headers=self.headers) as ws:
+                await ws.send_str(json.dumps({'type': 'getMetrics'}))
+                while True:
+                    message = await asyncio.wait_for(ws.receive(), timeout=10)
+                    if message.type != aiohttp.WSMsgType.TEXT:
+                        return None
+                    data = json.loads(message.data)
+                    if data.get('type') == 'metrics':
+                        return data.get('metrics')
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+
+    async def run(self):
+        args = self.args
+        http_session = aiohttp.ClientSession(
+            headers=self.headers,
+            connector=aiohttp.TCPConnector(limit=args.writers + args.readers + args.listers + 32))
+        ws_session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0))
+        try:
+            await self.wait_until_ready(http_session)
+            await self.prepare_files(http_session)
+
+            # 建立订阅
+            total = args.subscribers + args.root_subscribers
+            subscriptions = [self.subscription_for(i) for i in range(args.subscribers)]
+            subscriptions += ['/**'] * args.root_subscribers
+            print(f'建立 {total} 个WebSocket订阅者...')
+            ready = asyncio.Semaphore(0)
+            connect_started = time.perf_counter()
+            semaphore = asyncio.Semaphore(args.connect_concurrency)
+            subscriber_tasks = [asyncio.create_task(self.subscriber(ws_session, subscription, semaphore, ready))
+                                for subscription in subscriptions]
+            for _ in range(total):
+                await ready.acquire()
+            connect_seconds = time.perf_counter() - connect_started
+            print(f'订阅完成: {len(self.sockets)} 成功, {self.subscribe_failures} 失败, 用时 {connect_seconds:.1f}秒')
+            baseline_rss = self.server.rss() if self.server else None
+
+            # 负载阶段
+            print(f'运行负载 {args.duration:.0f} 秒 (PUT {args.writers}, GET {args.readers}, '
+                  f'PROPFIND {args.listers} 并发)...')
+            self.running = True
+            self.recording = True
+            started = time.perf_counter()
+            workers = [asyncio.create_task(self.writer(http_session)) for _ in range(args.writers)]
+            workers += [asyncio.create_task(self.reader(http_session)) for _ in range(args.readers)]
+            workers += [asyncio.create_task(self.lister(http_session)) for _ in range(args.listers)]
+            sampler = asyncio.create_task(self.sample_server())
+            await asyncio.sleep(args.duration)
+            self.running = False
+            elapsed = time.perf_counter() - started
+            await asyncio.gather(*workers, sampler)
+
+            # 等待负载阶段写入的剩余通知，仍然计入延迟
+            await asyncio.sleep(args.settle)
+            self.recording = False
+
+            server_metrics = await self.fetch_server_metrics(ws_session)
+            final_rss = self.server.rss() if self.server else None
+            for ws in self.sockets:
+                await ws.close()
+            await asyncio.gather(*subscriber_tasks, return_exceptions=True)
+        finally:
+            await http_session.close()
+            await ws_session.close()
+
+        return self.build_result(elapsed, connect_seconds, baseline_rss, final_rss, server_metrics)
+
+    def build_result(self, elapsed, connect_seconds, baseline_rss, final_rss, server_metrics):
+        args = self.args
+        http = {}
+        for method, latencies in self.http_latencies.items():
+            http[method] = {
+                'requests': len(latencies),
+                'errors': self.http_errors[method],
+                'perSec': round(len(latencies) / elapsed, 1),
+                'latencyMs': percentiles(latencies)
+            }
+        rss_samples = self.rss_samples or ([final_rss] if final_rss else [])
+        if server_metrics and not rss_samples:
+            # 测试远程服务器时使用服务器自己报告的RSS
+            rss = server_metrics.get('instrumentation', {}).get('gauges', {}).get('process_resident_memory_bytes')
+            rss_samples = [rss] if rss else []
+        return {
+            'label': args.label,
+            **git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'config': {
+                'serverCommand': args.server_cmd if self.server else None,
+                'serverUrl': None if self.server else self.server_url,
+                'serverEnv': args.server_env,
+                'subscribers': args.subscribers,
+                'rootSubscribers': args.root_subscribers,
+                'dirs': args.dirs,
+                'filesPerDir': args.files_per_dir,
+                'fileSize': args.file_size,
+                'writers': args.writers,
+                'readers': args.readers,
+                'listers': args.listers,
+                'durationSec': args.duration,
+                'seed': args.seed
+            },
+            'subscribers': {
+                'connected': len(self.sockets),
+                'failed': self.subscribe_failures,
+                'connectSec': round(connect_seconds, 2)
+            },
+            'throughput': {
+                'requestsPerSec': round(sum(len(v) for v in self.http_latencies.values()) / elapsed, 1),
+                'notificationsPerSec': round(self.notifications / elapsed, 1)
+            },
+            'notifications': {
+                'received': self.notifications,
+                'writesNotified': len(self.delivered),
+                'writes': self.writes,
+                # 写入开始到订阅者收到通知的时间；每个订阅者对每次写入只计一次
+                'latencyMs': percentiles(self.notify_latencies)
+            },
+            'http': http,
+            'serverRssBytes': {
+                'baseline': baseline_rss,
+                'peak': max(rss_samples) if rss_samples else None,
+                'final': final_rss
+            },
+            'clientLoopLagMs': percentiles(self.loop_lag),
+            'serverMetrics': server_metrics
+        }
+
+
+def print_summary(result):
+    print('\n负载测试结果:')
+    print(f"- 订阅者: {result['subscribers']['connected']} 成功, {result['subscribers']['failed']} 失败")
+    print(f"- 请求吞吐量: {result['throughput']['requestsPerSec']}/秒, "
+          f"通知吞吐量: {result['throughput']['notificationsPerSec']}/秒")
+    latency = result['notifications']['latencyMs']
+    print(f"- 事件到通知延迟: p50 {latency['p50']}ms, p99 {latency['p99']}ms "
+          f"({result['notifications']['writesNotified']}/{result['notifications']['writes']} 次写入收到通知)")
+    for method, stats in result['http'].items():
+        print(f"- {method}: {stats['perSec']}/秒, p50 {stats['latencyMs']['p50']}ms, "
+              f"p99 {stats['latencyMs']['p99']}ms, 错误 {stats['errors']}")
+    rss = result['serverRssBytes']
+    if rss['peak']:
+        print(f"- 服务器RSS: 峰值 {rss['peak'] / 1048576:.1f}MB")
+    if result['clientLoopLagMs']['p99'] > 100:
+        print('⚠️ 测试客户端的事件循环延迟较高，结果可能受客户端本身限制，请减少订阅者数量或并发数')
+
+
+# --compare 比较的指标：(名称, 取值路径, 越大越好)
+COMPARED_METRICS = [
+    ('请求/秒', ('throughput', 'requestsPerSec'), True),
+    ('通知/秒', ('throughput', 'notificationsPerSec'), True),
+    ('通知延迟 p50 (ms)', ('notifications', 'latencyMs', 'p50'), False),
+    ('通知延迟 p99 (ms)', ('notifications', 'latencyMs', 'p99'), False),
+] + [
+    (f'{method} {p} (ms)', ('http', method, 'latencyMs', p), False)
+    for method in ('PUT', 'GET', 'PROPFIND') for p in ('p50', 'p99')
+] + [
+    ('服务器RSS峰值 (MB)', ('serverRssBytes', 'peak'), False),
+]
+
+
+def compare_results(baseline_path, current_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(current_path) as f:
+        current = json.load(f)
+    print(f"基准: {baseline.get('commit', 'unknown')[:10]} {baseline.get('label', '')}")
+    print(f"当前: {current.get('commit', 'unknown')[:10]} {current.get('label', '')}")
+    if baseline.get('config') != current.get('config'):
+        print('⚠️ 两次测试的配置不同，结果不能直接比较')
+
+    def lookup(result, keys):
+        for key in keys:
+            result = result.get(key) if isinstance(result, dict) else None
+        return result
+
+    for name, keys, higher_is_better in COMPARED_METRICS:
+        before, after = lookup(baseline, keys), lookup(current, keys)
+        if before is None or after is None:
+            continue
+        if keys[-1] == 'peak':
+            before, after = before / 1048576, after / 1048576
+        change = (after - before) / before * 100 if before else 0.0
+        better = change > 0 if higher_is_better else change < 0
+        marker = '' if abs(change) < 5 else ('✅' if better else '❌')
+        print(f'  {name:<24} {before:>12.2f} -> {after:>12.2f}  ({change:+.1f}%) {marker}')
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    if args.compare:
+        compare_results(*args.compare)
+        return
+
+    raise_file_limit()
+    server = None
+    if args.url:
+        server_url = args.url if args.url.startswith('http') else f'http://{args.url}'
+    else:
+        server = LocalServer(args.server_cmd, args.username, args.password, args.server_env, args.debug)
+        server.start()
+        server_url = server.url
+        print(f'本地服务器: {server_url} (UPLOAD_DIR={server.upload_dir})')
+
+    try:
+        result = asyncio.run(LoadTester(args, server_url, server).run())
+    finally:
+        if server:
+            server.stop()
+
+    print_summary(result)
+    output = args.output or f"load_test_{result['commit'][:10]}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f'\n结果已保存到 {output}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
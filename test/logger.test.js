@@ -0,0 +1,102 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { BufferedSink, LogOutput, Logger } = require('../src/modules/logger');
+
+// 只记录写入的行，不输出
+const createOutput = (options = {}) => {
+  const stdout = [];
+  const stderr = [];
+  const output = new LogOutput({
+    stdout: { push: line => stdout.push(line) },
+    stderr: { push: line => stderr.push(line) },
+    ...options
+  });
+  return { output, stdout, stderr };
+};
+
+test('Logger filters by level and only builds enabled messages', () => {
+  const { output, stdout, stderr } = createOutput({ level: 'info' });
+  const log = new Logger('Test', output);
+  let built = 0;
+
+  log.debug(() => {
+    built++;
+    return 'expensive';
+  });
+  log.info(() => {
+    built++;
+    return 'started';
+  }, { port: 3000 });
+  log.error('failed');
+
+  assert.strictEqual(built, 1);
+  assert.strictEqual(stdout.length, 1);
+  assert.match(stdout[0], /^\S+ INFO {2}\[Test\] started port=3000\n$/);
+  assert.strictEqual(stderr.length, 1);
+  assert.match(stderr[0], /ERROR \[Test\] failed\n$/);
+
+  output.setLevel('debug');
+  assert.strictEqual(log.isEnabled('debug'), true);
+  assert.strictEqual(log.isEnabled('trace'), false);
+});
+
+test('Logger samples per-event debug lines unless tracing', () => {
+  const { output, stdout } = createOutput({ level: 'debug', sampleEvery: 3 });
+  const log = new Logger('Test', output);
+  for (let i = 1; i <= 7; i++) {
+    log.sampledDebug('event', `event ${i}`);
+    log.sampledDebug('other', `other ${i}`);
+  }
+  assert.deepStrictEqual(stdout.filter(line => line.includes('event')).map(line => line.split('] ')[1]), [
+    'event 1 sampled=1/3\n',
+    'event 4 sampled=1/3\n',
+    'event 7 sampled=1/3\n'
+  ]);
+  assert.strictEqual(stdout.filter(line => line.includes('other')).length, 3);
+
+  stdout.length = 0;
+  output.setLevel('trace');
+  for (let i = 0; i < 5; i++) {
+    log.sampledDebug('event', 'traced');
+  }
+  assert.strictEqual(stdout.length, 5);
+});
+
+test('Logger writes JSON records with serialized errors', () => {
+  const { output, stderr } = createOutput({ format: 'json' });
+  new Logger('Test', output).error('request failed', { error: new Error('boom'), status: 500 });
+  const record = JSON.parse(stderr[0]);
+  assert.strictEqual(record.level, 'error');
+  assert.strictEqual(record.scope, 'Test');
+  assert.strictEqual(record.msg, 'request failed');
+  assert.strictEqual(record.status, 500);
+  assert.match(record.error, /^Error: boom/);
+});
+
+test('BufferedSink writes asynchronously and reports dropped lines', async () => {
+  const dir = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-logger-'));
+  const filePath = path.join(dir, 'out.log');
+  const fd = fs.openSync(filePath, 'w');
+  try {
+    const sink = new BufferedSink({ fd, maxBufferBytes: 20 });
+    assert.strictEqual(sink.push('first line\n'), true);
+    assert.strictEqual(sink.push('second line\n'), false); // 超出缓冲上限
+    assert.strictEqual(fs.readFileSync(filePath, 'utf8'), ''); // 不在调用方的同步路径上写入
+
+    await new Promise(resolve => setTimeout(resolve, 50));
+    const lines = fs.readFileSync(filePath, 'utf8').split('\n');
+    assert.strictEqual(lines[0], 'first line');
+    assert.match(lines[1], /Dropped 1 log lines/);
+    assert.strictEqual(sink.getStats().linesDropped, 1);
+
+    sink.push('at exit\n');
+    sink.flushSync();
+    assert.match(fs.readFileSync(filePath, 'utf8'), /at exit\n$/);
+  } finally {
+    fs.closeSync(fd);
+    fs.rmSync(dir, { recursive: true, force: true });
+  }
+});
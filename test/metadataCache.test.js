@@ -0,0 +1,105 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { MetadataCache } = require('../src/modules/metadataCache');
+
+const withTempDir = async (fn) => {
+  const root = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-metadata-'));
+  try {
+    await fn(root);
+  } finally {
+    fs.rmSync(root, { recursive: true, force: true });
+  }
+};
+
+test('MetadataCache serves repeated stat and readdir calls from memory', () => withTempDir(async (root) => {
+  const cache = new MetadataCache({ ttlMs: 60000 });
+  const filePath = path.join(root, 'a.txt');
+  fs.writeFileSync(filePath, 'x');
+
+  assert.strictEqual((await cache.stat(filePath)).size, 1);
+  assert.deepStrictEqual(await cache.readdir(root), ['a.txt']);
+
+  // 未经失效时，磁盘上的变化不可见
+  fs.writeFileSync(filePath, 'xyz');
+  fs.writeFileSync(path.join(root, 'b.txt'), '');
+  assert.strictEqual((await cache.stat(filePath)).size, 1);
+  assert.deepStrictEqual(await cache.readdir(root), ['a.txt']);
+
+  const stats = cache.getStats();
+  assert.strictEqual(stats.hits, 2);
+  assert.strictEqual(stats.misses, 2);
+  assert.strictEqual(stats.hitRate, 0.5);
+}));
+
+test('MetadataCache invalidates the changed path and its parent listing', () => withTempDir(async (root) => {
+  const cache = new MetadataCache({ ttlMs: 60000 });
+  const filePath = path.join(root, 'a.txt');
+  assert.strictEqual(await cache.statOrNull(filePath), null);
+  assert.deepStrictEqual(await cache.readdir(root), []);
+
+  fs.writeFileSync(filePath, 'xyz');
+  cache.handleFileEvent('created', filePath);
+
+  assert.strictEqual((await cache.stat(filePath)).size, 3);
+  assert.deepStrictEqual(await cache.readdir(root), ['a.txt']);
+}));
+
+test('MetadataCache drops a whole subtree when a directory is deleted', () => withTempDir(async (root) => {
+  const cache = new MetadataCache({ ttlMs: 60000 });
+  const dirPath = path.join(root, 'sub');
+  fs.mkdirSync(path.join(dirPath, 'deep'), { recursive: true });
+  fs.writeFileSync(path.join(dirPath, 'deep', 'c.txt'), 'c');
+  await cache.stat(path.join(dirPath, 'deep', 'c.txt'));
+  await cache.readdir(path.join(dirPath, 'deep'));
+  await cache.readdir(root);
+
+  fs.rmSync(dirPath, { recursive: true });
+  cache.handleFileEvent('directoryDeleted', dirPath);
+
+  assert.strictEqual(await cache.statOrNull(path.join(dirPath, 'deep', 'c.txt')), null);
+  assert.deepStrictEqual(await cache.readdir(root), []);
+}));
+
+test('MetadataCache bypasses paths it cannot keep coherent and evicts least recently used entries', () => withTempDir(async (root) => {
+  const ignored = path.join(root, 'ignored.txt');
+  fs.writeFileSync(ignored, 'x');
+  const cache = new MetadataCache({
+    maxEntries: 2,
+    ttlMs: 60000,
+    isCacheable: (filePath) => filePath !== ignored
+  });
+
+  await cache.stat(ignored);
+  fs.writeFileSync(ignored, 'xy');
+  assert.strictEqual((await cache.stat(ignored)).size, 2);
+  assert.strictEqual(cache.getStats().entries, 0);
+
+  for (const name of ['a', 'b', 'c']) {
+    fs.writeFileSync(path.join(root, name), '');
+  }
+  await cache.stat(path.join(root, 'a'));
+  await cache.stat(path.join(root, 'b'));
+  await cache.stat(path.join(root, 'a'));
+  await cache.stat(path.join(root, 'c'));
+
+  const stats = cache.getStats();
+  assert.strictEqual(stats.entries, 2);
+  assert.strictEqual(stats.evictions, 1);
+  // b 最久未使用，被淘汰
+  await cache.stat(path.join(root, 'a'));
+  assert.strictEqual(cache.getStats().hits, stats.hits + 1);
+}));
+
+test('MetadataCache does not store a result loaded across an invalidation', () => withTempDir(async (root) => {
+  const cache = new MetadataCache({ ttlMs: 60000 });
+  const filePath = path.join(root, 'a.txt');
+  fs.writeFileSync(filePath, 'x');
+
+  const pending = cache.stat(filePath);
+  cache.invalidate(filePath);
+  await pending;
+  assert.strictEqual(cache.getStats().entries, 0);
+}));
@@ -0,0 +1,90 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { Histogram, MetricsRegistry } = require('../src/modules/metrics');
+const { MetadataCache } = require('../src/modules/metadataCache');
+const SubscriptionManager = require('../src/modules/subscriptions');
+
+process.env.WATCHER_BACKEND = 'polling';
+
+test('Histogram reports percentiles within the bucket precision', () => {
+  const histogram = new Histogram();
+  for (let value = 1; value <= 10000; value++) {
+    histogram.record(value);
+  }
+  const snapshot = histogram.snapshot();
+  assert.strictEqual(snapshot.count, 10000);
+  assert.strictEqual(snapshot.min, 1);
+  assert.strictEqual(snapshot.max, 10000);
+  for (const [percentile, expected] of [['p50', 5000], ['p90', 9000], ['p99', 9900]]) {
+    assert.ok(Math.abs(snapshot[percentile] - expected) / expected <= 0.125, `${percentile} = ${snapshot[percentile]}`);
+  }
+  assert.strictEqual(histogram.countBelowPowerOfTwo(10), 1023);
+  histogram.record(2 ** 40);
+  assert.strictEqual(histogram.snapshot().max, 2 ** 40);
+});
+
+test('MetricsRegistry exports Prometheus text and a matching JSON snapshot', () => {
+  const registry = new MetricsRegistry();
+  const latency = registry.histogram('webdav_request_duration', 'Request latency', { labelName: 'method' });
+  latency.record(1500, 'GET'); // 微秒
+  latency.record(300, 'GET');
+  latency.record(50000, 'PUT');
+  registry.gauge('ws_clients', 'Connected clients', () => 3);
+  registry.gauge('event_loop_lag_seconds', 'Lag', () => [['p99', 0.002]], 'stat');
+
+  const text = registry.toPrometheus();
+  assert.match(text, /# TYPE sdav_ws_clients gauge\nsdav_ws_clients 3\n/);
+  assert.match(text, /sdav_event_loop_lag_seconds\{stat="p99"\} 0.002\n/);
+  assert.match(text, /# TYPE sdav_webdav_request_duration_seconds histogram\n/);
+  assert.match(text, /sdav_webdav_request_duration_seconds_bucket\{method="GET",le="0.000512"\} 1\n/);
+  assert.match(text, /sdav_webdav_request_duration_seconds_bucket\{method="GET",le="\+Inf"\} 2\n/);
+  assert.match(text, /sdav_webdav_request_duration_seconds_sum\{method="PUT"\} 0.05\n/);
+  assert.match(text, /sdav_webdav_request_duration_seconds_count\{method="PUT"\} 1\n/);
+
+  const snapshot = registry.snapshot();
+  assert.strictEqual(snapshot.histograms.webdav_request_duration_seconds.GET.count, 2);
+  assert.strictEqual(snapshot.histograms.webdav_request_duration_seconds.PUT.max, 0.05);
+  assert.deepStrictEqual(snapshot.gauges, { ws_clients: 3, event_loop_lag_seconds: { p99: 0.002 } });
+
+  const disabled = new MetricsRegistry({ enabled: false });
+  disabled.histogram('event_match', 'Matcher time').record(10);
+  assert.deepStrictEqual(disabled.snapshot().histograms, {});
+});
+
+test('MetadataCache reports the duration of filesystem calls it makes', async () => {
+  const root = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-metrics-'));
+  const observed = [];
+  const cache = new MetadataCache({ observe: (operation, durationMs) => observed.push([operation, durationMs]) });
+  try {
+    await cache.stat(root);
+    await cache.stat(root); // 命中缓存，不再调用文件系统
+    await cache.readdir(root);
+    await assert.rejects(cache.stat(path.join(root, 'missing')));
+    await new Promise(resolve => setImmediate(resolve));
+    assert.deepStrictEqual(observed.map(([operation]) => operation), ['stat', 'readdir', 'stat']);
+    assert.ok(observed.every(([, durationMs]) => durationMs >= 0));
+  } finally {
+    fs.rmSync(root, { recursive: true, force: true });
+  }
+});
+
+test('SubscriptionManager records fan-out and matcher time per event', () => {
+  const uploadDir = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-metrics-'));
+  const registry = new MetricsRegistry();
+  const manager = new SubscriptionManager(uploadDir, { metrics: registry });
+  try {
+    const client = { readyState: 1, bufferedAmount: 0, send() {} };
+    manager.subscribe(client, '/docs/**');
+    manager.handleFileEvent('created', path.join(uploadDir, 'docs', 'a.txt'), null);
+    manager.handleFileEvent('created', path.join(uploadDir, 'other', 'b.txt'), null);
+    const { histograms } = registry.snapshot();
+    assert.strictEqual(histograms.event_fanout_seconds.all.count, 2);
+    assert.strictEqual(histograms.event_match_seconds.all.count, 2);
+  } finally {
+    manager.close();
+    fs.rmSync(uploadDir, { recursive: true, force: true });
+  }
+});
@@ -0,0 +1,107 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const { OutboundQueue } = require('../src/modules/outboundQueue');
+
+// 模拟WebSocket客户端：发送的数据计入bufferedAmount，直到手动flush
+const createClient = () => {
+  const client = {
+    readyState: 1,
+    bufferedAmount: 0,
+    sent: [],
+    callbacks: [],
+    send(data, options, callback) {
+      this.sent.push(data.toString());
+      this.bufferedAmount += data.length;
+      this.callbacks.push(callback);
+    },
+    flush() {
+      this.bufferedAmount = 0;
+      const callbacks = this.callbacks;
+      this.callbacks = [];
+      callbacks.forEach(callback => callback());
+    }
+  };
+  return client;
+};
+
+test('OutboundQueue sends directly while under the high-water mark', () => {
+  const client = createClient();
+  const queue = new OutboundQueue(client, { highWaterMark: 100, maxQueueLength: 2 });
+  queue.push(Buffer.from('a'), 'a.txt');
+  queue.push(Buffer.from('b'), 'b.txt');
+  assert.deepStrictEqual(client.sent, ['a', 'b']);
+  assert.strictEqual(queue.getStats().queueDepth, 0);
+});
+
+test('OutboundQueue queues behind a slow client and drains in order', () => {
+  const client = createClient();
+  const queue = new OutboundQueue(client, { highWaterMark: 4, maxQueueLength: 10 });
+  queue.push(Buffer.from('12345'), 'a.txt');
+  queue.push(Buffer.from('b'), 'b.txt');
+  queue.push(Buffer.from('c'), 'c.txt');
+  assert.deepStrictEqual(client.sent, ['12345']);
+  assert.strictEqual(queue.getStats().queueDepth, 2);
+
+  client.flush();
+  assert.deepStrictEqual(client.sent, ['12345', 'b', 'c']);
+  assert.strictEqual(queue.getStats().queueDepth, 0);
+});
+
+test('OutboundQueue replaces an overflowing backlog with one resyncRequired', () => {
+  const client = createClient();
+  const queue = new OutboundQueue(client, { highWaterMark: 4, maxQueueLength: 2 });
+  queue.push(Buffer.from('12345'), 'docs/a.txt');
+  queue.push(Buffer.from('b'), 'docs/b.txt');
+  queue.push(Buffer.from('c'), 'photos/c.jpg');
+  queue.push(Buffer.from('d'), 'photos/d.jpg'); // 溢出
+  queue.push(Buffer.from('e'), 'e.txt'); // 等待重新同步期间被丢弃
+
+  const stats = queue.getStats();
+  assert.strictEqual(stats.framesDropped, 4);
+  assert.strictEqual(stats.queueDepth, 0);
+  assert.strictEqual(stats.resyncPending, true);
+
+  client.flush();
+  const resync = JSON.parse(client.sent[client.sent.length - 1]);
+  assert.strictEqual(resync.type, 'resyncRequired');
+  assert.strictEqual(resync.droppedEvents, 4);
+  assert.deepStrictEqual(resync.directories.sort(), ['/', '/docs', '/photos']);
+  assert.strictEqual(queue.getStats().resyncsSent, 1);
+
+  // 重新同步后恢复逐条发送
+  client.flush();
+  queue.push(Buffer.from('f'), 'f.txt');
+  assert.strictEqual(client.sent[client.sent.length - 1], 'f');
+});
+
+test('OutboundQueue keeps draining from push when a send callback is lost', () => {
+  const client = createClient();
+  const queue = new OutboundQueue(client, { highWaterMark: 4, maxQueueLength: 10 });
+  queue.push(Buffer.from('12345'), 'a.txt');
+  queue.push(Buffer.from('b'), 'b.txt');
+  assert.deepStrictEqual(client.sent, ['12345']);
+
+  // 缓冲区已经写出，但发送回调没有到达
+  client.bufferedAmount = 0;
+  client.callbacks = [];
+  queue.push(Buffer.from('c'), 'c.txt');
+  assert.deepStrictEqual(client.sent, ['12345', 'b', 'c']);
+  assert.strictEqual(queue.getStats().queueDepth, 0);
+});
+
+test('OutboundQueue closes on a socket error and drops its backlog', () => {
+  const client = createClient();
+  const errors = [];
+  const queue = new OutboundQueue(client, { highWaterMark: 4, maxQueueLength: 10, onError: (err) => errors.push(err) });
+  queue.push(Buffer.from('12345'), 'a.txt');
+  queue.push(Buffer.from('b'), 'b.txt');
+  client.callbacks.forEach(callback => callback(new Error('socket hang up')));
+  client.callbacks = [];
+
+  assert.strictEqual(errors.length, 1);
+  assert.strictEqual(queue.getStats().closed, true);
+  assert.strictEqual(queue.getStats().queueDepth, 0);
+  client.bufferedAmount = 0;
+  queue.push(Buffer.from('c'), 'c.txt');
+  assert.deepStrictEqual(client.sent, ['12345']);
+});
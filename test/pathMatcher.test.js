@@ -0,0 +1,118 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const path = require('path');
+const { isPathMatch, SubscriptionIndex } = require('../src/modules/pathMatcher');
+
+// 固定种子的伪随机数，保证差分测试可复现
+const createRandom = (seed) => () => {
+  seed = (seed * 1103515245 + 12345) & 0x7fffffff;
+  return seed / 0x7fffffff;
+};
+
+const SEGMENTS = ['a', 'b', 'rime', 'scal', 'x.txt', 'a*', '..', '.', 'dir name'];
+
+const randomRelativePath = (random) => {
+  const depth = Math.floor(random() * 5);
+  const segments = [];
+  for (let i = 0; i < depth; i++) {
+    segments.push(SEGMENTS[Math.floor(random() * SEGMENTS.length)]);
+  }
+  return segments.join('/');
+};
+
+const randomSubscriptionPath = (random) => {
+  const base = '/' + randomRelativePath(random);
+  const suffix = ['', '/', '/*', '/**'][Math.floor(random() * 4)];
+  // 与 validateSubscriptionPath 相同的规范化方式
+  return path.normalize((base + suffix).replace(/\\/g, '/'));
+};
+
+// 用原始的逐个比较方式计算期望结果
+const bruteForceMatch = (subscriptions, relativePath) => {
+  const result = new Map();
+  for (const [client, paths] of subscriptions) {
+    const matched = [...paths].filter(subscriptionPath => isPathMatch(relativePath, subscriptionPath));
+    if (matched.length > 0) {
+      result.set(client, matched.sort());
+    }
+  }
+  return result;
+};
+
+const sortedMatch = (index, relativePath) => {
+  const result = new Map();
+  for (const [client, paths] of index.match(relativePath)) {
+    result.set(client, [...paths].sort());
+  }
+  return result;
+};
+
+test('SubscriptionIndex matches isPathMatch on documented patterns', () => {
+  const index = new SubscriptionIndex();
+  const client = { id: 1 };
+  const subscriptions = ['/', '/**', '/*', '/rime', '/rime/', '/rime/**', '/rime/*', '/scal/a.txt'];
+  for (const subscriptionPath of subscriptions) {
+    index.add(client, subscriptionPath);
+  }
+
+  for (const relativePath of ['', 'file.txt', 'rime', 'rime/a.txt', 'rime/sub/b.txt', 'scal/a.txt', 'scal/a.txt.bak', 'scal/a.txt/c']) {
+    const expected = subscriptions.filter(subscriptionPath => isPathMatch(relativePath, subscriptionPath)).sort();
+    const actual = (index.match(relativePath).get(client) || []).slice().sort();
+    assert.deepStrictEqual(actual, expected, `path ${relativePath}`);
+  }
+});
+
+test('SubscriptionIndex agrees with isPathMatch on random subscriptions and events', () => {
+  const random = createRandom(42);
+  const index = new SubscriptionIndex();
+  const subscriptions = new Map();
+  const clients = Array.from({ length: 20 }, (_, id) => ({ id }));
+
+  for (let round = 0; round < 2000; round++) {
+    const client = clients[Math.floor(random() * clients.length)];
+    const subscriptionPath = randomSubscriptionPath(random);
+    if (!subscriptions.has(client)) {
+      subscriptions.set(client, new Set());
+    }
+    const paths = subscriptions.get(client);
+
+    // 随机地添加或移除订阅，验证增量维护的正确性
+    if (paths.has(subscriptionPath) && random() < 0.5) {
+      paths.delete(subscriptionPath);
+      assert.strictEqual(index.remove(client, subscriptionPath), true);
+    } else if (!paths.has(subscriptionPath)) {
+      paths.add(subscriptionPath);
+      index.add(client, subscriptionPath);
+    }
+
+    const relativePath = randomRelativePath(random);
+    assert.deepStrictEqual(sortedMatch(index, relativePath), bruteForceMatch(subscriptions, relativePath),
+      `path ${relativePath}`);
+  }
+});
+
+test('SubscriptionIndex falls back to isPathMatch for non-canonical input', () => {
+  const index = new SubscriptionIndex();
+  const client = { id: 1 };
+  const subscriptions = ['//a//**', '/a*b', './c', '/d//*'];
+  for (const subscriptionPath of subscriptions) {
+    index.add(client, subscriptionPath);
+  }
+
+  for (const relativePath of ['a', 'a//b', '/a/b', 'a/', './c/x', 'a*b', 'd//e', 'd/e']) {
+    const expected = subscriptions.filter(subscriptionPath => isPathMatch(relativePath, subscriptionPath)).sort();
+    const actual = (index.match(relativePath).get(client) || []).slice().sort();
+    assert.deepStrictEqual(actual, expected, `path ${relativePath}`);
+  }
+});
+
+test('SubscriptionIndex prunes empty branches on removal', () => {
+  const index = new SubscriptionIndex();
+  const client = { id: 1 };
+  index.add(client, '/a/b/c/**');
+  index.add(client, '/a/*');
+  index.removeClient(client, ['/a/b/c/**', '/a/*']);
+  assert.strictEqual(index.size, 0);
+  assert.strictEqual(index.root.children.size, 0);
+  assert.strictEqual(index.remove(client, '/a/*'), false);
+});
@@ -0,0 +1,82 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { PollingScanner } = require('../src/modules/pollingScanner');
+
+const createScanner = (root, options = {}) => {
+  const events = [];
+  const scanner = new PollingScanner({
+    roots: [root],
+    isIgnored: (filePath) => path.basename(filePath).startsWith('.'),
+    onEvent: (eventType, filePath) => events.push([eventType, path.relative(root, filePath)]),
+    ...options
+  });
+  return { scanner, events };
+};
+
+// 确保mtime变化可被观察到（部分文件系统的时间精度较低）
+const touchLater = (filePath, content) => {
+  fs.writeFileSync(filePath, content);
+  const future = new Date(Date.now() + 5000);
+  fs.utimesSync(filePath, future, future);
+};
+
+test('PollingScanner reports created, updated and deleted entries after a silent baseline', async () => {
+  const root = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-scan-'));
+  fs.mkdirSync(path.join(root, 'docs'));
+  fs.writeFileSync(path.join(root, 'docs', 'a.txt'), 'a');
+  fs.writeFileSync(path.join(root, 'docs', 'b.txt'), 'b');
+  const { scanner, events } = createScanner(root);
+
+  await scanner.scan(true);
+  assert.deepStrictEqual(events, []);
+  assert.strictEqual(scanner.getStats().indexedEntries, 4);
+
+  touchLater(path.join(root, 'docs', 'a.txt'), 'changed');
+  fs.rmSync(path.join(root, 'docs', 'b.txt'));
+  fs.mkdirSync(path.join(root, 'new'));
+  fs.writeFileSync(path.join(root, 'new', 'c.txt'), 'c');
+  fs.writeFileSync(path.join(root, '.hidden'), 'ignored');
+  await scanner.scan(false);
+
+  assert.deepStrictEqual(events.sort(), [
+    ['created', path.join('new', 'c.txt')],
+    ['deleted', path.join('docs', 'b.txt')],
+    ['directoryCreated', 'new'],
+    ['updated', path.join('docs', 'a.txt')]
+  ]);
+
+  events.length = 0;
+  fs.rmSync(path.join(root, 'new'), { recursive: true });
+  await scanner.scan(false);
+  assert.deepStrictEqual(events, [['directoryDeleted', 'new']]);
+  assert.strictEqual(scanner.countIndexedDirectories(root), 2);
+  fs.rmSync(root, { recursive: true, force: true });
+});
+
+test('PollingScanner skips excluded subtrees and rebaselines them silently', async () => {
+  const root = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-scan-'));
+  const hot = path.join(root, 'hot');
+  fs.mkdirSync(hot);
+  let excluded = false;
+  const { scanner, events } = createScanner(root, { isExcluded: (filePath) => excluded && filePath === hot });
+  await scanner.scan(true);
+
+  // 原生监视期间的变化由原生监视报告，扫描器不重复报告
+  excluded = true;
+  fs.writeFileSync(path.join(hot, 'a.txt'), 'a');
+  await scanner.scan(false);
+  assert.deepStrictEqual(events, []);
+
+  excluded = false;
+  scanner.rebaseline(hot);
+  await scanner.scan(false);
+  assert.deepStrictEqual(events, []);
+
+  fs.writeFileSync(path.join(hot, 'b.txt'), 'b');
+  await scanner.scan(false);
+  assert.deepStrictEqual(events, [['created', path.join('hot', 'b.txt')]]);
+  fs.rmSync(root, { recursive: true, force: true });
+});
@@ -0,0 +1,72 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { Writable } = require('stream');
+const { parseDepth, streamPropfind, formatPropfindResponse, toResource } = require('../src/modules/propfind');
+const { computeEtag } = require('../src/modules/conditionalRequest');
+
+const collectPropfind = async (filePath, depth) => {
+  let body = '';
+  const res = new Writable({
+    highWaterMark: 16,
+    write(chunk, encoding, callback) {
+      body += chunk.toString();
+      setImmediate(callback);
+    }
+  });
+  const finished = new Promise(resolve => res.on('finish', resolve));
+  await streamPropfind(res, { filePath, href: '/root', stats: fs.statSync(filePath), depth, concurrency: 2 });
+  await finished;
+  return [...body.matchAll(/<D:href>([^<]*)<\/D:href>/g)].map(match => match[1]).sort();
+};
+
+test('parseDepth understands 0, 1 and infinity', () => {
+  assert.strictEqual(parseDepth('0'), 0);
+  assert.strictEqual(parseDepth('1'), 1);
+  assert.strictEqual(parseDepth('Infinity'), Infinity);
+  assert.strictEqual(parseDepth(undefined), 1);
+});
+
+test('streamPropfind honours the requested depth', async () => {
+  const root = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-propfind-'));
+  fs.mkdirSync(path.join(root, 'sub', 'deep'), { recursive: true });
+  fs.writeFileSync(path.join(root, 'a&b.txt'), 'x');
+  fs.writeFileSync(path.join(root, 'sub', 'c.txt'), 'y');
+  fs.writeFileSync(path.join(root, 'sub', 'deep', 'd.txt'), 'z');
+
+  try {
+    assert.deepStrictEqual(await collectPropfind(root, 0), ['/root']);
+    assert.deepStrictEqual(await collectPropfind(root, 1), ['/root', '/root/a&amp;b.txt', '/root/sub']);
+    assert.deepStrictEqual(await collectPropfind(root, Infinity), [
+      '/root', '/root/a&amp;b.txt', '/root/sub', '/root/sub/c.txt', '/root/sub/deep', '/root/sub/deep/d.txt'
+    ]);
+  } finally {
+    fs.rmSync(root, { recursive: true, force: true });
+  }
+});
+
+test('streamPropfind does not loop on a symlink cycle', async () => {
+  const root = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-propfind-'));
+  fs.mkdirSync(path.join(root, 'sub'));
+  fs.writeFileSync(path.join(root, 'sub', 'c.txt'), 'y');
+  fs.symlinkSync(root, path.join(root, 'sub', 'loop'), 'dir');
+
+  try {
+    // 链接本身作为条目列出，但不进入它指向的（已遍历的）目录
+    assert.deepStrictEqual(await collectPropfind(root, Infinity), ['/root', '/root/sub', '/root/sub/c.txt', '/root/sub/loop']);
+  } finally {
+    fs.rmSync(root, { recursive: true, force: true });
+  }
+});
+
+test('formatPropfindResponse exposes known content hashes as checksums', () => {
+  const stats = fs.statSync(__filename);
+  const hash = 'ab'.repeat(32);
+  const xml = formatPropfindResponse(toResource('/file.js', stats, hash));
+  // ETag只由文件状态决定，哈希算完前后不变
+  assert.ok(xml.includes(`<D:getetag>${computeEtag(stats)}</D:getetag>`));
+  assert.match(xml, /<oc:checksums><oc:checksum>SHA256:(ab){32}<\/oc:checksum><\/oc:checksums>/);
+  assert.doesNotMatch(formatPropfindResponse(toResource('/file.js', stats, null)), /oc:checksums/);
+});
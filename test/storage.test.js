@@ -0,0 +1,45 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const { parseSize } = require('../src/config/storage');
+
+test('parseSize understands the units used in docker-compose.yml', () => {
+  assert.strictEqual(parseSize('1mb', 0), 1024 * 1024);
+  assert.strictEqual(parseSize('128M', 0), 128 * 1024 * 1024);
+  assert.strictEqual(parseSize('64k', 0), 64 * 1024);
+  assert.strictEqual(parseSize('4096', 0), 4096);
+  assert.strictEqual(parseSize(undefined, 7), 7);
+  assert.strictEqual(parseSize('lots', 7), 7);
+});
+
+// 以给定的环境变量重新加载配置模块
+const loadStorageConfig = (env) => {
+  const modulePath = require.resolve('../src/config/storage');
+  const saved = {};
+  for (const key of Object.keys(env)) {
+    saved[key] = process.env[key];
+    process.env[key] = env[key];
+  }
+  delete require.cache[modulePath];
+  try {
+    return require(modulePath);
+  } finally {
+    for (const [key, value] of Object.entries(saved)) {
+      if (value === undefined) {
+        delete process.env[key];
+      } else {
+        process.env[key] = value;
+      }
+    }
+    delete require.cache[modulePath];
+  }
+};
+
+test('Read buffers follow WEBDAV_READ_BUFFER_SIZE, not the write-side multiple', () => {
+  const defaults = loadStorageConfig({});
+  assert.strictEqual(defaults.readHighWaterMark, 1024 * 1024);
+  assert.strictEqual(defaults.writeHighWaterMark, 4 * 1024 * 1024);
+
+  const compose = loadStorageConfig({ WEBDAV_READ_BUFFER_SIZE: '512kb', WEBDAV_STREAM_CHUNK_SIZE: '1mb', FS_BUFFER_MULTIPLE: '4' });
+  assert.strictEqual(compose.readHighWaterMark, 512 * 1024);
+  assert.strictEqual(loadStorageConfig({ WEBDAV_READ_BUFFER_SIZE: '8mb', FS_READ_AHEAD: '2mb' }).readHighWaterMark, 2 * 1024 * 1024);
+});
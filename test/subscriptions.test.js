@@ -0,0 +1,98 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const SubscriptionManager = require('../src/modules/subscriptions');
+
+const createClient = () => {
+  const messages = [];
+  return {
+    messages,
+    readyState: 1,
+    bufferedAmount: 0,
+    send(frame, options, callback) {
+      messages.push(JSON.parse(frame.toString()));
+      if (typeof callback === 'function') {
+        callback();
+      }
+    }
+  };
+};
+
+test('subscribe rejects a sinceSeq that is not a non-negative integer', () => {
+  const uploadDir = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-subscriptions-'));
+  const manager = new SubscriptionManager(uploadDir);
+  try {
+    manager.handleFileEvent('created', path.join(uploadDir, 'docs', 'a.txt'), null);
+
+    for (const sinceSeq of [-1, 1.5, NaN, Infinity, '0', {}]) {
+      const client = createClient();
+      assert.strictEqual(manager.subscribe(client, '/docs/**', { sinceSeq }), false);
+      assert.deepStrictEqual(client.messages.map(message => message.type), ['subscriptionError']);
+    }
+
+    const client = createClient();
+    assert.strictEqual(manager.subscribe(client, '/docs/**', { sinceSeq: 0 }), true);
+    assert.strictEqual(client.messages[0].type, 'subscriptionConfirmed');
+    assert.ok(client.messages.some(message => message.type === 'fileChange' && message.seq === 1));
+    assert.strictEqual(manager.subscribe(createClient(), '/docs/**', { sinceSeq: null }), true);
+  } finally {
+    manager.close();
+    fs.rmSync(uploadDir, { recursive: true, force: true });
+  }
+});
+
+test('A server-side directory DELETE is published as a single event', async () => {
+  const uploadDir = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-subscriptions-'));
+  const manager = new SubscriptionManager(uploadDir);
+  const dirPath = path.join(uploadDir, 'docs', 'old');
+  fs.mkdirSync(path.join(dirPath, 'nested'), { recursive: true });
+  fs.writeFileSync(path.join(dirPath, 'a.txt'), 'a');
+  fs.writeFileSync(path.join(dirPath, 'nested', 'b.txt'), 'b');
+  try {
+    const client = createClient();
+    manager.subscribe(client, '/docs/**');
+    client.messages.length = 0;
+
+    manager.beginLocalTransfer('directoryDeleted', dirPath, null);
+    fs.rmSync(dirPath, { recursive: true });
+    // 监视器随后报告的逐个子项删除都是这次DELETE的回声
+    manager.handleWatcherEvent('deleted', path.join(dirPath, 'nested', 'b.txt'));
+    manager.handleWatcherEvent('deleted', path.join(dirPath, 'a.txt'));
+    manager.handleWatcherEvent('directoryDeleted', path.join(dirPath, 'nested'));
+    manager.publishLocalTransfer('directoryDeleted', dirPath, null);
+    manager.handleWatcherEvent('directoryDeleted', dirPath);
+    await new Promise(resolve => setImmediate(resolve));
+
+    assert.deepStrictEqual(client.messages.map(message => [message.eventType, message.path]), [
+      ['directoryDeleted', 'docs/old']
+    ]);
+  } finally {
+    manager.close();
+    fs.rmSync(uploadDir, { recursive: true, force: true });
+  }
+});
+
+test('A local write is journalled before the watcher can report its echo', async () => {
+  const uploadDir = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-subscriptions-'));
+  const manager = new SubscriptionManager(uploadDir);
+  const filePath = path.join(uploadDir, 'docs', 'a.txt');
+  fs.mkdirSync(path.dirname(filePath));
+  try {
+    const client = createClient();
+    manager.subscribe(client, '/docs/**');
+    client.messages.length = 0;
+
+    fs.writeFileSync(filePath, 'new');
+    manager.publishLocalChange('created', filePath, fs.statSync(filePath));
+    // 不经合并窗口（EVENT_COALESCE_WINDOW_MS=0）时，回声可能在发布的stat完成之前就被处理
+    manager.handleWatcherEvent('created', filePath);
+    await new Promise(resolve => setTimeout(resolve, 20));
+
+    assert.deepStrictEqual(client.messages.map(message => [message.eventType, message.path]), [['created', 'docs/a.txt']]);
+  } finally {
+    manager.close();
+    fs.rmSync(uploadDir, { recursive: true, force: true });
+  }
+});
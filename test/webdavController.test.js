@@ -0,0 +1,71 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const http = require('http');
+
+// 控制器依赖express和fs-extra，未安装依赖时跳过
+const missingDependency = ['express', 'fs-extra'].find((name) => {
+  try {
+    require.resolve(name);
+    return false;
+  } catch (err) {
+    return true;
+  }
+});
+
+const request = (port, method, urlPath, headers = {}) => new Promise((resolve, reject) => {
+  const req = http.request({ port, method, path: urlPath, headers }, (res) => {
+    res.resume();
+    res.on('end', () => resolve(res.statusCode));
+  });
+  req.on('error', reject);
+  req.end();
+});
+
+// 在临时上传目录上启动只挂载WebDAV处理器的服务器
+const startServer = async () => {
+  const express = require('express');
+  const webdavController = require('../src/controllers/webdavController');
+  const uploadDir = fs.mkdtempSync(path.join(os.tmpdir(), 'sdav-controller-'));
+  webdavController.setUploadDir(uploadDir);
+  const app = express();
+  webdavController.integrateWithExpress(app);
+  const server = app.listen(0);
+  await new Promise(resolve => server.once('listening', resolve));
+  return {
+    uploadDir,
+    port: server.address().port,
+    close: () => {
+      server.close();
+      fs.rmSync(uploadDir, { recursive: true, force: true });
+    }
+  };
+};
+
+test('COPY and MOVE refuse to overwrite the source, its ancestors or its descendants', { skip: missingDependency && `${missingDependency} is not installed` }, async () => {
+  const server = await startServer();
+  try {
+    fs.mkdirSync(path.join(server.uploadDir, 'a', 'b', 'c'), { recursive: true });
+    fs.writeFileSync(path.join(server.uploadDir, 'a', 'b', 'file.txt'), 'data');
+    const destination = (target) => ({ Destination: `http://localhost:${server.port}${target}`, Overwrite: 'T' });
+
+    for (const method of ['COPY', 'MOVE']) {
+      assert.strictEqual(await request(server.port, method, '/a/b', destination('/a')), 409);
+      assert.strictEqual(await request(server.port, method, '/a/b/file.txt', destination('/a/b')), 409);
+      assert.strictEqual(await request(server.port, method, '/a/b', destination('/a/b/c')), 409);
+      assert.strictEqual(await request(server.port, method, '/a/b', destination('/a/b')), 403);
+    }
+    // 源和它的上级目录都没有被删除
+    assert.strictEqual(fs.readFileSync(path.join(server.uploadDir, 'a', 'b', 'file.txt'), 'utf8'), 'data');
+    assert.ok(fs.statSync(path.join(server.uploadDir, 'a', 'b', 'c')).isDirectory());
+
+    // 正常的覆盖不受影响
+    fs.mkdirSync(path.join(server.uploadDir, 'd'));
+    assert.strictEqual(await request(server.port, 'COPY', '/a/b', destination('/d')), 204);
+    assert.strictEqual(fs.readFileSync(path.join(server.uploadDir, 'd', 'file.txt'), 'utf8'), 'data');
+  } finally {
+    server.close();
+  }
+});